@@ -4,6 +4,8 @@
 import os, json, dotenv
 from crewai import Agent, LLM
 from .tools import CalculateEmissionsTool, FetchBenchmarkDataTool
+from .hedging import model_override
+from .llm_governor import current_user, get_llm_governor
 import google.generativeai as genai
 
 # Load environment variables from .env file
@@ -50,6 +52,20 @@ llm_agent_1_profiler = llm_gpt_4_1_nano
 llm_agent_2_analyst = llm_gpt_4_1_nano
 llm_agent_3_planner = llm_gpt_4_1_nano  # Using the more powerful mini model for Agent 3
 
+
+class GovernedLLM(LLM):
+    """LLM whose requests go through the shared AIML endpoint governor (see agent.llm_governor)"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Captured now: agents with max_execution_time call the LLM on another thread
+        self.governor_user = current_user()
+    
+    def call(self, *args, **kwargs):
+        call = super().call
+        return get_llm_governor().call(lambda: call(*args, **kwargs), user_id=self.governor_user)
+
+
 ## Agent 1: User Profiler Agent
 # This agent analyzes user onboarding data, extracts insights from additional_info,
 # and creates an enriched profile with key carbon reduction levers and narrative summary
@@ -71,7 +87,7 @@ def create_profiler_agent():
                  "their lifestyle, motivations, and personal context in 70-90 words.",
         verbose=False,
         allow_delegation=False,
-        llm=llm_agent_1_profiler,
+        llm=GovernedLLM(model=model_override() or llm_agent_1_profiler),
         tools=[],
         max_iter=1,
         max_execution_time=120,
@@ -108,8 +124,8 @@ def create_analyst_agent():
         allow_delegation=False,
         
         # llm=llm_agent_2_analyst,
-        llm = LLM(
-                model="openai/gpt-4.1-nano-2025-04-14",
+        llm = GovernedLLM(
+                model=model_override() or "openai/gpt-4.1-nano-2025-04-14",
                 provider="openai",
                 api_key=os.getenv("AI_ML_API_KEY"),
                 base_url="https://api.aimlapi.com/v1",
@@ -124,8 +140,16 @@ def create_analyst_agent():
 ## Agent 3:
 # Weekly Action Planner Agent
 
-def create_planner_agent():
-    """Creates the Weekly Action Planner Agent"""
+def _print_step(step):
+    if hasattr(step, 'action'):
+        print(f"🔄 Agent step: {step.action}")
+
+def create_planner_agent(step_callback=None):
+    """Creates the Weekly Action Planner Agent
+    
+    Args:
+        step_callback: Called with each agent step (defaults to printing it)
+    """
     
     return Agent(
         role="Personal Sustainability Challenge Planner & Action Coach",
@@ -142,9 +166,9 @@ def create_planner_agent():
                  "individual user, while ensuring actions are trackable and lead to measurable environmental impact.",
         verbose=True,  # Enable verbose output
         allow_delegation=False,
-        llm=llm_agent_3_planner,  # GPT 4.1 Mini - more powerful for complex tasks
+        llm=GovernedLLM(model=model_override() or llm_agent_3_planner),  # GPT 4.1 Mini - more powerful for complex tasks
         tools=[],
         max_iter=5,  # Increased from 3 to 5 to allow more retries
         max_execution_time=300,  # Increased from 180 to 300 seconds (5 minutes)
-        step_callback=lambda step: print(f"🔄 Agent step: {step.action}") if hasattr(step, 'action') else None
+        step_callback=step_callback or _print_step
     )
\ No newline at end of file
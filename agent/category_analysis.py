@@ -0,0 +1,277 @@
+"""
+Per-category carbon analysis units.
+
+The analyst estimates the whole footprint in one LLM call, so changing a
+single onboarding answer used to recompute every category. The footprint
+is split here into category units (transportation, diet, home energy,
+shopping, digital), each tied to the onboarding sections it depends on.
+Every unit's estimate is cached with a fingerprint of those sections
+(agent_stage_results rows 'analyst.<category>'), so an update recomputes
+only the dirty units and re-aggregates the totals, sustainability score,
+top impact categories and regional comparison from the cached ones.
+
+Location shapes every estimate (grid mix, climate, regional average), so a
+location change still triggers a full analysis.
+
+The same units drive the analyst fan-out mode: every category estimate,
+the lever validations, insights, regional benchmark and fun facts run as
+separate concurrent calls, and assemble_analysis() merges them into the
+AnalystAgentOutput shape with the same deterministic aggregation.
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .fingerprint import section_fingerprint
+
+
+@dataclass(frozen=True)
+class CategoryUnit:
+    """One independently estimated emission category."""
+    name: str
+    breakdown_key: str
+    label: str
+    sections: Tuple[str, ...]
+
+    @property
+    def stage(self) -> str:
+        return f"analyst.{self.name}"
+
+
+CATEGORY_UNITS = (
+    CategoryUnit('transportation', 'transportation_kg', 'Transportation', ('transportation', 'travel')),
+    CategoryUnit('diet', 'diet_kg', 'Diet', ('diet',)),
+    CategoryUnit('home_energy', 'home_energy_kg', 'Home Energy', ('household',)),
+    CategoryUnit('shopping', 'shopping_kg', 'Shopping', ('consumption',)),
+    CategoryUnit('digital', 'digital_footprint_kg', 'Digital Footprint', ('digital',)),
+)
+UNITS_BY_NAME = {unit.name: unit for unit in CATEGORY_UNITS}
+
+# 'other_kg' is not tied to any section and is carried over unchanged
+OTHER_KEY = 'other_kg'
+OTHER_LABEL = 'Other'
+
+# Sections every estimate depends on; cached under CONTEXT_STAGE
+CONTEXT_SECTIONS = ('location',)
+CONTEXT_STAGE = 'analyst.context'
+CATEGORY_STAGES = [unit.stage for unit in CATEGORY_UNITS] + [CONTEXT_STAGE]
+
+# Analysis fields recomputed by aggregate(); the rest (insights, facts,
+# lever validations) is carried over from the previous analysis
+AGGREGATED_FIELDS = (
+    'total_carbon_footprint_kg',
+    'total_carbon_footprint_tonnes',
+    'category_breakdown',
+    'top_impact_categories',
+    'sustainability_score',
+    'score_category',
+    'regional_comparison',
+)
+
+# Fallback regional average when the benchmark sub-analysis fails (global average)
+GLOBAL_AVERAGE_KG = 7000.0
+
+CONFIDENCE_LEVELS = ('low', 'medium', 'high')
+
+# Sustainability score bands of the benchmarking task:
+# (upper kg bound, score at the lower bound, score at the upper bound, category)
+SCORE_BANDS = (
+    (3000, 10.0, 9.0, 'Highly Sustainable'),
+    (6000, 8.0, 7.0, 'Below Average'),
+    (12000, 6.0, 4.0, 'Above Average'),
+    (24000, 3.0, 0.0, 'High Impact'),
+)
+
+
+def category_fingerprints(user_data: dict) -> Dict[str, str]:
+    """
+    Fingerprint the onboarding sections of each category unit and of the shared context.
+
+    Args:
+        user_data (dict): Nested onboarding data
+
+    Returns:
+        dict: Stage name ('analyst.<category>' or CONTEXT_STAGE) -> hex digest
+    """
+    fingerprints = {unit.stage: section_fingerprint(user_data, unit.sections) for unit in CATEGORY_UNITS}
+    fingerprints[CONTEXT_STAGE] = section_fingerprint(user_data, CONTEXT_SECTIONS)
+    return fingerprints
+
+
+def category_inputs(user_data: dict, unit: CategoryUnit) -> dict:
+    """Onboarding sections a unit's estimate depends on, plus the shared context."""
+    return {section: user_data.get(section) for section in CONTEXT_SECTIONS + unit.sections}
+
+
+def dirty_categories(cached: Dict[str, dict], user_data: dict) -> Optional[List[str]]:
+    """
+    Category units whose inputs changed since their cached estimate.
+
+    Args:
+        cached (dict): Stage name -> stored stage result (input_fingerprint, output)
+        user_data (dict): Current nested onboarding data
+
+    Returns:
+        list: Names of the units to recompute (empty if none changed), or
+        None when a full analysis is needed: the context changed, an
+        estimate is missing, or every unit is dirty anyway
+    """
+    current = category_fingerprints(user_data)
+    context = cached.get(CONTEXT_STAGE)
+    if not context or context.get('input_fingerprint') != current[CONTEXT_STAGE]:
+        return None
+
+    dirty = []
+    for unit in CATEGORY_UNITS:
+        row = cached.get(unit.stage)
+        if not row or _kg((row.get('output') or {}).get('kg')) is None:
+            return None
+        if row.get('input_fingerprint') != current[unit.stage]:
+            dirty.append(unit.name)
+    return None if len(dirty) == len(CATEGORY_UNITS) else dirty
+
+
+def cache_entries(user_data: dict, analysis: dict, categories: Optional[Iterable[str]] = None) -> List[dict]:
+    """
+    Stage results caching the per-category estimates of `analysis`.
+
+    Args:
+        user_data (dict): Nested onboarding data the analysis was computed from
+        analysis (dict): Analyst output with a category_breakdown
+        categories: Units to cache (all units and the context by default)
+
+    Returns:
+        list: Entries for data_model.database.save_stage_results
+    """
+    fingerprints = category_fingerprints(user_data)
+    breakdown = analysis.get('category_breakdown') or {}
+    full = categories is None
+    names = [unit.name for unit in CATEGORY_UNITS] if full else list(categories)
+
+    entries = []
+    for name in names:
+        unit = UNITS_BY_NAME[name]
+        kg = _kg(breakdown.get(unit.breakdown_key))
+        if kg is not None:
+            entries.append({'stage': unit.stage, 'input_fingerprint': fingerprints[unit.stage],
+                            'output': {'kg': kg}})
+    if full:
+        entries.append({'stage': CONTEXT_STAGE, 'input_fingerprint': fingerprints[CONTEXT_STAGE], 'output': {}})
+    return entries
+
+
+def score_for_footprint(total_kg: float) -> Tuple[float, str]:
+    """
+    Sustainability score and category for an annual footprint.
+
+    Interpolates linearly within the benchmarking task's bands.
+
+    Args:
+        total_kg (float): Annual footprint in kg CO2
+
+    Returns:
+        tuple: (score on the 0-10 scale, score category)
+    """
+    lower = 0
+    for upper, high, low, category in SCORE_BANDS:
+        if total_kg < upper or upper == SCORE_BANDS[-1][0]:
+            share = min(max((total_kg - lower) / (upper - lower), 0.0), 1.0)
+            return round(high - (high - low) * share, 1), category
+        lower = upper
+
+
+def aggregate(previous: dict, category_kg: Dict[str, float]) -> dict:
+    """
+    Apply recomputed category estimates to a previous analysis.
+
+    Only the fields in AGGREGATED_FIELDS change; the returned dict is a copy.
+
+    Args:
+        previous (dict): Previous analyst output
+        category_kg (dict): Unit name -> new annual kg CO2
+
+    Returns:
+        dict: Updated analyst output
+    """
+    analysis = dict(previous)
+    breakdown = dict(previous.get('category_breakdown') or {})
+    for name, kg in category_kg.items():
+        breakdown[UNITS_BY_NAME[name].breakdown_key] = round(float(kg), 1)
+    analysis['category_breakdown'] = breakdown
+
+    total = round(sum(_kg(value) or 0.0 for value in breakdown.values()), 1)
+    analysis['total_carbon_footprint_kg'] = total
+    analysis['total_carbon_footprint_tonnes'] = round(total / 1000, 2)
+
+    labels = {unit.breakdown_key: unit.label for unit in CATEGORY_UNITS}
+    labels[OTHER_KEY] = OTHER_LABEL
+    ranked = sorted((key for key in breakdown if key in labels), key=lambda key: _kg(breakdown[key]) or 0.0, reverse=True)
+    analysis['top_impact_categories'] = [labels[key] for key in ranked[:3]]
+
+    analysis['sustainability_score'], analysis['score_category'] = score_for_footprint(total)
+
+    comparison = dict(previous.get('regional_comparison') or {})
+    local_average = _kg(comparison.get('local_average_kg'))
+    if local_average:
+        difference = round((total - local_average) / local_average * 100, 1)
+        comparison['percentage_difference'] = abs(difference)
+        comparison['comparison_status'] = 'above' if difference > 0 else 'below' if difference < 0 else 'equal'
+    analysis['regional_comparison'] = comparison
+    return analysis
+
+
+def assemble_analysis(estimates: Dict[str, dict], lever_validations: List[dict], insights: List[dict],
+                      regional: dict, facts: List[str]) -> dict:
+    """
+    Merge the fan-out sub-analyses into an analyst output.
+
+    Totals, score, top impact categories and the regional comparison are
+    computed by aggregate(); priority areas are the categories of the
+    validated levers with the largest savings, then the top impact categories.
+
+    Args:
+        estimates (dict): Unit name -> CategoryEstimate dict (kg, calculation_method, data_confidence)
+        lever_validations (list): KeyLeverValidation dicts
+        insights (list): PsychographicInsight dicts
+        regional (dict): user_location and local_average_kg
+        facts (list): Fun comparison facts
+
+    Returns:
+        dict: Analyst output in the AnalystAgentOutput shape
+    """
+    breakdown = {unit.breakdown_key: 0.0 for unit in CATEGORY_UNITS}
+    breakdown[OTHER_KEY] = 0.0
+    confidences = [str(estimate.get('data_confidence', 'medium')).lower() for estimate in estimates.values()]
+    confidences = [level for level in confidences if level in CONFIDENCE_LEVELS] or ['medium']
+    methods = [f"{UNITS_BY_NAME[name].label}: {estimate['calculation_method']}"
+               for name, estimate in estimates.items() if estimate.get('calculation_method')]
+
+    analysis = aggregate({
+        'category_breakdown': breakdown,
+        'regional_comparison': {
+            'user_location': regional.get('user_location', ''),
+            'local_average_kg': _kg(regional.get('local_average_kg')) or GLOBAL_AVERAGE_KG,
+            'comparison_status': 'equal',
+            'percentage_difference': 0.0,
+        },
+        'key_lever_validations': lever_validations,
+        'psychographic_insights': insights,
+        'fun_comparison_facts': facts,
+        'calculation_method': '; '.join(methods) or 'Per-category estimates with standard emission factors',
+        'data_confidence': min(confidences, key=CONFIDENCE_LEVELS.index),
+    }, {name: estimate['kg'] for name, estimate in estimates.items()})
+
+    validated = sorted((lever for lever in lever_validations if lever.get('validated')),
+                       key=lambda lever: _kg(lever.get('potential_reduction_kg')) or 0.0, reverse=True)
+    areas = []
+    for area in [lever.get('impact_category') for lever in validated] + analysis['top_impact_categories']:
+        if area and area not in areas:
+            areas.append(area)
+    analysis['priority_reduction_areas'] = areas[:3]
+    return analysis
+
+
+def _kg(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
@@ -1,69 +1,300 @@
 # crew.py
 from crewai import Crew, Process
 from .agents import create_profiler_agent, create_analyst_agent, create_planner_agent
-from .tasks import create_profiling_task, create_analyst_task, create_benchmarking_task, create_weekly_planning_task, create_update_planning_task, create_feedback_aware_planning_task
+from .tasks import create_profiling_task, create_analyst_task, create_benchmarking_task, create_category_analysis_task, create_lever_validation_task, create_psychographic_insights_task, create_regional_benchmark_task, create_fun_facts_task, create_weekly_planning_task, create_update_planning_task, create_feedback_aware_planning_task
+from .progress import crew_callbacks, progress_stage
+from .hedging import ANALYST, PLANNER, PROFILER, HedgeFailed, get_hedger, use_model
+from .llm_governor import CircuitOpenError, for_user, get_llm_governor
+from .usage_limits import get_usage_limiter
+from .category_analysis import CATEGORY_UNITS, UNITS_BY_NAME, aggregate, assemble_analysis, category_inputs
+from .models import extract_json_from_text
+from .utils import build_local_plan_text
+from concurrent.futures import ThreadPoolExecutor
 import json
+import logging
 import re
 
+logger = logging.getLogger(__name__)
+
+
+def _kickoff_hedged(stage, build_crew, user_id=None, json_output=True, fallback=None, charge_budget=True):
+    """Kicks off a crew, hedged with a duplicate crew once it passes the stage's latency budget
+    
+    The duplicate runs on HEDGE_FALLBACK_MODEL when set, and the first valid
+    output wins (see agent.hedging). LLM requests queue under `user_id` in the
+    endpoint governor (see agent.llm_governor), and the measured token usage of
+    every finished run, including a hedge that lost or an output that failed
+    validation, is charged to the user's daily budget (see agent.usage_limits).
+    
+    Args:
+        stage (str): Hedging stage (profiler, analyst, planner or a sub-stage)
+        build_crew: Builds the crew; called once per attempt since agents keep per-run state
+        user_id (str): User the requests are queued under
+        json_output (bool): Every task must answer with a JSON object
+        fallback: Returns a local result while the LLM endpoint's circuit is open
+        charge_budget (bool): Charge the usage to the user's budget (False for runs the user did not start)
+    """
+    hedger = get_hedger()
+    
+    def attempt(model=None):
+        with for_user(user_id), use_model(model):
+            crew = build_crew()
+        results = crew.kickoff()
+        if charge_budget:
+            usage = getattr(results, 'token_usage', None)
+            get_usage_limiter().record_tokens(user_id, getattr(usage, 'total_tokens', 0) or 0)
+        return results
+    
+    try:
+        # Fail fast while the endpoint is unhealthy rather than starting crews CrewAI would retry
+        get_llm_governor().check()
+        results = hedger.run(stage, attempt, lambda: attempt(hedger.fallback_model),
+                             validate=lambda results: _valid_crew_output(results, json_output))
+    except (CircuitOpenError, HedgeFailed) as e:
+        errors = e.errors if isinstance(e, HedgeFailed) else [e]
+        if fallback is None or not any(isinstance(error, CircuitOpenError) for error in errors):
+            raise
+        logger.warning(f"LLM endpoint unavailable; using the local fallback for {stage}")
+        return fallback()
+    return results
+
+def _valid_crew_output(results, json_output):
+    """A crew output is valid when every task answered (with a JSON object if required)"""
+    tasks_output = getattr(results, 'tasks_output', None) or []
+    for task_output in tasks_output:
+        raw = getattr(task_output, 'raw', None)
+        if not raw or not raw.strip():
+            return False
+        if json_output and not getattr(task_output, 'json_dict', None):
+            extract_json_from_text(raw)
+    return bool(tasks_output) or bool(str(getattr(results, 'raw', '') or '').strip())
+
 
 
 
 
 # Agent 1 - Profiler Agent Workflow
 # =========================================================
-def run_profiler_workflow(user_data):
-    """Executes the profiler agent workflow (Agent 1)"""
-    
-    # Create profiler agent
-    profiler_agent = create_profiler_agent()    
-    # Create profiling task
-    profiling_task = create_profiling_task(profiler_agent, user_data)    
-    # Form the crew with single profiler agent
-    crew = Crew(
-        agents=[profiler_agent],
-        tasks=[profiling_task],
-        process=Process.sequential,
-        verbose=False,
-        memory=False
-    )    
+def run_profiler_workflow(user_data, progress=None):
+    """Executes the profiler agent workflow (Agent 1)
+    
+    Args:
+        user_data (dict): Nested onboarding data
+        progress (ProgressReporter): Optional reporter for stage/step/token events
+    """
+    
+    def build_crew():
+        # Create profiler agent
+        profiler_agent = create_profiler_agent()
+        # Create profiling task
+        profiling_task = create_profiling_task(profiler_agent, user_data)
+        # Form the crew with single profiler agent
+        return Crew(
+            agents=[profiler_agent],
+            tasks=[profiling_task],
+            process=Process.sequential,
+            verbose=False,
+            memory=False,
+            **crew_callbacks(progress)
+        )
+    
     # Execute and return results
-    results = crew.kickoff()    
+    with progress_stage(progress, "profiling", "Building your enriched profile"):
+        results = _kickoff_hedged(PROFILER, build_crew, user_data.get("user_id"))
+    if progress:
+        progress.report_usage(results)
     return results
 
 
 
 # Agent 2 - Analyst Agent Workflow
 # =========================================================
-def run_analyst_workflow(user_id):
-    """Executes the analyst workflow using enriched profile from Agent 1"""
+def run_analyst_workflow(user_id, progress=None, fan_out=None):
+    """Executes the analyst workflow using enriched profile from Agent 1
+    
+    Args:
+        user_id (str): User's UUID
+        progress (ProgressReporter): Optional reporter for stage/step/token events
+        fan_out (bool): Run concurrent sub-analyses instead of one call (defaults to ANALYST_FAN_OUT)
+    """
     
     # Import here to avoid circular imports
+    from config.settings import get_settings
     from data_model.database import get_profiler_results
     
+    if fan_out is None:
+        fan_out = get_settings().analyst_fan_out
+    if fan_out:
+        return run_analyst_fanout_workflow(user_id, progress)
+    
     # Get enriched profile from Agent 1 results
-    enriched_profile = get_profiler_results(user_id)
+    with progress_stage(progress, "load_profile", "Loading your enriched profile"):
+        enriched_profile = get_profiler_results(user_id)
     
     if not enriched_profile:
         raise ValueError("No enriched profile found. Agent 1 must be completed first.")
     
-    # Create analyst agent
-    analyst_agent = create_analyst_agent()
+    def build_crew():
+        # Create analyst agent
+        analyst_agent = create_analyst_agent()
+        
+        # Create analyst task with enriched profile as input
+        analyst_task = create_analyst_task(analyst_agent, enriched_profile)
+        
+        # Form the crew with single analyst agent
+        return Crew(
+            agents=[analyst_agent],
+            tasks=[analyst_task],
+            process=Process.sequential,
+            verbose=True,
+            memory=False,
+            **crew_callbacks(progress)
+        )
     
-    # Create analyst task with enriched profile as input
-    analyst_task = create_analyst_task(analyst_agent, enriched_profile)
+    # Execute and return results
+    with progress_stage(progress, "analysis", "Calculating your carbon footprint"):
+        results = _kickoff_hedged(ANALYST, build_crew, user_id)
+    if progress:
+        progress.report_usage(results)
+    return results
+
+def _kickoff_sub_analysis(name, create_task, user_id, progress=None):
+    """Runs one fan-out sub-analysis in its own single-task crew; returns (json dict, crew output)"""
     
-    # Form the crew with single analyst agent
-    crew = Crew(
-        agents=[analyst_agent],
-        tasks=[analyst_task],
-        process=Process.sequential,
-        verbose=True,
-        memory=False
+    def build_crew():
+        # Agents keep per-run state, so every concurrent crew gets its own
+        agent = create_analyst_agent()
+        return Crew(
+            agents=[agent],
+            tasks=[create_task(agent)],
+            process=Process.sequential,
+            verbose=False,
+            memory=False,
+            **crew_callbacks(progress)
+        )
+    
+    results = _kickoff_hedged(f"{ANALYST}.{name}", build_crew, user_id)
+    task_output = results.tasks_output[0]
+    return getattr(task_output, 'json_dict', None) or extract_json_from_text(task_output.raw), results
+
+def run_analyst_fanout_workflow(user_id, progress=None):
+    """Executes the analyst as concurrent sub-analyses merged by a deterministic aggregator
+    
+    Every category estimate, the lever validations, psychographic insights, regional
+    benchmark and fun facts are separate smaller calls, so the latency is that of the
+    slowest call rather than one long generation. Only the category estimates are
+    required; other failed sub-analyses leave their fields empty.
+    
+    Args:
+        user_id (str): User's UUID
+        progress (ProgressReporter): Optional reporter for stage/step/token events
+        
+    Returns:
+        dict: Analyst output in the AnalystAgentOutput shape
+    """
+    
+    # Import here to avoid circular imports
+    from data_model.database import get_profiler_results, get_user_onboarding_data
+    
+    with progress_stage(progress, "load_profile", "Loading your enriched profile"):
+        enriched_profile = get_profiler_results(user_id)
+        user_data = get_user_onboarding_data(user_id)
+    
+    if not enriched_profile:
+        raise ValueError("No enriched profile found. Agent 1 must be completed first.")
+    user_data = user_data or {}
+    location = user_data.get("location") or enriched_profile.get("demographics", {})
+    
+    sub_analyses = {
+        f"category:{unit.name}": lambda agent, unit=unit: create_category_analysis_task(
+            agent, unit, category_inputs(user_data, unit) if user_data else enriched_profile)
+        for unit in CATEGORY_UNITS
+    }
+    sub_analyses.update({
+        "levers": lambda agent: create_lever_validation_task(agent, enriched_profile),
+        "insights": lambda agent: create_psychographic_insights_task(agent, enriched_profile),
+        "regional": lambda agent: create_regional_benchmark_task(agent, location),
+        "facts": lambda agent: create_fun_facts_task(agent, enriched_profile),
+    })
+    
+    outputs, total_tokens = {}, 0
+    with progress_stage(progress, "analysis", "Calculating your carbon footprint"):
+        with ThreadPoolExecutor(max_workers=len(sub_analyses), thread_name_prefix="analyst-fanout") as executor:
+            futures = {name: executor.submit(_kickoff_sub_analysis, name, create_task, user_id, progress)
+                       for name, create_task in sub_analyses.items()}
+            for name, future in futures.items():
+                try:
+                    outputs[name], results = future.result()
+                except Exception as e:
+                    if name.startswith("category:"):
+                        raise
+                    logger.warning(f"Analyst sub-analysis {name} failed: {str(e)}")
+                    continue
+                total_tokens += getattr(getattr(results, 'token_usage', None), 'total_tokens', 0) or 0
+    if progress and total_tokens:
+        progress.tokens(int(total_tokens))
+    
+    estimates = {unit.name: outputs[f"category:{unit.name}"] for unit in CATEGORY_UNITS}
+    return assemble_analysis(
+        estimates,
+        outputs.get("levers", {}).get("key_lever_validations", []),
+        outputs.get("insights", {}).get("psychographic_insights", []),
+        outputs.get("regional", {}),
+        outputs.get("facts", {}).get("fun_comparison_facts", []),
     )
+
+def run_category_analysis_workflow(user_id, categories, previous_analysis, progress=None):
+    """Re-estimates only the given emission categories and re-aggregates the previous analysis
     
-    # Execute and return results
-    results = crew.kickoff()
-    return results
+    Args:
+        user_id (str): User's UUID
+        categories (list): Names of the category units to recompute (see agent.category_analysis)
+        previous_analysis (dict): Analyst output the other categories are kept from
+        progress (ProgressReporter): Optional reporter for stage/step/token events
+        
+    Returns:
+        dict: Updated analyst output
+    """
+    
+    # Import here to avoid circular imports
+    from data_model.database import get_user_onboarding_data
+    
+    with progress_stage(progress, "load_profile", "Loading your answers"):
+        user_data = get_user_onboarding_data(user_id)
+    
+    if not user_data:
+        raise ValueError("No onboarding data found for the category re-analysis.")
+    
+    # One small task per changed category instead of the full analysis
+    units = [UNITS_BY_NAME[name] for name in categories]
+    
+    def build_crew():
+        analyst_agent = create_analyst_agent()
+        tasks = [
+            create_category_analysis_task(analyst_agent, unit, category_inputs(user_data, unit), previous_analysis)
+            for unit in units
+        ]
+        return Crew(
+            agents=[analyst_agent],
+            tasks=tasks,
+            process=Process.sequential,
+            verbose=False,
+            memory=False,
+            **crew_callbacks(progress)
+        )
+    
+    labels = ", ".join(unit.label for unit in units)
+    with progress_stage(progress, "analysis", f"Updating your {labels} footprint"):
+        results = _kickoff_hedged(f"{ANALYST}.categories", build_crew, user_id)
+    if progress:
+        progress.report_usage(results)
+    
+    category_kg = {}
+    for unit, task_output in zip(units, results.tasks_output):
+        estimate = getattr(task_output, 'json_dict', None) or extract_json_from_text(task_output.raw)
+        category_kg[unit.name] = float(estimate['kg'])
+    
+    return aggregate(previous_analysis, category_kg)
 
 def create_analyst_crew(user_data):
     """Creates and runs the analyst crew (legacy - for backwards compatibility)"""
@@ -148,13 +379,15 @@ def validate_challenge_structure(challenges):
 
     return True
 
-def run_planner_workflow(user_id: str, test_data=None):
+def run_planner_workflow(user_id: str, test_data=None, progress=None, charge_budget=True):
     """
     Executes the basic planner workflow (Agent 3) for initial challenge generation.
     
     Args:
         user_id (str): User's UUID
         test_data: Optional test data for development
+        progress (ProgressReporter): Optional reporter for stage/step/token events
+        charge_budget (bool): Charge the LLM usage to the user's daily budget (False for scheduled runs)
     
     Returns:
         str: Raw text output from Agent 3
@@ -170,29 +403,37 @@ def run_planner_workflow(user_id: str, test_data=None):
             user_complete_data = test_data  # Use test data if provided
             print("📋 Using provided test data")
         else:
-            user_complete_data = get_complete_user_data_with_score(user_id)
+            with progress_stage(progress, "load_data", "Loading your profile and footprint"):
+                user_complete_data = get_complete_user_data_with_score(user_id)
             print("📋 Fetched complete user data with scores from database")
         
         if not user_complete_data:
             raise ValueError("No complete user data found. Agent 1 and 2 must be completed first.")
         
-        # Create planner agent
-        planner_agent = create_planner_agent()
-        
-        # Create planning task
-        planning_task = create_weekly_planning_task(planner_agent, user_complete_data)
+        def build_crew():
+            # Create planner agent
+            planner_agent = create_planner_agent(step_callback=progress.step_callback if progress else None)
+            
+            # Create planning task
+            planning_task = create_weekly_planning_task(planner_agent, user_complete_data)
+            
+            return Crew(
+                agents=[planner_agent],
+                tasks=[planning_task],
+                process=Process.sequential,
+                verbose=True,
+                memory=False,
+                **crew_callbacks(progress)
+            )
         
         # Form the crew and execute
         print("🚀 Executing planner workflow")
-        crew = Crew(
-            agents=[planner_agent],
-            tasks=[planning_task],
-            process=Process.sequential,
-            verbose=True,
-            memory=False
-        )
-        
-        raw_results = crew.kickoff()
+        with progress_stage(progress, "planning", "Creating your weekly challenges"):
+            raw_results = _kickoff_hedged(PLANNER, build_crew, user_id, json_output=False,
+                                          fallback=lambda: build_local_plan_text(user_complete_data),
+                                          charge_budget=charge_budget)
+        if progress:
+            progress.report_usage(raw_results)
 
         # Get the text output
         raw_output = None
@@ -215,7 +456,8 @@ def run_planner_workflow(user_id: str, test_data=None):
 
 
 
-def run_feedback_aware_planning_workflow(user_id: str, raw_feedback: str = None, test_data=None):
+def run_feedback_aware_planning_workflow(user_id: str, raw_feedback: str = None, test_data=None, progress=None,
+                                         charge_budget=True):
     """
     Executes the feedback-aware planning workflow using the Two-Tiered Memory System.
 
@@ -223,6 +465,8 @@ def run_feedback_aware_planning_workflow(user_id: str, raw_feedback: str = None,
         user_id (str): User's UUID
         raw_feedback (str): Optional new feedback from user
         test_data: Optional test data for development
+        progress (ProgressReporter): Optional reporter for stage/step/token events
+        charge_budget (bool): Charge the LLM usage to the user's daily budget (False for scheduled runs)
 
     Returns:
         dict: Planning results with feedback adaptation and validated JSON
@@ -238,7 +482,8 @@ def run_feedback_aware_planning_workflow(user_id: str, raw_feedback: str = None,
         # Step 1: Process new feedback if provided (skip for test data)
         if raw_feedback and not test_data:
             print(f"🔄 Processing new feedback for user {user_id}")
-            feedback_success = save_feedback_and_process(user_id, raw_feedback)
+            with progress_stage(progress, "feedback", "Saving your feedback"):
+                feedback_success = save_feedback_and_process(user_id, raw_feedback)
             if not feedback_success:
                 print("⚠️ Warning: Failed to save feedback, continuing with existing data")
 
@@ -248,14 +493,16 @@ def run_feedback_aware_planning_workflow(user_id: str, raw_feedback: str = None,
             print("📋 Using provided test data")
         else:
             print("📋 Fetching complete user data with scores")
-            user_complete_data = get_complete_user_data_with_score(user_id)
+            with progress_stage(progress, "load_data", "Loading your profile and footprint"):
+                user_complete_data = get_complete_user_data_with_score(user_id)
 
         if not user_complete_data:
             raise ValueError("No complete user data found. Agent 1 and 2 must be completed first.")
         
         # Step 3: Get Tier 2 Memory (dynamic feedback history)
         print("🧠 Fetching Tier 2 Memory (feedback history)")
-        feedback_history = get_user_feedback_history(user_id, limit=3)
+        with progress_stage(progress, "feedback_history", "Reviewing your past feedback"):
+            feedback_history = get_user_feedback_history(user_id, limit=3)
         
         if feedback_history:
             print(f"✅ Found {len(feedback_history)} feedback entries")
@@ -263,28 +510,35 @@ def run_feedback_aware_planning_workflow(user_id: str, raw_feedback: str = None,
         else:
             print("ℹ️ No feedback history found - using standard planning")
         
-        # Step 4: Create feedback-aware planner agent
-        planner_agent = create_planner_agent()
-        
-        # Step 5: Create feedback-aware planning task
-        planning_task = create_feedback_aware_planning_task(
-            planner_agent, 
-            user_complete_data,  # Using complete data instead of separate profile and carbon analysis
-            # {},  # benchmark_results placeholder (not needed with complete data)
-            feedback_history
-        )
+        def build_crew():
+            # Step 4: Create feedback-aware planner agent
+            planner_agent = create_planner_agent(step_callback=progress.step_callback if progress else None)
+            
+            # Step 5: Create feedback-aware planning task
+            planning_task = create_feedback_aware_planning_task(
+                planner_agent, 
+                user_complete_data,  # Using complete data instead of separate profile and carbon analysis
+                # {},  # benchmark_results placeholder (not needed with complete data)
+                feedback_history
+            )
+            
+            return Crew(
+                agents=[planner_agent],
+                tasks=[planning_task],
+                process=Process.sequential,
+                verbose=False,
+                memory=False,
+                **crew_callbacks(progress)
+            )
         
         # Step 6: Form the crew and execute
         print("🚀 Executing feedback-aware planning workflow")
-        crew = Crew(
-            agents=[planner_agent],
-            tasks=[planning_task],
-            process=Process.sequential,
-            verbose=False,
-            memory=False
-        )
-        
-        raw_results = crew.kickoff()
+        with progress_stage(progress, "planning", "Creating your weekly challenges"):
+            raw_results = _kickoff_hedged(PLANNER, build_crew, user_id, json_output=False,
+                                          fallback=lambda: build_local_plan_text(user_complete_data),
+                                          charge_budget=charge_budget)
+        if progress:
+            progress.report_usage(raw_results)
         
         # Get the text output
         raw_output = None
@@ -326,7 +580,7 @@ def run_feedback_aware_planning_workflow(user_id: str, raw_feedback: str = None,
 
 
 
-def run_update_planning_workflow(user_id: str, user_update_text: str, test_data=None):
+def run_update_planning_workflow(user_id: str, user_update_text: str, test_data=None, progress=None):
     """
     Executes the update planning workflow when user provides feedback from dashboard.
 
@@ -334,6 +588,7 @@ def run_update_planning_workflow(user_id: str, user_update_text: str, test_data=
         user_id (str): User's UUID
         user_update_text (str): User's update/feedback text
         test_data: Optional test data for development
+        progress (ProgressReporter): Optional reporter for stage/step/token events
 
     Returns:
         dict: Updated planning results with validated JSON
@@ -350,32 +605,39 @@ def run_update_planning_workflow(user_id: str, user_update_text: str, test_data=
             user_complete_data = test_data  # Use test data if provided
             print("📋 Using provided test data")
         else:
-            user_complete_data = get_complete_user_data_with_score(user_id)
+            with progress_stage(progress, "load_data", "Loading your profile and footprint"):
+                user_complete_data = get_complete_user_data_with_score(user_id)
 
         if not user_complete_data:
             raise ValueError("No complete user data found. Agent 1 and 2 must be completed first.")
         
-        # Create planner agent
-        planner_agent = create_planner_agent()
-        
-        # Create update planning task
-        update_task = create_update_planning_task(
-            planner_agent, 
-            user_complete_data,  # Using complete data instead of separate profile and carbon analysis
-            user_update_text
-        )
+        def build_crew():
+            # Create planner agent
+            planner_agent = create_planner_agent(step_callback=progress.step_callback if progress else None)
+            
+            # Create update planning task
+            update_task = create_update_planning_task(
+                planner_agent, 
+                user_complete_data,  # Using complete data instead of separate profile and carbon analysis
+                user_update_text
+            )
+            
+            return Crew(
+                agents=[planner_agent],
+                tasks=[update_task],
+                process=Process.sequential,
+                verbose=False,
+                memory=False,
+                **crew_callbacks(progress)
+            )
         
         # Form the crew and execute
         print("🚀 Executing update planning workflow")
-        crew = Crew(
-            agents=[planner_agent],
-            tasks=[update_task],
-            process=Process.sequential,
-            verbose=False,
-            memory=False
-        )
-        
-        raw_results = crew.kickoff()
+        with progress_stage(progress, "planning", "Creating your weekly challenges"):
+            raw_results = _kickoff_hedged(PLANNER, build_crew, user_id, json_output=False,
+                                          fallback=lambda: build_local_plan_text(user_complete_data))
+        if progress:
+            progress.report_usage(raw_results)
         
         # Get the text output
         raw_output = None
@@ -0,0 +1,306 @@
+"""
+Rule-based extraction of preference signals from user feedback.
+
+Most feedback is short and formulaic ("no car", "too hard", "want diet
+challenges"), so an LLM call per submission is mostly wasted.
+FeedbackExtractor maps feedback to structured signals (excluded and
+preferred challenge categories, difficulty preference, task preferences,
+motivations) with keyword/phrase patterns. Category keywords come from the
+challenge categories and impact vectors in data/challenges_metadata.json.
+
+Feedback is split into clauses; the confidence is the share of clauses
+that produced a signal. summarize() returns a summary built from the
+signals when the confidence reaches the threshold and falls back to the
+LLM otherwise, counting how many LLM calls the rules avoided.
+"""
+import logging
+import re
+import threading
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .llm_governor import CircuitOpenError
+from .utils import load_challenges_metadata
+
+logger = logging.getLogger(__name__)
+
+EASIER = 'easier'
+HARDER = 'harder'
+
+# Everyday words users write that the impact vectors do not cover
+CATEGORY_ALIASES = {
+    'Transport': ['car', 'cars', 'drive', 'driving', 'bike', 'bicycle', 'cycle', 'bus', 'train', 'travel',
+                  'commute', 'commuting', 'flight', 'flights', 'fly', 'walk', 'walking'],
+    'Diet': ['food', 'meat', 'meal', 'meals', 'eat', 'eating', 'cook', 'vegan', 'vegetarian', 'dairy'],
+    'Energy': ['electricity', 'heating', 'power', 'lights', 'appliances', 'thermostat'],
+    'Waste': ['recycle', 'recycling', 'compost', 'trash', 'rubbish', 'plastic'],
+    'Consumption': ['shopping', 'clothes', 'fashion', 'buy', 'buying', 'second-hand'],
+    'Community & Advocacy': ['community', 'advocacy', 'volunteer', 'volunteering', 'neighbours', 'neighbors',
+                             'social', 'petition', 'friends'],
+    'Digital': ['digital', 'phone', 'email', 'emails', 'streaming', 'screen', 'internet', 'online'],
+}
+
+# Clause-level cues, checked against the clause text
+NEGATION = re.compile(
+    r"\b(no|not|don'?t|doesn'?t|do not|can'?t|cannot|can not|won'?t|never|without|hate|dislike|"
+    r"stop|less|fewer|avoid|skip|tired of|sick of|enough|instead of)\b"
+)
+# "... focus on other areas": a redirect that only restates an exclusion
+REDIRECT = re.compile(r"\b(other (areas|categories|things|challenges)|something else)\b")
+PREFERENCE = re.compile(r"\b(more|want|wants|prefer|prefers|like|love|enjoy|focus on|give me|interested in)\b")
+DIFFICULTY_PATTERNS = {
+    EASIER: re.compile(r"\b(too (hard|difficult|challenging|much|many)|easier|simpler|overwhelm\w*|struggl\w*)\b"),
+    HARDER: re.compile(r"\b(too easy|harder|more (challenging|difficult|ambitious)|boring)\b"),
+}
+TASK_PREFERENCES = {
+    'home-based': re.compile(r"\b(home|indoors?|at home|house)\b"),
+    'quick': re.compile(r"\b(quick|short|small|busy|no time|little time|simple)\b"),
+    'daily': re.compile(r"\b(daily|every day|each day)\b"),
+    'varied': re.compile(r"\b(variety|varied|different|repetitive|same)\b"),
+}
+MOTIVATIONS = {
+    'saving money': re.compile(r"\b(money|cheap|cheaper|bills?|costs?|budget|savings|saving money|save money)\b"),
+    'health': re.compile(r"\b(health|healthy|healthier|fit|fitness)\b"),
+    'the environment': re.compile(r"\b(planet|climate|environment|earth|nature)\b"),
+    'family': re.compile(r"\b(family|kids|children)\b"),
+}
+
+CLAUSE_SPLIT = re.compile(r"[.;!?\n•,]+|\b(?:but|and|also|because)\b")
+WORD = re.compile(r"[a-z][a-z'\-]*")
+
+
+@dataclass
+class FeedbackSignals:
+    """Preference signals extracted from one piece of feedback."""
+    excluded_categories: List[str] = field(default_factory=list)
+    preferred_categories: List[str] = field(default_factory=list)
+    excluded_terms: List[str] = field(default_factory=list)
+    difficulty: Optional[str] = None
+    task_preferences: List[str] = field(default_factory=list)
+    motivations: List[str] = field(default_factory=list)
+    confidence: float = 0.0
+
+    @property
+    def empty(self) -> bool:
+        return not (self.excluded_categories or self.preferred_categories or self.difficulty
+                    or self.task_preferences or self.motivations)
+
+    def summary(self) -> str:
+        """Third-person summary in the format of the LLM summaries."""
+        sentences = []
+        if self.excluded_categories:
+            detail = f" (mentions {', '.join(self.excluded_terms)})" if self.excluded_terms else ''
+            sentences.append(f"User wants to avoid {_join(self.excluded_categories)} challenges{detail}.")
+        if self.difficulty == EASIER:
+            sentences.append("User finds challenges too difficult and prefers easier tasks.")
+        elif self.difficulty == HARDER:
+            sentences.append("User finds challenges too easy and wants more ambitious tasks.")
+        if self.preferred_categories:
+            sentences.append(f"User wants more {_join(self.preferred_categories)} challenges.")
+        if self.task_preferences:
+            sentences.append(f"Prefers {_join(self.task_preferences)} tasks.")
+        if self.motivations:
+            sentences.append(f"Motivated by {_join(self.motivations)}.")
+        return ' '.join(sentences)
+
+
+def _join(items: List[str]) -> str:
+    if len(items) <= 1:
+        return ''.join(items)
+    return f"{', '.join(items[:-1])} and {items[-1]}"
+
+
+def category_keywords(challenges: Iterable[dict]) -> Dict[str, str]:
+    """
+    Map keywords to challenge categories.
+
+    Each category's own name, its aliases, and every impact-vector term
+    that occurs mostly in that category's challenges point to it.
+
+    Args:
+        challenges: Entries of data/challenges_metadata.json
+
+    Returns:
+        dict: Lower-case keyword -> category name
+    """
+    term_categories = defaultdict(Counter)
+    categories = []
+    for challenge in challenges:
+        category = challenge.get('category')
+        if not category:
+            continue
+        if category not in categories:
+            categories.append(category)
+        for term in challenge.get('impact_vector', []):
+            term_categories[term.lower()][category] += 1
+
+    keywords = {}
+    for term, counts in term_categories.items():
+        category, count = counts.most_common(1)[0]
+        if count * 2 > sum(counts.values()):
+            keywords[term] = category
+    for category in categories:
+        for alias in CATEGORY_ALIASES.get(category, []):
+            keywords.setdefault(alias, category)
+        for word in WORD.findall(category.lower()):
+            if len(word) > 3:
+                keywords[word] = category
+    return keywords
+
+
+class FeedbackExtractor:
+    """Keyword/phrase extraction of feedback signals with an LLM fallback."""
+
+    def __init__(self, challenges: Optional[Iterable[dict]] = None, threshold: float = 0.75):
+        """
+        Args:
+            challenges: Challenge metadata (defaults to data/challenges_metadata.json)
+            threshold: Minimum confidence for a rule-based summary
+        """
+        if challenges is None:
+            challenges = load_challenges_metadata()['all_challenges']
+        self.threshold = threshold
+        self._keywords = category_keywords(challenges)
+        # Longest first, so "public transport" wins over "transport"
+        terms = sorted(self._keywords, key=len, reverse=True)
+        self._keyword_pattern = re.compile(r"\b(" + '|'.join(re.escape(term) for term in terms) + r")\b") if terms else None
+        self._lock = threading.Lock()
+        self._metrics = {
+            'extractions': 0,
+            'rule_summaries': 0,
+            'llm_calls': 0,
+            'llm_failures': 0,
+        }
+
+    def extract(self, feedback: str) -> FeedbackSignals:
+        """
+        Extract preference signals from `feedback`.
+
+        Args:
+            feedback: Raw feedback text
+
+        Returns:
+            FeedbackSignals: Signals plus the share of clauses they explain
+        """
+        signals = FeedbackSignals()
+        clauses = [clause.strip() for clause in CLAUSE_SPLIT.split((feedback or '').lower())]
+        # Greetings and fillers ("thanks", "hi") do not count against the confidence
+        clauses = [clause for clause in clauses if len(WORD.findall(clause)) > 1]
+        understood = 0
+
+        for clause in clauses:
+            found = False
+            categories = self._categories_in(clause)
+            if categories:
+                negated = NEGATION.search(clause)
+                for term, category in categories:
+                    if negated:
+                        _add(signals.excluded_categories, category)
+                        _add(signals.excluded_terms, term)
+                    elif PREFERENCE.search(clause):
+                        _add(signals.preferred_categories, category)
+                found = bool(negated or PREFERENCE.search(clause))
+            elif signals.excluded_categories and REDIRECT.search(clause):
+                found = True
+
+            for difficulty, pattern in DIFFICULTY_PATTERNS.items():
+                if pattern.search(clause):
+                    signals.difficulty = difficulty
+                    found = True
+                    break
+            for name, pattern in TASK_PREFERENCES.items():
+                if pattern.search(clause):
+                    _add(signals.task_preferences, name)
+                    found = True
+            for name, pattern in MOTIVATIONS.items():
+                if pattern.search(clause):
+                    _add(signals.motivations, name)
+                    found = True
+            understood += found
+
+        conflicting = set(signals.excluded_categories) & set(signals.preferred_categories)
+        if clauses and not signals.empty:
+            signals.confidence = understood / len(clauses)
+            if conflicting:
+                # "No more diet challenges, but more diet tips" needs a closer reading
+                signals.confidence /= 2
+        with self._lock:
+            self._metrics['extractions'] += 1
+        return signals
+
+    def summarize(self, feedback: str, llm: Callable[[str], str]) -> str:
+        """
+        Summarize `feedback` from its signals, or with `llm` when confidence is low.
+
+        While the LLM endpoint's circuit is open, any signals found are
+        summarized by rules even below the confidence threshold.
+
+        Args:
+            feedback: Raw feedback text
+            llm: Callable(feedback) returning an LLM summary (may raise)
+
+        Returns:
+            str: Feedback summary for the planner's memory
+        """
+        signals = self.extract(feedback)
+        if signals.confidence >= self.threshold:
+            with self._lock:
+                self._metrics['rule_summaries'] += 1
+            logger.info(f"Summarized feedback by rules (confidence {signals.confidence:.2f})")
+            return signals.summary()
+
+        with self._lock:
+            self._metrics['llm_calls'] += 1
+        try:
+            return llm(feedback)
+        except CircuitOpenError:
+            with self._lock:
+                self._metrics['llm_failures'] += 1
+            if signals.empty:
+                raise
+            # The endpoint is down: a partial rule summary beats none
+            logger.info(f"LLM unavailable; summarized feedback by rules (confidence {signals.confidence:.2f})")
+            return signals.summary()
+        except Exception:
+            with self._lock:
+                self._metrics['llm_failures'] += 1
+            raise
+
+    def metrics(self) -> Dict[str, float]:
+        """
+        Snapshot of extraction counters.
+
+        Returns:
+            dict: Counters plus the share of summaries that avoided an LLM call
+        """
+        with self._lock:
+            snapshot = dict(self._metrics)
+        summaries = snapshot['rule_summaries'] + snapshot['llm_calls']
+        snapshot['llm_calls_avoided'] = snapshot['rule_summaries']
+        snapshot['hit_rate'] = snapshot['rule_summaries'] / summaries if summaries else 0.0
+        return snapshot
+
+    def _categories_in(self, clause: str) -> List[tuple]:
+        if self._keyword_pattern is None:
+            return []
+        return [(term, self._keywords[term]) for term in self._keyword_pattern.findall(clause)]
+
+
+def _add(items: List[str], item: str) -> None:
+    if item not in items:
+        items.append(item)
+
+
+_extractor: Optional[FeedbackExtractor] = None
+_extractor_lock = threading.Lock()
+
+
+def get_feedback_extractor() -> FeedbackExtractor:
+    """Return the process-wide feedback extractor."""
+    global _extractor
+    if _extractor is None:
+        with _extractor_lock:
+            if _extractor is None:
+                _extractor = FeedbackExtractor()
+    return _extractor
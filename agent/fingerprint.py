@@ -0,0 +1,93 @@
+"""
+Stable fingerprints of agent inputs.
+
+A fingerprint is a hash of the canonical JSON of the inputs that shape an
+agent's output. Two inputs with the same fingerprint would produce the
+same prompt, so a result computed for one can be reused for the other.
+Empty values (None, "", [], {}) are treated alike, since an unanswered
+text input and an answer missing from a draft mean the same thing.
+
+Per-section fingerprints stored with a result tell which sections of the
+answers changed since it was computed.
+"""
+import hashlib
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+# Profiler input sections that drive its output: the high-signal lifestyle
+# sections plus the free-text additional_info it mines for context.
+# The remaining sections (consumption, travel, digital, goals) are copied
+# into the enriched profile rather than reasoned about.
+PROFILER_SIGNAL_SECTIONS = ("location", "household", "transportation", "diet", "additional_info")
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, dict):
+        normalized = {key: _normalize(item) for key, item in value.items()}
+        return {key: item for key, item in normalized.items() if item is not None} or None
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value] or None
+    if isinstance(value, str):
+        return value.strip() or None
+    return value
+
+
+def fingerprint(data: Any) -> str:
+    """
+    Hash `data` independently of key order and empty values.
+
+    Args:
+        data: JSON-serializable inputs
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    canonical = json.dumps(_normalize(data), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def section_fingerprint(data: dict, sections: Iterable[str]) -> str:
+    """Fingerprint only the given top-level sections of `data`."""
+    return fingerprint({section: data.get(section) for section in sections})
+
+
+def profiler_fingerprint(user_data: dict) -> str:
+    """
+    Fingerprint the parts of the nested onboarding data the profiler depends on.
+
+    Args:
+        user_data (dict): Nested onboarding data (as passed to run_profiler_workflow)
+
+    Returns:
+        str: Hex digest
+    """
+    return section_fingerprint(user_data, PROFILER_SIGNAL_SECTIONS)
+
+
+def section_fingerprints(data: dict, exclude: Iterable[str] = ("user_id",)) -> Dict[str, str]:
+    """
+    Fingerprint each top-level section of `data` separately.
+
+    Args:
+        data (dict): Nested onboarding data
+        exclude: Keys that identify rather than describe the user
+
+    Returns:
+        dict: Section name -> hex digest
+    """
+    return {section: fingerprint(value) for section, value in data.items() if section not in exclude}
+
+
+def changed_sections(previous: Optional[Dict[str, str]], current: Dict[str, str]) -> List[str]:
+    """
+    Sections whose fingerprint differs between two section_fingerprints() results.
+
+    A section present on only one side counts as changed when it is not empty.
+
+    Returns:
+        list: Changed section names, in the order of `current`
+    """
+    previous = previous or {}
+    empty = fingerprint(None)
+    names = list(current) + [name for name in previous if name not in current]
+    return [name for name in names if previous.get(name, empty) != current.get(name, empty)]
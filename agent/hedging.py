@@ -0,0 +1,320 @@
+"""
+Hedged LLM calls with per-stage latency targets.
+
+The agents only bound a call by max_execution_time (120-300 s), so one slow
+upstream response stalled the user for minutes. Hedger gives each stage
+(profiler, analyst, planner) a latency budget: once a call has run for the
+stage's p95 (the observed p95 of recent calls, capped at the stage's SLO),
+a duplicate request starts, optionally on a fallback model. The first
+valid answer wins and the other request is cancelled. Hedging doubles the
+spend of slow calls, so it is off by default and the settings only turn it
+on together with a fallback model (HEDGING_ENABLED, HEDGE_FALLBACK_MODEL).
+
+A crew run cannot be interrupted once it is inside an HTTP call, so
+"cancelled" means its future is cancelled if it has not started and its
+result is discarded otherwise; calls run on daemon threads so an abandoned
+one never blocks shutdown.
+
+metrics() reports per-stage hedge rates, hedge wins, SLO misses and
+p50/p95/p99 latencies (as seen by the user) for tuning the budgets.
+"""
+import contextlib
+import contextvars
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILER = 'profiler'
+ANALYST = 'analyst'
+PLANNER = 'planner'
+
+_model_override: contextvars.ContextVar = contextvars.ContextVar('llm_model_override', default=None)
+
+
+@contextlib.contextmanager
+def use_model(model: Optional[str]):
+    """Make agents created inside the block use `model` (None keeps their default)."""
+    reset = _model_override.set(model)
+    try:
+        yield
+    finally:
+        _model_override.reset(reset)
+
+
+def model_override() -> Optional[str]:
+    """Model set by use_model() for agents created now, if any."""
+    return _model_override.get()
+
+
+def percentile(samples, fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of `samples` (None when empty)."""
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+class HedgeFailed(RuntimeError):
+    """Neither the primary nor the hedged request produced a valid answer."""
+
+    def __init__(self, message: str, errors=()):
+        super().__init__(message)
+        self.errors = list(errors)
+
+
+class _Invalid(Exception):
+    """An answer that completed but failed validation."""
+
+
+class _StageStats:
+    def __init__(self, window: int):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.cancelled = 0
+        self.invalid = 0
+        self.failures = 0
+        self.slo_misses = 0
+
+
+class Hedger:
+    """Runs LLM calls with a duplicate request once they pass their stage's latency budget."""
+
+    def __init__(self, slos: Dict[str, float], enabled: bool = True, fallback_model: Optional[str] = None,
+                 window: int = 200, min_samples: int = 20, min_budget: float = 5.0):
+        """
+        Args:
+            slos: Stage -> latency target in seconds (the largest budget the stage gets)
+            enabled: Start duplicate requests (when False, calls are only timed)
+            fallback_model: Model for the duplicate request (None: same model)
+            window: Recent latencies kept per stage for the p95
+            min_samples: Samples needed before the observed p95 is used
+            min_budget: Smallest budget in seconds, so a fast warm-up does not hedge every call
+        """
+        self.slos = dict(slos)
+        self.enabled = enabled
+        self.fallback_model = fallback_model
+        self.window = window
+        self.min_samples = min_samples
+        self.min_budget = min_budget
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _StageStats] = {}
+
+    def slo(self, stage: str) -> Optional[float]:
+        """
+        Latency target of `stage`.
+
+        Sub-stages ('analyst.diet') use their parent stage's SLO but keep
+        their own latency window, so short sub-calls do not shrink the
+        budget of the full call.
+        """
+        if stage in self.slos:
+            return self.slos[stage]
+        return self.slos.get(stage.split('.', 1)[0])
+
+    def budget(self, stage: str) -> Optional[float]:
+        """
+        Seconds a `stage` call may run before it is hedged.
+
+        Returns:
+            float: The recent p95 capped at the stage's SLO (the SLO until
+            there are enough samples), or None for a stage without an SLO
+        """
+        slo = self.slo(stage)
+        if slo is None:
+            return None
+        with self._lock:
+            stats = self._stats.get(stage)
+            samples = list(stats.latencies) if stats else []
+        if len(samples) < self.min_samples:
+            return slo
+        return min(slo, max(self.min_budget, percentile(samples, 0.95)))
+
+    def run(self, stage: str, call: Callable[[], Any], hedge_call: Optional[Callable[[], Any]] = None,
+            validate: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        Run `call`, hedging it with `hedge_call` once it passes the stage's budget.
+
+        Args:
+            stage: Stage name (PROFILER, ANALYST, PLANNER or a sub-stage such as 'analyst.diet')
+            call: The request
+            hedge_call: The duplicate request (defaults to `call`)
+            validate: Returns True for a usable answer; an invalid answer does not win
+
+        Returns:
+            The first valid answer
+
+        Raises:
+            Exception: The primary request's error when there is no hedge and it failed
+            HedgeFailed: When both requests failed or answered invalidly
+        """
+        validate = validate or (lambda result: True)
+        started = time.monotonic()
+        with self._lock:
+            stats = self._stats.setdefault(stage, _StageStats(self.window))
+            stats.calls += 1
+
+        budget = self.budget(stage) if self.enabled else None
+        primary = self._start(call, f"{stage}-primary")
+        pending = {primary}
+        hedge = None
+        errors = []
+
+        done, _ = wait(pending, timeout=budget)
+        while True:
+            if not done and hedge is None:
+                # Past the budget: start the duplicate and take whichever answers first
+                hedge = self._start(hedge_call or call, f"{stage}-hedge")
+                pending.add(hedge)
+                with self._lock:
+                    stats.hedged += 1
+                logger.info(f"{stage} call passed its {budget:.1f}s budget; hedging")
+            for future in done:
+                pending.discard(future)
+                result, error = self._outcome(future, validate)
+                if error is None:
+                    self._finish(stage, started, won_by_hedge=future is hedge, losers=pending)
+                    return result
+                errors.append(error)
+                if isinstance(error, _Invalid):
+                    with self._lock:
+                        stats.invalid += 1
+            if not pending:
+                if hedge is None and self.enabled and budget is not None:
+                    # The primary failed fast: the duplicate is the retry
+                    hedge = self._start(hedge_call or call, f"{stage}-hedge")
+                    pending.add(hedge)
+                    with self._lock:
+                        stats.hedged += 1
+                else:
+                    break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+        with self._lock:
+            stats.failures += 1
+        first = errors[0]
+        if hedge is None and not isinstance(first, _Invalid):
+            raise first
+        raise HedgeFailed(f"{stage} call failed: " + '; '.join(str(error) for error in errors), errors)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Snapshot of per-stage hedging and latency statistics.
+
+        Returns:
+            dict: Stage -> counters, hedge_rate, hedge_win_rate, p50/p95/p99 seconds and the current budget
+        """
+        with self._lock:
+            stages = {stage: (stats, list(stats.latencies)) for stage, stats in self._stats.items()}
+            snapshot = {}
+            for stage, (stats, samples) in stages.items():
+                snapshot[stage] = {
+                    'calls': stats.calls,
+                    'hedged': stats.hedged,
+                    'hedge_wins': stats.hedge_wins,
+                    'cancelled': stats.cancelled,
+                    'invalid': stats.invalid,
+                    'failures': stats.failures,
+                    'slo_misses': stats.slo_misses,
+                    'hedge_rate': stats.hedged / stats.calls if stats.calls else 0.0,
+                    'hedge_win_rate': stats.hedge_wins / stats.hedged if stats.hedged else 0.0,
+                    'p50': percentile(samples, 0.50),
+                    'p95': percentile(samples, 0.95),
+                    'p99': percentile(samples, 0.99),
+                }
+        for stage in snapshot:
+            snapshot[stage]['budget'] = self.budget(stage)
+        return snapshot
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _start(call: Callable[[], Any], name: str) -> Future:
+        future = Future()
+
+        def target():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(call())
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=target, name=f"hedge-{name}", daemon=True).start()
+        return future
+
+    @staticmethod
+    def _outcome(future: Future, validate: Callable[[Any], bool]):
+        error = future.exception()
+        if error is not None:
+            return None, error
+        result = future.result()
+        try:
+            valid = validate(result)
+        except Exception:
+            valid = False
+        return (result, None) if valid else (None, _Invalid("invalid answer"))
+
+    def _finish(self, stage: str, started: float, won_by_hedge: bool, losers) -> None:
+        latency = time.monotonic() - started
+        for future in losers:
+            future.cancel()
+        with self._lock:
+            stats = self._stats[stage]
+            stats.latencies.append(latency)
+            stats.hedge_wins += won_by_hedge
+            stats.cancelled += len(losers)
+            slo = self.slo(stage)
+            if slo is not None and latency > slo:
+                stats.slo_misses += 1
+
+
+_hedger: Optional[Hedger] = None
+_hedger_lock = threading.Lock()
+
+
+def get_hedger() -> Hedger:
+    """Return the process-wide hedger configured from settings (hedges only with a fallback model)."""
+    global _hedger
+    if _hedger is None:
+        with _hedger_lock:
+            if _hedger is None:
+                # Import here to avoid circular imports
+                from config.settings import get_settings
+
+                settings = get_settings()
+                enabled = settings.hedging_enabled and bool(settings.hedge_fallback_model)
+                if settings.hedging_enabled and not enabled:
+                    logger.warning("HEDGING_ENABLED is set without HEDGE_FALLBACK_MODEL; calls are only timed")
+                _hedger = Hedger(
+                    slos={
+                        PROFILER: settings.profiler_latency_slo_seconds,
+                        ANALYST: settings.analyst_latency_slo_seconds,
+                        PLANNER: settings.planner_latency_slo_seconds,
+                    },
+                    enabled=enabled,
+                    fallback_model=settings.hedge_fallback_model,
+                )
+    return _hedger
+
+
+def get_hedging_metrics() -> Dict[str, Dict[str, Any]]:
+    """
+    Get per-stage hedge-rate and tail-latency metrics.
+
+    Returns:
+        dict: Stage metrics (empty if the hedger has not been started)
+    """
+    if _hedger is None:
+        return {}
+    return _hedger.metrics()
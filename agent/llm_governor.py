@@ -0,0 +1,356 @@
+"""
+Client-side governor for the shared AIML LLM endpoint.
+
+CrewAI agents and the feedback summarizer all call api.aimlapi.com with
+no coordination, so bursts caused 429s and timeouts that CrewAI then
+retried, making the burst worse. LLMGovernor sits in front of every call:
+
+- Concurrency limit learned AIMD-style: every fast success raises the limit
+  by 1/limit (about +1 per round of calls), every 429, timeout or response
+  slower than the latency target halves it. Only requests started after
+  the last decrease can trigger another, so one burst of failures halves
+  the limit once instead of collapsing it.
+- Fair queue: callers over the limit wait in per-user queues served round
+  robin, so one user's fan-out cannot starve everyone else.
+- Circuit breaker: after `failure_threshold` consecutive endpoint failures
+  (429, timeout, 5xx, connection errors) the circuit opens and calls fail
+  fast with CircuitOpenError, which callers turn into their local fallbacks
+  (rule-based feedback summaries, a plan built from challenge metadata).
+  After `cooldown` seconds one probe call is let through; its outcome
+  closes or re-opens the circuit.
+"""
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Outcome classes of a failed call (see classify_error)
+THROTTLED = 'throttled'
+TIMEOUT = 'timeout'
+FAILED = 'failed'
+
+_current_user: contextvars.ContextVar = contextvars.ContextVar('llm_governor_user', default=None)
+
+
+@contextlib.contextmanager
+def for_user(user_id: Optional[str]):
+    """Queue LLM calls made inside the block under `user_id`."""
+    reset = _current_user.set(user_id)
+    try:
+        yield
+    finally:
+        _current_user.reset(reset)
+
+
+def current_user() -> Optional[str]:
+    """User set by for_user() for LLM calls made now, if any."""
+    return _current_user.get()
+
+
+class CircuitOpenError(RuntimeError):
+    """The LLM endpoint is unhealthy; use the local fallback instead of calling it."""
+
+
+class QueueTimeout(RuntimeError):
+    """A call waited longer than max_wait for a concurrency slot."""
+
+
+def classify_error(error: BaseException) -> Optional[str]:
+    """
+    Classify an LLM call error as an endpoint health signal.
+
+    Works on openai and litellm exceptions without importing either.
+
+    Returns:
+        str: THROTTLED, TIMEOUT or FAILED, or None for errors that say
+        nothing about the endpoint's health (bad requests, parsing errors)
+    """
+    status = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    name = type(error).__name__.lower()
+    if status == 429 or 'ratelimit' in name:
+        return THROTTLED
+    if isinstance(error, TimeoutError) or 'timeout' in name:
+        return TIMEOUT
+    if (isinstance(status, int) and status >= 500) or isinstance(error, ConnectionError) \
+            or 'connection' in name or 'serviceunavailable' in name:
+        return FAILED
+    return None
+
+
+class LLMGovernor:
+    """Adaptive concurrency limit, fair per-user queue and circuit breaker for LLM calls."""
+
+    def __init__(self, initial_limit: int = 4, min_limit: int = 1, max_limit: int = 16,
+                 latency_target: float = 30.0, decrease_factor: float = 0.5, failure_threshold: int = 5,
+                 cooldown: float = 30.0, max_wait: float = 120.0, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            initial_limit: Concurrent calls allowed before anything is learned
+            min_limit: Floor of the learned limit
+            max_limit: Ceiling of the learned limit
+            latency_target: Seconds above which a successful call counts as congestion
+            decrease_factor: Multiplier applied to the limit on congestion
+            failure_threshold: Consecutive endpoint failures that open the circuit
+            cooldown: Seconds the circuit stays open before a probe call
+            max_wait: Seconds a call may wait in the queue (QueueTimeout after that)
+            clock: Monotonic time source (injectable for tests)
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_wait = max_wait
+        self._clock = clock
+
+        self._cond = threading.Condition()
+        self._limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self._in_flight = 0
+        # user -> waiters; the first user's first waiter is served next
+        self._queues: 'OrderedDict[Optional[str], deque]' = OrderedDict()
+        self._last_decrease = float('-inf')
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._consecutive_failures = 0
+        self._metrics = {
+            'admitted': 0,
+            'succeeded': 0,
+            'throttled': 0,
+            'timeouts': 0,
+            'errors': 0,
+            'slow': 0,
+            'rejected': 0,
+            'queue_timeouts': 0,
+            'decreases': 0,
+            'circuit_opens': 0,
+        }
+        self._total_wait = 0.0
+
+    @property
+    def limit(self) -> int:
+        """Current number of concurrent calls allowed."""
+        return int(self._limit)
+
+    @property
+    def state(self) -> str:
+        """Circuit state (CLOSED, OPEN or HALF_OPEN)."""
+        with self._cond:
+            self._refresh_state()
+            return self._state
+
+    def check(self) -> None:
+        """
+        Fail fast if the circuit is open.
+
+        Raises:
+            CircuitOpenError: While the endpoint is considered unhealthy
+        """
+        with self._cond:
+            self._refresh_state()
+            if self._state == OPEN:
+                self._metrics['rejected'] += 1
+                raise CircuitOpenError("LLM endpoint unavailable (circuit open)")
+
+    def call(self, fn: Callable[[], Any], user_id: Optional[str] = None) -> Any:
+        """
+        Run `fn` (one LLM request) under the concurrency limit.
+
+        Args:
+            fn: Makes the request
+            user_id: Fair-queue key (defaults to the user set by for_user())
+
+        Returns:
+            Whatever `fn` returns
+
+        Raises:
+            CircuitOpenError: The circuit is open (fn is not called)
+            QueueTimeout: No slot freed up within max_wait
+        """
+        probe = self._acquire(user_id if user_id is not None else current_user())
+        started = self._clock()
+        try:
+            result = fn()
+        except BaseException as e:
+            failure = classify_error(e)
+            self._release(started, probe, failure, neutral=failure is None)
+            raise
+        self._release(started, probe)
+        return result
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Snapshot of the limit, queue and circuit counters.
+
+        Returns:
+            dict: Counters plus limit, in_flight, queued, state and mean_queue_wait seconds
+        """
+        with self._cond:
+            self._refresh_state()
+            snapshot = dict(self._metrics)
+            snapshot.update({
+                'limit': int(self._limit),
+                'in_flight': self._in_flight,
+                'queued': sum(len(waiters) for waiters in self._queues.values()),
+                'queued_users': len(self._queues),
+                'state': self._state,
+                'mean_queue_wait': self._total_wait / snapshot['admitted'] if snapshot['admitted'] else 0.0,
+            })
+        return snapshot
+
+    # ------------------------------------------------------------------
+    # Internals (called with self._cond held unless noted)
+    # ------------------------------------------------------------------
+
+    def _acquire(self, user_id: Optional[str]) -> bool:
+        """Wait for a slot (not holding the lock); returns True for a half-open probe call."""
+        with self._cond:
+            self._refresh_state()
+            if self._state == HALF_OPEN and not self._probing:
+                # The probe skips the queue: it decides whether anyone else may call
+                self._probing = True
+                self._admit(0.0)
+                return True
+            if self._state != CLOSED:
+                self._metrics['rejected'] += 1
+                raise CircuitOpenError("LLM endpoint unavailable (circuit open)")
+
+            waiter = object()
+            self._queues.setdefault(user_id, deque()).append(waiter)
+            queued_at = self._clock()
+            deadline = queued_at + self.max_wait
+            while not (self._in_flight < int(self._limit) and self._next_waiter() is waiter):
+                remaining = deadline - self._clock()
+                if remaining <= 0 or self._state != CLOSED:
+                    self._remove_waiter(user_id, waiter)
+                    self._cond.notify_all()
+                    if self._state != CLOSED:
+                        self._metrics['rejected'] += 1
+                        raise CircuitOpenError("LLM endpoint unavailable (circuit open)")
+                    self._metrics['queue_timeouts'] += 1
+                    raise QueueTimeout(f"No LLM slot within {self.max_wait:.0f}s")
+                self._cond.wait(remaining)
+                self._refresh_state()
+
+            # Round robin: the served user goes to the back of the rotation
+            self._queues[user_id].popleft()
+            if self._queues[user_id]:
+                self._queues.move_to_end(user_id)
+            else:
+                del self._queues[user_id]
+            self._admit(self._clock() - queued_at)
+            # Another waiter may fit under the limit too
+            self._cond.notify_all()
+            return False
+
+    def _release(self, started: float, probe: bool, failure: Optional[str] = None, neutral: bool = False) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            latency = self._clock() - started
+            if neutral:
+                # The endpoint answered; the error is about the request itself
+                self._consecutive_failures = 0
+                if probe:
+                    self._state = CLOSED
+            elif failure is None:
+                self._metrics['succeeded'] += 1
+                self._consecutive_failures = 0
+                if latency > self.latency_target:
+                    self._metrics['slow'] += 1
+                    self._decrease(started)
+                else:
+                    self._limit = min(float(self.max_limit), self._limit + 1.0 / self._limit)
+                if probe:
+                    logger.info("LLM endpoint probe succeeded; closing circuit")
+                    self._state = CLOSED
+            else:
+                self._metrics[{THROTTLED: 'throttled', TIMEOUT: 'timeouts', FAILED: 'errors'}[failure]] += 1
+                self._consecutive_failures += 1
+                self._decrease(started)
+                if probe or self._consecutive_failures >= self.failure_threshold:
+                    self._open()
+            if probe:
+                self._probing = False
+            self._cond.notify_all()
+
+    def _admit(self, waited: float) -> None:
+        self._in_flight += 1
+        self._metrics['admitted'] += 1
+        self._total_wait += waited
+
+    def _decrease(self, started: float) -> None:
+        # Requests sent before the last decrease saw the old limit; ignore them
+        if started < self._last_decrease:
+            return
+        self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+        self._last_decrease = self._clock()
+        self._metrics['decreases'] += 1
+
+    def _open(self) -> None:
+        if self._state != OPEN:
+            logger.warning(f"LLM endpoint unhealthy after {self._consecutive_failures} failures; opening circuit")
+            self._metrics['circuit_opens'] += 1
+        self._state = OPEN
+        self._opened_at = self._clock()
+
+    def _refresh_state(self) -> None:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.cooldown:
+            self._state = HALF_OPEN
+
+    def _next_waiter(self):
+        for waiters in self._queues.values():
+            return waiters[0]
+        return None
+
+    def _remove_waiter(self, user_id: Optional[str], waiter) -> None:
+        waiters = self._queues.get(user_id)
+        if waiters is not None:
+            waiters.remove(waiter)
+            if not waiters:
+                del self._queues[user_id]
+
+
+_governor: Optional[LLMGovernor] = None
+_governor_lock = threading.Lock()
+
+
+def get_llm_governor() -> LLMGovernor:
+    """Return the process-wide governor configured from settings."""
+    global _governor
+    if _governor is None:
+        with _governor_lock:
+            if _governor is None:
+                # Import here to avoid circular imports
+                from config.settings import get_settings
+
+                settings = get_settings()
+                _governor = LLMGovernor(
+                    initial_limit=settings.llm_concurrency_initial,
+                    max_limit=settings.llm_concurrency_max,
+                    latency_target=settings.llm_latency_target_seconds,
+                    failure_threshold=settings.llm_circuit_failure_threshold,
+                    cooldown=settings.llm_circuit_cooldown_seconds,
+                )
+    return _governor
+
+
+def get_llm_governor_metrics() -> Dict[str, Any]:
+    """
+    Get concurrency-limit, queue and circuit-breaker metrics.
+
+    Returns:
+        dict: Governor metrics (empty if the governor has not been started)
+    """
+    if _governor is None:
+        return {}
+    return _governor.metrics()
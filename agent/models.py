@@ -125,6 +125,26 @@ class AnalystAgentOutput(BaseModel):
     calculation_method: str = Field(..., description="Brief description of calculation methodology")
     data_confidence: str = Field(..., description="Confidence level: high/medium/low")
 
+class CategoryEstimate(BaseModel):
+    category: str = Field(..., description="Emission category that was estimated")
+    kg: float = Field(..., description="Annual emissions of the category in kg CO2")
+    calculation_method: str = Field(..., description="Brief description of the calculation")
+    data_confidence: str = Field("medium", description="Confidence level: high/medium/low")
+
+# Agent 2 (Analyst) fan-out sub-analysis outputs, merged into AnalystAgentOutput
+class LeverValidationOutput(BaseModel):
+    key_lever_validations: List[KeyLeverValidation] = Field(..., description="Validation of Agent 1's key levers")
+
+class PsychographicInsightsOutput(BaseModel):
+    psychographic_insights: List[PsychographicInsight] = Field(..., description="Personalized insights based on user psychology")
+
+class RegionalBenchmarkOutput(BaseModel):
+    user_location: str = Field(..., description="User's location from profile")
+    local_average_kg: float = Field(..., description="Local/regional average annual emissions per person")
+
+class FunFactsOutput(BaseModel):
+    fun_comparison_facts: List[str] = Field(..., description="Engaging comparison facts")
+
 # Legacy models for backward compatibility (if needed)
 class FollowUpQuestion(BaseModel):
     id: str = Field(..., description="Unique identifier for the question")
@@ -0,0 +1,259 @@
+"""
+Progress events for long-running agent workflows.
+
+Workflows publish events (stage started/finished/failed, agent steps,
+token counts, retries) through a ProgressReporter to a channel on the
+process-wide ProgressBroker. Each Streamlit session has its own channel
+(see ui.progress), and any number of subscribers can follow it, e.g. the
+page that started the run and another view of the same session.
+
+The broker is in-memory and per process, so subscribers must run in the
+process that executes the workflow. Channels keep a short history, so a
+subscriber that connects late (or reconnects with the last sequence
+number it saw) still gets the events it missed.
+"""
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+STARTED = 'started'
+FINISHED = 'finished'
+FAILED = 'failed'
+STEP = 'step'
+TOKENS = 'tokens'
+RETRY = 'retry'
+
+# Rough characters per token, for running estimates before the final usage is known
+CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class ProgressEvent:
+    """One progress update of a workflow run."""
+    channel: str
+    workflow: str
+    kind: str
+    stage: Optional[str] = None
+    message: str = ''
+    tokens: Optional[int] = None
+    attempt: Optional[int] = None
+    seq: int = 0
+    timestamp: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class Subscription:
+    """Queue of events delivered to one subscriber of a channel."""
+
+    def __init__(self, broker: 'ProgressBroker', channel: str, max_queue: int):
+        self.channel = channel
+        self._broker = broker
+        self._queue: "queue.Queue[ProgressEvent]" = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.closed = False
+
+    def deliver(self, event: ProgressEvent) -> None:
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # A slow subscriber loses events instead of blocking the workflow
+            self.dropped += 1
+
+    def get(self, timeout: Optional[float] = None) -> Optional[ProgressEvent]:
+        """Next event, or None if none arrives within `timeout` seconds."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def drain(self) -> List[ProgressEvent]:
+        """All events currently queued, without waiting."""
+        events = []
+        while True:
+            event = self.get(timeout=0)
+            if event is None:
+                return events
+            events.append(event)
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self._broker.unsubscribe(self)
+
+
+class ProgressBroker:
+    """In-process pub/sub of progress events, keyed by channel."""
+
+    def __init__(self, history_size: int = 200, max_queue: int = 1000, max_channels: int = 1000):
+        """
+        Args:
+            history_size: Events kept per channel for late subscribers
+            max_queue: Events buffered per subscriber before new ones are dropped
+            max_channels: Channels with history kept before the least recently used is dropped
+        """
+        self.history_size = history_size
+        self.max_queue = max_queue
+        self.max_channels = max_channels
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._history: "OrderedDict[str, Deque[ProgressEvent]]" = OrderedDict()
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+
+    def publish(self, event: ProgressEvent) -> ProgressEvent:
+        """Assign a sequence number to `event` and deliver it to the channel's subscribers."""
+        with self._lock:
+            self._seq += 1
+            event.seq = self._seq
+            self._history.setdefault(event.channel, deque(maxlen=self.history_size)).append(event)
+            self._history.move_to_end(event.channel)
+            while len(self._history) > self.max_channels:
+                self._history.popitem(last=False)
+            subscribers = list(self._subscribers.get(event.channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+        return event
+
+    def subscribe(self, channel: str, after_seq: Optional[int] = None) -> Subscription:
+        """
+        Follow `channel`.
+
+        Args:
+            channel: Channel to follow
+            after_seq: Replay kept events with a higher sequence number (None replays nothing)
+
+        Returns:
+            Subscription: Call close() when done
+        """
+        subscription = Subscription(self, channel, self.max_queue)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+            if after_seq is not None:
+                for event in self._history.get(channel, ()):
+                    if event.seq > after_seq:
+                        subscription.deliver(event)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def history(self, channel: str, after_seq: int = 0) -> List[ProgressEvent]:
+        """Kept events of `channel` with a sequence number above `after_seq`."""
+        with self._lock:
+            return [event for event in self._history.get(channel, ()) if event.seq > after_seq]
+
+    def clear(self, channel: str) -> None:
+        """Forget the history of `channel`."""
+        with self._lock:
+            self._history.pop(channel, None)
+
+
+_broker: Optional[ProgressBroker] = None
+_broker_lock = threading.Lock()
+
+
+def get_progress_broker() -> ProgressBroker:
+    """Return the process-wide progress broker."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = ProgressBroker()
+    return _broker
+
+
+class ProgressReporter:
+    """Publishes the progress of one workflow run to a channel."""
+
+    def __init__(self, channel: str, workflow: str, broker: Optional[ProgressBroker] = None):
+        """
+        Args:
+            channel: Channel of the session that started the run
+            workflow: Workflow name shown to subscribers (e.g. 'planner')
+            broker: Broker to publish to (defaults to the process-wide one)
+        """
+        self.channel = channel
+        self.workflow = workflow
+        self._broker = broker or get_progress_broker()
+        self._stage: Optional[str] = None
+        self.tokens_so_far = 0
+
+    def _publish(self, kind: str, **kwargs) -> None:
+        try:
+            self._broker.publish(ProgressEvent(self.channel, self.workflow, kind, **kwargs))
+        except Exception as e:
+            # Progress reporting must never break the workflow itself
+            logger.warning(f"Failed to publish progress event: {str(e)}")
+
+    def started(self, stage: str, message: str = '') -> None:
+        self._stage = stage
+        self._publish(STARTED, stage=stage, message=message)
+
+    def finished(self, stage: str, message: str = '') -> None:
+        self._publish(FINISHED, stage=stage, message=message, tokens=self.tokens_so_far or None)
+
+    def failed(self, stage: str, error: str) -> None:
+        self._publish(FAILED, stage=stage, message=error)
+
+    def retry(self, stage: str, attempt: int, error: str = '') -> None:
+        self._publish(RETRY, stage=stage, attempt=attempt, message=error)
+
+    def tokens(self, total: int, message: str = '') -> None:
+        """Report the token count so far (replaces any running estimate)."""
+        self.tokens_so_far = total
+        self._publish(TOKENS, stage=self._stage, tokens=total, message=message)
+
+    def step_callback(self, step: Any) -> None:
+        """CrewAI step callback: publish each agent step with a running token estimate."""
+        text = getattr(step, 'text', None) or getattr(step, 'output', None) or getattr(step, 'result', None) or ''
+        self.tokens_so_far += len(str(text)) // CHARS_PER_TOKEN
+        tool = getattr(step, 'tool', None)
+        message = f"Using {tool}" if tool else (getattr(step, 'thought', None) or 'Agent step')
+        self._publish(STEP, stage=self._stage, message=str(message)[:200], tokens=self.tokens_so_far)
+
+    def task_callback(self, task_output: Any) -> None:
+        """CrewAI task callback: publish each finished task."""
+        name = getattr(task_output, 'name', None) or getattr(task_output, 'agent', None) or 'Task'
+        self._publish(STEP, stage=self._stage, message=f"{name} finished", tokens=self.tokens_so_far)
+
+    def report_usage(self, crew_output: Any) -> None:
+        """Publish the exact token usage of a finished crew run, if available."""
+        usage = getattr(crew_output, 'token_usage', None)
+        total = getattr(usage, 'total_tokens', None)
+        if total:
+            self.tokens(int(total))
+
+
+def crew_callbacks(progress: Optional[ProgressReporter]) -> Dict[str, Any]:
+    """Crew() keyword arguments wiring in `progress` (empty without a reporter)."""
+    if progress is None:
+        return {}
+    return {'step_callback': progress.step_callback, 'task_callback': progress.task_callback}
+
+
+@contextmanager
+def progress_stage(progress: Optional[ProgressReporter], stage: str, message: str = ''):
+    """Report `stage` as started, then finished or failed (no-op without a reporter)."""
+    if progress is None:
+        yield
+        return
+    progress.started(stage, message)
+    try:
+        yield
+    except Exception as e:
+        progress.failed(stage, str(e))
+        raise
+    progress.finished(stage)
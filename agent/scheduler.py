@@ -0,0 +1,432 @@
+"""
+Off-peak pre-generation of next week's plans.
+
+On Monday every active user opened the dashboard and pressed "Generate
+Challenges" at about the same time, each click blocking on a planner run.
+PlanScheduler generates next week's plans ahead of time, in an off-peak
+window (by default the night before the week starts), and writes them to
+weekly_plans with week_of set to that week's Monday. Plan readers hide
+plans for weeks that have not started, so on Monday the dashboard simply
+reads the ready plan.
+
+- Users are served from a priority queue, most active first (actions
+  logged recently, then latest activity), so the users most likely to
+  open the dashboard get their plan even if the window closes early.
+- At most `max_concurrency` planner runs are in flight at once: the
+  scheduler's share of the LLM budget, leaving headroom for interactive
+  runs.
+- Each run holds the single-flight lease for (user, week), so app
+  processes that all run the scheduler do not generate the same plan
+  twice, and users who already have a plan for the week are skipped.
+
+Users with feedback get the feedback-aware planner, the others the basic
+one. Against Supabase the scheduler reads and writes across users, so it
+runs with the service-role key (SUPABASE_SERVICE_ROLE_KEY). It therefore
+runs in its own worker process, never in the Streamlit app, which only
+holds per-user sessions. Either run the worker, which checks the window
+every poll_seconds:
+
+    python -m agent.scheduler --serve
+
+or run one pass from cron:
+
+    python -m agent.scheduler [--week YYYY-MM-DD]
+"""
+import atexit
+import heapq
+import itertools
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WORKFLOW = 'plan_pregeneration'
+
+
+@dataclass(order=True)
+class PlanJob:
+    """A queued plan generation; lower priority tuples run first."""
+    priority: tuple
+    seq: int
+    user_id: str = field(compare=False)
+    week_of: date = field(compare=False)
+
+
+def next_week_start(now: datetime) -> date:
+    """Monday of the week after the one containing `now`."""
+    today = now.date()
+    return today - timedelta(days=today.weekday()) + timedelta(days=7)
+
+
+def activity_priority(candidate: dict) -> tuple:
+    """Queue priority of a candidate: most recent actions first, then latest activity."""
+    try:
+        last_active = datetime.fromisoformat(str(candidate.get('last_active_at'))).timestamp()
+    except ValueError:
+        last_active = 0.0
+    return (-int(candidate.get('recent_actions') or 0), -last_active)
+
+
+class PlanScheduler:
+    """Pre-generates next week's plans for active users during an off-peak window."""
+
+    def __init__(self, generate: Callable[[str, date], Any], candidates: Callable[[datetime], List[dict]],
+                 has_plan: Callable[[str, date], bool], max_concurrency: int = 2, weekday: int = 6,
+                 start_hour: int = 1, end_hour: int = 5, active_days: int = 14, poll_seconds: float = 300.0,
+                 clock: Callable[[], datetime] = datetime.now):
+        """
+        Args:
+            generate: Callable(user_id, week_of) generating and saving the user's plan for that week
+            candidates: Callable(active_since) returning dicts with user_id, recent_actions, last_active_at
+            has_plan: Callable(user_id, week_of) telling whether a plan for that week already exists
+            max_concurrency: Most planner runs in flight at once
+            weekday: Day of the window (Monday is 0); plans are for the following Monday
+            start_hour: First hour of the window
+            end_hour: Hour the window closes; no new runs start after it
+            active_days: Users active within this many days get a plan
+            poll_seconds: Interval between window checks of the background thread
+            clock: Current local time
+        """
+        self._generate = generate
+        self._candidates = candidates
+        self._has_plan = has_plan
+        self.max_concurrency = max(1, max_concurrency)
+        self.weekday = weekday
+        self.start_hour = start_hour
+        self.end_hour = end_hour
+        self.active_days = active_days
+        self.poll_seconds = poll_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._queue: List[PlanJob] = []
+        self._queued = set()
+        self._seq = itertools.count()
+        self._completed_weeks = set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._metrics = {
+            'queued': 0,
+            'generated': 0,
+            'skipped_existing': 0,
+            'failed': 0,
+            'deferred': 0,
+            'expired': 0,
+            'in_flight': 0,
+        }
+
+    def in_window(self, now: datetime) -> bool:
+        """Whether `now` falls in the off-peak window."""
+        return now.weekday() == self.weekday and self.start_hour <= now.hour < self.end_hour
+
+    def enqueue(self, user_id: str, week_of: date, priority: tuple = ()) -> bool:
+        """
+        Queue a plan generation unless the same one is already queued.
+
+        Returns:
+            bool: True if the job was added
+        """
+        with self._lock:
+            if (user_id, week_of) in self._queued:
+                return False
+            self._queued.add((user_id, week_of))
+            heapq.heappush(self._queue, PlanJob(priority, next(self._seq), user_id, week_of))
+            self._metrics['queued'] += 1
+        return True
+
+    def queue_week(self, week_of: date, now: Optional[datetime] = None) -> int:
+        """
+        Queue plans for every active user for `week_of`.
+
+        Returns:
+            int: Number of jobs added
+        """
+        now = now or self._clock()
+        candidates = self._candidates(now - timedelta(days=self.active_days))
+        return sum(self.enqueue(candidate['user_id'], week_of, activity_priority(candidate))
+                   for candidate in candidates)
+
+    def run_pending(self, deadline: Optional[datetime] = None) -> int:
+        """
+        Work through the queue with up to max_concurrency runs at a time.
+
+        Args:
+            deadline: No new runs start after this time; the rest stay queued
+
+        Returns:
+            int: Number of plans generated
+        """
+        generated = [0]
+        count_lock = threading.Lock()
+
+        def worker():
+            while True:
+                job = self._next_job(deadline)
+                if job is None:
+                    return
+                if self._run(job):
+                    with count_lock:
+                        generated[0] += 1
+
+        workers = [threading.Thread(target=worker, name=f"plan-scheduler-{i}", daemon=True)
+                   for i in range(min(self.max_concurrency, self.pending()))]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return generated[0]
+
+    def tick(self, now: Optional[datetime] = None, force: bool = False, week_of: Optional[date] = None) -> int:
+        """
+        Pre-generate next week's plans if the window is open and they are not done yet.
+
+        Args:
+            now: Current time (defaults to the clock)
+            force: Run regardless of the window and of an earlier completed pass
+            week_of: Week to generate (defaults to the week after `now`)
+
+        Returns:
+            int: Number of plans generated
+        """
+        now = now or self._clock()
+        self.drop_started_weeks(now)
+        if not force and not self.in_window(now):
+            return 0
+        week_of = week_of or next_week_start(now)
+        if not force and week_of in self._completed_weeks:
+            return 0
+
+        self.queue_week(week_of, now)
+        deadline = None if force else now.replace(hour=self.end_hour, minute=0, second=0, microsecond=0)
+        generated = self.run_pending(deadline)
+        if not self.pending():
+            self._completed_weeks.add(week_of)
+        logger.info(f"Pre-generated {generated} plans for the week of {week_of.isoformat()}")
+        return generated
+
+    def drop_started_weeks(self, now: datetime) -> int:
+        """
+        Drop queued jobs for weeks that have already started.
+
+        Jobs left over when a window closes would otherwise run in the next
+        window and generate plans for a week that is already under way.
+
+        Returns:
+            int: Number of jobs dropped
+        """
+        with self._lock:
+            kept = [job for job in self._queue if job.week_of > now.date()]
+            dropped = len(self._queue) - len(kept)
+            if dropped:
+                heapq.heapify(kept)
+                self._queue = kept
+                self._queued = {(job.user_id, job.week_of) for job in kept}
+                self._metrics['expired'] += dropped
+                logger.info(f"Dropped {dropped} queued plan jobs for weeks that have started")
+        return dropped
+
+    def pending(self) -> int:
+        """Number of queued jobs."""
+        with self._lock:
+            return len(self._queue)
+
+    def start(self) -> None:
+        """Check the window every poll_seconds on a daemon thread (idempotent)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="plan-scheduler", daemon=True)
+        self._thread.start()
+
+    def serve(self) -> None:
+        """Check the window every poll_seconds in the calling thread until stop()."""
+        self._loop()
+
+    def stop(self) -> None:
+        """Stop the background thread after its current pass."""
+        self._stop.set()
+
+    def metrics(self) -> Dict[str, int]:
+        """
+        Snapshot of scheduling counters.
+
+        Returns:
+            dict: Counters plus the number of queued jobs
+        """
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot['pending'] = len(self._queue)
+        return snapshot
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _next_job(self, deadline: Optional[datetime]) -> Optional[PlanJob]:
+        with self._lock:
+            if not self._queue or self._stop.is_set():
+                return None
+            if deadline is not None and self._clock() >= deadline:
+                self._metrics['deferred'] = len(self._queue)
+                return None
+            job = heapq.heappop(self._queue)
+            self._queued.discard((job.user_id, job.week_of))
+            self._metrics['in_flight'] += 1
+            return job
+
+    def _run(self, job: PlanJob) -> bool:
+        outcome = 'failed'
+        try:
+            if self._has_plan(job.user_id, job.week_of):
+                outcome = 'skipped_existing'
+                return False
+            self._generate(job.user_id, job.week_of)
+            outcome = 'generated'
+            return True
+        except Exception as e:
+            logger.warning(f"Could not pre-generate plan for {job.user_id}: {str(e)}")
+            return False
+        finally:
+            with self._lock:
+                self._metrics['in_flight'] -= 1
+                self._metrics[outcome] += 1
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                logger.warning(f"Plan pre-generation pass failed: {str(e)}")
+            self._stop.wait(self.poll_seconds)
+
+
+def pregenerate_weekly_plan(user_id: str, week_of: date):
+    """
+    Generate and save a user's plan for `week_of` (one run across processes).
+
+    Args:
+        user_id (str): User's UUID
+        week_of (date): Monday of the week the plan is for
+
+    Returns:
+        dict: The saved plan
+    """
+    # Import here to avoid circular imports
+    from data_model.database import (
+        create_agent_session, get_user_feedback_history, save_weekly_plan_results, update_agent_session
+    )
+    from .crew import run_feedback_aware_planning_workflow, run_planner_workflow
+    from .single_flight import FlightKey, get_single_flight
+    from .utils import parse_agent3_text_output, parse_text_to_json
+
+    description = f"Pre-generated plan for the week of {week_of.isoformat()}"
+
+    def run(lease_session_id):
+        session_id = lease_session_id or create_agent_session(user_id, WORKFLOW, description)
+        try:
+            if get_user_feedback_history(user_id, limit=1):
+                # The user did not start this run, so it is not charged to their daily budget
+                plan = parse_agent3_text_output(run_feedback_aware_planning_workflow(user_id, charge_budget=False),
+                                                task_type="feedback_aware")
+            else:
+                plan = parse_text_to_json(run_planner_workflow(user_id, charge_budget=False))
+            if not plan:
+                raise ValueError("Planner output could not be parsed")
+            save_weekly_plan_results(user_id, session_id, plan, week_of=week_of)
+        except Exception as e:
+            if not lease_session_id:
+                update_agent_session(session_id, "failed", {"error": str(e)})
+            raise
+        if not lease_session_id:
+            update_agent_session(session_id, "completed", plan)
+        return plan
+
+    key = FlightKey.for_inputs(user_id, WORKFLOW, week_of.isoformat())
+    return get_single_flight().do(key, run, description).value
+
+
+_scheduler: Optional[PlanScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_plan_scheduler() -> PlanScheduler:
+    """Return the process-wide plan scheduler configured from settings."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                # Import here to avoid circular imports
+                from config.settings import get_settings
+                from data_model.client_pool import bind_access_token
+                from data_model.database import get_plan_pregeneration_candidates, has_weekly_plan
+                from data_model.storage import SUPABASE, get_storage_backend_name
+
+                settings = get_settings()
+                # Cross-user reads and writes need the service role on Supabase; the bound key
+                # resolves to the dedicated service-role client, never to a pooled session client
+                token = settings.supabase_service_role_key if get_storage_backend_name() == SUPABASE else None
+
+                def as_service(fn):
+                    def call(*args):
+                        with bind_access_token(token):
+                            return fn(*args)
+                    return call
+
+                _scheduler = PlanScheduler(
+                    generate=as_service(pregenerate_weekly_plan),
+                    candidates=as_service(get_plan_pregeneration_candidates),
+                    has_plan=as_service(has_weekly_plan),
+                    max_concurrency=settings.plan_pregeneration_concurrency,
+                    weekday=settings.plan_pregeneration_weekday,
+                    start_hour=settings.plan_pregeneration_start_hour,
+                    end_hour=settings.plan_pregeneration_end_hour,
+                    active_days=settings.plan_pregeneration_active_days,
+                )
+                atexit.register(_scheduler.stop)
+    return _scheduler
+
+
+def start_plan_scheduler(block: bool = False) -> Optional[PlanScheduler]:
+    """
+    Start the scheduler if PLAN_PREGENERATION_ENABLED is set (for worker processes).
+
+    Args:
+        block: Serve in the calling thread until stopped instead of on a daemon thread
+
+    Returns:
+        PlanScheduler: The scheduler, or None when disabled
+    """
+    from config.settings import get_settings
+    from data_model.storage import SUPABASE, get_storage_backend_name
+
+    settings = get_settings()
+    if not settings.plan_pregeneration_enabled:
+        return None
+    if get_storage_backend_name() == SUPABASE and not settings.supabase_service_role_key:
+        logger.warning("Plan pre-generation needs SUPABASE_SERVICE_ROLE_KEY; not starting the scheduler")
+        return None
+    scheduler = get_plan_scheduler()
+    if block:
+        scheduler.serve()
+    else:
+        scheduler.start()
+    return scheduler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pre-generate next week's plans for active users")
+    parser.add_argument("--week", type=date.fromisoformat, help="Monday of the week to generate (default: next week)")
+    parser.add_argument("--serve", action="store_true",
+                        help="Keep running and generate plans in each off-peak window")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.serve:
+        if start_plan_scheduler(block=True) is None:
+            raise SystemExit("Plan pre-generation is disabled (see PLAN_PREGENERATION_ENABLED)")
+    else:
+        count = get_plan_scheduler().tick(force=True, week_of=args.week)
+        print(f"Pre-generated {count} plans")
@@ -0,0 +1,226 @@
+"""
+Single-flight execution of agent workflows.
+
+Double clicks, repeated "Regenerate" presses and a second open tab each
+used to start their own planner run, with its own agent session and its
+own weekly_plans write. SingleFlight coalesces concurrent requests for the
+same (user, workflow, input hash) onto one run and hands every caller its
+result:
+
+- Within a process, later callers wait on the leader's future.
+- Across processes, the leader holds a lease: the only active
+  agent_sessions row for the flight key (see
+  data_model.acquire_agent_session_lease). Callers in other processes fail
+  to acquire it and poll that row until it is finished, then return its
+  final_output. A lease that expires (crashed leader) can be taken over.
+
+The leader's function receives the lease's agent session id so it can
+record its results against that session.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from .fingerprint import fingerprint
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = 'active'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+
+class FlightFailed(RuntimeError):
+    """The shared run failed in another process."""
+
+
+@dataclass(frozen=True)
+class FlightKey:
+    """Identifies a workflow run: who, what, and on which inputs."""
+    user_id: str
+    workflow: str
+    input_hash: str
+
+    @classmethod
+    def for_inputs(cls, user_id: str, workflow: str, inputs: Any = None) -> 'FlightKey':
+        return cls(user_id, workflow, fingerprint(inputs)[:16])
+
+    @property
+    def name(self) -> str:
+        return f"{self.workflow}:{self.user_id}:{self.input_hash}"
+
+
+@dataclass
+class FlightResult:
+    """Outcome of SingleFlight.do()."""
+    value: Any
+    leader: bool
+    session_id: Optional[str] = None
+
+
+class SingleFlight:
+    """Coalesces concurrent runs of the same workflow onto one execution."""
+
+    def __init__(self, acquire: Optional[Callable[[FlightKey, str, int], Optional[str]]] = None,
+                 lookup: Optional[Callable[[str], Optional[dict]]] = None,
+                 release: Optional[Callable[[str, str, Any], Any]] = None,
+                 lease_seconds: int = 600, poll_seconds: float = 2.0, wait_timeout: float = 900.0):
+        """
+        Args:
+            acquire: Callable(key, description, lease_seconds) returning a lease id, or None if held elsewhere
+            lookup: Callable(key name) returning the latest lease row (status, final_output)
+            release: Callable(lease id, status, output) finishing a lease
+            lease_seconds: Lease duration
+            poll_seconds: Interval between checks of a lease held in another process
+            wait_timeout: Longest wait for another process's run
+        """
+        self._acquire = acquire
+        self._lookup = lookup
+        self._release = release
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._flights: Dict[FlightKey, Future] = {}
+        self._metrics = {
+            'runs': 0,
+            'coalesced_local': 0,
+            'coalesced_remote': 0,
+            'failed': 0,
+            'lease_errors': 0,
+        }
+
+    def do(self, key: FlightKey, fn: Callable[[Optional[str]], Any], description: str = '') -> FlightResult:
+        """
+        Run `fn(session_id)` unless the same flight is already running, and share its result.
+
+        Args:
+            key: Flight key
+            fn: Workflow run; receives the lease's agent session id (None without a lease store)
+            description: Initial prompt recorded on the lease's agent session
+
+        Returns:
+            FlightResult: The value plus whether this caller ran it
+        """
+        with self._lock:
+            future = self._flights.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._flights[key] = future
+            else:
+                self._metrics['coalesced_local'] += 1
+
+        if not leader:
+            logger.info(f"Joining in-flight run {key.name}")
+            return FlightResult(future.result(), leader=False)
+
+        try:
+            result = self._lead(key, fn, description)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result.value)
+            return result
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+
+    def metrics(self) -> Dict[str, int]:
+        """
+        Snapshot of run and coalescing counters.
+
+        Returns:
+            dict: Counters plus the number of flights in progress
+        """
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot['in_flight'] = len(self._flights)
+        return snapshot
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _lead(self, key: FlightKey, fn: Callable[[Optional[str]], Any], description: str) -> FlightResult:
+        deadline = time.monotonic() + self.wait_timeout
+        waited = False
+        while True:
+            if waited:
+                # Check the other process's run before retrying the lease, so a run that
+                # just finished is shared rather than started again
+                row = self._lookup(key.name) if self._lookup else None
+                status = (row or {}).get('status')
+                if status == COMPLETED:
+                    with self._lock:
+                        self._metrics['coalesced_remote'] += 1
+                    logger.info(f"Shared result of run {key.name} from another process")
+                    return FlightResult(row.get('final_output'), leader=False, session_id=row.get('id'))
+                if status == FAILED:
+                    raise FlightFailed(f"Run {key.name} failed: {row.get('final_output')}")
+
+            try:
+                session_id = self._acquire(key, description, self.lease_seconds) if self._acquire else None
+                lease_held = self._acquire is not None
+            except Exception as e:
+                # The lease store is an optimisation; run unprotected rather than not at all
+                logger.warning(f"Could not acquire lease for {key.name}: {str(e)}")
+                with self._lock:
+                    self._metrics['lease_errors'] += 1
+                session_id, lease_held = None, False
+
+            if session_id is not None or not lease_held:
+                return FlightResult(self._run(key, fn, session_id), leader=True, session_id=session_id)
+
+            # Held by another process (or expired and about to be taken over): wait for it
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Timed out waiting for run {key.name}")
+            waited = True
+            time.sleep(self.poll_seconds)
+
+    def _run(self, key: FlightKey, fn: Callable[[Optional[str]], Any], session_id: Optional[str]) -> Any:
+        with self._lock:
+            self._metrics['runs'] += 1
+        try:
+            value = fn(session_id)
+        except Exception as e:
+            with self._lock:
+                self._metrics['failed'] += 1
+            if session_id is not None:
+                self._release(session_id, FAILED, {'error': str(e)})
+            raise
+        if session_id is not None:
+            self._release(session_id, COMPLETED, value)
+        return value
+
+
+_single_flight: Optional[SingleFlight] = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """Return the process-wide single-flight coordinator backed by agent_sessions leases."""
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                # Import here to avoid circular imports
+                from config.settings import get_settings
+                from data_model.database import (
+                    acquire_agent_session_lease, get_agent_session_lease, release_agent_session_lease
+                )
+
+                def acquire(key: FlightKey, description: str, lease_seconds: int) -> Optional[str]:
+                    return acquire_agent_session_lease(key.user_id, key.workflow, description, key.name, lease_seconds)
+
+                _single_flight = SingleFlight(
+                    acquire=acquire,
+                    lookup=get_agent_session_lease,
+                    release=release_agent_session_lease,
+                    lease_seconds=get_settings().single_flight_lease_seconds,
+                )
+    return _single_flight
@@ -0,0 +1,223 @@
+"""
+Speculative execution of agent workflows.
+
+The onboarding page starts the profiler in the background as soon as the
+high-signal sections (household/energy, transport, diet) are answered,
+while the user is still filling the remaining sections. Each job is keyed
+by user and tagged with the fingerprint of its inputs:
+
+- start() with an unchanged fingerprint keeps the running job;
+  with a changed one, the old job is cancelled and a new one started.
+- take() on final submit returns the job's result if the fingerprint
+  still matches (waiting for it if it is still running), otherwise
+  cancels it and returns None so the caller runs the workflow itself.
+
+A job that is already running cannot be interrupted (crew.kickoff()
+blocks its thread); cancelling it only drops its result.
+"""
+import atexit
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SpeculativeJob:
+    """One background run of a workflow for a given input fingerprint."""
+    key: str
+    fingerprint: str
+    future: Future
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def failed(self) -> bool:
+        return self.future.done() and not self.future.cancelled() and self.future.exception() is not None
+
+
+class SpeculativeRunner:
+    """Background jobs keyed by user, reused or replaced by input fingerprint."""
+
+    def __init__(self, max_workers: int = 2, max_age_seconds: float = 3600.0):
+        """
+        Args:
+            max_workers: Concurrent speculative jobs
+            max_age_seconds: Finished jobs older than this are dropped unclaimed
+        """
+        self.max_age_seconds = max_age_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculative")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, SpeculativeJob] = {}
+        self._metrics = {
+            'started': 0,
+            'kept': 0,
+            'cancelled': 0,
+            'reused': 0,
+            'mismatched': 0,
+            'failed': 0,
+            'missing': 0,
+            'expired': 0,
+            'saved_seconds': 0.0,
+        }
+
+    def start(self, key: str, fingerprint: str, fn: Callable[..., Any], *args, **kwargs) -> SpeculativeJob:
+        """
+        Run `fn(*args, **kwargs)` speculatively for `key`.
+
+        Args:
+            key: Job owner (e.g. user id)
+            fingerprint: Fingerprint of the inputs the result depends on
+
+        Returns:
+            SpeculativeJob: The running job (the existing one if the fingerprint is unchanged)
+        """
+        with self._lock:
+            self._expire()
+            existing = self._jobs.get(key)
+            if existing is not None and existing.fingerprint == fingerprint and not existing.failed:
+                self._metrics['kept'] += 1
+                return existing
+            if existing is not None:
+                self._cancel(existing)
+            job = SpeculativeJob(key, fingerprint, self._executor.submit(fn, *args, **kwargs))
+            self._jobs[key] = job
+            self._metrics['started'] += 1
+        logger.info(f"Started speculative job for {key} ({fingerprint[:12]})")
+        return job
+
+    def take(self, key: str, fingerprint: str, timeout: Optional[float] = None) -> Optional[Any]:
+        """
+        Claim the result of `key`'s job if it was computed for `fingerprint`.
+
+        Args:
+            key: Job owner
+            fingerprint: Fingerprint of the final inputs
+            timeout: Seconds to wait for a job that is still running
+
+        Returns:
+            The job's result, or None if there is no matching successful job
+        """
+        with self._lock:
+            job = self._jobs.pop(key, None)
+            if job is None:
+                self._metrics['missing'] += 1
+                return None
+            if job.fingerprint != fingerprint:
+                self._cancel(job)
+                self._metrics['mismatched'] += 1
+                return None
+
+        claimed_at = time.monotonic()
+        try:
+            result = job.future.result(timeout=timeout)
+        except Exception as e:
+            logger.warning(f"Speculative job for {key} unusable: {str(e) or type(e).__name__}")
+            with self._lock:
+                self._metrics['failed'] += 1
+            return None
+
+        with self._lock:
+            self._metrics['reused'] += 1
+            # Time the job had already been running when its result was claimed
+            self._metrics['saved_seconds'] += claimed_at - job.started_at
+        return result
+
+    def cancel(self, key: str) -> None:
+        """Cancel `key`'s job, if any."""
+        with self._lock:
+            job = self._jobs.pop(key, None)
+            if job is not None:
+                self._cancel(job)
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Snapshot of job outcomes.
+
+        Returns:
+            dict: Counters plus the number of jobs currently tracked
+        """
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot['tracked'] = len(self._jobs)
+        return snapshot
+
+    def close(self) -> None:
+        """Drop queued jobs and stop the workers."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _cancel(self, job: SpeculativeJob) -> None:
+        # A running job can't be stopped; its result is simply never claimed
+        job.future.cancel()
+        self._metrics['cancelled'] += 1
+        logger.info(f"Cancelled speculative job for {job.key} ({job.fingerprint[:12]})")
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.max_age_seconds
+        expired = [key for key, job in self._jobs.items() if job.future.done() and job.started_at < cutoff]
+        for key in expired:
+            del self._jobs[key]
+            self._metrics['expired'] += 1
+
+
+_runner: Optional[SpeculativeRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_speculative_runner() -> SpeculativeRunner:
+    """Return the process-wide speculative runner, starting it on first use."""
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                _runner = SpeculativeRunner()
+                atexit.register(_runner.close)
+    return _runner
+
+
+def apply_late_sections(profile: dict, user_data: dict) -> dict:
+    """
+    Fill the enriched profile fields copied from sections answered after a speculative run.
+
+    The profiler restates consumption habits and goals rather than reasoning
+    about them, so these are taken from the final answers instead of
+    re-running the profiler when only they changed.
+
+    Args:
+        profile (dict): Profiler output
+        user_data (dict): Final nested onboarding data
+
+    Returns:
+        dict: Copy of `profile` with consumption patterns and psychographic insights updated
+    """
+    profile = dict(profile)
+    diet = user_data.get("diet") or {}
+    consumption = user_data.get("consumption") or {}
+    goals = user_data.get("goals") or {}
+
+    patterns = dict(profile.get("consumption_patterns") or {})
+    for field_name, value in (("shopping_frequency", diet.get("shopping_frequency")),
+                              ("plastic_usage", consumption.get("plastic_usage")),
+                              ("recycling_habit", consumption.get("recycling_habits"))):
+        if value:
+            patterns[field_name] = value
+    profile["consumption_patterns"] = patterns
+
+    insights = dict(profile.get("psychographic_insights") or {})
+    improvement_areas = list(goals.get("improvement_area") or [])
+    if goals.get("other_improvement_area"):
+        improvement_areas.append(goals["other_improvement_area"])
+    for field_name, value in (("motivations", goals.get("main_motivation")),
+                              ("barriers", goals.get("biggest_challenge")),
+                              ("goals", improvement_areas)):
+        if value:
+            insights[field_name] = list(value)
+    profile["psychographic_insights"] = insights
+    return profile
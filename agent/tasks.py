@@ -2,7 +2,12 @@
 from crewai import Task
 from .models import (
     ProfilerAgentOutput, 
-    AnalystAgentOutput
+    AnalystAgentOutput,
+    CategoryEstimate,
+    LeverValidationOutput,
+    PsychographicInsightsOutput,
+    RegionalBenchmarkOutput,
+    FunFactsOutput
 )
 import json
 import os
@@ -254,6 +259,156 @@ def create_benchmarking_task(agent, user_data, carbon_results):
         output_json=AnalystAgentOutput,
     )
 
+# # Task 3
+# # -----------------------------
+def create_category_analysis_task(agent, unit, category_inputs, previous_analysis=None):
+    """Creates a task estimating the annual emissions of a single category (incremental re-analysis and fan-out)"""
+    
+    previous_kg = (previous_analysis or {}).get("category_breakdown", {}).get(unit.breakdown_key)
+    
+    return Task(
+        description=(
+            f"Estimate the user's annual {unit.label} emissions in kg CO2. "
+            "Do not estimate any other category.\n\n"
+            
+            "RELEVANT ONBOARDING ANSWERS:\n"
+            f"{category_inputs}\n\n"
+            
+            + (f"PREVIOUS ESTIMATE FOR THIS CATEGORY: {previous_kg} kg CO2 (before the answers changed)\n\n"
+               if previous_kg is not None else "")
+            
+            + "EMISSION FACTORS:\n"
+            "Transport: Gas car 0.4kg/mile, Hybrid 0.2kg/mile, Electric 0.15kg/mile\n"
+            "Diet: Beef 27kg/kg, Chicken 7kg/kg, Vegetables 2kg/kg\n"
+            "Energy: Natural gas 5.3kg/therm, Electricity 0.7kg/kWh\n"
+            "Digital: AI query 4g, Streaming 36g/hour\n"
+        ),
+        expected_output=(
+            "JSON object with the category estimate:\n"
+            "{\n"
+            f'  "category": "{unit.label}",\n'
+            '  "kg": number,\n'
+            '  "calculation_method": "brief method",\n'
+            '  "data_confidence": "high/medium/low"\n'
+            "}\n"
+            "CRITICAL: Respond ONLY with a valid JSON object."
+        ),
+        agent=agent,
+        async_execution=False,
+        output_json=CategoryEstimate,
+    )
+
+# # Fan-out sub-analyses (run concurrently, merged by agent.category_analysis.assemble_analysis)
+# # -----------------------------
+def create_lever_validation_task(agent, enriched_profile_data):
+    """Creates the key lever validation sub-analysis"""
+    
+    return Task(
+        description=(
+            "Validate the top 3 key levers of the enriched profile: is each a high-impact carbon reduction "
+            "opportunity for this user, which emission category does it affect, and how many kg CO2 per year could it save?\n\n"
+            
+            "ENRICHED PROFILE:\n"
+            f"{enriched_profile_data}\n\n"
+            
+            "Use one of these categories: 'Transportation', 'Diet', 'Home Energy', 'Shopping', 'Digital Footprint', 'Other'."
+        ),
+        expected_output=(
+            "JSON object:\n"
+            "{\n"
+            '  "key_lever_validations": [\n'
+            '    {"lever": "lever text", "validated": boolean, "impact_category": "category", '
+            '"potential_reduction_kg": number, "validation_reason": "brief reason"}\n'
+            "  ]\n"
+            "}\n"
+            "CRITICAL: Respond ONLY with a valid JSON object."
+        ),
+        agent=agent,
+        async_execution=False,
+        output_json=LeverValidationOutput,
+    )
+
+def create_psychographic_insights_task(agent, enriched_profile_data):
+    """Creates the psychographic insights sub-analysis"""
+    
+    return Task(
+        description=(
+            "Create 2-3 personalized insights connecting the user's lifestyle emissions to their motivations and barriers.\n\n"
+            
+            "ENRICHED PROFILE:\n"
+            f"{enriched_profile_data}\n\n"
+            
+            "PSYCHOGRAPHIC INTEGRATION (keep insights precise - under 10 words):\n"
+            "- Connect high-emission habits with user motivations (e.g., 'saving money' + energy use)\n"
+            "- Address barriers with specific actions (e.g., 'not knowing what to do' + simple steps)\n"
+            "- Link goals to emission reductions"
+        ),
+        expected_output=(
+            "JSON object:\n"
+            "{\n"
+            '  "psychographic_insights": [\n'
+            '    {"insight_text": "precise insight", "related_motivation": "motivation from profile", '
+            '"addresses_barrier": "barrier from profile", "actionable_next_step": "concrete action"}\n'
+            "  ]\n"
+            "}\n"
+            "CRITICAL: Respond ONLY with a valid JSON object."
+        ),
+        agent=agent,
+        async_execution=False,
+        output_json=PsychographicInsightsOutput,
+    )
+
+def create_regional_benchmark_task(agent, location):
+    """Creates the regional benchmark sub-analysis (the comparison itself is computed from the totals)"""
+    
+    return Task(
+        description=(
+            "Give the average annual carbon footprint per person, in kg CO2, for the user's location.\n\n"
+            
+            "USER LOCATION:\n"
+            f"{location}\n\n"
+            
+            "Regional Averages (kg CO2/year/person):\n"
+            "- US: 14,000 | Europe: 10,700 | India: 2,000 | Asia: 4,700 | China: 8,900\n"
+            "- Africa: 1,000 | Global Average: 7,000\n"
+            "Use your knowledge for other countries/regions not listed."
+        ),
+        expected_output=(
+            "JSON object:\n"
+            "{\n"
+            '  "user_location": "location",\n'
+            '  "local_average_kg": number\n'
+            "}\n"
+            "CRITICAL: Respond ONLY with a valid JSON object."
+        ),
+        agent=agent,
+        async_execution=False,
+        output_json=RegionalBenchmarkOutput,
+    )
+
+def create_fun_facts_task(agent, enriched_profile_data):
+    """Creates the fun comparison facts sub-analysis"""
+    
+    return Task(
+        description=(
+            "Create 2-3 engaging, relatable comparison facts about the carbon impact of this user's habits "
+            "(cars, trees, flights, phone charges, etc.) and their location.\n\n"
+            
+            "ENRICHED PROFILE:\n"
+            f"{enriched_profile_data}"
+        ),
+        expected_output=(
+            "JSON object:\n"
+            "{\n"
+            '  "fun_comparison_facts": ["fact1", "fact2"]\n'
+            "}\n"
+            "CRITICAL: Respond ONLY with a valid JSON object."
+        ),
+        agent=agent,
+        async_execution=False,
+        output_json=FunFactsOutput,
+    )
+
 
 # # =========================================================
 # #             Agent 3 - Planner Agents Tasks
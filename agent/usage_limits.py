@@ -0,0 +1,211 @@
+"""
+Per-user rate limits and daily token budgets for agent workflows.
+
+Nothing stopped one user from starting plan updates back to back, each a
+multi-call LLM run on capacity shared with everyone else. UsageLimiter
+enforces two limits per user before a workflow starts:
+
+- A token bucket refilled at RATE_LIMIT_PER_MINUTE units a minute (and
+  holding at most a minute's worth); each workflow run costs WORKFLOW_COST
+  units, so the defaults allow 3 runs a minute.
+- A daily budget of LLM tokens (DAILY_TOKEN_BUDGET), charged with the
+  measured usage of every crew run (see agent.crew._kickoff_hedged).
+
+A run over either limit is refused with UsageLimitExceeded before any LLM
+call, and the caller degrades: the dashboard keeps the current plan, or
+builds one from the challenge metadata when there is none.
+
+Counters are in memory and per process, like the progress broker; a
+restart forgets the day's usage.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Callable, Dict, Optional
+
+
+class UsageLimitExceeded(RuntimeError):
+    """A workflow run was refused; the message is shown to the user."""
+
+
+class RateLimited(UsageLimitExceeded):
+    """The user started workflows faster than their rate limit."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"You're updating quickly; please try again in {max(1, round(retry_after))} seconds.")
+        self.retry_after = retry_after
+
+
+class BudgetExhausted(UsageLimitExceeded):
+    """The user used up today's token budget."""
+
+    def __init__(self, used: int, budget: int):
+        super().__init__("You've reached today's limit for AI-generated plans; it resets tomorrow.")
+        self.used = used
+        self.budget = budget
+
+
+class TokenBucket:
+    """Token bucket holding up to `capacity` units, refilled continuously."""
+
+    def __init__(self, capacity: float, refill_per_second: float, now: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.level = capacity
+        self.updated = now
+
+    def take(self, cost: float, now: float) -> float:
+        """
+        Take `cost` units if available.
+
+        Returns:
+            float: 0 if taken, else the seconds until `cost` units are available
+        """
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+        if self.level >= cost:
+            self.level -= cost
+            return 0.0
+        if self.refill_per_second <= 0:
+            return float('inf')
+        return (cost - self.level) / self.refill_per_second
+
+
+class UsageLimiter:
+    """Per-user workflow rate limit and daily token budget."""
+
+    def __init__(self, rate_per_minute: float = 60, workflow_cost: float = 20, daily_token_budget: int = 200000,
+                 max_users: int = 10000, clock: Callable[[], float] = time.time):
+        """
+        Args:
+            rate_per_minute: Units refilled per minute (also the bucket's capacity)
+            workflow_cost: Units one workflow run takes
+            daily_token_budget: LLM tokens a user may use per day (0 disables the budget)
+            max_users: Users tracked before the least recently seen is forgotten
+            clock: Wall-clock time source (injectable for tests)
+        """
+        self.rate_per_minute = rate_per_minute
+        self.workflow_cost = workflow_cost
+        self.daily_token_budget = daily_token_budget
+        self.max_users = max_users
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        # user -> (day, tokens used that day)
+        self._usage: "OrderedDict[str, tuple]" = OrderedDict()
+        self._metrics = {
+            'admitted': 0,
+            'rate_limited': 0,
+            'budget_exhausted': 0,
+            'tokens_recorded': 0,
+        }
+
+    def admit(self, user_id: str, workflow: str = '') -> None:
+        """
+        Charge one workflow run to `user_id`.
+
+        Args:
+            user_id: User starting the run
+            workflow: Workflow name (for the caller's logs)
+
+        Raises:
+            BudgetExhausted: Today's token budget is used up
+            RateLimited: The user's bucket is empty
+        """
+        now = self._clock()
+        with self._lock:
+            used = self._tokens_today(user_id, now)
+            if self.daily_token_budget and used >= self.daily_token_budget:
+                self._metrics['budget_exhausted'] += 1
+                raise BudgetExhausted(used, self.daily_token_budget)
+
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                bucket = TokenBucket(self.rate_per_minute, self.rate_per_minute / 60.0, now)
+                self._buckets[user_id] = bucket
+            self._buckets.move_to_end(user_id)
+            while len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+
+            retry_after = bucket.take(self.workflow_cost, now)
+            if retry_after:
+                self._metrics['rate_limited'] += 1
+                raise RateLimited(retry_after)
+            self._metrics['admitted'] += 1
+
+    def record_tokens(self, user_id: str, tokens: int) -> None:
+        """Charge `tokens` of measured LLM usage to today's budget of `user_id`."""
+        if not user_id or not tokens:
+            return
+        now = self._clock()
+        with self._lock:
+            self._usage[user_id] = (self._today(now), self._tokens_today(user_id, now) + int(tokens))
+            self._usage.move_to_end(user_id)
+            while len(self._usage) > self.max_users:
+                self._usage.popitem(last=False)
+            self._metrics['tokens_recorded'] += int(tokens)
+
+    def tokens_used(self, user_id: str) -> int:
+        """LLM tokens `user_id` used today."""
+        with self._lock:
+            return self._tokens_today(user_id, self._clock())
+
+    def remaining_tokens(self, user_id: str) -> Optional[int]:
+        """Tokens left in today's budget of `user_id` (None without a budget)."""
+        if not self.daily_token_budget:
+            return None
+        return max(0, self.daily_token_budget - self.tokens_used(user_id))
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Snapshot of admission counters.
+
+        Returns:
+            dict: Counters plus the number of tracked users
+        """
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot['tracked_users'] = len(self._buckets)
+        return snapshot
+
+    def _today(self, now: float) -> date:
+        return date.fromtimestamp(now)
+
+    def _tokens_today(self, user_id: str, now: float) -> int:
+        day, tokens = self._usage.get(user_id, (None, 0))
+        return tokens if day == self._today(now) else 0
+
+
+_limiter: Optional[UsageLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_usage_limiter() -> UsageLimiter:
+    """Return the process-wide usage limiter configured from settings."""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                # Import here to avoid circular imports
+                from config.settings import get_settings
+
+                settings = get_settings()
+                _limiter = UsageLimiter(
+                    rate_per_minute=settings.rate_limit_per_minute,
+                    workflow_cost=settings.workflow_cost,
+                    daily_token_budget=settings.daily_token_budget,
+                )
+    return _limiter
+
+
+def get_usage_limit_metrics() -> Dict[str, Any]:
+    """
+    Get rate-limit and budget admission metrics.
+
+    Returns:
+        dict: Limiter metrics (empty if the limiter has not been started)
+    """
+    if _limiter is None:
+        return {}
+    return _limiter.metrics()
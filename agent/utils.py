@@ -293,4 +293,66 @@ def load_challenges_metadata():
         }
     except Exception as e:
         print(f"Warning: Could not load challenges metadata: {e}")
-        return {'all_challenges': [], 'easy': [], 'medium': [], 'hard': []}
\ No newline at end of file
+        return {'all_challenges': [], 'easy': [], 'medium': [], 'hard': []}
+
+# Label of an impact area (analyst output) -> challenge metadata category
+IMPACT_AREA_CATEGORIES = {
+    'transportation': 'Transport',
+    'diet': 'Diet',
+    'home energy': 'Energy',
+    'shopping': 'Consumption',
+    'digital footprint': 'Digital',
+}
+
+# Rough weekly savings per difficulty; the metadata carries no CO2 figures
+LOCAL_PLAN_SAVINGS_KG = {'Easy': 1.5, 'Medium': 4.0, 'Hard': 10.0}
+LOCAL_PLAN_TIME = {'Daily': '15 minutes a day', 'Weekly': '1 hour', 'Long-Term': 'A few hours'}
+
+
+def build_local_plan_text(user_complete_data: dict = None) -> str:
+    """
+    Build a weekly plan from the challenge metadata without calling the LLM.
+
+    Used while the LLM endpoint is unavailable. Picks 2 easy, 1 medium and
+    1 hard challenge, preferring the user's priority areas, and formats them
+    like Agent 3's text output so the usual parsers apply.
+
+    Args:
+        user_complete_data: Complete profile with the carbon analysis (optional)
+
+    Returns:
+        str: Plan text in the weekly planning format
+    """
+    user_complete_data = user_complete_data or {}
+    areas = user_complete_data.get('priority_reduction_areas') or user_complete_data.get('top_impact_categories') or []
+    preferred = [IMPACT_AREA_CATEGORIES.get(str(area).lower(), str(area)) for area in areas]
+
+    def rank(challenge):
+        category = challenge.get('category')
+        return preferred.index(category) if category in preferred else len(preferred)
+
+    challenges = load_challenges_metadata()['all_challenges']
+    picked = []
+    for difficulty, count in (('Easy', 2), ('Medium', 1), ('Hard', 1)):
+        candidates = sorted((c for c in challenges if c.get('difficulty') == difficulty), key=rank)
+        picked.extend(candidates[:count])
+
+    focus = preferred[0] if preferred else 'Energy'
+    lines = [f"WEEK FOCUS: Small steps in {focus.lower()}", f"PRIORITY AREA: {focus}", "", "CHALLENGES:"]
+    for number, challenge in enumerate(picked, 1):
+        title, _, description = challenge['description'].partition(':')
+        if not description:
+            title, description = title[:40], title
+        lines += [
+            f"{number}. {challenge['difficulty'].upper()} - {title.strip()}",
+            f"   Description: {description.strip()}",
+            f"   Category: {challenge.get('category', 'Energy').lower()}",
+            f"   CO2 Savings: {LOCAL_PLAN_SAVINGS_KG[challenge['difficulty']]} kg",
+            f"   Time: {LOCAL_PLAN_TIME.get(challenge.get('type'), '30 minutes')}",
+            "   Motivation: A proven step that adds up over the week",
+            "",
+        ]
+    total = sum(LOCAL_PLAN_SAVINGS_KG[challenge['difficulty']] for challenge in picked)
+    lines += [f"TOTAL SAVINGS: {total:.1f} kg CO2",
+              "MOTIVATION MESSAGE: Every small action adds up to make a big difference for our planet!"]
+    return "\n".join(lines)
@@ -9,6 +9,7 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from data_model.auth import get_current_user, is_authenticated
+from ui.assets import picture_html
 
 # Page configuration - this is the first command that must be run
 st.set_page_config(
@@ -268,11 +269,20 @@ def show_front_page():
     
     # Cover image section
     try:
+        # Resized variants served by URL; the markup is cached in memory
+        cover_html = picture_html(
+            "images/cover_image_1.jpg",
+            css_class="cover-image",
+            alt="EcoAction AI Cover",
+            sizes="(max-width: 1200px) 100vw, 1200px",
+        )
+        if not cover_html:
+            raise FileNotFoundError("images/cover_image_1.jpg")
         st.markdown("""
         <div class="cover-container">
-            <img src="data:image/jpeg;base64,{}" class="cover-image" alt="EcoAction AI Cover">
+            {}
         </div>
-        """.format(get_image_base64("images/cover_image_1.jpg")), unsafe_allow_html=True)
+        """.format(cover_html), unsafe_allow_html=True)
     except:
         # Fallback if image not found
         st.markdown("""
@@ -328,15 +338,6 @@ def show_front_page():
     </div>
     """, unsafe_allow_html=True)
 
-def get_image_base64(image_path):
-    """Convert image to base64 for embedding"""
-    import base64
-    try:
-        with open(image_path, "rb") as img_file:
-            return base64.b64encode(img_file.read()).decode()
-    except:
-        return ""
-
 # Run the main function
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""
+Benchmark: per-rerun cost of the carbon analysis chart data.
+
+Compares rebuilding the category DataFrames and the Altair chart on every
+dashboard rerun (the previous render path, including serializing the chart
+to Vega-Lite as st.altair_chart does) with ui.charts.get_carbon_charts,
+which builds them once per scores version and serves later reruns from
+memory.
+
+Usage:
+    python benchmarks/bench_chart_building.py [--runs 200]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('OPENAI_API_KEY', 'bench-openai-key')
+os.environ.setdefault('SUPABASE_URL', 'https://bench.supabase.co')
+os.environ.setdefault('SUPABASE_ANON_KEY', 'bench-anon-key')
+
+import altair as alt
+import pandas as pd
+
+from ui import charts
+
+USER_ID = 'bench-user'
+SCORES_VERSION = '2025-01-06T09:00:00+00:00'
+
+CALCULATION_DATA = {
+    'total_carbon_footprint_kg': 8450,
+    'sustainability_score': 6,
+    'score_category': 'Good',
+    'regional_comparison': {'comparison_status': 'below', 'percentage_difference': -12.5},
+    'top_impact_categories': ['Transportation', 'Home Energy'],
+    'category_breakdown': {
+        'transportation_kg': 3200, 'diet_kg': 1900, 'home_energy_kg': 2100,
+        'shopping_kg': 850, 'digital_footprint_kg': 400, 'other_kg': 0,
+    },
+}
+BENCHMARK_DATA = {'sustainability_score': 6, 'score_category': 'Good'}
+
+
+def build_uncached():
+    """The previous render path: fresh DataFrames and Altair chart every rerun."""
+    categories, emissions = [], []
+    for key, value in CALCULATION_DATA['category_breakdown'].items():
+        if value > 0:
+            categories.append(charts.CATEGORY_NAMES.get(key, key))
+            emissions.append(value)
+    df = pd.DataFrame({'Category': categories, charts.EMISSIONS_COLUMN: emissions})
+    df_sorted = df.sort_values(by=charts.EMISSIONS_COLUMN, ascending=False)
+    chart = alt.Chart(df_sorted).mark_bar().encode(
+        x=alt.X('Category', title='Emission Category', sort=None, axis=alt.Axis(labelAngle=45)),
+        y=alt.Y(charts.EMISSIONS_COLUMN, title=charts.EMISSIONS_COLUMN)
+    )
+    chart.to_dict()
+    df['Percentage'] = (df[charts.EMISSIONS_COLUMN] / df[charts.EMISSIONS_COLUMN].sum() * 100).round(1)
+    df['Percentage'] = df['Percentage'].astype(str) + '%'
+    df.sort_values(by=charts.EMISSIONS_COLUMN, ascending=False)
+
+
+def build_cached():
+    charts.get_carbon_charts(USER_ID, SCORES_VERSION, CALCULATION_DATA, BENCHMARK_DATA)
+
+
+def time_runs(builder, runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        builder()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main(runs: int):
+    uncached = time_runs(build_uncached, runs)
+
+    started = time.perf_counter()
+    build_cached()
+    first_build_ms = (time.perf_counter() - started) * 1000
+    cached = time_runs(build_cached, runs)
+
+    print(f"Chart data per rerun, {runs} runs")
+    for label, timings in (('uncached', uncached), ('cached', cached)):
+        print(f"  {label:<9} median {statistics.median(timings):8.3f} ms   max {max(timings):8.3f} ms")
+    print(f"  first cached build {first_build_ms:.3f} ms")
+    print(f"  speedup   {statistics.median(uncached) / statistics.median(cached):.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=200)
+    args = parser.parse_args()
+    main(args.runs)
@@ -0,0 +1,99 @@
+"""
+Benchmark: wall time of the dashboard's data loading.
+
+Compares issuing the dashboard's independent PostgREST queries one after
+another (what the sync data layer does) with fetch_dashboard_data, which
+gathers them concurrently over one pooled client. The server is simulated
+with httpx.MockTransport and a fixed per-request latency, so the numbers
+reflect round-trip structure rather than database speed.
+
+Usage:
+    python benchmarks/bench_dashboard_loading.py [--latency-ms 40] [--runs 20]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('OPENAI_API_KEY', 'bench-openai-key')
+os.environ.setdefault('SUPABASE_URL', 'https://bench.supabase.co')
+os.environ.setdefault('SUPABASE_ANON_KEY', 'bench-anon-key')
+
+import httpx
+
+from data_model import async_database
+from data_model.async_database import AsyncDataClient
+
+USER_ID = 'bench-user'
+PLAN_ID = 'bench-plan'
+
+FIXTURES = {
+    'user_scores': [{'id': 's1', 'user_id': USER_ID, 'scores': {'total_kg': 1200}, 'benchmarks': {'country_avg': 1500}}],
+    'weekly_plans': [{
+        'id': PLAN_ID, 'user_id': USER_ID, 'week_of': '2025-01-06', 'created_at': '2025-01-06T09:00:00+00:00',
+        'suggestions': {'challenges': [{'id': 'challenge_1'}]},
+    }],
+    'user_feedback': [{
+        'id': 'f1', 'user_id': USER_ID, 'week_of': '2025-01-06', 'created_at': '2025-01-06T10:00:00+00:00',
+        'raw_feedback': 'more diet tips', 'feedback_summary': 'Prefers diet challenges',
+    }],
+    'user_actions': [{'suggestion_id': 'challenge_1', 'status': 'completed', 'user_id': USER_ID,
+                      'weekly_plan_id': PLAN_ID, 'created_at': '2025-01-07T10:00:00+00:00'}],
+}
+
+
+def make_transport(latency_s: float) -> httpx.MockTransport:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency_s)
+        table = request.url.path.rsplit('/', 1)[-1]
+        return httpx.Response(200, json=FIXTURES.get(table, []))
+    return httpx.MockTransport(handler)
+
+
+async def load_sequential(client: AsyncDataClient):
+    """The same queries awaited one at a time."""
+    await client.select('user_scores', filters={'user_id': USER_ID})
+    await async_database.fetch_latest_weekly_plan(client, USER_ID)
+    await async_database.fetch_current_week_feedback(client, USER_ID)
+    await async_database.fetch_user_feedback_history(client, USER_ID, 2)
+    await async_database.fetch_task_completions(client, USER_ID, PLAN_ID)
+
+
+async def load_gathered(client: AsyncDataClient):
+    await async_database.fetch_dashboard_data(client, USER_ID)
+
+
+async def time_runs(loader, client: AsyncDataClient, runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await loader(client)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+async def main(latency_ms: float, runs: int):
+    client = AsyncDataClient('https://bench.supabase.co', 'bench-anon-key',
+                             transport=make_transport(latency_ms / 1000), http2=False)
+    try:
+        sequential = await time_runs(load_sequential, client, runs)
+        gathered = await time_runs(load_gathered, client, runs)
+    finally:
+        await client.aclose()
+
+    print(f"Simulated latency: {latency_ms:.0f} ms/request, {runs} runs")
+    for label, timings in (('sequential', sequential), ('gathered', gathered)):
+        print(f"  {label:<10} median {statistics.median(timings):7.1f} ms   max {max(timings):7.1f} ms")
+    print(f"  speedup    {statistics.median(sequential) / statistics.median(gathered):.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--latency-ms', type=float, default=40.0)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.latency_ms, args.runs))
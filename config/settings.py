@@ -22,6 +22,9 @@ class Settings(BaseSettings):
     supabase_url: str
     supabase_anon_key: str
     supabase_service_role_key: Optional[str] = None
+    supabase_jwt_secret: Optional[str] = None
+    client_pool_max_size: int = 256
+    client_pool_idle_seconds: int = 1800
 
     # Application
     environment: str = "development"
@@ -32,9 +35,34 @@ class Settings(BaseSettings):
     cors_origins: list = ["http://localhost:3000", "http://localhost:5173"]
     rate_limit_per_minute: int = 60
     session_timeout_hours: int = 24
+    workflow_cost: int = 20  # Rate-limit units per agent workflow run
+    daily_token_budget: int = 200000  # LLM tokens per user per day (0 disables)
+
+    # Agents
+    speculative_profiling: bool = True
+    analyst_fan_out: bool = False
+    single_flight_lease_seconds: int = 600
+    plan_pregeneration_enabled: bool = False
+    plan_pregeneration_weekday: int = 6  # Day before the new week (Monday is 0)
+    plan_pregeneration_start_hour: int = 1
+    plan_pregeneration_end_hour: int = 5
+    plan_pregeneration_concurrency: int = 2
+    plan_pregeneration_active_days: int = 14
+    hedging_enabled: bool = False  # Also needs hedge_fallback_model
+    hedge_fallback_model: Optional[str] = None
+    profiler_latency_slo_seconds: float = 45.0
+    analyst_latency_slo_seconds: float = 60.0
+    planner_latency_slo_seconds: float = 90.0
+    llm_concurrency_initial: int = 4
+    llm_concurrency_max: int = 16
+    llm_latency_target_seconds: float = 30.0
+    llm_circuit_failure_threshold: int = 5
+    llm_circuit_cooldown_seconds: float = 30.0
 
     # Database
     database_url: Optional[str] = None
+    storage_backend: str = "supabase"
+    sqlite_path: str = "data/ecoaction.db"
 
     # Logging
     log_level: str = "INFO"
@@ -54,6 +82,12 @@ class Settings(BaseSettings):
             raise ValueError("SUPABASE_URL must use HTTPS")
         return v
 
+    @validator('storage_backend')
+    def validate_storage_backend(cls, v):
+        if v not in ["supabase", "sqlite"]:
+            raise ValueError("STORAGE_BACKEND must be supabase or sqlite")
+        return v
+
     @validator('environment')
     def validate_environment(cls, v):
         if v not in ["development", "staging", "production"]:
@@ -72,13 +106,39 @@ class Settings(BaseSettings):
             'supabase_url': 'SUPABASE_URL',
             'supabase_anon_key': 'SUPABASE_ANON_KEY',
             'supabase_service_role_key': 'SUPABASE_SERVICE_ROLE_KEY',
+            'supabase_jwt_secret': 'SUPABASE_JWT_SECRET',
+            'client_pool_max_size': 'CLIENT_POOL_MAX_SIZE',
+            'client_pool_idle_seconds': 'CLIENT_POOL_IDLE_SECONDS',
             'environment': 'ENVIRONMENT',
             'debug': 'DEBUG',
             'secret_key': 'SECRET_KEY',
             'cors_origins': 'CORS_ORIGINS',
             'rate_limit_per_minute': 'RATE_LIMIT_PER_MINUTE',
             'session_timeout_hours': 'SESSION_TIMEOUT_HOURS',
+            'workflow_cost': 'WORKFLOW_COST',
+            'daily_token_budget': 'DAILY_TOKEN_BUDGET',
+            'speculative_profiling': 'SPECULATIVE_PROFILING',
+            'analyst_fan_out': 'ANALYST_FAN_OUT',
+            'single_flight_lease_seconds': 'SINGLE_FLIGHT_LEASE_SECONDS',
+            'plan_pregeneration_enabled': 'PLAN_PREGENERATION_ENABLED',
+            'plan_pregeneration_weekday': 'PLAN_PREGENERATION_WEEKDAY',
+            'plan_pregeneration_start_hour': 'PLAN_PREGENERATION_START_HOUR',
+            'plan_pregeneration_end_hour': 'PLAN_PREGENERATION_END_HOUR',
+            'plan_pregeneration_concurrency': 'PLAN_PREGENERATION_CONCURRENCY',
+            'plan_pregeneration_active_days': 'PLAN_PREGENERATION_ACTIVE_DAYS',
+            'hedging_enabled': 'HEDGING_ENABLED',
+            'hedge_fallback_model': 'HEDGE_FALLBACK_MODEL',
+            'profiler_latency_slo_seconds': 'PROFILER_LATENCY_SLO_SECONDS',
+            'analyst_latency_slo_seconds': 'ANALYST_LATENCY_SLO_SECONDS',
+            'planner_latency_slo_seconds': 'PLANNER_LATENCY_SLO_SECONDS',
+            'llm_concurrency_initial': 'LLM_CONCURRENCY_INITIAL',
+            'llm_concurrency_max': 'LLM_CONCURRENCY_MAX',
+            'llm_latency_target_seconds': 'LLM_LATENCY_TARGET_SECONDS',
+            'llm_circuit_failure_threshold': 'LLM_CIRCUIT_FAILURE_THRESHOLD',
+            'llm_circuit_cooldown_seconds': 'LLM_CIRCUIT_COOLDOWN_SECONDS',
             'database_url': 'DATABASE_URL',
+            'storage_backend': 'STORAGE_BACKEND',
+            'sqlite_path': 'SQLITE_PATH',
             'log_level': 'LOG_LEVEL',
             'log_file': 'LOG_FILE',
         }
@@ -0,0 +1,329 @@
+"""
+Async data access for read paths that issue several independent queries.
+
+Queries go straight to the Supabase PostgREST endpoint through one pooled
+httpx.AsyncClient (HTTP/2 when the `h2` package is installed, keep-alive
+HTTP/1.1 otherwise). The client lives on a dedicated event-loop thread so
+its connection pool survives across Streamlit reruns, and independent
+queries are issued concurrently with asyncio.gather.
+
+Streamlit code should call the sync facades (load_dashboard_data,
+load_agent_results); they fall back to the sync functions in
+data_model.database if the async path fails or the SQLite storage
+backend is active.
+"""
+import asyncio
+import importlib.util
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Union
+
+import httpx
+
+from config.settings import get_settings
+from . import database
+from .client_pool import current_access_token
+from .query_metrics import record_payload_bytes
+from .storage import SUPABASE, get_storage_backend_name
+
+logger = logging.getLogger(__name__)
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+DEFAULT_TIMEOUT = 10.0
+
+
+class AsyncDataClient:
+    """Minimal async PostgREST reader sharing one connection pool."""
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        http2: Optional[bool] = None,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        """
+        Args:
+            base_url: Supabase project URL
+            api_key: Supabase anon key (sent as `apikey`)
+            transport: Optional transport override (used by benchmarks and tests)
+            http2: Force HTTP/2 on or off; defaults to on when `h2` is installed
+            max_connections: Upper bound on pooled connections
+            max_keepalive_connections: Idle connections kept open for reuse
+            timeout: Per-request timeout in seconds
+        """
+        self.api_key = api_key
+        self._client = httpx.AsyncClient(
+            base_url=f"{base_url.rstrip('/')}/rest/v1",
+            http2=HTTP2_AVAILABLE if http2 is None else http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+            ),
+            timeout=timeout,
+            transport=transport,
+            headers={
+                "apikey": api_key,
+                "X-Client-Info": "ecoaction-ai-backend@1.0.0",
+            },
+        )
+
+    async def select(
+        self,
+        table: str,
+        columns: str = "*",
+        filters: Optional[Dict[str, Any]] = None,
+        order: Optional[Union[str, List[str]]] = None,
+        desc: bool = False,
+        limit: Optional[int] = None,
+        access_token: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Run a PostgREST select with equality (or other operator) filters.
+
+        Args:
+            table: Table name
+            columns: Comma-separated column list
+            filters: Column -> value equality filters, or -> (operator, value) such as ('lte', '2024-01-01')
+            order: Column (or columns, in priority order) to order by
+            desc: Order descending
+            limit: Maximum rows to return
+            access_token: User JWT for row-level security (anon key if omitted)
+
+        Returns:
+            list: Rows returned by PostgREST
+        """
+        params = [("select", columns)]
+        for column, value in (filters or {}).items():
+            operator, value = value if isinstance(value, tuple) else ("eq", value)
+            params.append((column, f"{operator}.{value}"))
+        if order:
+            direction = 'desc' if desc else 'asc'
+            columns_order = [order] if isinstance(order, str) else order
+            params.append(("order", ",".join(f"{column}.{direction}" for column in columns_order)))
+        if limit is not None:
+            params.append(("limit", str(limit)))
+
+        headers = {"Authorization": f"Bearer {access_token or self.api_key}"}
+        response = await self._client.get(f"/{table}", params=params, headers=headers)
+        response.raise_for_status()
+        rows = response.json()
+        record_payload_bytes(f"async.{table}", len(response.content), len(rows))
+        return rows
+
+    async def aclose(self) -> None:
+        """Close pooled connections."""
+        await self._client.aclose()
+
+
+# ----------------------------------------------------------------------
+# Async queries
+# ----------------------------------------------------------------------
+
+def _started_plan_filters(user_id: str) -> Dict[str, Any]:
+    """Filters hiding plans pre-generated for a week that has not started yet."""
+    return {'user_id': user_id, 'week_of': ('lte', database.get_week_start().isoformat())}
+
+
+async def fetch_latest_weekly_plan(client: AsyncDataClient, user_id: str, access_token: str = None):
+    """Latest weekly_plans row for a user up to the current week, or None."""
+    rows = await client.select(
+        'weekly_plans', columns=database.WEEKLY_PLAN_COLUMNS, filters=_started_plan_filters(user_id),
+        order=['week_of', 'created_at'], desc=True, limit=1, access_token=access_token,
+    )
+    return rows[0] if rows else None
+
+
+async def fetch_agent_results(client: AsyncDataClient, user_id: str, access_token: str = None):
+    """Async equivalent of database.get_agent_results; both queries run concurrently."""
+    scores_rows, plan_rows = await asyncio.gather(
+        client.select('user_scores', columns='scores, benchmarks, calculated_at', filters={'user_id': user_id},
+                      access_token=access_token),
+        client.select(
+            'weekly_plans', columns='suggestions', filters=_started_plan_filters(user_id),
+            order=['week_of', 'created_at'], desc=True, limit=1, access_token=access_token,
+        ),
+    )
+    return database._combine_agent_results(scores_rows, plan_rows)
+
+
+async def fetch_task_completions(client: AsyncDataClient, user_id: str, weekly_plan_id: str,
+                                 access_token: str = None) -> list:
+    """Async equivalent of database.get_task_completions."""
+    rows = await client.select(
+        'user_actions', columns='suggestion_id, status, user_id, weekly_plan_id, created_at',
+        filters={'user_id': user_id, 'weekly_plan_id': weekly_plan_id, 'status': 'completed'},
+        access_token=access_token,
+    )
+    return database._task_completions_from_actions(rows)
+
+
+async def fetch_current_week_feedback(client: AsyncDataClient, user_id: str, access_token: str = None):
+    """Async equivalent of database.get_current_week_feedback."""
+    rows = await client.select(
+        'user_feedback', columns=database.USER_FEEDBACK_COLUMNS,
+        filters={'user_id': user_id, 'week_of': database.get_week_start().isoformat()},
+        order='created_at', desc=True, limit=1, access_token=access_token,
+    )
+    return database._current_feedback_from_rows(rows)
+
+
+async def fetch_user_feedback_history(client: AsyncDataClient, user_id: str, limit: int = 3,
+                                      access_token: str = None) -> list:
+    """Async equivalent of database.get_user_feedback_history."""
+    rows = await client.select(
+        'user_feedback', columns=database.USER_FEEDBACK_COLUMNS,
+        filters={'user_id': user_id},
+        order='created_at', desc=True, limit=limit, access_token=access_token,
+    )
+    return database._feedback_history_from_rows(rows)
+
+
+async def fetch_dashboard_data(client: AsyncDataClient, user_id: str, feedback_limit: int = 2,
+                               access_token: str = None) -> Dict[str, Any]:
+    """
+    Load everything the dashboard needs in two round-trip stages.
+
+    The scores, latest plan and feedback queries are independent and run
+    together; task completions depend on the plan id and run afterwards.
+
+    Args:
+        client: Shared async client
+        user_id: The user's UUID
+        feedback_limit: Number of feedback history entries
+        access_token: User JWT for row-level security
+
+    Returns:
+        dict: agents_status, agent_results, has_scores, latest_weekly_plan,
+            task_completions, current_feedback and feedback_history
+    """
+    scores_rows, latest_plan, current_feedback, feedback_history = await asyncio.gather(
+        client.select('user_scores', columns='scores, benchmarks, calculated_at', filters={'user_id': user_id},
+                      access_token=access_token),
+        fetch_latest_weekly_plan(client, user_id, access_token),
+        fetch_current_week_feedback(client, user_id, access_token),
+        fetch_user_feedback_history(client, user_id, feedback_limit, access_token),
+    )
+
+    task_completions = []
+    if latest_plan:
+        task_completions = await fetch_task_completions(client, user_id, str(latest_plan['id']), access_token)
+
+    agent_results = database._combine_agent_results(scores_rows, [latest_plan] if latest_plan else [])
+    return {
+        'agents_status': {
+            'analyst_completed': agent_results['analyst_completed'],
+            'planner_completed': agent_results['planner_completed'],
+        },
+        'agent_results': agent_results,
+        'has_scores': agent_results['analyst_completed'],
+        'latest_weekly_plan': latest_plan,
+        'task_completions': task_completions,
+        'current_feedback': current_feedback,
+        'feedback_history': feedback_history,
+    }
+
+
+# ----------------------------------------------------------------------
+# Background event loop and sync facades
+# ----------------------------------------------------------------------
+
+class _LoopThread:
+    """Runs an event loop on a daemon thread so pooled connections outlive a single call."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="async-database", daemon=True)
+        self._thread.start()
+
+    def run(self, coro, timeout: float):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+
+_loop_thread: Optional[_LoopThread] = None
+_client: Optional[AsyncDataClient] = None
+_init_lock = threading.Lock()
+
+
+def _get_runtime():
+    """Return the shared loop thread and async client, creating them on first use."""
+    global _loop_thread, _client
+    with _init_lock:
+        if _loop_thread is None:
+            _loop_thread = _LoopThread()
+        if _client is None:
+            settings = get_settings()
+
+            async def _create():
+                return AsyncDataClient(settings.supabase_url, settings.supabase_anon_key)
+
+            _client = _loop_thread.run(_create(), DEFAULT_TIMEOUT)
+    return _loop_thread, _client
+
+
+def _current_access_token() -> Optional[str]:
+    """Access token of the signed-in browser session, if any."""
+    return current_access_token()
+
+
+def _run(coro_factory, timeout: float = DEFAULT_TIMEOUT * 2):
+    loop_thread, client = _get_runtime()
+    return loop_thread.run(coro_factory(client, _current_access_token()), timeout)
+
+
+def load_dashboard_data(user_id: str, feedback_limit: int = 2) -> Dict[str, Any]:
+    """
+    Sync facade over fetch_dashboard_data for Streamlit pages.
+
+    Args:
+        user_id (str): The user's UUID
+        feedback_limit (int): Number of feedback history entries
+
+    Returns:
+        dict: Dashboard data (see fetch_dashboard_data)
+    """
+    if get_storage_backend_name() != SUPABASE:
+        return _load_dashboard_data_sync(user_id, feedback_limit)
+    # Like the sync readers: rows still in the write-behind buffer must be visible
+    database.flush_pending_writes()
+    try:
+        return _run(lambda client, token: fetch_dashboard_data(client, user_id, feedback_limit, token))
+    except Exception as e:
+        logger.warning(f"Async dashboard load failed, falling back to sync queries: {str(e)}")
+        return _load_dashboard_data_sync(user_id, feedback_limit)
+
+
+def load_agent_results(user_id: str):
+    """Sync facade over fetch_agent_results with fallback to database.get_agent_results."""
+    if get_storage_backend_name() != SUPABASE:
+        return database.get_agent_results(user_id)
+    database.flush_pending_writes()
+    try:
+        return _run(lambda client, token: fetch_agent_results(client, user_id, token))
+    except Exception as e:
+        logger.warning(f"Async agent results load failed, falling back to sync queries: {str(e)}")
+        return database.get_agent_results(user_id)
+
+
+def _load_dashboard_data_sync(user_id: str, feedback_limit: int) -> Dict[str, Any]:
+    agent_results = database.get_agent_results(user_id) or {
+        'analyst_completed': False, 'planner_completed': False
+    }
+    latest_plan = database.get_latest_weekly_plan(user_id)
+    task_completions = database.get_task_completions(user_id, str(latest_plan['id'])) if latest_plan else []
+    return {
+        'agents_status': {
+            'analyst_completed': agent_results['analyst_completed'],
+            'planner_completed': agent_results['planner_completed'],
+        },
+        'agent_results': agent_results,
+        'has_scores': agent_results['analyst_completed'],
+        'latest_weekly_plan': latest_plan,
+        'task_completions': task_completions,
+        'current_feedback': database.get_current_week_feedback(user_id),
+        'feedback_history': database.get_user_feedback_history(user_id, limit=feedback_limit),
+    }
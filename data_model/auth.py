@@ -1,11 +1,44 @@
 # Handles login, signup, and session management
-# utils/auth.py - backend auth helpers (no Streamlit)
+# utils/auth.py - auth helpers; the signed-in user is cached in Streamlit session state
+import time
 from supabase import Client
-from .supabase_client import init_supabase
+from config.settings import get_settings
+from .supabase_client import create_session_client, init_supabase
+from .client_pool import (
+    current_access_token,
+    get_session_client,
+    register_session_client,
+    release_session_client,
+    update_session_tokens,
+)
+from .database import USER_PROFILE_COLUMNS
+from .query_metrics import record_query
+from .token_verifier import (
+    SigningKeyUnavailable,
+    TokenExpiredError,
+    TokenVerificationError,
+    VerifiedUser,
+    get_token_verifier,
+)
+
+# Session-state key holding the user resolved for the current access token
+AUTH_CACHE_KEY = "_auth_user_cache"
+
+# Session-state key holding when the user signed in (token refreshes do not reset it)
+SESSION_STARTED_KEY = "_auth_session_started_at"
+
+# Fallback cache when called outside a Streamlit script run
+_local_auth_cache = {}
 
 def get_supabase() -> Client:
-    """Initialize and return the Supabase client."""
-    return init_supabase()
+    """Return this browser session's pooled client, or the shared client when signed out."""
+    return get_session_client() or init_supabase()
+
+def start_session(client: Client, session, user) -> None:
+    """Pool the client that signed in and memoize its user for this browser session."""
+    register_session_client(client, session.access_token, session.refresh_token)
+    cache_user(session.access_token, user, session.expires_at)
+    _auth_cache()[SESSION_STARTED_KEY] = time.time()
 
 def is_authenticated() -> bool:
     """Placeholder for backend session check (handled in frontend or API)."""
@@ -23,10 +56,13 @@ def login(email: str, password: str) -> tuple[bool, str]:
         tuple[bool, str]: (success status, message)
     """
     try:
-        supabase = get_supabase()
+        # Each sign-in gets its own client so concurrent sessions never share auth state
+        supabase = create_session_client()
         response = supabase.auth.sign_in_with_password({"email": email, "password": password})
         
         if response.user:
+            if response.session:
+                start_session(supabase, response.session, response.user)
             return True, "Login successful"
         else:
             return False, "Login failed. Please check your credentials."
@@ -54,7 +90,7 @@ def sign_up(email: str, password: str, first_name: str, last_name: str, age: int
         tuple[bool, str]: (success status, message)
     """
     try:
-        supabase = get_supabase()
+        supabase = create_session_client()
         
         # Sign up the user with Supabase Auth
         response = supabase.auth.sign_up({
@@ -63,6 +99,8 @@ def sign_up(email: str, password: str, first_name: str, last_name: str, age: int
         })
 
         if response.user:
+            if response.session:
+                start_session(supabase, response.session, response.user)
             # The user record is automatically created by the trigger
             # We just need to update it with additional profile information
             try:
@@ -96,23 +134,98 @@ def sign_up(email: str, password: str, first_name: str, last_name: str, age: int
         else:
             return False, f"An error occurred during sign up: {error_msg}"
 
+def _auth_cache():
+    """Per-browser-session cache (Streamlit session state when available)."""
+    try:
+        import streamlit as st
+        return st.session_state
+    except Exception:
+        return _local_auth_cache
+
+def cache_user(access_token: str, user, expires_at: int = None):
+    """Memoize `user` for `access_token` until the token expires."""
+    _auth_cache()[AUTH_CACHE_KEY] = {
+        'access_token': access_token,
+        'user': user,
+        'expires_at': expires_at or 0,
+    }
+
+def clear_cached_user():
+    """Forget the memoized user (on logout or invalid token)."""
+    _auth_cache().pop(AUTH_CACHE_KEY, None)
+
+def session_expired() -> bool:
+    """
+    Whether this browser session is older than SESSION_TIMEOUT_HOURS.
+    
+    Sessions without a recorded sign-in time start counting now.
+    """
+    started_at = _auth_cache().setdefault(SESSION_STARTED_KEY, time.time())
+    return time.time() - started_at > get_settings().session_timeout_hours * 3600
+
 def get_current_user():
     """
     Get the current authenticated user.
     
+    The access token is verified locally (signature and expiry) and the
+    resolved user is memoized in session state until the token expires.
+    The auth server is only contacted when the token has been refreshed,
+    when it has expired, or when no local signing key is available.
+    Sessions older than SESSION_TIMEOUT_HOURS are signed out, however often
+    their token was refreshed.
+    
     Returns:
         User object if authenticated, None otherwise
     """
     try:
-        # Try to get user from Supabase session
-        supabase = get_supabase()
-        response = supabase.auth.get_user()
+        supabase = get_session_client()
+        if supabase is None:
+            clear_cached_user()
+            return None
+        if session_expired():
+            logout()
+            return None
+        # Reads the stored session; only hits the network to refresh an expired token
+        session = supabase.auth.get_session()
+        if not session or not session.access_token:
+            clear_cached_user()
+            return None
         
-        if response.user:
-            return response.user
-        else:
+        if session.access_token != current_access_token():
+            # The client refreshed its session; move it to the new pool key
+            update_session_tokens(session.access_token, session.refresh_token)
+        
+        cached = _auth_cache().get(AUTH_CACHE_KEY)
+        if cached and cached['access_token'] == session.access_token and cached['expires_at'] > time.time():
+            return cached['user']
+        
+        # A different token for a cached user means the session was refreshed;
+        # confirm with the auth server once rather than trusting the new token blindly
+        refreshed = cached is not None and cached['access_token'] != session.access_token
+        
+        try:
+            claims = get_token_verifier().verify(session.access_token)
+            user = VerifiedUser.from_claims(claims)
+            expires_at = claims.get('exp')
+            if refreshed:
+                user = supabase.auth.get_user(session.access_token).user or user
+        except (SigningKeyUnavailable, TokenExpiredError):
+            # No local key, or the stored token expired before auto-refresh: ask the server
+            response = supabase.auth.get_user()
+            user = response.user if response else None
+            session = supabase.auth.get_session()
+            expires_at = session.expires_at if session else None
+        
+        if not user or not session:
+            clear_cached_user()
             return None
-            
+        
+        cache_user(session.access_token, user, expires_at)
+        return user
+        
+    except TokenVerificationError:
+        clear_cached_user()
+        return None
     except Exception:
         # If any error occurs (like expired token), return None
         return None
@@ -138,7 +251,8 @@ def get_user_profile(user_id: str = None):
             user_id = current_user.id
         
         # Get user profile from users table
-        response = supabase.table("users").select("*").eq("id", user_id).execute()
+        response = supabase.table("users").select(USER_PROFILE_COLUMNS).eq("id", user_id).execute()
+        record_query("get_user_profile.users", response)
         
         if response.data and len(response.data) > 0:
             return response.data[0]
@@ -152,8 +266,11 @@ def logout():
     """
     Log out the current user and clear session data.
     """
-    supabase = get_supabase()
-    supabase.auth.sign_out()
+    clear_cached_user()
+    _auth_cache().pop(SESSION_STARTED_KEY, None)
+    supabase = release_session_client()
+    if supabase is not None:
+        supabase.auth.sign_out()
 
 def clear_session():
     """No-op for backend-only context."""
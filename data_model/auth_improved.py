@@ -4,7 +4,10 @@ Improved authentication module with proper validation, error handling, and secur
 import logging
 from typing import Tuple, Optional, Dict, Any
 from supabase import Client
-from .supabase_client import init_supabase
+from .supabase_client import create_session_client, init_supabase
+from .database import USER_PROFILE_COLUMNS
+from .query_metrics import record_query
+from . import auth as session_auth
 from .validators import UserValidator, DataSanitizer
 from config.settings import get_settings
 
@@ -70,7 +73,8 @@ class AuthService:
             # Attempt to create user
             logger.info(f"Attempting to create user with email: {email}")
 
-            response = self.supabase.auth.sign_up({
+            client = create_session_client()
+            response = client.auth.sign_up({
                 "email": email,
                 "password": password
             })
@@ -79,9 +83,12 @@ class AuthService:
                 logger.warning(f"User creation failed for email: {email}")
                 return False, "Account creation failed. Please try again.", None
 
+            if response.session:
+                session_auth.start_session(client, response.session, response.user)
+
             # Update user profile
             try:
-                profile_response = self.supabase.table("users").update({
+                profile_response = client.table("users").update({
                     "first_name": first_name,
                     "last_name": last_name,
                     "age": age,
@@ -141,7 +148,9 @@ class AuthService:
 
             logger.info(f"Attempting sign in for email: {email}")
 
-            response = self.supabase.auth.sign_in_with_password({
+            # Each sign-in gets its own pooled client (see client_pool.py)
+            client = create_session_client()
+            response = client.auth.sign_in_with_password({
                 "email": email,
                 "password": password
             })
@@ -150,6 +159,9 @@ class AuthService:
                 logger.warning(f"Sign in failed for email: {email}")
                 return False, "Invalid email or password.", None
 
+            if response.session:
+                session_auth.start_session(client, response.session, response.user)
+
             logger.info(f"Sign in successful for email: {email}")
             return True, "Login successful!", {
                 "user_id": response.user.id,
@@ -178,14 +190,15 @@ class AuthService:
             User data if authenticated, None otherwise
         """
         try:
-            response = self.supabase.auth.get_user()
+            # Locally verified and memoized until the access token expires
+            user = session_auth.get_current_user()
 
-            if response.user:
+            if user:
                 return {
-                    "id": response.user.id,
-                    "email": response.user.email,
-                    "created_at": response.user.created_at,
-                    "last_sign_in_at": response.user.last_sign_in_at
+                    "id": user.id,
+                    "email": user.email,
+                    "created_at": user.created_at,
+                    "last_sign_in_at": user.last_sign_in_at
                 }
 
             return None
@@ -211,7 +224,8 @@ class AuthService:
                     return None
                 user_id = current_user["id"]
 
-            response = self.supabase.table("users").select("*").eq("id", user_id).execute()
+            response = session_auth.get_supabase().table("users").select(USER_PROFILE_COLUMNS).eq("id", user_id).execute()
+            record_query("AuthService.get_user_profile.users", response)
 
             if response.data and len(response.data) > 0:
                 return response.data[0]
@@ -230,7 +244,7 @@ class AuthService:
             Tuple of (success, message)
         """
         try:
-            self.supabase.auth.sign_out()
+            session_auth.logout()
             logger.info("User signed out successfully")
             return True, "Signed out successfully."
         except Exception as e:
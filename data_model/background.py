@@ -0,0 +1,191 @@
+"""
+Background persister for optimistic UI updates.
+
+Pages update st.session_state immediately and hand the database write to
+this persister, which runs it on a worker thread with retries. Each write is
+tracked under a caller-chosen key so the page can later reconcile: drop
+the key once the write succeeded, or roll the optimistic change back if it
+failed. Submitting a key that is already in flight returns the existing
+write, so double clicks do not issue duplicate requests.
+"""
+import atexit
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+
+@dataclass
+class PendingWrite:
+    """State of one background write."""
+    key: str
+    status: str = PENDING
+    error: Optional[str] = None
+    attempts: int = 0
+    submitted_at: float = field(default_factory=time.monotonic)
+    finished_at: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status != PENDING
+
+
+class BackgroundPersister:
+    """Runs writes off the request path and tracks their outcome by key."""
+
+    def __init__(self, max_workers: int = 4, max_retries: int = 2, backoff_base: float = 0.5,
+                 keep_finished_seconds: float = 600.0):
+        """
+        Args:
+            max_workers: Concurrent writes
+            max_retries: Retries per write before it is marked failed
+            backoff_base: Initial retry delay in seconds (doubled per retry)
+            keep_finished_seconds: How long finished writes stay queryable
+        """
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.keep_finished_seconds = keep_finished_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="background-persister")
+        self._lock = threading.Lock()
+        self._writes: Dict[str, PendingWrite] = {}
+        self._futures = []
+        self._metrics = {
+            'submitted': 0,
+            'succeeded': 0,
+            'failed': 0,
+            'retries': 0,
+            'deduplicated': 0,
+            'total_latency_ms': 0.0,
+            'max_latency_ms': 0.0,
+        }
+
+    def submit(self, key: str, write: Callable[..., Any], *args, **kwargs) -> PendingWrite:
+        """
+        Run `write(*args, **kwargs)` in the background.
+
+        The write fails if it raises or returns a falsy value (the data
+        layer's convention for "not saved").
+
+        Args:
+            key: Identifies the write for reconciliation
+            write: Callable performing the database write
+
+        Returns:
+            PendingWrite: Tracked state (the existing one if `key` is in flight)
+        """
+        with self._lock:
+            self._expire_finished()
+            existing = self._writes.get(key)
+            if existing is not None and not existing.done:
+                self._metrics['deduplicated'] += 1
+                return existing
+            pending = PendingWrite(key)
+            self._writes[key] = pending
+            self._metrics['submitted'] += 1
+            future = self._executor.submit(self._run, pending, write, args, kwargs)
+            self._futures = [f for f in self._futures if not f.done()] + [future]
+        return pending
+
+    def get(self, key: str) -> Optional[PendingWrite]:
+        """Current state of the write submitted under `key`, if known."""
+        with self._lock:
+            return self._writes.get(key)
+
+    def discard(self, key: str) -> None:
+        """Forget a finished write once the page has reconciled it."""
+        with self._lock:
+            pending = self._writes.get(key)
+            if pending is not None and pending.done:
+                del self._writes[key]
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Block until every submitted write has finished."""
+        with self._lock:
+            futures = list(self._futures)
+        wait(futures, timeout=timeout)
+
+    def close(self) -> None:
+        """Finish in-flight writes and stop the workers."""
+        self._executor.shutdown(wait=True)
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Snapshot of write outcomes and latency.
+
+        Returns:
+            dict: Counters plus in-flight count and average latency
+        """
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot['in_flight'] = sum(1 for pending in self._writes.values() if not pending.done)
+        finished = snapshot['succeeded'] + snapshot['failed']
+        snapshot['avg_latency_ms'] = snapshot['total_latency_ms'] / finished if finished else 0.0
+        return snapshot
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _run(self, pending: PendingWrite, write: Callable[..., Any], args, kwargs) -> None:
+        error = None
+        for attempt in range(self.max_retries + 1):
+            pending.attempts = attempt + 1
+            try:
+                if write(*args, **kwargs):
+                    error = None
+                    break
+                error = "write reported failure"
+            except Exception as e:
+                error = str(e)
+            if attempt < self.max_retries:
+                with self._lock:
+                    self._metrics['retries'] += 1
+                delay = self.backoff_base * (2 ** attempt)
+                logger.warning(f"Retrying background write {pending.key} in {delay:.2f}s: {error}")
+                time.sleep(delay)
+
+        with self._lock:
+            pending.finished_at = time.monotonic()
+            latency_ms = (pending.finished_at - pending.submitted_at) * 1000
+            self._metrics['total_latency_ms'] += latency_ms
+            self._metrics['max_latency_ms'] = max(self._metrics['max_latency_ms'], latency_ms)
+            if error is None:
+                pending.status = SUCCEEDED
+                self._metrics['succeeded'] += 1
+            else:
+                pending.status = FAILED
+                pending.error = error
+                self._metrics['failed'] += 1
+                logger.error(f"Background write {pending.key} failed after {pending.attempts} attempts: {error}")
+
+    def _expire_finished(self) -> None:
+        cutoff = time.monotonic() - self.keep_finished_seconds
+        expired: List[str] = [
+            key for key, pending in self._writes.items()
+            if pending.done and pending.finished_at < cutoff
+        ]
+        for key in expired:
+            del self._writes[key]
+
+
+_persister: Optional[BackgroundPersister] = None
+_persister_lock = threading.Lock()
+
+
+def get_background_persister() -> BackgroundPersister:
+    """Return the process-wide persister, starting it on first use."""
+    global _persister
+    if _persister is None:
+        with _persister_lock:
+            if _persister is None:
+                _persister = BackgroundPersister()
+                atexit.register(_persister.close)
+    return _persister
@@ -0,0 +1,319 @@
+"""
+Per-session Supabase client pool.
+
+The process-wide client from init_supabase() keeps a single auth session, so
+concurrent browser sessions would serialize on it and overwrite each other's
+tokens. Instead, each signed-in session gets its own lightweight client,
+keyed by its access token and kept in an LRU pool with an idle timeout.
+All pooled clients share one httpx connection pool (see
+supabase_client.create_session_client), so a new client costs no new
+connections.
+
+Work bound to the service-role key (the plan scheduler) gets a dedicated
+client instead, which is never pooled and never shares connections or
+headers with session clients.
+
+The session's tokens are stored in Streamlit session state at login;
+get_session_client() resolves the pooled client for the current session,
+rebuilding it from the stored tokens if it was evicted.
+"""
+import contextvars
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+from config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Session-state key holding the signed-in session's tokens
+SESSION_TOKENS_KEY = "_supabase_session_tokens"
+
+# Fallback store when called outside a Streamlit script run
+_local_session_store = {}
+
+# Access token bound for work done on behalf of a session off the script thread
+_bound_access_token = contextvars.ContextVar('bound_access_token', default=None)
+
+ClientFactory = Callable[[str, Optional[str]], Any]
+
+
+class ClientPool:
+    """LRU pool of clients keyed by access token, with idle-timeout eviction."""
+
+    def __init__(self, factory: ClientFactory, max_size: int = 256, idle_timeout: float = 1800.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            factory: Callable(access_token, refresh_token) building a client on a miss
+            max_size: Clients kept before the least recently used is evicted
+            idle_timeout: Seconds a client may go unused before it is evicted
+            clock: Monotonic time source (overridable in tests)
+        """
+        self._factory = factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._clients: "OrderedDict[str, list]" = OrderedDict()
+        self._metrics = {
+            'hits': 0,
+            'misses': 0,
+            'created': 0,
+            'evicted_lru': 0,
+            'evicted_idle': 0,
+        }
+
+    def get(self, access_token: str, refresh_token: Optional[str] = None) -> Any:
+        """
+        Return the client for `access_token`, building it on a miss.
+
+        Args:
+            access_token: The session's access token (pool key)
+            refresh_token: Refresh token used to restore the session on a miss
+
+        Returns:
+            The pooled client
+        """
+        with self._lock:
+            self._prune_idle()
+            entry = self._clients.get(access_token)
+            if entry is not None:
+                entry[1] = self._clock()
+                self._clients.move_to_end(access_token)
+                self._metrics['hits'] += 1
+                return entry[0]
+            self._metrics['misses'] += 1
+
+        # Build outside the lock; restoring a session may hit the network
+        client = self._factory(access_token, refresh_token)
+        with self._lock:
+            self._metrics['created'] += 1
+        self.put(access_token, client)
+        return client
+
+    def put(self, access_token: str, client: Any) -> None:
+        """Add (or replace) the client for `access_token`, e.g. right after sign-in."""
+        with self._lock:
+            self._clients[access_token] = [client, self._clock()]
+            self._clients.move_to_end(access_token)
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+                self._metrics['evicted_lru'] += 1
+
+    def rekey(self, old_token: str, new_token: str) -> None:
+        """Move a client to its refreshed access token."""
+        with self._lock:
+            entry = self._clients.pop(old_token, None)
+            if entry is not None:
+                entry[1] = self._clock()
+                self._clients[new_token] = entry
+
+    def release(self, access_token: str) -> Optional[Any]:
+        """Remove and return the client for `access_token` (on sign-out)."""
+        with self._lock:
+            entry = self._clients.pop(access_token, None)
+            return entry[0] if entry else None
+
+    def prune(self) -> int:
+        """Evict idle clients now; returns how many were removed."""
+        with self._lock:
+            return self._prune_idle()
+
+    def clear(self) -> None:
+        """Drop every pooled client."""
+        with self._lock:
+            self._clients.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Snapshot of pool size and hit-rate metrics.
+
+        Returns:
+            dict: Counters plus current size and hit rate
+        """
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot['size'] = len(self._clients)
+        snapshot['max_size'] = self.max_size
+        lookups = snapshot['hits'] + snapshot['misses']
+        snapshot['hit_rate'] = snapshot['hits'] / lookups if lookups else 0.0
+        return snapshot
+
+    def _prune_idle(self) -> int:
+        cutoff = self._clock() - self.idle_timeout
+        removed = 0
+        # Entries are in LRU order, so idle ones are at the front
+        while self._clients:
+            token, (_, last_used) = next(iter(self._clients.items()))
+            if last_used > cutoff:
+                break
+            del self._clients[token]
+            removed += 1
+        self._metrics['evicted_idle'] += removed
+        return removed
+
+
+# ====================================================================
+# PROCESS-WIDE POOL AND SESSION TOKENS
+# ====================================================================
+
+_pool: Optional[ClientPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_client_pool() -> ClientPool:
+    """Return the process-wide client pool configured from settings."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                from .supabase_client import create_session_client
+                settings = get_settings()
+                _pool = ClientPool(
+                    create_session_client,
+                    max_size=settings.client_pool_max_size,
+                    idle_timeout=settings.client_pool_idle_seconds,
+                )
+    return _pool
+
+
+_service_client: Optional[Any] = None
+_service_client_lock = threading.Lock()
+
+
+def get_service_client() -> Any:
+    """Return the process-wide service-role client (never pooled)."""
+    global _service_client
+    if _service_client is None:
+        with _service_client_lock:
+            if _service_client is None:
+                from .supabase_client import create_service_client
+                _service_client = create_service_client()
+    return _service_client
+
+
+def get_client_for_token(access_token: str, refresh_token: Optional[str] = None) -> Any:
+    """
+    Return the client acting with `access_token`.
+
+    Args:
+        access_token: A session's access token, or the service-role key
+        refresh_token: Refresh token used to restore the session on a pool miss
+
+    Returns:
+        The dedicated service-role client for the service-role key, else the session's pooled client
+    """
+    service_role_key = get_settings().supabase_service_role_key
+    if service_role_key and access_token == service_role_key:
+        return get_service_client()
+    return get_client_pool().get(access_token, refresh_token)
+
+
+def get_client_pool_metrics() -> Dict[str, Any]:
+    """
+    Get pool size and hit-rate metrics.
+
+    Returns:
+        dict: Pool metrics (empty if the pool has not been started)
+    """
+    if _pool is None:
+        return {}
+    return _pool.metrics()
+
+
+def _session_store():
+    """Per-browser-session store (Streamlit session state when available)."""
+    try:
+        import streamlit as st
+        return st.session_state
+    except Exception:
+        return _local_session_store
+
+
+@contextmanager
+def bind_access_token(access_token: Optional[str]):
+    """
+    Act as the session owning `access_token` inside the block.
+
+    Background threads have no Streamlit session state; binding the token
+    captured on the script thread makes get_session_client() resolve that
+    session's pooled client.
+
+    Args:
+        access_token: Token captured with current_access_token(), or None
+    """
+    reset = _bound_access_token.set(access_token)
+    try:
+        yield
+    finally:
+        _bound_access_token.reset(reset)
+
+
+def get_session_tokens() -> Optional[Dict[str, str]]:
+    """Tokens of the current browser session, if signed in."""
+    bound = _bound_access_token.get()
+    if bound:
+        return {'access_token': bound, 'refresh_token': None}
+    try:
+        return _session_store().get(SESSION_TOKENS_KEY)
+    except Exception:
+        # No script run context (e.g. a background thread)
+        return None
+
+
+def current_access_token() -> Optional[str]:
+    """Access token of the current browser session, if signed in."""
+    tokens = get_session_tokens()
+    return tokens['access_token'] if tokens else None
+
+
+def register_session_client(client: Any, access_token: str, refresh_token: Optional[str] = None) -> None:
+    """
+    Pool a freshly signed-in client and remember its tokens for this session.
+
+    Args:
+        client: Client that performed the sign-in
+        access_token: The new session's access token
+        refresh_token: The new session's refresh token
+    """
+    get_client_pool().put(access_token, client)
+    _session_store()[SESSION_TOKENS_KEY] = {
+        'access_token': access_token,
+        'refresh_token': refresh_token,
+    }
+
+
+def update_session_tokens(access_token: str, refresh_token: Optional[str] = None) -> None:
+    """Record refreshed tokens for this session and rekey its pooled client."""
+    tokens = get_session_tokens()
+    if tokens and tokens['access_token'] != access_token:
+        get_client_pool().rekey(tokens['access_token'], access_token)
+    _session_store()[SESSION_TOKENS_KEY] = {
+        'access_token': access_token,
+        'refresh_token': refresh_token or (tokens or {}).get('refresh_token'),
+    }
+
+
+def release_session_client() -> Optional[Any]:
+    """Forget this session's tokens and remove its client from the pool."""
+    tokens = _session_store().pop(SESSION_TOKENS_KEY, None)
+    if not tokens:
+        return None
+    return get_client_pool().release(tokens['access_token'])
+
+
+def get_session_client() -> Optional[Any]:
+    """
+    Return the pooled client for the current browser session.
+
+    Returns:
+        The session's client, or None if this session is not signed in
+    """
+    tokens = get_session_tokens()
+    if not tokens:
+        return None
+    return get_client_for_token(tokens['access_token'], tokens.get('refresh_token'))
@@ -162,9 +162,9 @@ def save_complete_profile_to_users_table(user_id: str, complete_profile: Dict[st
         bool: True if successful, False otherwise
     """
     try:
-        from .supabase_client import init_supabase
+        from .storage import get_storage_backend
         
-        supabase = init_supabase()
+        supabase = get_storage_backend()
         
         # Update the users table with the complete profile
         response = supabase.table('users').update({
@@ -195,9 +195,9 @@ def get_complete_profile_from_users_table(user_id: str) -> Optional[Dict[str, An
         dict or None: Complete profile data or None if not found
     """
     try:
-        from .supabase_client import init_supabase
+        from .storage import get_storage_backend
         
-        supabase = init_supabase()
+        supabase = get_storage_backend()
         
         response = supabase.table('users').select('complete_profile_w_scores').eq('id', user_id).execute()
         
@@ -211,6 +211,47 @@ def get_complete_profile_from_users_table(user_id: str) -> Optional[Dict[str, An
         return None
 
 
+def patch_complete_profile(user_id: str, changes: Dict[str, Any]) -> bool:
+    """
+    Update only the given top-level fields of users.complete_profile_w_scores.
+    
+    On Supabase the fields are merged server-side, so the rest of the stored
+    profile is neither read nor rewritten.
+    
+    Args:
+        user_id (str): User's UUID
+        changes (dict): Top-level profile fields to replace
+    
+    Returns:
+        bool: True if a stored profile was patched, False if there is none (or on error)
+    """
+    try:
+        from .storage import SUPABASE, get_storage_backend, get_storage_backend_name
+        
+        supabase = get_storage_backend()
+        
+        if get_storage_backend_name() == SUPABASE:
+            response = supabase.rpc('patch_complete_profile', {'p_user_id': user_id, 'p_changes': changes}).execute()
+            patched = bool(response.data)
+        else:
+            existing_profile = get_complete_profile_from_users_table(user_id)
+            patched = bool(existing_profile)
+            if patched:
+                response = supabase.table('users').update({
+                    'complete_profile_w_scores': {**existing_profile, **changes},
+                    'last_active_at': datetime.now().isoformat()
+                }).eq('id', user_id).execute()
+                patched = bool(response.data)
+        
+        if patched:
+            print(f"✅ Patched {', '.join(changes)} in complete profile for user {user_id}")
+        return patched
+        
+    except Exception as e:
+        print(f"❌ Error patching complete profile: {str(e)}")
+        return False
+
+
 def get_agent1_data_from_database(user_id: str) -> Optional[Dict[str, Any]]:
     """
     Get Agent 1 (Profiler) data from user_profiles.onboarding_final column.
@@ -222,9 +263,9 @@ def get_agent1_data_from_database(user_id: str) -> Optional[Dict[str, Any]]:
         dict or None: Agent 1 data or None if not found
     """
     try:
-        from .supabase_client import init_supabase
+        from .storage import get_storage_backend
         
-        supabase = init_supabase()
+        supabase = get_storage_backend()
         
         # Get Agent 1 data from user_profiles table
         response = supabase.table('user_profiles').select('onboarding_final').eq('user_id', user_id).execute()
@@ -254,9 +295,9 @@ def get_agent2_data_from_database(user_id: str) -> Optional[Dict[str, Any]]:
         dict or None: Agent 2 data or None if not found
     """
     try:
-        from .supabase_client import init_supabase
+        from .storage import get_storage_backend
         
-        supabase = init_supabase()
+        supabase = get_storage_backend()
         
         # Get Agent 2 data from user_scores table
         response = supabase.table('user_scores').select('scores').eq('user_id', user_id).execute()
@@ -332,6 +373,43 @@ def merge_json(user_id: str) -> bool:
         return False
 
 
+def patch_json(user_id: str, analysis: Dict[str, Any], fields) -> bool:
+    """
+    Patch the analysis fields (and the latest Agent 1 profile) into the complete profile
+    after an incremental re-analysis, falling back to a full merge_json() when no
+    complete profile exists yet.
+    
+    Args:
+        user_id (str): User's UUID
+        analysis (dict): Updated Agent 2 output
+        fields: Analysis fields that changed (e.g. agent.category_analysis.AGGREGATED_FIELDS)
+    
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        agent1_data = get_agent1_data_from_database(user_id)
+        if not agent1_data:
+            print("❌ Cannot proceed: Agent 1 data not found")
+            return False
+        
+        merged_profile = merge_agent_outputs(agent1_data, analysis)
+        # Agent 1 fields may have changed along with the answers that triggered the update
+        profile_fields = ["narrative_text", "demographics", "lifestyle_habits", "consumption_patterns",
+                          "psychographic_insights", "key_levers"]
+        changes = {field: merged_profile[field] for field in profile_fields + list(fields) if field in merged_profile}
+        changes["profile_updated_at"] = datetime.now().isoformat()
+        
+        if patch_complete_profile(user_id, changes):
+            return True
+        
+        print(f"⚠️ No complete profile to patch for user {user_id}. Running full merge...")
+        return merge_json(user_id)
+        
+    except Exception as e:
+        print(f"❌ Error in JSON patch workflow: {str(e)}")
+        return False
+
 # Test function for development
 def test_merge_function():
     """Test the merge function with sample data that matches the database structure"""
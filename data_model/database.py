@@ -1,16 +1,118 @@
 # data_model/database.py
 # Functions for user profiles & action logging (Supabase)
+import atexit
+import hashlib
+import threading
 import streamlit as st
 import pandas as pd
 import streamlit as st
-from datetime import date, timedelta
-from supabase import Client
-from .supabase_client import init_supabase
+from datetime import date, datetime, timedelta, timezone
+from .storage import SUPABASE, StorageBackend, get_storage_backend, get_storage_backend_name
+from .client_pool import bind_access_token, current_access_token, get_client_for_token
+from .background import PendingWrite, get_background_persister
+from .drafts import DraftSaver
+from .write_buffer import WriteBehindBuffer
+from .query_metrics import record_query
 
-def get_supabase() -> Client:
-    """Initialize and return the Supabase client."""
-    return init_supabase()
+# Explicit column lists for reads. users.complete_profile_w_scores is a large
+# JSON document, so profile reads leave it out and fetch it only where needed.
+USER_PROFILE_COLUMNS = 'id, email, first_name, last_name, age, country, onboarding_status, last_active_at, created_at'
+USER_ACTION_COLUMNS = 'id, action_id, suggestion_id, weekly_plan_id, status, co2_saved, notes, completed_at, created_at'
+WEEKLY_PLAN_COLUMNS = 'id, user_id, week_of, suggestions, agent_session_id, created_at'
+USER_FEEDBACK_COLUMNS = 'id, raw_feedback, feedback_summary, week_of, created_at'
 
+def get_supabase() -> StorageBackend:
+    """Return the configured storage backend (Supabase client or embedded SQLite)."""
+    return get_storage_backend()
+
+def get_week_start(today: date = None) -> date:
+    """Return the Monday of the week containing `today` (defaults to the current date)."""
+    today = today or date.today()
+    return today - timedelta(days=today.weekday())
+
+
+# ====================================================================
+# WRITE-BEHIND BUFFER FOR APPEND-ONLY LOGGING WRITES
+# ====================================================================
+
+_write_buffer = None
+_write_buffer_lock = threading.Lock()
+
+def _write_context():
+    """Access token of the session queuing a write, so the flush thread can use its client."""
+    if get_storage_backend_name() != SUPABASE:
+        return None
+    return current_access_token()
+
+def _client_for_context(access_token: str = None) -> StorageBackend:
+    """Client acting with `access_token`, or the configured backend when there is none."""
+    if access_token:
+        return get_client_for_token(access_token)
+    return get_supabase()
+
+def _insert_rows(table: str, rows: list, context: str = None) -> None:
+    """Insert a batch of rows in a single request (used by the write-behind buffer)."""
+    _client_for_context(context).table(table).insert(rows).execute()
+
+def _update_rows(table: str, match: dict, values: dict, context: str = None) -> None:
+    """Apply one update with equality filters (used by the write-behind buffer)."""
+    query = _client_for_context(context).table(table).update(values)
+    for column, value in match.items():
+        query = query.eq(column, value)
+    query.execute()
+
+def get_write_buffer() -> WriteBehindBuffer:
+    """Return the process-wide write-behind buffer, starting it on first use."""
+    global _write_buffer
+    if _write_buffer is None:
+        with _write_buffer_lock:
+            if _write_buffer is None:
+                _write_buffer = WriteBehindBuffer(_insert_rows, _update_rows, context_provider=_write_context)
+    return _write_buffer
+
+def flush_pending_writes() -> None:
+    """Block until every buffered logging write has been sent (writes in retry backoff are not waited for)."""
+    if _write_buffer is not None:
+        _write_buffer.flush()
+
+def get_write_buffer_metrics() -> dict:
+    """
+    Get queue-depth and flush-latency metrics for the write-behind buffer.
+    
+    Returns:
+        dict: Buffer metrics (empty if the buffer has not been started)
+    """
+    if _write_buffer is None:
+        return {}
+    return _write_buffer.metrics()
+
+
+
+# ====================================================================
+# SCORES-SAVED LISTENERS
+# ====================================================================
+
+_scores_saved_listeners = []
+
+def on_scores_saved(callback) -> None:
+    """
+    Register `callback(user_id)` to run whenever a user's user_scores row changes.
+    
+    Used to invalidate caches derived from the scores (e.g. dashboard charts).
+    
+    Args:
+        callback: Callable taking the user's UUID
+    """
+    if callback not in _scores_saved_listeners:
+        _scores_saved_listeners.append(callback)
+
+def notify_scores_saved(user_id: str) -> None:
+    """Run the scores-saved listeners for `user_id`; listener errors are logged, not raised."""
+    for callback in list(_scores_saved_listeners):
+        try:
+            callback(user_id)
+        except Exception as e:
+            print(f"Scores-saved listener failed for {user_id}: {str(e)}")
 
 
 def fetch_user_profile(user_id: str):
@@ -25,7 +127,8 @@ def fetch_user_profile(user_id: str):
     """
     try:
         supabase = get_supabase()
-        response = supabase.table('users').select('*').eq('id', user_id).execute()
+        response = supabase.table('users').select(USER_PROFILE_COLUMNS).eq('id', user_id).execute()
+        record_query('fetch_user_profile.users', response)
         
         if response.data:
             return response.data[0]
@@ -66,6 +169,98 @@ def save_onboarding_data(user_id: str, onboarding_data: dict) -> bool:
         st.error(f"Error saving onboarding data: {str(e)}")
         return False
 
+# ====================================================================
+# ONBOARDING DRAFTS (DEBOUNCED, CHANGED FIELDS ONLY)
+# ====================================================================
+
+_draft_saver = None
+_draft_saver_lock = threading.Lock()
+
+def _write_onboarding_draft(user_id: str, changes: dict, draft: dict, context: str = None) -> bool:
+    """Persist a draft update (used by the draft saver's timer thread)."""
+    client = _client_for_context(context)
+    if get_storage_backend_name() == SUPABASE:
+        # Merged server-side, so only the changed fields are sent
+        client.rpc('merge_onboarding_draft', {'p_user_id': user_id, 'p_changes': changes}).execute()
+    else:
+        client.table('user_profiles').upsert({
+            'user_id': user_id,
+            'onboarding_draft': draft,
+            'draft_updated_at': 'now()'
+        }).execute()
+    return True
+
+def get_draft_saver() -> DraftSaver:
+    """Return the process-wide onboarding draft saver."""
+    global _draft_saver
+    if _draft_saver is None:
+        with _draft_saver_lock:
+            if _draft_saver is None:
+                _draft_saver = DraftSaver(_write_onboarding_draft, context_provider=_write_context)
+                atexit.register(_draft_saver.close)
+    return _draft_saver
+
+def queue_onboarding_draft(user_id: str, fields: dict) -> int:
+    """
+    Queue an onboarding section's answers for a debounced draft save.
+    
+    Args:
+        user_id (str): The user's UUID
+        fields (dict): Answers of the submitted section
+        
+    Returns:
+        int: Number of fields that changed and will be written
+    """
+    return get_draft_saver().update(user_id, fields)
+
+def get_onboarding_draft(user_id: str):
+    """
+    Load the user's saved onboarding draft.
+    
+    Args:
+        user_id (str): The user's UUID
+        
+    Returns:
+        dict: Draft answers (empty if none)
+    """
+    try:
+        supabase = get_supabase()
+        
+        response = supabase.table('user_profiles')\
+            .select('onboarding_draft')\
+            .eq('user_id', user_id)\
+            .execute()
+        record_query('get_onboarding_draft.user_profiles', response)
+        
+        draft = response.data[0].get('onboarding_draft') if response.data else None
+        get_draft_saver().prime(user_id, draft)
+        return draft or {}
+        
+    except Exception as e:
+        st.error(f"Error loading onboarding draft: {str(e)}")
+        return {}
+
+def clear_onboarding_draft(user_id: str) -> bool:
+    """
+    Drop the user's onboarding draft once the full profile has been saved.
+    
+    Args:
+        user_id (str): The user's UUID
+        
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    get_draft_saver().discard(user_id)
+    try:
+        get_supabase().table('user_profiles')\
+            .update({'onboarding_draft': None, 'draft_updated_at': None})\
+            .eq('user_id', user_id)\
+            .execute()
+        return True
+    except Exception as e:
+        print(f"Error clearing onboarding draft: {str(e)}")
+        return False
+
 def update_onboarding_status(user_id: str, status: bool = True) -> bool:
     """
     Update user's onboarding status.
@@ -95,6 +290,7 @@ def update_onboarding_status(user_id: str, status: bool = True) -> bool:
 def log_user_action(user_id: str, action_id: str, co2_saved: float) -> bool:
     """
     Log a completed user action in Supabase.
+    The insert is queued on the write-behind buffer and batched with other rows.
     
     Args:
         user_id (str): The user's UUID
@@ -102,18 +298,17 @@ def log_user_action(user_id: str, action_id: str, co2_saved: float) -> bool:
         co2_saved (float): The CO2 saved by this action
         
     Returns:
-        bool: True if successful, False otherwise
+        bool: True if the action was queued, False otherwise
     """
     try:
-        supabase = get_supabase()
-        
-        response = supabase.table('user_actions').insert({
+        get_write_buffer().enqueue_insert('user_actions', {
             'user_id': user_id,
             'action_id': action_id,
-            'co2_saved': co2_saved
-        }).execute()
+            'co2_saved': co2_saved,
+            'completed_at': datetime.now(timezone.utc).isoformat()
+        })
         
-        return True if response.data else False
+        return True
         
     except Exception as e:
         st.error(f"Error logging user action: {str(e)}")
@@ -131,14 +326,17 @@ def get_user_actions(user_id: str, limit: int = 50):
         list: List of user actions
     """
     try:
+        # Read-your-writes: push any buffered action logs first
+        flush_pending_writes()
         supabase = get_supabase()
         
         response = supabase.table('user_actions')\
-            .select('*')\
+            .select(USER_ACTION_COLUMNS)\
             .eq('user_id', user_id)\
             .order('completed_at', desc=True)\
             .limit(limit)\
             .execute()
+        record_query('get_user_actions.user_actions', response)
         
         return response.data
         
@@ -157,6 +355,8 @@ def get_user_total_co2_saved(user_id: str) -> float:
         float: Total CO2 saved in kg
     """
     try:
+        # Read-your-writes: push any buffered action logs first
+        flush_pending_writes()
         supabase = get_supabase()
         
         # Simple aggregation query since tables exist in Supabase
@@ -164,6 +364,7 @@ def get_user_total_co2_saved(user_id: str) -> float:
             .select('co2_saved')\
             .eq('user_id', user_id)\
             .execute()
+        record_query('get_user_total_co2_saved.user_actions', response)
         
         if response.data:
             total = sum(float(action['co2_saved']) for action in response.data)
@@ -191,6 +392,7 @@ def get_country(user_id: str):
             .select('country')\
             .eq('id', user_id)\
             .execute()
+        record_query('get_country.users', response)
         
         if response.data:
             return response.data[0].get('country', '')
@@ -212,6 +414,8 @@ def get_user_recent_actions(user_id: str, limit: int = 10):
         list: Recent actions with action_id, completed_at, and co2_saved
     """
     try:
+        # Read-your-writes: push any buffered action logs first
+        flush_pending_writes()
         supabase = get_supabase()
         
         # Direct query to existing table
@@ -221,6 +425,7 @@ def get_user_recent_actions(user_id: str, limit: int = 10):
             .order('completed_at', desc=True)\
             .limit(limit)\
             .execute()
+        record_query('get_user_recent_actions.user_actions', response)
         
         return response.data if response.data else []
         
@@ -247,6 +452,7 @@ def get_community_challenges(active_only: bool = True):
             query = query.eq('is_active', True)
             
         response = query.order('created_at', desc=True).execute()
+        record_query('get_community_challenges.community_challenges', response)
         
         return response.data
         
@@ -296,6 +502,7 @@ def get_user_challenges(user_id: str):
             .select('*, community_challenges(*)')\
             .eq('user_id', user_id)\
             .execute()
+        record_query('get_user_challenges.user_challenges', response)
         
         return response.data
         
@@ -314,19 +521,23 @@ def get_user_progress_summary(user_id: str):
         dict: User progress summary
     """
     try:
+        # Read-your-writes: push any buffered action logs first
+        flush_pending_writes()
         supabase = get_supabase()
         
         # Get user profile
         profile_response = supabase.table('users')\
-            .select('*')\
+            .select('id')\
             .eq('id', user_id)\
             .execute()
+        record_query('get_user_progress_summary.users', profile_response)
         
         # Get user actions
         actions_response = supabase.table('user_actions')\
-            .select('*')\
+            .select('co2_saved, completed_at')\
             .eq('user_id', user_id)\
             .execute()
+        record_query('get_user_progress_summary.user_actions', actions_response)
         
         actions = actions_response.data if actions_response.data else []
         
@@ -399,6 +610,7 @@ def check_onboarding_status(user_id: str) -> bool:
             .select('onboarding_status')\
             .eq('id', user_id)\
             .execute()
+        record_query('check_onboarding_status.users', response)
         
         if response.data and len(response.data) > 0:
             return response.data[0].get('onboarding_status', False)
@@ -424,9 +636,10 @@ def get_user_profile_data(user_id: str):
         supabase = get_supabase()
         
         response = supabase.table('user_profiles')\
-            .select('*')\
+            .select('user_id, onboarding_data, onboarding_final')\
             .eq('user_id', user_id)\
             .execute()
+        record_query('get_user_profile_data.user_profiles', response)
         
         if response.data and len(response.data) > 0:
             return response.data[0]
@@ -455,6 +668,7 @@ def get_complete_user_data_with_score(user_id: str):
             .select('complete_profile_w_scores')\
             .eq('id', user_id)\
             .execute()
+        record_query('get_complete_user_data_with_score.users', response)
         
         if response.data and len(response.data) > 0:
             complete_data = response.data[0].get('complete_profile_w_scores')
@@ -504,6 +718,8 @@ def create_agent_session(user_id: str, agent_type: str, initial_prompt: str) ->
 def update_agent_session(session_id: str, status: str, final_output: dict = None) -> bool:
     """
     Update agent session with completion status and output.
+    The update is queued on the write-behind buffer; repeated updates to the
+    same session before a flush are coalesced into one write.
     
     Args:
         session_id (str): Agent session ID
@@ -511,31 +727,129 @@ def update_agent_session(session_id: str, status: str, final_output: dict = None
         final_output (dict): Final output from agent
         
     Returns:
-        bool: True if successful, False otherwise
+        bool: True if the update was queued, False otherwise
     """
     try:
-        supabase = get_supabase()
-        
         update_data = {'status': status}
         if status == 'completed':
-            update_data['completed_at'] = 'now()'
+            # Timestamp at enqueue time, not at flush time
+            update_data['completed_at'] = datetime.now(timezone.utc).isoformat()
         if final_output:
             update_data['final_output'] = final_output
         
-        response = supabase.table('agent_sessions')\
-            .update(update_data)\
-            .eq('id', session_id)\
-            .execute()
+        get_write_buffer().enqueue_update('agent_sessions', {'id': session_id}, update_data)
         
-        return True if response.data else False
+        return True
         
     except Exception as e:
         st.error(f"Error updating agent session: {str(e)}")
         return False
 
+# ====================================================================
+# AGENT SESSION LEASES (SINGLE-FLIGHT WORKFLOW RUNS)
+# ====================================================================
+
+def _is_unique_violation(error: Exception) -> bool:
+    message = str(error)
+    return '23505' in message or 'UNIQUE constraint failed' in message or 'duplicate key' in message
+
+def acquire_agent_session_lease(user_id: str, agent_type: str, initial_prompt: str,
+                                flight_key: str, lease_seconds: int) -> str:
+    """
+    Create an active agent session holding the lease on `flight_key`.
+    
+    Only one active session may exist per flight key (unique partial index,
+    see migrations/002_agent_session_leases.sql), so this fails while another
+    process runs the same workflow. Leases past their expiry are released
+    first, so a crashed run does not block the key forever.
+    
+    Args:
+        user_id (str): The user's UUID
+        agent_type (str): Type of agent session
+        initial_prompt (str): The initial prompt for the agent
+        flight_key (str): Identifies the workflow run (user, workflow, input hash)
+        lease_seconds (int): How long the lease is held without completing
+        
+    Returns:
+        str: Agent session ID, or None if the lease is held elsewhere
+    """
+    supabase = get_supabase()
+    now = datetime.now(timezone.utc)
+    
+    supabase.table('agent_sessions')\
+        .update({'status': 'expired'})\
+        .eq('flight_key', flight_key)\
+        .eq('status', 'active')\
+        .lt('lease_expires_at', now.isoformat())\
+        .execute()
+    
+    try:
+        response = supabase.table('agent_sessions').insert({
+            'user_id': user_id,
+            'agent_type': agent_type,
+            'status': 'active',
+            'initial_prompt': initial_prompt,
+            'flight_key': flight_key,
+            'lease_expires_at': (now + timedelta(seconds=lease_seconds)).isoformat()
+        }).execute()
+    except Exception as e:
+        if _is_unique_violation(e):
+            return None
+        raise
+    
+    return response.data[0]['id'] if response.data else None
+
+def get_agent_session_lease(flight_key: str):
+    """
+    Get the most recent agent session for `flight_key`.
+    
+    Args:
+        flight_key (str): Identifies the workflow run
+        
+    Returns:
+        dict: id, status, final_output and lease_expires_at, or None
+    """
+    response = get_supabase().table('agent_sessions')\
+        .select('id, status, final_output, lease_expires_at')\
+        .eq('flight_key', flight_key)\
+        .order('created_at', desc=True)\
+        .limit(1)\
+        .execute()
+    record_query('get_agent_session_lease.agent_sessions', response)
+    return response.data[0] if response.data else None
+
+def release_agent_session_lease(session_id: str, status: str, final_output=None) -> bool:
+    """
+    Finish a leased agent session.
+    
+    Written directly rather than through the write-behind buffer, since
+    runs waiting on the lease in other processes poll for this row.
+    
+    Args:
+        session_id (str): Agent session ID holding the lease
+        status (str): 'completed' or 'failed'
+        final_output: Shared result (or error details)
+        
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        update_data = {'status': status, 'final_output': final_output}
+        if status == 'completed':
+            update_data['completed_at'] = datetime.now(timezone.utc).isoformat()
+        get_supabase().table('agent_sessions')\
+            .update(update_data)\
+            .eq('id', session_id)\
+            .execute()
+        return True
+    except Exception as e:
+        print(f"Error releasing agent session lease: {str(e)}")
+        return False
+
 def save_agent_message(session_id: str, role: str, content: str) -> bool:
     """
     Save agent message to the chat history.
+    The insert is queued on the write-behind buffer and batched with other rows.
     
     Args:
         session_id (str): Agent session ID
@@ -543,18 +857,17 @@ def save_agent_message(session_id: str, role: str, content: str) -> bool:
         content (str): Message content
         
     Returns:
-        bool: True if successful, False otherwise
+        bool: True if the message was queued, False otherwise
     """
     try:
-        supabase = get_supabase()
-        
-        response = supabase.table('agent_messages').insert({
+        get_write_buffer().enqueue_insert('agent_messages', {
             'agent_session_id': session_id,
             'role': role,
-            'content': content
-        }).execute()
+            'content': content,
+            'created_at': datetime.now(timezone.utc).isoformat()
+        })
         
-        return True if response.data else False
+        return True
         
     except Exception as e:
         st.error(f"Error saving agent message: {str(e)}")
@@ -571,13 +884,16 @@ def get_agent_messages(session_id: str):
         list: List of messages or empty list if none found
     """
     try:
+        # Make sure buffered messages are visible to this read
+        flush_pending_writes()
         supabase = get_supabase()
         
         response = supabase.table('agent_messages')\
-            .select('*')\
+            .select('agent_session_id, role, content, created_at')\
             .eq('agent_session_id', session_id)\
             .order('created_at')\
             .execute()
+        record_query('get_agent_messages.agent_messages', response)
         
         return response.data if response.data else []
         
@@ -602,6 +918,7 @@ def get_user_onboarding_data(user_id: str):
             .select('onboarding_data')\
             .eq('user_id', user_id)\
             .execute()
+        record_query('get_user_onboarding_data.user_profiles', response)
         
         if response.data and len(response.data) > 0:
             return response.data[0]['onboarding_data']
@@ -640,9 +957,10 @@ def save_agent_results(user_id: str, agent_type: str, results: dict, agent_sessi
             
             # Check if user_scores record exists
             existing_response = supabase.table('user_scores')\
-                .select('*')\
+                .select('id')\
                 .eq('user_id', user_id)\
                 .execute()
+            record_query('save_agent_results.user_scores', existing_response)
             
             if existing_response.data:
                 # Update existing record
@@ -672,16 +990,15 @@ def save_agent_results(user_id: str, agent_type: str, results: dict, agent_sessi
             from datetime import datetime, date
             
             # Get current week start date (Monday)
-            today = date.today()
-            days_since_monday = today.weekday()
-            week_start = today - timedelta(days=days_since_monday)
+            week_start = get_week_start()
             
             # Check if weekly plan for this week exists
             existing_response = supabase.table('weekly_plans')\
-                .select('*')\
+                .select('id')\
                 .eq('user_id', user_id)\
                 .eq('week_of', week_start.isoformat())\
                 .execute()
+            record_query('save_agent_results.weekly_plans', existing_response)
             
             if existing_response.data:
                 # Update existing weekly plan
@@ -704,12 +1021,49 @@ def save_agent_results(user_id: str, agent_type: str, results: dict, agent_sessi
                     })\
                     .execute()
         
-        return True if response.data else False
+        saved = True if response.data else False
+        if saved and agent_type == 'analyst':
+            notify_scores_saved(user_id)
+        return saved
         
     except Exception as e:
         st.error(f"Error saving agent results: {str(e)}")
         return False
 
+def _combine_agent_results(scores_rows: list, plan_rows: list):
+    """
+    Combine user_scores and weekly_plans rows into the agent results dict.
+    
+    Args:
+        scores_rows (list): Rows from user_scores (first row is used)
+        plan_rows (list): Rows from weekly_plans, latest first
+        
+    Returns:
+        dict: Combined agent results data
+    """
+    result = {}
+    
+    if scores_rows and len(scores_rows) > 0:
+        scores_data = scores_rows[0]
+        result['carbon_footprint_data'] = {
+            'calculation_data': scores_data.get('scores', {}),
+            'benchmark_data': scores_data.get('benchmarks', {}),
+            # Version of the scores, used to key cached chart data
+            'calculated_at': scores_data.get('calculated_at')
+        }
+        result['analyst_completed'] = True
+    else:
+        result['analyst_completed'] = False
+        
+    if plan_rows and len(plan_rows) > 0:
+        plan_data = plan_rows[0]
+        result['weekly_plan_data'] = plan_data.get('suggestions', {})
+        result['planner_completed'] = True
+    else:
+        result['planner_completed'] = False
+    
+    return result if result else None
+
 def get_agent_results(user_id: str):
     """
     Get agent analysis results from user_scores and weekly_plans tables.
@@ -725,39 +1079,24 @@ def get_agent_results(user_id: str):
         
         # Get scores from user_scores table
         scores_response = supabase.table('user_scores')\
-            .select('*')\
+            .select('scores, benchmarks, calculated_at')\
             .eq('user_id', user_id)\
             .execute()
+        record_query('get_agent_results.user_scores', scores_response)
         
         # Get current week's plan from weekly_plans table - get latest plan
+        # (plans pre-generated for next week stay hidden until it starts)
         plans_response = supabase.table('weekly_plans')\
-            .select('*')\
+            .select('suggestions')\
             .eq('user_id', user_id)\
+            .lte('week_of', get_week_start().isoformat())\
+            .order('week_of', desc=True)\
             .order('created_at', desc=True)\
             .limit(1)\
             .execute()
+        record_query('get_agent_results.weekly_plans', plans_response)
         
-        # Combine results
-        result = {}
-        
-        if scores_response.data and len(scores_response.data) > 0:
-            scores_data = scores_response.data[0]
-            result['carbon_footprint_data'] = {
-                'calculation_data': scores_data.get('scores', {}),
-                'benchmark_data': scores_data.get('benchmarks', {})
-            }
-            result['analyst_completed'] = True
-        else:
-            result['analyst_completed'] = False
-            
-        if plans_response.data and len(plans_response.data) > 0:
-            plan_data = plans_response.data[0]
-            result['weekly_plan_data'] = plan_data.get('suggestions', {})
-            result['planner_completed'] = True
-        else:
-            result['planner_completed'] = False
-        
-        return result if result else None
+        return _combine_agent_results(scores_response.data, plans_response.data)
         
     except Exception as e:
         st.error(f"Error fetching agent results: {str(e)}")
@@ -781,6 +1120,7 @@ def check_agents_status(user_id: str):
             .select('id')\
             .eq('user_id', user_id)\
             .execute()
+        record_query('check_agents_status.user_scores', scores_response)
         
         analyst_completed = len(scores_response.data) > 0
         
@@ -790,6 +1130,7 @@ def check_agents_status(user_id: str):
             .eq('user_id', user_id)\
             .limit(1)\
             .execute()
+        record_query('check_agents_status.weekly_plans', plans_response)
         
         planner_completed = len(plans_response.data) > 0
         
@@ -803,20 +1144,143 @@ def check_agents_status(user_id: str):
         return {'analyst_completed': False, 'planner_completed': False}
 
 
+# ====================================================================
+# KEYSET PAGINATION FOR HISTORY QUERIES
+# ====================================================================
+
+def _quote_filter_value(value) -> str:
+    """Quote a value for a PostgREST logical filter (timestamps contain '.' and ':')."""
+    return '"' + str(value).replace('"', '\\"') + '"'
+
+def fetch_page(table: str, columns: str, filters: dict, page_size: int = 50, cursor: tuple = None):
+    """
+    Fetch one page of rows, newest first, keyed on (created_at, id).
+    
+    Rows after `cursor` are selected with a keyset filter rather than an
+    OFFSET, so every page costs one indexed range scan regardless of depth.
+    
+    Args:
+        table (str): Table name
+        columns (str): Columns to select (created_at and id are always added)
+        filters (dict): Column -> value equality filters
+        page_size (int): Rows per page
+        cursor (tuple): (created_at, id) of the last row of the previous page
+        
+    Returns:
+        tuple: (rows, next_cursor) where next_cursor is None on the last page
+    """
+    selected = [column.strip() for column in columns.split(',') if column.strip()]
+    for key_column in ('created_at', 'id'):
+        if key_column not in selected:
+            selected.append(key_column)
+    
+    query = get_supabase().table(table).select(', '.join(selected))
+    for column, value in filters.items():
+        query = query.eq(column, value)
+    
+    if cursor:
+        created_at, row_id = (_quote_filter_value(value) for value in cursor)
+        query = query.or_(f"created_at.lt.{created_at},and(created_at.eq.{created_at},id.lt.{row_id})")
+    
+    # Fetch one extra row to know whether another page exists
+    response = query.order('created_at', desc=True)\
+        .order('id', desc=True)\
+        .limit(page_size + 1)\
+        .execute()
+    record_query(f'fetch_page.{table}', response)
+    
+    rows = response.data or []
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        return rows, (rows[-1]['created_at'], rows[-1]['id'])
+    return rows, None
+
+def iter_pages(table: str, columns: str, filters: dict, page_size: int = 50, cursor: tuple = None):
+    """
+    Lazily yield pages of rows (newest first) until the table range is exhausted.
+    
+    Only one page is held in memory at a time.
+    
+    Args:
+        table (str): Table name
+        columns (str): Columns to select
+        filters (dict): Column -> value equality filters
+        page_size (int): Rows per page
+        cursor (tuple): Optional (created_at, id) to resume after
+        
+    Yields:
+        list: One page of rows
+    """
+    while True:
+        rows, cursor = fetch_page(table, columns, filters, page_size, cursor)
+        if rows:
+            yield rows
+        if cursor is None:
+            return
+
+def iter_user_actions(user_id: str, weekly_plan_id: str = None, page_size: int = 100):
+    """
+    Stream a user's actions newest first.
+    
+    Args:
+        user_id (str): The user's UUID
+        weekly_plan_id (str): Optional weekly plan to restrict to
+        page_size (int): Rows fetched per request
+        
+    Yields:
+        dict: One user_actions row at a time
+    """
+    flush_pending_writes()
+    filters = {'user_id': user_id}
+    if weekly_plan_id:
+        filters['weekly_plan_id'] = weekly_plan_id
+    for page in iter_pages('user_actions', USER_ACTION_COLUMNS, filters, page_size):
+        yield from page
+
+def iter_weekly_plans(user_id: str, columns: str = 'id, week_of, agent_session_id, created_at', page_size: int = 50):
+    """
+    Stream a user's weekly plans newest first.
+    
+    Args:
+        user_id (str): The user's UUID
+        columns (str): Columns to select (suggestions is large; include it only if needed)
+        page_size (int): Rows fetched per request
+        
+    Yields:
+        dict: One weekly_plans row at a time
+    """
+    for page in iter_pages('weekly_plans', columns, {'user_id': user_id}, page_size):
+        yield from page
+
+def fetch_user_actions_page(user_id: str, cursor: tuple = None, page_size: int = 20):
+    """
+    Get one page of a user's action history for incremental (infinite scroll) views.
+    
+    Args:
+        user_id (str): The user's UUID
+        cursor (tuple): Cursor returned by the previous call, None for the first page
+        page_size (int): Rows per page
+        
+    Returns:
+        tuple: (rows, next_cursor) where next_cursor is None when there are no more rows
+    """
+    try:
+        if cursor is None:
+            # Read-your-writes: push any buffered action logs first
+            flush_pending_writes()
+        return fetch_page('user_actions', USER_ACTION_COLUMNS, {'user_id': user_id}, page_size, cursor)
+        
+    except Exception as e:
+        st.error(f"Error fetching action history: {str(e)}")
+        return [], None
+
+
 def debug_weekly_plans(user_id: str):
     """
     Debug function to show what's in the weekly_plans table for a user.
     """
     try:
-        supabase = get_supabase()
-        
-        response = supabase.table('weekly_plans')\
-            .select('*')\
-            .eq('user_id', user_id)\
-            .order('created_at', desc=True)\
-            .execute()
-        
-        return response.data
+        return list(iter_weekly_plans(user_id))
         
     except Exception as e:
         print(f"Error debugging weekly plans: {str(e)}")
@@ -827,24 +1291,13 @@ def debug_user_actions(user_id: str, weekly_plan_id: str = None):
     Debug function to show what's in the user_actions table for a user.
     """
     try:
-        supabase = get_supabase()
-        
-        query = supabase.table('user_actions')\
-            .select('*')\
-            .eq('user_id', user_id)
-        
-        if weekly_plan_id:
-            query = query.eq('weekly_plan_id', weekly_plan_id)
-            
-        response = query.order('created_at', desc=True).execute()
-        
-        return response.data
+        return list(iter_user_actions(user_id, weekly_plan_id))
         
     except Exception as e:
         print(f"Error debugging user actions: {str(e)}")
         return []
 
-def save_weekly_plan_results(user_id: str, session_id: str, plan_data: dict) -> bool:
+def save_weekly_plan_results(user_id: str, session_id: str, plan_data: dict, week_of: date = None) -> bool:
     """
     Save weekly plan results to the database.
     
@@ -852,6 +1305,7 @@ def save_weekly_plan_results(user_id: str, session_id: str, plan_data: dict) ->
         user_id (str): The user's UUID
         session_id (str): The agent session ID
         plan_data (dict): The weekly plan data
+        week_of (date): Monday of the week the plan is for (defaults to the current week)
         
     Returns:
         bool: True if successful, False otherwise
@@ -860,10 +1314,7 @@ def save_weekly_plan_results(user_id: str, session_id: str, plan_data: dict) ->
         supabase = get_supabase()
         
         # Calculate week start date
-        from datetime import date, timedelta
-        today = date.today()
-        days_since_monday = today.weekday()
-        week_start = today - timedelta(days=days_since_monday)
+        week_start = week_of or get_week_start()
         
         response = supabase.table('weekly_plans').insert({
             'user_id': user_id,
@@ -891,12 +1342,16 @@ def get_latest_weekly_plan(user_id: str):
     try:
         supabase = get_supabase()
         
+        # Plans pre-generated for next week stay hidden until it starts
         response = supabase.table('weekly_plans')\
-            .select('*')\
+            .select(WEEKLY_PLAN_COLUMNS)\
             .eq('user_id', user_id)\
+            .lte('week_of', get_week_start().isoformat())\
+            .order('week_of', desc=True)\
             .order('created_at', desc=True)\
             .limit(1)\
             .execute()
+        record_query('get_latest_weekly_plan.weekly_plans', response)
         
         if response.data:
             return response.data[0]
@@ -906,6 +1361,85 @@ def get_latest_weekly_plan(user_id: str):
         st.error(f"Error fetching latest weekly plan: {str(e)}")
         return None
 
+def has_weekly_plan(user_id: str, week_of: date) -> bool:
+    """
+    Check whether a plan already exists for the given week.
+    
+    Args:
+        user_id (str): The user's UUID
+        week_of (date): Monday of the week
+        
+    Returns:
+        bool: True if a weekly_plans row exists for that week
+    """
+    response = get_supabase().table('weekly_plans')\
+        .select('id')\
+        .eq('user_id', user_id)\
+        .eq('week_of', week_of.isoformat())\
+        .limit(1)\
+        .execute()
+    record_query('has_weekly_plan.weekly_plans', response)
+    return bool(response.data)
+
+CANDIDATE_PAGE_SIZE = 500
+
+def _as_aware(moment: datetime) -> datetime:
+    """`moment` with a timezone (naive values are taken as local time)."""
+    return moment if moment.tzinfo else moment.astimezone()
+
+def get_plan_pregeneration_candidates(active_since: datetime) -> list:
+    """
+    Users with completed onboarding who were active since `active_since`.
+    
+    Activity is the number of user_actions logged since then; users without
+    actions count as active if their last_active_at is recent.
+    
+    Args:
+        active_since (datetime): Start of the activity window
+        
+    Returns:
+        list: Dicts with user_id, recent_actions and last_active_at
+    """
+    supabase = get_supabase()
+    since = active_since.isoformat()
+    
+    # Walk user_actions newest first, one keyset page at a time, until the window ends
+    window_start = _as_aware(active_since)
+    action_counts = {}
+    for page in iter_pages('user_actions', 'user_id', {}, page_size=CANDIDATE_PAGE_SIZE):
+        in_window = [row for row in page
+                     if _as_aware(pd.Timestamp(row['created_at']).to_pydatetime()) >= window_start]
+        for row in in_window:
+            action_counts[row['user_id']] = action_counts.get(row['user_id'], 0) + 1
+        if len(in_window) < len(page):
+            break
+    
+    users = {}
+    recent_response = supabase.table('users')\
+        .select('id, last_active_at')\
+        .eq('onboarding_status', True)\
+        .gte('last_active_at', since)\
+        .execute()
+    record_query('get_plan_pregeneration_candidates.users', recent_response)
+    for row in recent_response.data or []:
+        users[row['id']] = row
+    acting_ids = [user_id for user_id in action_counts if user_id not in users]
+    for start in range(0, len(acting_ids), CANDIDATE_PAGE_SIZE):
+        acting_response = supabase.table('users')\
+            .select('id, last_active_at')\
+            .eq('onboarding_status', True)\
+            .in_('id', acting_ids[start:start + CANDIDATE_PAGE_SIZE])\
+            .execute()
+        record_query('get_plan_pregeneration_candidates.users', acting_response)
+        for row in acting_response.data or []:
+            users[row['id']] = row
+    
+    return [{
+        'user_id': user_id,
+        'recent_actions': action_counts.get(user_id, 0),
+        'last_active_at': row.get('last_active_at')
+    } for user_id, row in users.items()]
+
 def get_latest_scoring_results(user_id: str):
     """
     Get the latest scoring results for a user.
@@ -920,11 +1454,12 @@ def get_latest_scoring_results(user_id: str):
         supabase = get_supabase()
         
         response = supabase.table('user_scores')\
-            .select('*')\
+            .select('id, scores, benchmarks, agent_session_id, calculated_at')\
             .eq('user_id', user_id)\
             .order('calculated_at', desc=True)\
             .limit(1)\
             .execute()
+        record_query('get_latest_scoring_results.user_scores', response)
         
         if response.data:
             return response.data[0]
@@ -964,6 +1499,7 @@ def save_task_completion(user_id: str, weekly_plan_id: str, task_id: str, task_t
             .eq('suggestion_id', task_id)\
             .eq('status', 'completed')\
             .execute()
+        record_query('save_task_completion.user_actions', existing_response)
         
         # If it already exists, return True (already completed)
         if existing_response.data:
@@ -984,6 +1520,51 @@ def save_task_completion(user_id: str, weekly_plan_id: str, task_id: str, task_t
         st.error(f"Error saving task completion: {str(e)}")
         return False
 
+def task_completion_key(user_id: str, weekly_plan_id: str, task_id: str) -> str:
+    """Key identifying a task completion write in the background persister."""
+    return f"task_completion:{user_id}:{weekly_plan_id}:{task_id}"
+
+def save_task_completion_async(user_id: str, weekly_plan_id: str, task_id: str, task_title: str, task_type: str) -> PendingWrite:
+    """
+    Persist a task completion in the background for optimistic UI updates.
+    
+    The caller marks the task completed in session state right away and
+    later reconciles with the returned write's status (see
+    get_background_persister().get(key)).
+    
+    Args:
+        user_id (str): The user's UUID
+        weekly_plan_id (str): The weekly plan UUID (from weekly_plans.id)
+        task_id (str): Unique task identifier (maps to suggestion_id)
+        task_title (str): Task title/description (stored in notes)
+        task_type (str): 'weekly' or other type (stored in notes)
+        
+    Returns:
+        PendingWrite: Tracked state of the write
+    """
+    # Captured here: the worker thread has no session state to find the user's client
+    access_token = _write_context()
+    
+    def write():
+        with bind_access_token(access_token):
+            return save_task_completion(user_id, weekly_plan_id, task_id, task_title, task_type)
+    
+    key = task_completion_key(user_id, weekly_plan_id, task_id)
+    return get_background_persister().submit(key, write)
+
+def _task_completions_from_actions(action_rows: list) -> list:
+    """Convert user_actions rows to the task_completions format used by the dashboard."""
+    task_completions = []
+    for action in action_rows if action_rows else []:
+        task_completions.append({
+            'task_id': action['suggestion_id'],
+            'completed': action['status'] == 'completed',
+            'user_id': action['user_id'],
+            'weekly_plan_id': action['weekly_plan_id'],
+            'created_at': action['created_at']
+        })
+    return task_completions
+
 def get_task_completions(user_id: str, weekly_plan_id: str):
     """
     Get task completions for a specific weekly plan from user_actions table.
@@ -999,24 +1580,14 @@ def get_task_completions(user_id: str, weekly_plan_id: str):
         supabase = get_supabase()
         
         response = supabase.table('user_actions')\
-            .select('*')\
+            .select('suggestion_id, status, user_id, weekly_plan_id, created_at')\
             .eq('user_id', user_id)\
             .eq('weekly_plan_id', weekly_plan_id)\
             .eq('status', 'completed')\
             .execute()
+        record_query('get_task_completions.user_actions', response)
         
-        # Convert user_actions format to expected task_completions format
-        task_completions = []
-        for action in response.data if response.data else []:
-            task_completions.append({
-                'task_id': action['suggestion_id'],
-                'completed': action['status'] == 'completed',
-                'user_id': action['user_id'],
-                'weekly_plan_id': action['weekly_plan_id'],
-                'created_at': action['created_at']
-            })
-        
-        return task_completions
+        return _task_completions_from_actions(response.data)
         
     except Exception as e:
         st.error(f"Error fetching task completions: {str(e)}")
@@ -1042,6 +1613,7 @@ def get_completed_tasks_count(user_id: str, weekly_plan_id: str) -> int:
             .eq('weekly_plan_id', weekly_plan_id)\
             .eq('status', 'completed')\
             .execute()
+        record_query('get_completed_tasks_count.user_actions', response)
         
         return response.count if response.count else 0
         
@@ -1098,6 +1670,7 @@ def get_daily_tasks(user_id: str, weekly_plan_id: str):
             .order('generated_at', desc=True)\
             .limit(1)\
             .execute()
+        record_query('get_daily_tasks.daily_tasks', response)
         
         if response.data and len(response.data) > 0:
             return response.data[0]['task_data']
@@ -1163,6 +1736,7 @@ def get_profiler_results(user_id: str):
             .select('onboarding_final')\
             .eq('user_id', user_id)\
             .execute()
+        record_query('get_profiler_results.user_profiles', response)
         
         if response.data and len(response.data) > 0 and response.data[0]['onboarding_final']:
             return response.data[0]['onboarding_final']
@@ -1175,103 +1749,187 @@ def get_profiler_results(user_id: str):
 
 
 # ====================================================================
-# FEEDBACK SYSTEM FUNCTIONS - Two-Tiered Memory Implementation
+# AGENT STAGE RESULTS (REUSED WHEN INPUTS ARE UNCHANGED)
 # ====================================================================
 
-def save_user_feedback(user_id: str, raw_feedback: str, feedback_summary: str = None) -> bool:
+def get_stage_result(user_id: str, stage: str):
     """
-    Save user feedback to the weekly_plans table for the current week.
+    Get the last stored output of an agent stage with the fingerprints of its inputs.
     
     Args:
         user_id (str): The user's UUID
-        raw_feedback (str): Raw feedback text from user
-        feedback_summary (str): Optional pre-processed summary
+        stage (str): 'profiler' or 'analyst'
         
     Returns:
-        bool: True if successful, False otherwise
+        dict: input_fingerprint, section_fingerprints and output, or None
     """
     try:
         supabase = get_supabase()
         
-        # Calculate current week
-        from datetime import date, timedelta
-        today = date.today()
-        days_since_monday = today.weekday()
-        week_start = today - timedelta(days=days_since_monday)
-        
-        # Get the latest weekly plan for this user
-        plan_response = supabase.table('weekly_plans')\
-            .select('id')\
+        response = supabase.table('agent_stage_results')\
+            .select('input_fingerprint, section_fingerprints, output, updated_at')\
             .eq('user_id', user_id)\
-            .eq('week_of', week_start.isoformat())\
-            .order('created_at', desc=True)\
+            .eq('stage', stage)\
             .limit(1)\
             .execute()
+        record_query('get_stage_result.agent_stage_results', response)
         
-        if plan_response.data and len(plan_response.data) > 0:
-            # Update existing weekly plan with feedback
-            plan_id = plan_response.data[0]['id']
-            
-            update_data = {
-                'user_feedback': raw_feedback,
-                'updated_at': 'now()'
-            }
-            
-            if feedback_summary:
-                update_data['feedback_summary'] = feedback_summary
-            
-            response = supabase.table('weekly_plans')\
-                .update(update_data)\
-                .eq('id', plan_id)\
-                .execute()
-                
-            return len(response.data) > 0
-        else:
-            # Create new weekly plan entry with feedback
-            insert_data = {
+        return response.data[0] if response.data else None
+        
+    except Exception as e:
+        print(f"Error fetching {stage} stage result: {str(e)}")
+        return None
+
+def get_stage_results(user_id: str, stages: list) -> dict:
+    """
+    Get the stored outputs of several agent stages in one query.
+    
+    Args:
+        user_id (str): The user's UUID
+        stages (list): Stage names (e.g. agent.category_analysis.CATEGORY_STAGES)
+        
+    Returns:
+        dict: Stage name -> input_fingerprint, output and updated_at, for the stages that have one
+    """
+    try:
+        supabase = get_supabase()
+        
+        response = supabase.table('agent_stage_results')\
+            .select('stage, input_fingerprint, output, updated_at')\
+            .eq('user_id', user_id)\
+            .in_('stage', list(stages))\
+            .execute()
+        record_query('get_stage_results.agent_stage_results', response)
+        
+        return {row['stage']: row for row in response.data or []}
+        
+    except Exception as e:
+        print(f"Error fetching stage results: {str(e)}")
+        return {}
+
+def save_stage_result(user_id: str, stage: str, input_fingerprint: str, section_fingerprints: dict, output: dict) -> bool:
+    """
+    Store the output of an agent stage with the fingerprints of its inputs (replacing the previous one).
+    
+    Args:
+        user_id (str): The user's UUID
+        stage (str): 'profiler' or 'analyst'
+        input_fingerprint (str): Fingerprint of the inputs the stage depends on
+        section_fingerprints (dict): Per-section fingerprints of the onboarding data, for diff reports
+        output (dict): Stage output
+        
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    return save_stage_results(user_id, [{
+        'stage': stage,
+        'input_fingerprint': input_fingerprint,
+        'section_fingerprints': section_fingerprints,
+        'output': output
+    }])
+
+def save_stage_results(user_id: str, entries: list) -> bool:
+    """
+    Store several stage outputs in one upsert (replacing the previous ones).
+    
+    Args:
+        user_id (str): The user's UUID
+        entries (list): Dicts with stage, input_fingerprint, output and optionally section_fingerprints
+        
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    if not entries:
+        return True
+    try:
+        supabase = get_supabase()
+        updated_at = datetime.now(timezone.utc).isoformat()
+        
+        response = supabase.table('agent_stage_results')\
+            .upsert([{
                 'user_id': user_id,
-                'week_of': week_start.isoformat(),
-                'user_feedback': raw_feedback,
-                'suggestions': {}  # Empty suggestions for now
-            }
+                'stage': entry['stage'],
+                'input_fingerprint': entry['input_fingerprint'],
+                'section_fingerprints': entry.get('section_fingerprints'),
+                'output': entry['output'],
+                'updated_at': updated_at
+            } for entry in entries], on_conflict='user_id,stage')\
+            .execute()
             
-            if feedback_summary:
-                insert_data['feedback_summary'] = feedback_summary
-                
-            response = supabase.table('weekly_plans')\
-                .insert(insert_data)\
-                .execute()
-                
-            return len(response.data) > 0
+        return len(response.data) > 0
         
     except Exception as e:
-        st.error(f"Error saving user feedback: {str(e)}")
+        stages = ', '.join(entry['stage'] for entry in entries)
+        print(f"Error saving {stages} stage result: {str(e)}")
         return False
 
 
-def process_feedback_text(raw_feedback: str) -> str:
+# ====================================================================
+# FEEDBACK SYSTEM FUNCTIONS - Two-Tiered Memory Implementation
+# ====================================================================
+
+def save_user_feedback(user_id: str, raw_feedback: str, feedback_summary: str = None):
     """
-    Process raw user feedback into a structured summary using a lightweight LLM call.
-    This is Step 1 of the feedback system - the "Translator".
+    Append user feedback for the current week to the user_feedback table.
     
     Args:
+        user_id (str): The user's UUID
         raw_feedback (str): Raw feedback text from user
+        feedback_summary (str): Optional pre-processed summary
         
     Returns:
-        str: Structured feedback summary for agent memory
+        str: The new feedback record's id, or None if it was not saved
     """
     try:
+        supabase = get_supabase()
+        
+        insert_data = {
+            'user_id': user_id,
+            'week_of': get_week_start().isoformat(),
+            'raw_feedback': raw_feedback
+        }
+        
+        if feedback_summary:
+            insert_data['feedback_summary'] = feedback_summary
+            
+        response = supabase.table('user_feedback')\
+            .insert(insert_data)\
+            .execute()
+            
+        return response.data[0]['id'] if response.data else None
+        
+    except Exception as e:
+        st.error(f"Error saving user feedback: {str(e)}")
+        return None
+
+
+_feedback_llm_client = None
+
+def _get_feedback_llm_client():
+    """Return the OpenAI client (AIMLAPI endpoint) used for feedback summaries, created once."""
+    global _feedback_llm_client
+    if _feedback_llm_client is None:
         import os
         from openai import OpenAI
-        
-        # Initialize OpenAI client with AIMLAPI settings
-        client = OpenAI(
+        _feedback_llm_client = OpenAI(
             api_key=os.getenv("AI_ML_API_KEY"),
             base_url="https://api.aimlapi.com/v1"
         )
+    return _feedback_llm_client
+
+
+def summarize_feedback_text(raw_feedback: str) -> str:
+    """
+    Summarize raw user feedback with a lightweight LLM call (raises on failure).
+    
+    Args:
+        raw_feedback (str): Raw feedback text from user
         
-        # Lightweight prompt to convert feedback to structured summary
-        prompt = f"""Summarize the following user feedback into a concise, third-person statement for an AI coach's memory. Extract key preferences, difficulties, and motivations. Keep it under 50 words.
+    Returns:
+        str: Structured feedback summary for agent memory
+    """
+    # Lightweight prompt to convert feedback to structured summary
+    prompt = f"""Summarize the following user feedback into a concise, third-person statement for an AI coach's memory. Extract key preferences, difficulties, and motivations. Keep it under 50 words.
 
 User feedback: "{raw_feedback}"
 
@@ -1284,22 +1942,56 @@ Examples:
 
 Summary:"""
 
-        response = client.chat.completions.create(
-            model="openai/gpt-4.1-nano-2025-04-14",
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=60,  # Keep it very short and cheap
-            temperature=0.3
-        )
+    # Import here to avoid circular imports
+    from agent.llm_governor import get_llm_governor
+    
+    # Shares the endpoint's concurrency limit and circuit breaker with the agents
+    response = get_llm_governor().call(lambda: _get_feedback_llm_client().chat.completions.create(
+        model="openai/gpt-4.1-nano-2025-04-14",
+        messages=[
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=60,  # Keep it very short and cheap
+        temperature=0.3
+    ))
+    
+    summary = response.choices[0].message.content.strip()
+    
+    # Clean up the summary if needed
+    if summary.startswith('"') and summary.endswith('"'):
+        summary = summary[1:-1]
         
-        summary = response.choices[0].message.content.strip()
+    return summary
+
+
+def summarize_feedback(raw_feedback: str) -> str:
+    """
+    Summarize feedback by rules when it is formulaic, by LLM otherwise (raises on LLM failure).
+    
+    Args:
+        raw_feedback (str): Raw feedback text from user
         
-        # Clean up the summary if needed
-        if summary.startswith('"') and summary.endswith('"'):
-            summary = summary[1:-1]
-            
-        return summary
+    Returns:
+        str: Structured feedback summary for agent memory
+    """
+    # Import here to avoid circular imports
+    from agent.feedback_extractor import get_feedback_extractor
+    return get_feedback_extractor().summarize(raw_feedback, summarize_feedback_text)
+
+
+def process_feedback_text(raw_feedback: str) -> str:
+    """
+    Process raw user feedback into a structured summary using a lightweight LLM call.
+    This is Step 1 of the feedback system - the "Translator".
+    
+    Args:
+        raw_feedback (str): Raw feedback text from user
+        
+    Returns:
+        str: Structured feedback summary for agent memory
+    """
+    try:
+        return summarize_feedback(raw_feedback)
         
     except Exception as e:
         print(f"Error processing feedback text: {str(e)}")
@@ -1307,10 +1999,35 @@ Summary:"""
         return f"User provided feedback: {raw_feedback[:50]}{'...' if len(raw_feedback) > 50 else ''}"
 
 
+def _feedback_history_from_rows(feedback_rows: list) -> list:
+    """Convert user_feedback rows (latest first) to feedback history entries."""
+    return [
+        {
+            # The summary is written by a background job; use the raw text until it lands
+            'summary': row.get('feedback_summary') or row['raw_feedback'],
+            'raw_feedback': row['raw_feedback'],
+            'week_of': row['week_of'],
+            'date': row['created_at']
+        }
+        for row in feedback_rows or []
+    ]
+
+
+def _current_feedback_from_rows(feedback_rows: list):
+    """The latest of the current week's user_feedback rows, in the dashboard's shape."""
+    if feedback_rows:
+        row = feedback_rows[0]
+        return {
+            'id': row['id'],
+            'feedback_summary': row.get('feedback_summary') or '',
+            'user_feedback': row['raw_feedback']
+        }
+    return None
+
+
 def get_user_feedback_history(user_id: str, limit: int = 3) -> list:
     """
     Get recent feedback history for a user (Tier 2 Memory).
-    Since feedback is stored in suggestions field, we'll extract it from there.
     
     Args:
         user_id (str): The user's UUID
@@ -1322,27 +2039,15 @@ def get_user_feedback_history(user_id: str, limit: int = 3) -> list:
     try:
         supabase = get_supabase()
         
-        response = supabase.table('weekly_plans')\
-            .select('suggestions, week_of, created_at')\
+        response = supabase.table('user_feedback')\
+            .select(USER_FEEDBACK_COLUMNS)\
             .eq('user_id', user_id)\
             .order('created_at', desc=True)\
             .limit(limit)\
             .execute()
+        record_query('get_user_feedback_history.user_feedback', response)
         
-        if response.data:
-            feedback_history = []
-            for item in response.data:
-                suggestions = item.get('suggestions', {})
-                if isinstance(suggestions, dict) and suggestions.get('user_feedback'):
-                    feedback_history.append({
-                        'summary': suggestions.get('feedback_summary', 'User provided feedback'),
-                        'raw_feedback': suggestions.get('user_feedback', ''),
-                        'week_of': item['week_of'],
-                        'date': item['created_at']
-                    })
-            return feedback_history
-        
-        return []
+        return _feedback_history_from_rows(response.data)
         
     except Exception as e:
         print(f"Error fetching user feedback history: {str(e)}")
@@ -1363,39 +2068,67 @@ def get_current_week_feedback(user_id: str) -> dict:
         supabase = get_supabase()
         
         # Calculate current week
-        from datetime import date, timedelta
-        today = date.today()
-        days_since_monday = today.weekday()
-        week_start = today - timedelta(days=days_since_monday)
+        week_start = get_week_start()
         
-        response = supabase.table('weekly_plans')\
-            .select('suggestions')\
+        response = supabase.table('user_feedback')\
+            .select(USER_FEEDBACK_COLUMNS)\
             .eq('user_id', user_id)\
             .eq('week_of', week_start.isoformat())\
             .order('created_at', desc=True)\
             .limit(1)\
             .execute()
+        record_query('get_current_week_feedback.user_feedback', response)
         
-        if response.data and len(response.data) > 0:
-            suggestions = response.data[0].get('suggestions', {})
-            if isinstance(suggestions, dict) and suggestions.get('user_feedback'):
-                return {
-                    'feedback_summary': suggestions.get('feedback_summary', ''),
-                    'user_feedback': suggestions.get('user_feedback', ''),
-                    'suggestions': suggestions
-                }
-        
-        return None
+        return _current_feedback_from_rows(response.data)
         
     except Exception as e:
         print(f"Error fetching current week feedback: {str(e)}")
         return None
 
 
+def feedback_summary_key(user_id: str, raw_feedback: str) -> str:
+    """Key identifying a feedback summarization job in the background persister."""
+    digest = hashlib.sha256(raw_feedback.encode('utf-8')).hexdigest()[:16]
+    return f"feedback_summary:{user_id}:{digest}"
+
+def _save_feedback_summary(feedback_id: str, raw_feedback: str) -> bool:
+    """Summarize `raw_feedback` and store the summary on its feedback record."""
+    feedback_summary = summarize_feedback(raw_feedback)
+    
+    get_supabase().table('user_feedback')\
+        .update({'feedback_summary': feedback_summary})\
+        .eq('id', feedback_id)\
+        .execute()
+    return True
+
+def summarize_feedback_async(user_id: str, feedback_id: str, raw_feedback: str) -> PendingWrite:
+    """
+    Fill in the summary of a feedback record in the background.
+    
+    Args:
+        user_id (str): The user's UUID
+        feedback_id (str): The user_feedback record holding the raw feedback
+        raw_feedback (str): Raw feedback text from user
+        
+    Returns:
+        PendingWrite: Tracked state of the job (see feedback_summary_key)
+    """
+    # Captured here: the worker thread has no session state to find the user's client
+    access_token = _write_context()
+    
+    def write():
+        with bind_access_token(access_token):
+            return _save_feedback_summary(feedback_id, raw_feedback)
+    
+    return get_background_persister().submit(feedback_summary_key(user_id, raw_feedback), write)
+
 def save_feedback_and_process(user_id: str, raw_feedback: str) -> bool:
     """
-    Complete feedback workflow: save raw feedback, process it, and update database.
-    This stores feedback in the suggestions field of the current week's plan.
+    Complete feedback workflow: save raw feedback now, summarize it in the background.
+    Each submission is appended to the user_feedback table.
+    
+    The LLM summary is written by a background job once it is ready; until
+    then readers fall back to the raw text (see _feedback_history_from_rows).
     
     Args:
         user_id (str): The user's UUID
@@ -1405,62 +2138,23 @@ def save_feedback_and_process(user_id: str, raw_feedback: str) -> bool:
         bool: True if successful, False otherwise
     """
     try:
-        # Step 1: Process the raw feedback into structured summary
-        feedback_summary = process_feedback_text(raw_feedback)
-        
-        # Step 2: Get current week's plan
-        supabase = get_supabase()
+        # Step 1: Skip feedback that is already this week's latest (e.g. regenerating with it)
+        current = get_current_week_feedback(user_id)
+        if current and current['user_feedback'] == raw_feedback:
+            if not current['feedback_summary']:
+                summarize_feedback_async(user_id, current['id'], raw_feedback)
+            return True
         
-        from datetime import date, timedelta
-        today = date.today()
-        days_since_monday = today.weekday()
-        week_start = today - timedelta(days=days_since_monday)
+        # Step 2: Save the raw feedback
+        feedback_id = save_user_feedback(user_id, raw_feedback)
+        success = feedback_id is not None
         
-        # Try to find existing plan for this week
-        response = supabase.table('weekly_plans')\
-            .select('id, suggestions')\
-            .eq('user_id', user_id)\
-            .eq('week_of', week_start.isoformat())\
-            .order('created_at', desc=True)\
-            .limit(1)\
-            .execute()
-        
-        if response.data and len(response.data) > 0:
-            # Update existing plan with feedback
-            plan_id = response.data[0]['id']
-            existing_suggestions = response.data[0].get('suggestions', {})
-            
-            # Add feedback to suggestions
-            if isinstance(existing_suggestions, dict):
-                existing_suggestions['user_feedback'] = raw_feedback
-                existing_suggestions['feedback_summary'] = feedback_summary
-            else:
-                existing_suggestions = {
-                    'user_feedback': raw_feedback,
-                    'feedback_summary': feedback_summary
-                }
-            
-            update_response = supabase.table('weekly_plans')\
-                .update({'suggestions': existing_suggestions})\
-                .eq('id', plan_id)\
-                .execute()
-            
-            success = len(update_response.data) > 0
-        else:
-            # Create new plan entry with feedback
-            insert_response = supabase.table('weekly_plans').insert({
-                'user_id': user_id,
-                'week_of': week_start.isoformat(),
-                'suggestions': {
-                    'user_feedback': raw_feedback,
-                    'feedback_summary': feedback_summary
-                }
-            }).execute()
-            
-            success = len(insert_response.data) > 0
+        # Step 3: Summarize off the request path
+        if success:
+            summarize_feedback_async(user_id, feedback_id, raw_feedback)
         
         if success:
-            print("✅ Feedback saved and processed successfully!")
+            print("✅ Feedback saved, summary queued")
         else:
             print("❌ Failed to save feedback")
             
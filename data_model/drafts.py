@@ -0,0 +1,156 @@
+"""
+Debounced, coalesced draft persistence for multi-step forms.
+
+Each section submit hands its answers to DraftSaver.update(). Only fields
+whose value differs from the last persisted draft are queued; repeated
+updates for the same user are merged, and one write per user is issued
+once no new changes have arrived for `debounce_seconds`. The writer
+receives both the changed fields and the full merged draft, so backends
+that can merge server-side only need to send the changes.
+"""
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+DraftWriter = Callable[[str, Dict[str, Any], Dict[str, Any], Hashable], bool]
+
+
+class DraftSaver:
+    """Per-user debounce timers over a coalescing buffer of changed fields."""
+
+    def __init__(self, writer: DraftWriter, debounce_seconds: float = 2.0,
+                 context_provider: Optional[Callable[[], Hashable]] = None):
+        """
+        Args:
+            writer: Callable(user_id, changes, draft, context) persisting a draft; falsy on failure
+            debounce_seconds: Quiet period before pending changes are written
+            context_provider: Callable returning the caller's context (e.g. access token)
+                at update time; passed to the writer from the timer thread
+        """
+        self._writer = writer
+        self.debounce_seconds = debounce_seconds
+        self._context_provider = context_provider
+        self._lock = threading.Lock()
+        self._persisted: Dict[str, Dict[str, Any]] = {}
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._contexts: Dict[str, Hashable] = {}
+        self._timers: Dict[str, threading.Timer] = {}
+        self._metrics = {
+            'updates': 0,
+            'fields_changed': 0,
+            'fields_unchanged': 0,
+            'writes': 0,
+            'fields_written': 0,
+            'failed_writes': 0,
+        }
+
+    def prime(self, user_id: str, draft: Optional[Dict[str, Any]]) -> None:
+        """Record the draft already stored for `user_id` (e.g. loaded on resume)."""
+        with self._lock:
+            self._persisted[user_id] = dict(draft or {})
+
+    def update(self, user_id: str, fields: Dict[str, Any]) -> int:
+        """
+        Queue the fields that changed since the last persisted draft.
+
+        Args:
+            user_id: Owner of the draft
+            fields: Current values of the submitted section
+
+        Returns:
+            int: Number of changed fields queued
+        """
+        context = self._context_provider() if self._context_provider else None
+        with self._lock:
+            persisted = self._persisted.get(user_id, {})
+            pending = self._pending.setdefault(user_id, {})
+            changed = {
+                key: value for key, value in fields.items()
+                if pending.get(key, persisted.get(key)) != value
+            }
+            self._metrics['updates'] += 1
+            self._metrics['fields_changed'] += len(changed)
+            self._metrics['fields_unchanged'] += len(fields) - len(changed)
+            if not changed:
+                if not pending:
+                    del self._pending[user_id]
+                return 0
+
+            pending.update(changed)
+            self._contexts[user_id] = context
+            self._restart_timer(user_id)
+        return len(changed)
+
+    def flush(self, user_id: Optional[str] = None) -> None:
+        """Write pending changes now (for one user, or all users)."""
+        with self._lock:
+            user_ids = [user_id] if user_id is not None else list(self._pending)
+        for pending_user in user_ids:
+            self._write(pending_user)
+
+    def discard(self, user_id: str) -> None:
+        """Drop pending changes and the cached draft (e.g. after final submission)."""
+        with self._lock:
+            timer = self._timers.pop(user_id, None)
+            if timer is not None:
+                timer.cancel()
+            self._pending.pop(user_id, None)
+            self._contexts.pop(user_id, None)
+            self._persisted.pop(user_id, None)
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Snapshot of update/write counters.
+
+        Returns:
+            dict: Counters plus the number of users with pending changes
+        """
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot['users_pending'] = len(self._pending)
+        return snapshot
+
+    def _restart_timer(self, user_id: str) -> None:
+        timer = self._timers.pop(user_id, None)
+        if timer is not None:
+            timer.cancel()
+        timer = threading.Timer(self.debounce_seconds, self._write, args=(user_id,))
+        timer.daemon = True
+        self._timers[user_id] = timer
+        timer.start()
+
+    def _write(self, user_id: str) -> None:
+        with self._lock:
+            timer = self._timers.pop(user_id, None)
+            if timer is not None:
+                timer.cancel()
+            changes = self._pending.pop(user_id, None)
+            context = self._contexts.pop(user_id, None)
+            if not changes:
+                return
+            draft = dict(self._persisted.get(user_id, {}))
+            draft.update(changes)
+
+        try:
+            saved = self._writer(user_id, changes, draft, context)
+        except Exception as e:
+            logger.error(f"Draft write for {user_id} failed: {str(e)}")
+            saved = False
+
+        with self._lock:
+            if saved:
+                self._persisted[user_id] = draft
+                self._metrics['writes'] += 1
+                self._metrics['fields_written'] += len(changes)
+            else:
+                # Keep the changes so the next update or flush retries them
+                newer = self._pending.get(user_id, {})
+                self._pending[user_id] = {**changes, **newer}
+                self._contexts.setdefault(user_id, context)
+                self._metrics['failed_writes'] += 1
+
+    def close(self) -> None:
+        """Write everything still pending."""
+        self.flush()
@@ -0,0 +1,20 @@
+-- Onboarding drafts: answers saved section by section so a reload resumes
+-- where the user left off. Written by data_model.database.queue_onboarding_draft.
+
+alter table public.user_profiles
+    add column if not exists onboarding_draft jsonb,
+    add column if not exists draft_updated_at timestamptz;
+
+-- Merge only the changed fields into the stored draft (one round-trip,
+-- creating the profile row if needed). Runs as the caller so RLS applies.
+create or replace function public.merge_onboarding_draft(p_user_id uuid, p_changes jsonb)
+returns void
+language sql
+security invoker
+as $$
+    insert into public.user_profiles (user_id, onboarding_draft, draft_updated_at)
+    values (p_user_id, p_changes, now())
+    on conflict (user_id) do update
+        set onboarding_draft = coalesce(public.user_profiles.onboarding_draft, '{}'::jsonb) || excluded.onboarding_draft,
+            draft_updated_at = now();
+$$;
@@ -0,0 +1,16 @@
+-- Single-flight leases for agent workflows (see agent/single_flight.py).
+-- A workflow run holds a lease by owning the only *active* agent_sessions
+-- row for its flight key; concurrent runs in other processes fail the
+-- unique index and wait for that row's final_output instead.
+
+alter table public.agent_sessions
+    add column if not exists flight_key text,
+    add column if not exists lease_expires_at timestamptz;
+
+create unique index if not exists agent_sessions_active_flight_key
+    on public.agent_sessions (flight_key)
+    where status = 'active' and flight_key is not null;
+
+create index if not exists agent_sessions_flight_key_created
+    on public.agent_sessions (flight_key, created_at desc)
+    where flight_key is not null;
@@ -0,0 +1,36 @@
+-- Tier-2 feedback memory as its own append-only table. Feedback used to be
+-- stored inside weekly_plans.suggestions, so every save rewrote the plan
+-- document and every history lookup pulled and filtered those documents.
+-- Written by data_model.database.save_feedback_and_process; the summary is
+-- filled in by a background job.
+
+create table if not exists public.user_feedback (
+    id uuid primary key default gen_random_uuid(),
+    user_id uuid not null references public.users(id) on delete cascade,
+    week_of date not null,
+    raw_feedback text not null,
+    feedback_summary text,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists user_feedback_user_created
+    on public.user_feedback (user_id, created_at desc);
+
+create index if not exists user_feedback_user_week
+    on public.user_feedback (user_id, week_of, created_at desc);
+
+alter table public.user_feedback enable row level security;
+
+create policy "Users manage their own feedback" on public.user_feedback
+    for all using (auth.uid() = user_id) with check (auth.uid() = user_id);
+
+-- Backfill feedback saved in plan documents
+insert into public.user_feedback (user_id, week_of, raw_feedback, feedback_summary, created_at)
+select wp.user_id, wp.week_of, wp.suggestions->>'user_feedback', nullif(wp.suggestions->>'feedback_summary', ''), wp.created_at
+from public.weekly_plans wp
+where wp.week_of is not null
+  and coalesce(wp.suggestions->>'user_feedback', '') <> ''
+  and not exists (
+      select 1 from public.user_feedback f
+      where f.user_id = wp.user_id and f.week_of = wp.week_of and f.created_at = wp.created_at
+  );
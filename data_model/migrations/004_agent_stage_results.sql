@@ -0,0 +1,19 @@
+-- Latest profiler/analyst output per user, stored with the fingerprint of
+-- the inputs it was computed from (see agent/fingerprint.py). When a user
+-- restarts onboarding and resubmits unchanged answers, the stage is skipped
+-- and this output reused. Kept across restarts; removed with the user.
+
+create table if not exists public.agent_stage_results (
+    user_id uuid not null references public.users(id) on delete cascade,
+    stage text not null,
+    input_fingerprint text not null,
+    section_fingerprints jsonb,
+    output jsonb not null,
+    updated_at timestamptz not null default now(),
+    primary key (user_id, stage)
+);
+
+alter table public.agent_stage_results enable row level security;
+
+create policy "Users manage their own stage results" on public.agent_stage_results
+    for all using (auth.uid() = user_id) with check (auth.uid() = user_id);
@@ -0,0 +1,23 @@
+-- Incremental re-analysis: when only some footprint categories are
+-- recomputed, the changed top-level fields are merged into the stored
+-- complete profile instead of rewriting it. Written by
+-- data_model.data_merge_json.patch_complete_profile. Category estimates
+-- are cached in agent_stage_results as 'analyst.<category>' rows.
+
+-- Returns false when the user has no complete profile yet, so the caller
+-- can fall back to a full merge. Runs as the caller so RLS applies.
+create or replace function public.patch_complete_profile(p_user_id uuid, p_changes jsonb)
+returns boolean
+language sql
+security invoker
+as $$
+    with patched as (
+        update public.users
+            set complete_profile_w_scores = complete_profile_w_scores || p_changes,
+                last_active_at = now()
+            where id = p_user_id
+              and complete_profile_w_scores is not null
+            returning id
+    )
+    select exists (select 1 from patched);
+$$;
@@ -0,0 +1,79 @@
+"""
+Response payload instrumentation for database reads.
+
+Each instrumented query records the number of rows and the serialized size
+of its response under a label (e.g. "get_agent_results.user_scores"), and
+logs it at DEBUG level. Use get_query_payload_stats() to see which reads
+move the most bytes.
+"""
+import json
+import logging
+import threading
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+def payload_size(data: Any) -> int:
+    """Approximate wire size of a PostgREST response body in bytes."""
+    if data is None:
+        return 0
+    return len(json.dumps(data, default=str, separators=(',', ':')).encode('utf-8'))
+
+
+def record_payload_bytes(label: str, payload_bytes: int, rows: int) -> None:
+    """
+    Record one response for `label`.
+
+    Args:
+        label: Query label, usually "<function>.<table>"
+        payload_bytes: Response body size in bytes
+        rows: Number of rows returned
+    """
+    with _lock:
+        stats = _stats.setdefault(label, {'calls': 0, 'rows': 0, 'total_bytes': 0, 'max_bytes': 0})
+        stats['calls'] += 1
+        stats['rows'] += rows
+        stats['total_bytes'] += payload_bytes
+        stats['max_bytes'] = max(stats['max_bytes'], payload_bytes)
+    logger.debug(f"Query {label}: {rows} rows, {payload_bytes} bytes")
+
+
+def record_query(label: str, response):
+    """
+    Record the payload of an executed Supabase query and return the response unchanged.
+
+    Args:
+        label: Query label, usually "<function>.<table>"
+        response: Result of `.execute()`
+
+    Returns:
+        The same response object
+    """
+    data = getattr(response, 'data', None)
+    rows = len(data) if isinstance(data, list) else (1 if data else 0)
+    record_payload_bytes(label, payload_size(data), rows)
+    return response
+
+
+def get_query_payload_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Snapshot of payload stats per query label, largest total first.
+
+    Returns:
+        dict: label -> calls, rows, total_bytes, max_bytes, avg_bytes
+    """
+    with _lock:
+        snapshot = {label: dict(stats) for label, stats in _stats.items()}
+    for stats in snapshot.values():
+        stats['avg_bytes'] = stats['total_bytes'] // stats['calls'] if stats['calls'] else 0
+    return dict(sorted(snapshot.items(), key=lambda item: item[1]['total_bytes'], reverse=True))
+
+
+def reset_query_payload_stats() -> None:
+    """Clear all recorded stats."""
+    with _lock:
+        _stats.clear()
@@ -0,0 +1,612 @@
+"""
+Embedded SQLite implementation of the storage backend.
+
+Implements the subset of the Supabase/PostgREST query builder used by the
+data layer (select with explicit columns and count, eq/neq/gt/gte/lt/lte,
+is_, in_, like, not_, or_, order, limit, range, insert, upsert, update,
+delete) on top of a local SQLite file, so database.py runs unchanged
+without a Supabase project. JSON columns are stored as TEXT and decoded on
+read; booleans are stored as INTEGER.
+"""
+import json
+import re
+import sqlite3
+import threading
+import uuid
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    email TEXT UNIQUE,
+    first_name TEXT,
+    last_name TEXT,
+    age INTEGER,
+    country TEXT,
+    onboarding_status INTEGER DEFAULT 0,
+    complete_profile_w_scores TEXT,
+    last_active_at TEXT,
+    created_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS user_profiles (
+    user_id TEXT PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    onboarding_data TEXT,
+    onboarding_final TEXT,
+    onboarding_draft TEXT,
+    draft_updated_at TEXT,
+    created_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS user_scores (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    scores TEXT,
+    benchmarks TEXT,
+    agent_session_id TEXT,
+    calculated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_user_scores_user ON user_scores (user_id, calculated_at);
+
+CREATE TABLE IF NOT EXISTS weekly_plans (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    week_of TEXT,
+    suggestions TEXT,
+    agent_session_id TEXT,
+    user_feedback TEXT,
+    feedback_summary TEXT,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_weekly_plans_user_created ON weekly_plans (user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_weekly_plans_user_week ON weekly_plans (user_id, week_of);
+
+CREATE TABLE IF NOT EXISTS user_actions (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    action_id TEXT,
+    co2_saved REAL DEFAULT 0,
+    completed_at TEXT,
+    weekly_plan_id TEXT,
+    suggestion_id TEXT,
+    status TEXT,
+    notes TEXT,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_user_actions_user_created ON user_actions (user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_user_actions_user_completed ON user_actions (user_id, completed_at);
+CREATE INDEX IF NOT EXISTS idx_user_actions_plan ON user_actions (user_id, weekly_plan_id, status);
+
+CREATE TABLE IF NOT EXISTS agent_sessions (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    agent_type TEXT,
+    status TEXT,
+    initial_prompt TEXT,
+    final_output TEXT,
+    completed_at TEXT,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_agent_sessions_user ON agent_sessions (user_id, agent_type, created_at);
+
+CREATE TABLE IF NOT EXISTS agent_messages (
+    id TEXT PRIMARY KEY,
+    agent_session_id TEXT NOT NULL REFERENCES agent_sessions(id) ON DELETE CASCADE,
+    role TEXT,
+    content TEXT,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_agent_messages_session ON agent_messages (agent_session_id, created_at);
+
+CREATE TABLE IF NOT EXISTS user_feedback (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    week_of TEXT NOT NULL,
+    raw_feedback TEXT NOT NULL,
+    feedback_summary TEXT,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_user_feedback_user_created ON user_feedback (user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_user_feedback_user_week ON user_feedback (user_id, week_of, created_at);
+
+CREATE TABLE IF NOT EXISTS agent_stage_results (
+    user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    stage TEXT NOT NULL,
+    input_fingerprint TEXT NOT NULL,
+    section_fingerprints TEXT,
+    output TEXT NOT NULL,
+    updated_at TEXT,
+    PRIMARY KEY (user_id, stage)
+);
+"""
+
+# Columns added after the initial schema (see data_model/migrations); added
+# to existing database files on open
+ADDED_COLUMNS = (
+    ('user_profiles', 'onboarding_draft', 'TEXT'),
+    ('user_profiles', 'draft_updated_at', 'TEXT'),
+    ('agent_sessions', 'flight_key', 'TEXT'),
+    ('agent_sessions', 'lease_expires_at', 'TEXT'),
+)
+
+# Indexes on added columns, created once the columns exist
+ADDED_INDEXES = """
+CREATE UNIQUE INDEX IF NOT EXISTS idx_agent_sessions_active_flight_key
+    ON agent_sessions (flight_key) WHERE status = 'active' AND flight_key IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_agent_sessions_flight_key
+    ON agent_sessions (flight_key, created_at) WHERE flight_key IS NOT NULL;
+"""
+
+# Data copied into tables added after the initial schema, run when the
+# table is created in an existing database file
+BACKFILLS = {
+    # Feedback used to live in weekly_plans.suggestions
+    'user_feedback': """
+        INSERT INTO user_feedback (id, user_id, week_of, raw_feedback, feedback_summary, created_at)
+        SELECT uuid4(), user_id, week_of, json_extract(suggestions, '$.user_feedback'),
+               nullif(json_extract(suggestions, '$.feedback_summary'), ''), created_at
+        FROM weekly_plans
+        WHERE week_of IS NOT NULL AND json_valid(suggestions)
+          AND coalesce(json_extract(suggestions, '$.user_feedback'), '') <> ''
+    """,
+}
+
+JSON_COLUMNS = {
+    'users': {'complete_profile_w_scores'},
+    'user_profiles': {'onboarding_data', 'onboarding_final', 'onboarding_draft'},
+    'user_scores': {'scores', 'benchmarks'},
+    'weekly_plans': {'suggestions'},
+    'agent_sessions': {'final_output'},
+    'agent_stage_results': {'section_fingerprints', 'output'},
+}
+
+BOOL_COLUMNS = {
+    'users': {'onboarding_status'},
+}
+
+# Columns filled with the current time when an insert leaves them out
+TIMESTAMP_DEFAULTS = {
+    'users': ('created_at',),
+    'user_profiles': ('created_at',),
+    'user_scores': ('calculated_at',),
+    'weekly_plans': ('created_at',),
+    'user_actions': ('completed_at', 'created_at'),
+    'agent_sessions': ('created_at',),
+    'agent_messages': ('created_at',),
+    'user_feedback': ('created_at',),
+    'agent_stage_results': ('updated_at',),
+}
+
+
+class StorageError(Exception):
+    """Raised for invalid queries against the SQLite backend."""
+    pass
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class SQLiteResponse:
+    """Mirrors the `data` / `count` attributes of a PostgREST response."""
+
+    def __init__(self, data: List[Dict[str, Any]], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class SQLiteBackend:
+    """Storage backend on an embedded SQLite database."""
+
+    name = 'sqlite'
+
+    def __init__(self, path: str = ':memory:'):
+        """
+        Args:
+            path: SQLite file path, or ':memory:' for a throwaway database
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA foreign_keys = ON')
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode = WAL')
+        existing = {row['name'] for row in self._conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self._conn.executescript(SCHEMA)
+        tables = [row['name'] for row in self._conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+        self._columns = {
+            table: [row['name'] for row in self._conn.execute(f'PRAGMA table_info("{table}")')]
+            for table in tables
+        }
+        for table, column, column_type in ADDED_COLUMNS:
+            if column not in self._columns[table]:
+                self._conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{column}" {column_type}')
+                self._columns[table].append(column)
+        self._conn.executescript(ADDED_INDEXES)
+        # A new file has nothing to backfill
+        if existing:
+            self._conn.create_function('uuid4', 0, lambda: str(uuid.uuid4()))
+            for table, backfill in BACKFILLS.items():
+                if table not in existing:
+                    self._conn.execute(backfill)
+            self._conn.commit()
+        self._primary_keys = {
+            table: [row['name'] for row in self._conn.execute(f'PRAGMA table_info("{table}")') if row['pk']]
+            for table in self._columns
+        }
+
+    def table(self, name: str) -> 'SQLiteQuery':
+        """Start a query on `name`."""
+        if name not in self._columns:
+            raise StorageError(f"Unknown table: {name}")
+        return SQLiteQuery(self, name)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ------------------------------------------------------------------
+    # Helpers used by SQLiteQuery
+    # ------------------------------------------------------------------
+
+    def columns(self, table: str) -> List[str]:
+        return self._columns[table]
+
+    def primary_key(self, table: str) -> List[str]:
+        return self._primary_keys[table]
+
+    def check_column(self, table: str, column: str) -> str:
+        if not _IDENTIFIER.match(column) or column not in self._columns[table]:
+            raise StorageError(f"Column '{column}' does not exist on table '{table}'")
+        return column
+
+    def encode(self, table: str, column: str, value: Any) -> Any:
+        """Convert a Python value to its stored representation."""
+        if column in JSON_COLUMNS.get(table, ()):
+            return None if value is None else json.dumps(value, default=str)
+        if value == 'now()':
+            return _now()
+        if isinstance(value, bool):
+            return int(value)
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, default=str)
+        return value
+
+    def decode(self, table: str, row: sqlite3.Row) -> Dict[str, Any]:
+        """Convert a stored row back to the shape PostgREST returns."""
+        result = dict(row)
+        for column in JSON_COLUMNS.get(table, ()):
+            if result.get(column) is not None:
+                result[column] = json.loads(result[column])
+        for column in BOOL_COLUMNS.get(table, ()):
+            if result.get(column) is not None:
+                result[column] = bool(result[column])
+        return result
+
+    def run(self, sql: str, params: Tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            rows = cursor.fetchall()
+            self._conn.commit()
+            return rows
+
+    def run_many(self, statements: List[Tuple[str, Tuple]]) -> None:
+        """Run several statements in one transaction."""
+        with self._lock:
+            try:
+                for sql, params in statements:
+                    self._conn.execute(sql, params)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+
+class _NotProxy:
+    """Supports `query.not_.is_(...)` by negating the next filter."""
+
+    def __init__(self, query: 'SQLiteQuery'):
+        self._query = query
+
+    def __getattr__(self, name):
+        method = getattr(self._query, name)
+
+        def negated(*args, **kwargs):
+            self._query._negate_next = True
+            return method(*args, **kwargs)
+        return negated
+
+
+class SQLiteQuery:
+    """Chainable query mirroring the PostgREST builder API."""
+
+    _OPERATORS = {'eq': '=', 'neq': '!=', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<=',
+                  'like': 'LIKE', 'ilike': 'LIKE'}
+
+    def __init__(self, backend: SQLiteBackend, table: str):
+        self._backend = backend
+        self._table = table
+        self._action = 'select'
+        self._columns: List[str] = backend.columns(table)
+        self._count: Optional[str] = None
+        self._payload: Any = None
+        self._on_conflict: Optional[str] = None
+        self._where: List[Tuple[str, List[Any]]] = []
+        self._order: List[str] = []
+        self._limit: Optional[int] = None
+        self._offset: Optional[int] = None
+        self._negate_next = False
+
+    # ------------------------------------------------------------------
+    # Actions
+    # ------------------------------------------------------------------
+
+    def select(self, columns: str = '*', count: Optional[str] = None) -> 'SQLiteQuery':
+        self._action = 'select'
+        self._count = count
+        if columns.strip() != '*':
+            self._columns = [self._backend.check_column(self._table, c.strip())
+                             for c in columns.split(',') if c.strip()]
+        return self
+
+    def insert(self, rows, **kwargs) -> 'SQLiteQuery':
+        self._action = 'insert'
+        self._payload = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows, on_conflict: Optional[str] = None, **kwargs) -> 'SQLiteQuery':
+        self._action = 'upsert'
+        self._payload = rows if isinstance(rows, list) else [rows]
+        self._on_conflict = on_conflict
+        return self
+
+    def update(self, values: Dict[str, Any], **kwargs) -> 'SQLiteQuery':
+        self._action = 'update'
+        self._payload = values
+        return self
+
+    def delete(self, **kwargs) -> 'SQLiteQuery':
+        self._action = 'delete'
+        return self
+
+    # ------------------------------------------------------------------
+    # Filters and modifiers
+    # ------------------------------------------------------------------
+
+    @property
+    def not_(self) -> _NotProxy:
+        return _NotProxy(self)
+
+    def eq(self, column: str, value: Any) -> 'SQLiteQuery':
+        return self._filter(column, 'eq', value)
+
+    def neq(self, column: str, value: Any) -> 'SQLiteQuery':
+        return self._filter(column, 'neq', value)
+
+    def gt(self, column: str, value: Any) -> 'SQLiteQuery':
+        return self._filter(column, 'gt', value)
+
+    def gte(self, column: str, value: Any) -> 'SQLiteQuery':
+        return self._filter(column, 'gte', value)
+
+    def lt(self, column: str, value: Any) -> 'SQLiteQuery':
+        return self._filter(column, 'lt', value)
+
+    def lte(self, column: str, value: Any) -> 'SQLiteQuery':
+        return self._filter(column, 'lte', value)
+
+    def like(self, column: str, pattern: str) -> 'SQLiteQuery':
+        return self._filter(column, 'like', pattern.replace('*', '%'))
+
+    def ilike(self, column: str, pattern: str) -> 'SQLiteQuery':
+        return self._filter(column, 'ilike', pattern.replace('*', '%'))
+
+    def is_(self, column: str, value: Any) -> 'SQLiteQuery':
+        return self._filter(column, 'is', value)
+
+    def in_(self, column: str, values) -> 'SQLiteQuery':
+        return self._filter(column, 'in', list(values))
+
+    def or_(self, filters: str) -> 'SQLiteQuery':
+        """PostgREST logical filter, e.g. "created_at.lt.X,and(created_at.eq.X,id.lt.Y)"."""
+        sql, params = self._logic('or', _split_logic(filters))
+        return self._add_where(sql, params)
+
+    def order(self, column: str, desc: bool = False, nullsfirst: bool = False) -> 'SQLiteQuery':
+        column = self._backend.check_column(self._table, column)
+        self._order.append(f'"{column}" {"DESC" if desc else "ASC"}')
+        return self
+
+    def limit(self, size: int) -> 'SQLiteQuery':
+        self._limit = int(size)
+        return self
+
+    def range(self, start: int, end: int) -> 'SQLiteQuery':
+        self._offset = int(start)
+        self._limit = int(end) - int(start) + 1
+        return self
+
+    # ------------------------------------------------------------------
+    # Execution
+    # ------------------------------------------------------------------
+
+    def execute(self) -> SQLiteResponse:
+        return getattr(self, f'_execute_{self._action}')()
+
+    def _execute_select(self) -> SQLiteResponse:
+        where, params = self._where_clause()
+        column_sql = ', '.join(f'"{c}"' for c in self._columns)
+        sql = f'SELECT {column_sql} FROM "{self._table}"{where}'
+        if self._order:
+            sql += ' ORDER BY ' + ', '.join(self._order)
+        if self._limit is not None:
+            sql += f' LIMIT {self._limit}'
+            if self._offset:
+                sql += f' OFFSET {self._offset}'
+        rows = [self._backend.decode(self._table, row) for row in self._backend.run(sql, tuple(params))]
+
+        count = None
+        if self._count:
+            count = self._backend.run(f'SELECT COUNT(*) FROM "{self._table}"{where}', tuple(params))[0][0]
+        return SQLiteResponse(rows, count)
+
+    def _execute_insert(self) -> SQLiteResponse:
+        return self._write_rows(upsert=False)
+
+    def _execute_upsert(self) -> SQLiteResponse:
+        return self._write_rows(upsert=True)
+
+    def _write_rows(self, upsert: bool) -> SQLiteResponse:
+        statements = []
+        keys = []
+        conflict = ([c.strip() for c in self._on_conflict.split(',')] if self._on_conflict
+                    else self._backend.primary_key(self._table))
+        for original in self._payload:
+            row = self._with_defaults(dict(original))
+            columns = [self._backend.check_column(self._table, c) for c in row]
+            values = tuple(self._backend.encode(self._table, c, row[c]) for c in columns)
+            column_sql = ', '.join(f'"{c}"' for c in columns)
+            placeholders = ', '.join('?' for _ in columns)
+            sql = f'INSERT INTO "{self._table}" ({column_sql}) VALUES ({placeholders})'
+            if upsert:
+                updates = ', '.join(f'"{c}" = excluded."{c}"' for c in columns if c not in conflict)
+                conflict_sql = ', '.join(f'"{c}"' for c in conflict)
+                sql += f' ON CONFLICT ({conflict_sql}) DO ' + (f'UPDATE SET {updates}' if updates else 'NOTHING')
+            statements.append((sql, values))
+            keys.append({c: row[c] for c in conflict if c in row})
+
+        try:
+            self._backend.run_many(statements)
+        except sqlite3.IntegrityError as e:
+            raise StorageError(str(e)) from e
+
+        # Return the stored representation, like PostgREST's return=representation
+        written = []
+        for key in keys:
+            if not key:
+                continue
+            where = ' AND '.join(f'"{c}" = ?' for c in key)
+            params = tuple(self._backend.encode(self._table, c, v) for c, v in key.items())
+            written.extend(self._backend.decode(self._table, row) for row in
+                           self._backend.run(f'SELECT * FROM "{self._table}" WHERE {where}', params))
+        return SQLiteResponse(written)
+
+    def _execute_update(self) -> SQLiteResponse:
+        where, params = self._where_clause()
+        rowids = [row[0] for row in self._backend.run(f'SELECT rowid FROM "{self._table}"{where}', tuple(params))]
+        if not rowids:
+            return SQLiteResponse([])
+
+        columns = [self._backend.check_column(self._table, c) for c in self._payload]
+        set_sql = ', '.join(f'"{c}" = ?' for c in columns)
+        values = [self._backend.encode(self._table, c, self._payload[c]) for c in columns]
+        id_sql = ', '.join('?' for _ in rowids)
+        self._backend.run(f'UPDATE "{self._table}" SET {set_sql} WHERE rowid IN ({id_sql})', tuple(values + rowids))
+
+        rows = self._backend.run(f'SELECT * FROM "{self._table}" WHERE rowid IN ({id_sql})', tuple(rowids))
+        return SQLiteResponse([self._backend.decode(self._table, row) for row in rows])
+
+    def _execute_delete(self) -> SQLiteResponse:
+        where, params = self._where_clause()
+        rows = self._backend.run(f'SELECT * FROM "{self._table}"{where}', tuple(params))
+        self._backend.run(f'DELETE FROM "{self._table}"{where}', tuple(params))
+        return SQLiteResponse([self._backend.decode(self._table, row) for row in rows])
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _with_defaults(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        columns = self._backend.columns(self._table)
+        if 'id' in columns and row.get('id') is None:
+            row['id'] = str(uuid.uuid4())
+        for column in TIMESTAMP_DEFAULTS.get(self._table, ()):
+            if row.get(column) is None:
+                row[column] = _now()
+        return row
+
+    def _filter(self, column: str, op: str, value: Any) -> 'SQLiteQuery':
+        sql, params = self._condition(column, op, value)
+        return self._add_where(sql, params)
+
+    def _add_where(self, sql: str, params: List[Any]) -> 'SQLiteQuery':
+        if self._negate_next:
+            sql = f'NOT ({sql})'
+            self._negate_next = False
+        self._where.append((sql, params))
+        return self
+
+    def _condition(self, column: str, op: str, value: Any) -> Tuple[str, List[Any]]:
+        column = self._backend.check_column(self._table, column)
+        if op == 'is':
+            if value is None or str(value).lower() == 'null':
+                return f'"{column}" IS NULL', []
+            return f'"{column}" = ?', [1 if str(value).lower() == 'true' else 0]
+        if op == 'in':
+            if not value:
+                return '0', []
+            placeholders = ', '.join('?' for _ in value)
+            return f'"{column}" IN ({placeholders})', [self._backend.encode(self._table, column, v) for v in value]
+        if op not in self._OPERATORS:
+            raise StorageError(f"Unsupported filter operator: {op}")
+        if value is None and op in ('eq', 'neq'):
+            return f'"{column}" IS {"NOT " if op == "neq" else ""}NULL', []
+        return f'"{column}" {self._OPERATORS[op]} ?', [self._backend.encode(self._table, column, value)]
+
+    def _logic(self, joiner: str, items: List[str]) -> Tuple[str, List[Any]]:
+        parts, params = [], []
+        for item in items:
+            negate = item.startswith('not.')
+            if negate:
+                item = item[4:]
+            match = re.match(r'^(and|or)\((.*)\)$', item)
+            if match:
+                sql, item_params = self._logic(match.group(1), _split_logic(match.group(2)))
+            else:
+                pieces = item.split('.', 2)
+                if len(pieces) != 3:
+                    raise StorageError(f"Invalid logical filter: {item}")
+                column, op, value = pieces
+                if op == 'in':
+                    value = [v.strip().strip('"') for v in value.strip('()').split(',')]
+                else:
+                    value = value.strip('"')
+                sql, item_params = self._condition(column, op, value)
+            parts.append(f'NOT ({sql})' if negate else f'({sql})')
+            params.extend(item_params)
+        return f' {joiner.upper()} '.join(parts), params
+
+    def _where_clause(self) -> Tuple[str, List[Any]]:
+        if not self._where:
+            return '', []
+        sql = ' WHERE ' + ' AND '.join(f'({clause})' for clause, _ in self._where)
+        params = [p for _, clause_params in self._where for p in clause_params]
+        return sql, params
+
+
+def _split_logic(expression: str) -> List[str]:
+    """Split a PostgREST logic expression on top-level commas, respecting parentheses and quotes."""
+    items, depth, quoted, current = [], 0, False, []
+    for char in expression:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and char == ',' and depth == 0:
+            items.append(''.join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    if current:
+        items.append(''.join(current).strip())
+    return [item for item in items if item]
@@ -0,0 +1,85 @@
+"""
+Storage backend selection for the data layer.
+
+database.py and data_merge_json.py talk to a repository that exposes the
+Supabase query-builder interface: `backend.table(name)` returns a builder
+supporting select/insert/upsert/update/delete, filters, order/limit and
+`.execute()` returning an object with `.data` (and `.count`). Two
+implementations exist:
+
+- "supabase" (default): the hosted Supabase project via supabase-py
+- "sqlite": an embedded SQLite file (see sqlite_backend.py) for offline
+  benchmarks, fast tests and single-node deployments
+
+The backend is chosen with the STORAGE_BACKEND setting; SQLITE_PATH sets
+the database file for the SQLite backend.
+"""
+import threading
+from typing import Any, Optional, Protocol
+
+from config.settings import get_settings
+
+SUPABASE = 'supabase'
+SQLITE = 'sqlite'
+
+
+class QueryResponse(Protocol):
+    data: Any
+    count: Optional[int]
+
+
+class StorageBackend(Protocol):
+    """Repository interface shared by the Supabase client and SQLiteBackend."""
+
+    def table(self, name: str) -> Any:
+        """Return a query builder for `name`."""
+        ...
+
+
+_backend_override: Optional[StorageBackend] = None
+_sqlite_backend = None
+_lock = threading.Lock()
+
+
+def get_storage_backend_name() -> str:
+    """Name of the active backend ("supabase" or "sqlite")."""
+    if _backend_override is not None:
+        return getattr(_backend_override, 'name', SUPABASE)
+    return get_settings().storage_backend
+
+
+def get_storage_backend() -> StorageBackend:
+    """
+    Return the configured storage backend.
+
+    Returns:
+        StorageBackend: The Supabase client or the shared SQLite backend
+    """
+    global _sqlite_backend
+
+    if _backend_override is not None:
+        return _backend_override
+
+    settings = get_settings()
+    if settings.storage_backend == SQLITE:
+        with _lock:
+            if _sqlite_backend is None:
+                from .sqlite_backend import SQLiteBackend
+                _sqlite_backend = SQLiteBackend(settings.sqlite_path)
+        return _sqlite_backend
+
+    # Signed-in sessions use their own pooled client so requests carry that user's token
+    from .client_pool import get_session_client
+    from .supabase_client import init_supabase
+    return get_session_client() or init_supabase()
+
+
+def set_storage_backend(backend: Optional[StorageBackend]) -> None:
+    """
+    Use `backend` for all data access (e.g. an in-memory SQLiteBackend in tests).
+
+    Args:
+        backend: Backend instance, or None to return to the configured backend
+    """
+    global _backend_override
+    _backend_override = backend
@@ -1,9 +1,12 @@
 """
 Improved Supabase client configuration with proper error handling and validation.
 """
+import importlib.util
 import logging
+import threading
 from typing import Optional
-from supabase import Client, create_client
+import httpx
+from supabase import Client, ClientOptions, create_client
 import streamlit as st
 from config.settings import get_settings
 
@@ -12,6 +15,12 @@ logger = logging.getLogger(__name__)
 # Global client instance
 _supabase_client: Optional[Client] = None
 
+# Connection pool shared by every per-session client
+_shared_transport: Optional[httpx.HTTPTransport] = None
+_transport_lock = threading.Lock()
+
+CLIENT_INFO_HEADERS = {"X-Client-Info": "ecoaction-ai-backend@1.0.0"}
+
 @st.cache_resource
 def init_supabase() -> Client:
     """
@@ -62,9 +71,7 @@ def init_supabase() -> Client:
                 "auto_refresh_token": True,
                 "persist_session": True,
                 "detect_session_in_url": True,
-                "headers": {
-                    "X-Client-Info": "ecoaction-ai-backend@1.0.0"
-                }
+                "headers": dict(CLIENT_INFO_HEADERS)
             }
         )
 
@@ -88,6 +95,112 @@ def get_supabase_client() -> Client:
         return init_supabase()
     return _supabase_client
 
+class _SharedTransport(httpx.BaseTransport):
+    """Hands a session's requests to the shared pool; closing a session client leaves the pool open."""
+
+    def __init__(self, transport: httpx.BaseTransport):
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        return self._transport.handle_request(request)
+
+    def close(self) -> None:
+        pass
+
+def get_shared_http_transport() -> httpx.HTTPTransport:
+    """
+    Return the transport whose connection pool all per-session clients share.
+
+    Returns:
+        httpx.HTTPTransport: Keep-alive transport (HTTP/2 when `h2` is installed)
+    """
+    global _shared_transport
+    if _shared_transport is None:
+        with _transport_lock:
+            if _shared_transport is None:
+                _shared_transport = httpx.HTTPTransport(
+                    http2=importlib.util.find_spec("h2") is not None,
+                    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+                )
+    return _shared_transport
+
+def create_session_http_client() -> httpx.Client:
+    """
+    Create a session's own httpx client on top of the shared connection pool.
+
+    supabase-py writes the session's base URL and Authorization header onto
+    the httpx client it is given, so each session needs its own client;
+    only the transport (the connections) is shared.
+
+    Returns:
+        httpx.Client: Client for one session
+    """
+    return httpx.Client(transport=_SharedTransport(get_shared_http_transport()), timeout=httpx.Timeout(10.0))
+
+def create_session_client(access_token: Optional[str] = None, refresh_token: Optional[str] = None) -> Client:
+    """
+    Create a client for a single browser session.
+    
+    Unlike init_supabase(), the client keeps its auth session in memory only
+    (persist_session=False), so sessions cannot clobber each other. Each
+    client gets its own httpx client, and with it its own headers, whose
+    connections come from the shared pool when the installed supabase-py
+    accepts a custom httpx client. Within one client that httpx client is
+    used for the table and auth APIs; storage and functions would rebind
+    its base URL, so this app does not use them on session clients.
+    
+    Args:
+        access_token: Restore this session's access token (None for a sign-in client)
+        refresh_token: Refresh token of the session being restored
+        
+    Returns:
+        Client: A new per-session Supabase client
+    """
+    settings = get_settings()
+    option_kwargs = {
+        "schema": "public",
+        "auto_refresh_token": True,
+        "persist_session": False,
+        "headers": dict(CLIENT_INFO_HEADERS),
+    }
+    try:
+        options = ClientOptions(httpx_client=create_session_http_client(), **option_kwargs)
+    except TypeError:
+        # Older supabase-py: each client keeps its own connection pool
+        options = ClientOptions(**option_kwargs)
+    
+    client = create_client(settings.supabase_url, settings.supabase_anon_key, options=options)
+    
+    if access_token:
+        if refresh_token:
+            try:
+                client.auth.set_session(access_token, refresh_token)
+            except Exception as e:
+                logger.warning(f"Could not restore auth session, using token for data access only: {str(e)}")
+        # Data requests carry the session's token even if the auth session was not restored
+        client.postgrest.auth(access_token)
+    
+    return client
+
+def create_service_client() -> Client:
+    """
+    Create a client acting with the service-role key, which bypasses RLS.
+
+    It keeps its own httpx client and connections rather than the shared
+    pool, and is never put in the session client pool.
+
+    Returns:
+        Client: A new service-role Supabase client
+    """
+    settings = get_settings()
+    options = ClientOptions(
+        schema="public",
+        auto_refresh_token=False,
+        persist_session=False,
+        headers=dict(CLIENT_INFO_HEADERS),
+    )
+    return create_client(settings.supabase_url, settings.supabase_service_role_key, options=options)
+
 def reset_supabase_client():
     """Reset the global client instance (useful for testing)."""
     global _supabase_client
@@ -0,0 +1,207 @@
+"""
+Local verification of Supabase access tokens.
+
+Access tokens are JWTs signed either with the project's shared JWT secret
+(HS256) or with an asymmetric key published at the project's JWKS endpoint.
+Verifying the signature and expiry locally lets get_current_user resolve
+the signed-in user without a round-trip to the auth server. Only HS256,
+RS256 and ES256 tokens are accepted. The JWKS document is fetched once and
+cached; an unknown key id triggers a refetch so key rotation is picked up,
+at most once per JWKS_REFRESH_SECONDS so forged key ids cannot turn every
+verification into a network call.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+import httpx
+from jose import ExpiredSignatureError, JWTError, jwt
+
+from config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+AUDIENCE = "authenticated"
+JWKS_CACHE_SECONDS = 3600
+JWKS_REFRESH_SECONDS = 60
+
+ALLOWED_ALGORITHMS = ('HS256', 'RS256', 'ES256')
+# JWK key type for each asymmetric algorithm
+KEY_TYPES = {'RS256': 'RSA', 'ES256': 'EC'}
+
+
+class TokenVerificationError(Exception):
+    """The token is malformed, has a bad signature or wrong audience."""
+    pass
+
+
+class TokenExpiredError(TokenVerificationError):
+    """The token signature is valid but it has expired."""
+    pass
+
+
+class SigningKeyUnavailable(TokenVerificationError):
+    """No local key is available to verify the token; fall back to the auth server."""
+    pass
+
+
+@dataclass
+class VerifiedUser:
+    """User resolved from verified token claims (mirrors the fields the pages use)."""
+    id: str
+    email: Optional[str] = None
+    role: Optional[str] = None
+    user_metadata: Dict[str, Any] = field(default_factory=dict)
+    app_metadata: Dict[str, Any] = field(default_factory=dict)
+    expires_at: Optional[int] = None
+    created_at: Optional[str] = None
+    last_sign_in_at: Optional[str] = None
+
+    @classmethod
+    def from_claims(cls, claims: Dict[str, Any]) -> 'VerifiedUser':
+        return cls(
+            id=claims['sub'],
+            email=claims.get('email'),
+            role=claims.get('role'),
+            user_metadata=claims.get('user_metadata') or {},
+            app_metadata=claims.get('app_metadata') or {},
+            expires_at=claims.get('exp'),
+        )
+
+
+class TokenVerifier:
+    """Verifies access tokens against a shared secret or a cached JWKS."""
+
+    def __init__(self, jwt_secret: Optional[str] = None, jwks_url: Optional[str] = None,
+                 api_key: Optional[str] = None, jwks_cache_seconds: int = JWKS_CACHE_SECONDS,
+                 jwks_refresh_seconds: int = JWKS_REFRESH_SECONDS, leeway: int = 10):
+        """
+        Args:
+            jwt_secret: Project JWT secret for HS256 tokens
+            jwks_url: JWKS endpoint for asymmetric signing keys
+            api_key: Anon key sent when fetching the JWKS
+            jwks_cache_seconds: How long a fetched JWKS is trusted
+            jwks_refresh_seconds: Minimum seconds between refetches forced by an unknown key id
+            leeway: Clock skew tolerance in seconds
+        """
+        self.jwt_secret = jwt_secret
+        self.jwks_url = jwks_url
+        self.api_key = api_key
+        self.jwks_cache_seconds = jwks_cache_seconds
+        self.jwks_refresh_seconds = jwks_refresh_seconds
+        self.leeway = leeway
+        self._jwks: Optional[Dict[str, Any]] = None
+        self._jwks_fetched_at = 0.0
+        self._forced_refresh_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """
+        Verify signature, audience and expiry of `token`.
+
+        Args:
+            token: Access token (JWT)
+
+        Returns:
+            dict: Verified claims
+
+        Raises:
+            TokenExpiredError: The token has expired
+            SigningKeyUnavailable: No key is available to check the signature
+            TokenVerificationError: The token is invalid
+        """
+        try:
+            header = jwt.get_unverified_header(token)
+        except JWTError as e:
+            raise TokenVerificationError(f"Malformed token: {str(e)}") from e
+
+        algorithm = header.get('alg')
+        if algorithm not in ALLOWED_ALGORITHMS:
+            raise TokenVerificationError(f"Unsupported signing algorithm: {algorithm}")
+        key = self._signing_key(algorithm, header.get('kid'))
+
+        try:
+            return jwt.decode(
+                token,
+                key,
+                algorithms=[algorithm],
+                audience=AUDIENCE,
+                options={'leeway': self.leeway},
+            )
+        except ExpiredSignatureError as e:
+            raise TokenExpiredError("Access token has expired") from e
+        except JWTError as e:
+            raise TokenVerificationError(f"Invalid token: {str(e)}") from e
+
+    def _signing_key(self, algorithm: str, kid: Optional[str]):
+        if algorithm == 'HS256':
+            if not self.jwt_secret:
+                raise SigningKeyUnavailable("SUPABASE_JWT_SECRET is not configured")
+            return self.jwt_secret
+
+        jwks = self._get_jwks()
+        key = self._find_jwk(jwks, algorithm, kid)
+        if key is None and self._claim_forced_refresh():
+            jwks = self._get_jwks(force=True)
+            key = self._find_jwk(jwks, algorithm, kid)
+        if key is not None:
+            return key
+        with self._lock:
+            # The JWKS was refetched within the last jwks_refresh_seconds
+            refetched = self._jwks is not None and self._jwks_fetched_at >= self._forced_refresh_at
+        if not refetched:
+            raise SigningKeyUnavailable(f"No current JWKS to check kid={kid}")
+        raise TokenVerificationError(f"No {algorithm} signing key found for kid={kid}")
+
+    @staticmethod
+    def _find_jwk(jwks: Optional[Dict[str, Any]], algorithm: str, kid: Optional[str]) -> Optional[Dict[str, Any]]:
+        for key in (jwks or {}).get('keys', []):
+            if key.get('kty') != KEY_TYPES[algorithm] or key.get('alg', algorithm) != algorithm:
+                continue
+            if kid is None or key.get('kid') == kid:
+                return key
+        return None
+
+    def _claim_forced_refresh(self) -> bool:
+        """Allow one forced JWKS refetch per jwks_refresh_seconds."""
+        with self._lock:
+            now = time.time()
+            if now - self._forced_refresh_at < self.jwks_refresh_seconds:
+                return False
+            self._forced_refresh_at = now
+            return True
+
+    def _get_jwks(self, force: bool = False) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            fresh = self._jwks is not None and time.time() - self._jwks_fetched_at < self.jwks_cache_seconds
+            if fresh and not force:
+                return self._jwks
+            if not self.jwks_url:
+                return None
+            try:
+                headers = {'apikey': self.api_key} if self.api_key else {}
+                response = httpx.get(self.jwks_url, headers=headers, timeout=5.0)
+                response.raise_for_status()
+                self._jwks = response.json()
+                self._jwks_fetched_at = time.time()
+            except Exception as e:
+                logger.warning(f"Could not fetch JWKS from {self.jwks_url}: {str(e)}")
+            return self._jwks
+
+
+_verifier: Optional[TokenVerifier] = None
+
+
+def get_token_verifier() -> TokenVerifier:
+    """Return the process-wide verifier configured from settings."""
+    global _verifier
+    if _verifier is None:
+        settings = get_settings()
+        _verifier = TokenVerifier(
+            jwt_secret=settings.supabase_jwt_secret,
+            jwks_url=f"{settings.supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json",
+            api_key=settings.supabase_anon_key,
+        )
+    return _verifier
@@ -0,0 +1,419 @@
+"""
+Write-behind buffer for append-only logging writes.
+
+Rows for logging tables (user_actions, agent_messages) and agent_sessions
+status updates are queued in memory and written to the database from a
+background thread, in batches per table. Buffers are flushed when a table
+reaches the batch size, when the oldest queued write reaches the flush
+interval, on explicit flush() and at interpreter shutdown.
+
+A batch that fails is re-queued with a backoff deadline instead of being
+retried in place, so a flush never sleeps and readers that flush before
+reading are not held up by another row's retries. A batch that still
+fails after max_retries goes to a bounded dead-letter list (and the
+optional on_dead_letter callback) from which it can be re-queued.
+
+An optional context provider captures per-caller state at enqueue time
+(e.g. the session's access token) so that rows are written with the
+caller's credentials even though the flush happens on another thread.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+InsertWriter = Callable[[str, List[Dict[str, Any]]], None]
+UpdateWriter = Callable[[str, Dict[str, Any], Dict[str, Any]], None]
+
+
+class WriteBehindBuffer:
+    """Batches inserts and coalesces updates per table, writing them off the request path."""
+
+    def __init__(
+        self,
+        insert_writer: InsertWriter,
+        update_writer: UpdateWriter,
+        batch_size: int = 25,
+        flush_interval: float = 2.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        max_queue_size: int = 5000,
+        register_atexit: bool = True,
+        context_provider: Optional[Callable[[], Hashable]] = None,
+        on_dead_letter: Optional[Callable[[Dict[str, Any]], None]] = None,
+        max_dead_letters: int = 1000,
+    ):
+        """
+        Args:
+            insert_writer: Callable(table, rows) performing one batched insert
+            update_writer: Callable(table, match, values) performing one update
+            batch_size: Rows per table that trigger an immediate flush
+            flush_interval: Max seconds a queued write waits before flushing
+            max_retries: Retries per batch before the batch is dead-lettered
+            backoff_base: Initial retry delay in seconds (doubled per retry)
+            max_queue_size: Queue depth at which enqueuing flushes inline
+            register_atexit: Flush remaining writes at interpreter shutdown
+            context_provider: Callable returning the caller's context at enqueue
+                time; writes are grouped by it and writers receive it as `context=`
+            on_dead_letter: Called with each dead-lettered write (see dead_letters())
+            max_dead_letters: Dead-lettered writes kept before the oldest is discarded
+        """
+        self._insert_writer = insert_writer
+        self._update_writer = update_writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_queue_size = max_queue_size
+        self._context_provider = context_provider
+        self._on_dead_letter = on_dead_letter
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        # Keyed by (table, context); context is None without a provider
+        self._inserts: Dict[Tuple[str, Any], deque] = {}
+        # Updates are coalesced per (table, match, context) so repeated
+        # status changes to the same row cost a single write.
+        self._updates: Dict[Tuple[str, Tuple, Any], Dict[str, Any]] = {}
+        self._oldest_enqueued_at: Optional[float] = None
+        # Failed writes waiting out their backoff: inserts as
+        # (due, attempts, key, rows), updates keyed like _updates
+        self._insert_retries: List[Tuple[float, int, Tuple[str, Any], List[Dict[str, Any]]]] = []
+        self._update_retries: Dict[Tuple[str, Tuple, Any], Tuple[float, int, Dict[str, Any]]] = {}
+        self._dead_letters: deque = deque(maxlen=max_dead_letters)
+        self._closed = False
+
+        self._metrics = {
+            'rows_enqueued': 0,
+            'rows_written': 0,
+            'rows_dead_lettered': 0,
+            'updates_coalesced': 0,
+            'flushes': 0,
+            'retries': 0,
+            'max_queue_depth': 0,
+            'last_flush_latency_ms': 0.0,
+            'max_flush_latency_ms': 0.0,
+            'total_flush_latency_ms': 0.0,
+        }
+
+        self._thread = threading.Thread(target=self._run, name="write-behind-buffer", daemon=True)
+        self._thread.start()
+
+        if register_atexit:
+            atexit.register(self.close)
+
+    # ------------------------------------------------------------------
+    # Enqueueing
+    # ------------------------------------------------------------------
+
+    def enqueue_insert(self, table: str, row: Dict[str, Any]) -> None:
+        """Queue a row for a batched insert into `table`."""
+        key = (table, self._current_context())
+        with self._lock:
+            self._check_open()
+            self._inserts.setdefault(key, deque()).append(row)
+            self._after_enqueue()
+            table_full = len(self._inserts[key]) >= self.batch_size
+            saturated = self._depth() >= self.max_queue_size
+            if table_full:
+                self._wakeup.notify()
+
+        if saturated:
+            # The background thread is not keeping up; make the caller pay
+            # for the flush rather than growing the queue without bound.
+            self.flush()
+
+    def enqueue_update(self, table: str, match: Dict[str, Any], values: Dict[str, Any]) -> None:
+        """Queue an update of the rows in `table` matching `match` (equality filters)."""
+        key = (table, tuple(sorted(match.items())), self._current_context())
+        with self._lock:
+            self._check_open()
+            retry = self._update_retries.get(key)
+            if retry is not None:
+                # Keep the row's updates in order: merge into the write
+                # waiting out its backoff instead of overtaking it
+                retry[2].update(values)
+                self._metrics['rows_enqueued'] += 1
+                self._metrics['updates_coalesced'] += 1
+                return
+            pending = self._updates.get(key)
+            if pending is None:
+                self._updates[key] = dict(values)
+            else:
+                pending.update(values)
+                self._metrics['updates_coalesced'] += 1
+            self._after_enqueue()
+            saturated = self._depth() >= self.max_queue_size
+
+        if saturated:
+            self.flush()
+
+    # ------------------------------------------------------------------
+    # Flushing
+    # ------------------------------------------------------------------
+
+    def flush(self) -> None:
+        """
+        Write every queued row now, blocking until done.
+
+        Each batch gets one attempt. Failed batches are re-queued and
+        retried by a later flush once their backoff has elapsed; batches
+        still waiting out a backoff are skipped.
+        """
+        with self._flush_lock:
+            now = time.monotonic()
+            with self._lock:
+                inserts = []
+                for key, rows in self._inserts.items():
+                    rows = list(rows)
+                    for start in range(0, len(rows), self.batch_size):
+                        inserts.append((0, key, rows[start:start + self.batch_size]))
+                updates = [(0, key, values) for key, values in self._updates.items()]
+                self._inserts.clear()
+                self._updates.clear()
+                self._oldest_enqueued_at = None
+
+                waiting = []
+                for due, attempts, key, rows in self._insert_retries:
+                    if due <= now:
+                        inserts.append((attempts, key, rows))
+                    else:
+                        waiting.append((due, attempts, key, rows))
+                self._insert_retries = waiting
+                for key, (due, attempts, values) in list(self._update_retries.items()):
+                    if due <= now:
+                        updates.append((attempts, key, values))
+                        del self._update_retries[key]
+
+            if not inserts and not updates:
+                return
+
+            started = time.perf_counter()
+
+            for attempts, key, rows in inserts:
+                table, context = key
+                try:
+                    self._call_writer(self._insert_writer, context, table, rows)
+                except Exception as e:
+                    self._insert_failed(key, rows, attempts, e)
+                else:
+                    with self._lock:
+                        self._metrics['rows_written'] += len(rows)
+
+            for attempts, key, values in updates:
+                table, match_items, context = key
+                try:
+                    self._call_writer(self._update_writer, context, table, dict(match_items), values)
+                except Exception as e:
+                    self._update_failed(key, values, attempts, e)
+                else:
+                    with self._lock:
+                        self._metrics['rows_written'] += 1
+
+            latency_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._metrics['flushes'] += 1
+                self._metrics['last_flush_latency_ms'] = latency_ms
+                self._metrics['total_flush_latency_ms'] += latency_ms
+                self._metrics['max_flush_latency_ms'] = max(self._metrics['max_flush_latency_ms'], latency_ms)
+
+    def close(self) -> None:
+        """Stop the background thread and flush whatever is still queued, retries included."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wakeup.notify()
+        self._thread.join(timeout=self.flush_interval + 1)
+        while True:
+            self.flush()
+            with self._lock:
+                delay = self._next_retry_delay()
+            if delay is None:
+                return
+            # Not holding any lock: this is the only caller left
+            time.sleep(delay)
+
+    def dead_letters(self) -> List[Dict[str, Any]]:
+        """
+        Writes that failed max_retries times, oldest first.
+
+        Returns:
+            list: Dicts with kind ('insert' or 'update'), table, rows or
+            match and values, context, attempts, error and failed_at (epoch seconds)
+        """
+        with self._lock:
+            return list(self._dead_letters)
+
+    def requeue_dead_letters(self) -> int:
+        """
+        Queue every dead-lettered write again with a fresh retry allowance.
+
+        Returns:
+            int: Number of writes re-queued
+        """
+        with self._lock:
+            self._check_open()
+            letters = list(self._dead_letters)
+            self._dead_letters.clear()
+            for letter in letters:
+                if letter['kind'] == 'insert':
+                    self._insert_retries.append((0.0, 0, (letter['table'], letter['context']), letter['rows']))
+                else:
+                    key = (letter['table'], tuple(sorted(letter['match'].items())), letter['context'])
+                    self._requeue_update(key, letter['values'], 0, 0.0)
+            self._wakeup.notify()
+        return len(letters)
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Snapshot of queue-depth and flush-latency metrics.
+
+        Returns:
+            dict: Counters plus current queue depth (total and per table)
+        """
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot['queue_depth'] = self._depth()
+            depth_by_table = {}
+            for (table, _), rows in self._inserts.items():
+                if rows:
+                    depth_by_table[table] = depth_by_table.get(table, 0) + len(rows)
+            for table, _, _ in self._updates:
+                depth_by_table[table] = depth_by_table.get(table, 0) + 1
+            snapshot['queue_depth_by_table'] = depth_by_table
+            snapshot['retry_queue_depth'] = (sum(len(rows) for _, _, _, rows in self._insert_retries)
+                                             + len(self._update_retries))
+            snapshot['dead_letter_depth'] = len(self._dead_letters)
+
+        flushes = snapshot['flushes']
+        snapshot['avg_flush_latency_ms'] = snapshot['total_flush_latency_ms'] / flushes if flushes else 0.0
+        return snapshot
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _check_open(self) -> None:
+        if self._closed:
+            raise RuntimeError("Write-behind buffer is closed")
+
+    def _current_context(self) -> Hashable:
+        if self._context_provider is None:
+            return None
+        try:
+            return self._context_provider()
+        except Exception:
+            return None
+
+    def _call_writer(self, writer: Callable, context: Hashable, *args) -> None:
+        if self._context_provider is None:
+            writer(*args)
+        else:
+            writer(*args, context=context)
+
+    def _depth(self) -> int:
+        return sum(len(rows) for rows in self._inserts.values()) + len(self._updates)
+
+    def _after_enqueue(self) -> None:
+        self._metrics['rows_enqueued'] += 1
+        self._metrics['max_queue_depth'] = max(self._metrics['max_queue_depth'], self._depth())
+        if self._oldest_enqueued_at is None:
+            self._oldest_enqueued_at = time.monotonic()
+            # Wake the flusher so it starts timing the new oldest write
+            self._wakeup.notify()
+
+    def _flush_due(self) -> bool:
+        if any(len(rows) >= self.batch_size for rows in self._inserts.values()):
+            return True
+        delay = self._next_retry_delay()
+        if delay is not None and delay <= 0:
+            return True
+        if self._oldest_enqueued_at is None:
+            return False
+        return time.monotonic() - self._oldest_enqueued_at >= self.flush_interval
+
+    def _next_retry_delay(self) -> Optional[float]:
+        dues = [due for due, _, _, _ in self._insert_retries]
+        dues.extend(due for due, _, _ in self._update_retries.values())
+        if not dues:
+            return None
+        return max(0.0, min(dues) - time.monotonic())
+
+    def _backoff(self, attempts: int) -> float:
+        return self.backoff_base * (2 ** (attempts - 1))
+
+    def _insert_failed(self, key: Tuple[str, Any], rows: List[Dict[str, Any]], attempts: int, error: Exception) -> None:
+        attempts += 1
+        table, context = key
+        if attempts > self.max_retries:
+            self._dead_letter({'kind': 'insert', 'table': table, 'rows': rows, 'context': context},
+                              attempts, error, len(rows))
+            return
+        delay = self._backoff(attempts)
+        logger.warning(f"Retrying insert into {table} in {delay:.2f}s: {str(error)}")
+        with self._lock:
+            self._metrics['retries'] += 1
+            self._insert_retries.append((time.monotonic() + delay, attempts, key, rows))
+            self._wakeup.notify()
+
+    def _update_failed(self, key: Tuple[str, Tuple, Any], values: Dict[str, Any], attempts: int,
+                       error: Exception) -> None:
+        attempts += 1
+        table, match_items, context = key
+        if attempts > self.max_retries:
+            self._dead_letter({'kind': 'update', 'table': table, 'match': dict(match_items), 'values': values,
+                               'context': context}, attempts, error, 1)
+            return
+        delay = self._backoff(attempts)
+        logger.warning(f"Retrying update of {table} in {delay:.2f}s: {str(error)}")
+        with self._lock:
+            # Updates queued since this one was taken are newer: fold them
+            # in so they are not written before the retry overwrites them
+            newer = self._updates.pop(key, None)
+            if newer is not None:
+                values = {**values, **newer}
+            self._metrics['retries'] += 1
+            self._requeue_update(key, values, attempts, time.monotonic() + delay)
+            self._wakeup.notify()
+
+    def _requeue_update(self, key: Tuple[str, Tuple, Any], values: Dict[str, Any], attempts: int,
+                        due: float) -> None:
+        retry = self._update_retries.get(key)
+        if retry is not None:
+            values = {**values, **retry[2]}
+        self._update_retries[key] = (due, attempts, values)
+
+    def _dead_letter(self, letter: Dict[str, Any], attempts: int, error: Exception, rows: int) -> None:
+        letter.update({'attempts': attempts, 'error': str(error), 'failed_at': time.time()})
+        logger.error(f"Dead-lettering {letter['kind']} of {letter['table']} after {attempts} attempts: {str(error)}")
+        with self._lock:
+            self._metrics['rows_dead_lettered'] += rows
+            self._dead_letters.append(letter)
+        if self._on_dead_letter is not None:
+            try:
+                self._on_dead_letter(letter)
+            except Exception as e:
+                logger.error(f"Dead-letter callback failed: {str(e)}")
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while not self._closed and not self._flush_due():
+                    timeouts = [self._next_retry_delay()]
+                    if self._oldest_enqueued_at is not None:
+                        timeouts.append(max(0.0, self.flush_interval - (time.monotonic() - self._oldest_enqueued_at)))
+                    timeouts = [timeout for timeout in timeouts if timeout is not None]
+                    self._wakeup.wait(min(timeouts) if timeouts else None)
+                if self._closed:
+                    return
+
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind flush failed: {str(e)}")
@@ -9,9 +9,15 @@ import json
 # Add the parent directory to the path so we can import from utils
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from agent.category_analysis import AGGREGATED_FIELDS, CATEGORY_STAGES, UNITS_BY_NAME, cache_entries, dirty_categories
+from agent.fingerprint import changed_sections, fingerprint, profiler_fingerprint, section_fingerprints
+from agent.speculative import apply_late_sections, get_speculative_runner
+from config.settings import get_settings
+from ui.progress import run_with_progress
 from data_model.auth import get_current_user, get_user_profile
 from data_model.database import (
     check_onboarding_status,
+    notify_scores_saved,
     update_onboarding_status,
     save_onboarding_data,
     get_user_onboarding_data,
@@ -22,42 +28,91 @@ from data_model.database import (
     get_agent_results,
     get_supabase,
     save_profiler_results,
-    get_profiler_results
+    get_profiler_results,
+    get_onboarding_draft,
+    queue_onboarding_draft,
+    clear_onboarding_draft,
+    get_stage_result,
+    get_stage_results,
+    save_stage_result,
+    save_stage_results
 )
 
 # ======================================================================================
 
+def parse_profiler_output(results):
+    """Extract the enriched profile dict from the profiler crew output"""
+    if hasattr(results, 'json') and results.json:
+        # If results.json is a string, parse it
+        if isinstance(results.json, str):
+            return json.loads(results.json)
+        return results.json
+    if hasattr(results, 'raw'):
+        return json.loads(results.raw)
+    return results
+
+def profile_user_data(user_data: dict, progress=None):
+    """Run the profiler workflow and return the parsed profile (safe to call off the script thread)"""
+    from agent.crew import run_profiler_workflow
+    
+    results = run_profiler_workflow(user_data, progress=progress)
+    if not results:
+        raise ValueError("Profiler agent returned no results")
+    return parse_profiler_output(results)
+
+def start_speculative_profiler(user_id: str, user_data: dict):
+    """Start (or keep) a background profiler run on the answers given so far"""
+    if not get_settings().speculative_profiling:
+        return
+    get_speculative_runner().start(user_id, profiler_fingerprint(user_data), profile_user_data, user_data)
+
+def report_changed_sections(previous: dict, sections: dict):
+    """Tell the user which answer sections changed since the stored result was computed"""
+    changed = changed_sections(previous.get('section_fingerprints'), sections)
+    if changed:
+        labels = ", ".join(name.replace('_', ' ').title() for name in changed)
+        st.info(f"🔍 Changed since your last analysis: {labels}")
+    else:
+        st.info("🔍 No changes since your last analysis")
+
 def run_profiler_agent(user_id: str, user_data: dict):
     """Run Agent 1 (Profiler) to analyze data and generate enriched profile"""
     try:
-        from agent.crew import run_profiler_workflow
+        parsed_results = None
+        input_fingerprint = profiler_fingerprint(user_data)
+        sections = section_fingerprints(user_data)
         
-        # Run the profiler workflow
-        results = run_profiler_workflow(user_data)
+        # Reuse the stored profile if the answers it depends on are unchanged (e.g. after a restart)
+        previous = get_stage_result(user_id, "profiler")
+        if previous:
+            report_changed_sections(previous, sections)
+            if previous['input_fingerprint'] == input_fingerprint:
+                st.info("♻️ Your profile answers are unchanged, reusing your enriched profile")
+                parsed_results = apply_late_sections(previous['output'], user_data)
         
-        if results:
-            # Parse the results
-            if hasattr(results, 'json') and results.json:
-                # If results.json is a string, parse it
-                if isinstance(results.json, str):
-                    parsed_results = json.loads(results.json)
-                else:
-                    parsed_results = results.json
-            elif hasattr(results, 'raw'):
-                parsed_results = json.loads(results.raw)
-            else:
-                parsed_results = results
-            
-            # Save to database in onboarding_final column
-            save_success = save_profiler_results(user_id, parsed_results)
-            
-            if save_success:
-                return parsed_results
+        if get_settings().speculative_profiling:
+            if parsed_results is not None:
+                # The speculative run for these answers is not needed
+                get_speculative_runner().cancel(user_id)
             else:
-                st.error("Failed to save profiler results")
-                return None
+                # Reuse the speculative run if its inputs are unchanged (waits if it's still running)
+                with st.spinner("🧠 Finishing your profile..."):
+                    speculative_results = get_speculative_runner().take(user_id, input_fingerprint)
+                if speculative_results:
+                    parsed_results = apply_late_sections(speculative_results, user_data)
+        
+        if parsed_results is None:
+            parsed_results = run_with_progress("🧠 AI is analyzing your profile...", "profiler",
+                                               profile_user_data, user_data)
+        
+        # Save to database in onboarding_final column
+        save_success = save_profiler_results(user_id, parsed_results)
+        
+        if save_success:
+            save_stage_result(user_id, "profiler", input_fingerprint, sections, parsed_results)
+            return parsed_results
         else:
-            st.error("Profiler agent returned no results")
+            st.error("Failed to save profiler results")
             return None
             
     except Exception as e:
@@ -111,7 +166,7 @@ def run_analyst_agent(user_id: str):
     """
     try:
         # Import agent workflows
-        from agent.crew import run_analyst_workflow
+        from agent.crew import run_analyst_workflow, run_category_analysis_workflow
         
         # Create agent session for this workflow
         agent_session_id = create_agent_session(user_id, "scoring", "Agent 2 (Analyst) workflow execution")
@@ -120,12 +175,37 @@ def run_analyst_agent(user_id: str):
             st.error("Failed to create agent session")
             return False
         
-        # Run the analyst workflow with user_id (it will get enriched profile internally)
-        results = run_analyst_workflow(user_id)
+        # The analyst only sees the enriched profile: reuse its stored output if that is unchanged
+        enriched_profile = get_profiler_results(user_id)
+        input_fingerprint = fingerprint(enriched_profile) if enriched_profile else None
+        previous = get_stage_result(user_id, "analyst") if enriched_profile else None
+        reused = previous is not None and previous['input_fingerprint'] == input_fingerprint
+        
+        # Otherwise recompute only the categories whose answers changed (None: full analysis)
+        user_data = get_user_onboarding_data(user_id) if previous and not reused else None
+        dirty = dirty_categories(get_stage_results(user_id, CATEGORY_STAGES), user_data) if user_data else None
+        incremental = dirty is not None
+        
+        if reused:
+            st.info("♻️ Your enriched profile is unchanged, reusing your carbon analysis")
+            results = previous['output']
+        elif incremental and not dirty:
+            st.info("♻️ None of your footprint answers changed, keeping your carbon footprint")
+            results = previous['output']
+        elif incremental:
+            labels = ", ".join(UNITS_BY_NAME[name].label for name in dirty)
+            results = run_with_progress(f"🤖 Updating your {labels} footprint...",
+                                        "analyst", run_category_analysis_workflow, user_id, dirty, previous['output'])
+        else:
+            # Run the analyst workflow with user_id (it will get enriched profile internally)
+            results = run_with_progress("🤖 Our AI is analyzing your carbon footprint... This may take a moment.",
+                                        "analyst", run_analyst_workflow, user_id)
         
         if results:
             # Parse the results
-            if hasattr(results, 'json') and results.json:
+            if reused or incremental:
+                parsed_results = results
+            elif hasattr(results, 'json') and results.json:
                 # If results.json is a string, parse it
                 if isinstance(results.json, str):
                     parsed_results = json.loads(results.json)
@@ -152,15 +232,27 @@ def run_analyst_agent(user_id: str):
             if save_success:
                 # Update agent session as completed
                 update_agent_session(agent_session_id, "completed", parsed_results)
+                if not reused and input_fingerprint:
+                    save_stage_result(user_id, "analyst", input_fingerprint,
+                                      section_fingerprints(enriched_profile), parsed_results)
+                if not reused:
+                    user_data = user_data or get_user_onboarding_data(user_id)
+                    if user_data:
+                        save_stage_results(user_id, cache_entries(user_data, parsed_results,
+                                                                  dirty if incremental else None))
                 
                 # ---------------------------------------------------------------------------
                 # 🔄 AUTOMATIC PROFILE MERGING - Trigger when Agent 2 completes successfully
                 # ---------------------------------------------------------------------------
                 try:
-                    from data_model.data_merge_json import merge_json
+                    from data_model.data_merge_json import merge_json, patch_json
                     
-                    # Call the complete workflow function that handles everything
-                    merge_success = merge_json(user_id)
+                    if incremental:
+                        # Only the aggregated fields changed: patch them into the stored profile
+                        merge_success = patch_json(user_id, parsed_results, AGGREGATED_FIELDS)
+                    else:
+                        # Call the complete workflow function that handles everything
+                        merge_success = merge_json(user_id)
                     
                     if merge_success:
                         st.success("🎉 Complete profile with scores saved successfully!")
@@ -277,6 +369,7 @@ if onboarding_completed:
                         
                         supabase.table('user_profiles').delete().eq('user_id', user.id).execute()
                         supabase.table('user_scores').delete().eq('user_id', user.id).execute()
+                        notify_scores_saved(user.id)
                         supabase.table('weekly_plans').delete().eq('user_id', user.id).execute()
                         supabase.table('agent_sessions').delete().eq('user_id', user.id).execute()
                         
@@ -300,8 +393,7 @@ if onboarding_completed:
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
         if st.button("🧮 Generate Carbon Footprint Score", use_container_width=True, type="primary"):
-            with st.spinner("🤖 Our AI is analyzing your carbon footprint... This may take a moment."):
-                agent_success = run_analyst_agent(user.id)
+            agent_success = run_analyst_agent(user.id)
                 
             if agent_success:
                 st.success("🎉 **Carbon analysis complete!** Your dashboard is ready with personalized recommendations.")
@@ -334,6 +426,8 @@ if onboarding_completed:
         - Weekly sustainability plans
         - All agent session data
         
+        Your last AI results are kept only so that unchanged answers don't have to be analyzed again.
+        
         **Click 'Restart Onboarding' again to confirm this action.**
         """)
         
@@ -402,217 +496,287 @@ form_keys = [
     "improvement_area", "additional_info"
 ]
 
-with st.form("onboarding_form"):
-    # Location & Climate
-    st.subheader("🌍 Location & Climate")
+# The questionnaire is split into sections, each its own st.form, so widget
+# changes don't rerun the script; answers are batched per section submit.
+# Answers live in ANSWERS_KEY (Streamlit drops the state of widgets that are
+# not rendered) and are autosaved as a draft so a reload resumes in place.
+ANSWERS_KEY = "onboarding_answers"
+STEP_KEY = "onboarding_step"
+
+def location_section():
     col1, col2 = st.columns(2)
     with col1:
-        country = st.text_input("Country", key="country")
-        city = st.text_input("City", key="city")        
+        st.text_input("Country", key="country")
+        st.text_input("City", key="city")        
     with col2:
-        climate = st.pills("Climate", 
+        st.pills("Climate", 
             ["Tropical", "Arid", "Temperate", "Continental", "Polar", "Mediterranean", "Subtropical", "Monsoon", "Savanna", "Tundra", "Highland"], 
             key="climate")
     
     st.info("💡 Please fill out at least 15 fields, in order to save profile and generate your Carbon !!")
 
-    # Household
-    st.subheader("🏠 Household Information")
+def household_section():
     col1, col2 = st.columns(2)
     with col1:
-        household_size = st.number_input("Number of people in the house", min_value=1, max_value=20, value=1, key="household_size")
-        home_type = st.pills("Type of Home", ["House", "Apartment", "Condo"], key="home_type", selection_mode="multi")
-        home_size = st.text_input("Approx Size of Home (square feet / m²)", key="home_size")
-        ownership = st.pills("Do you own or rent your home?", ["Own", "Rent"], key="ownership", selection_mode="multi")
+        st.number_input("Number of people in the house", min_value=1, max_value=20, key="household_size")
+        st.pills("Type of Home", ["House", "Apartment", "Condo"], key="home_type", selection_mode="multi")
+        st.text_input("Approx Size of Home (square feet / m²)", key="home_size")
+        st.pills("Do you own or rent your home?", ["Own", "Rent"], key="ownership", selection_mode="multi")
     with col2:
-        appliances = st.pills("Key Appliances & Devices", ["Refrigerator", "Washing Machine", "Microwave", "Oven", "Dishwasher", "Air Conditioner", "Heater", "Ceiling Fan", "Vacuum Cleaner", "Toaster", "Electric Kettle", "Blender", "Coffee Maker", "Juicer", "Rice Cooker", "Iron", "Hair Dryer", "Television", "Personal Computer", "Water Purifier", "Printer", "Space Heater", "Sewing Machine", "Speaker", "Lamp", "Gaming PC (1000 Watts)", "Old Refrigerator (>5 years), Old Washing Machine (>5 years)", "Geyser"], key="appliances", selection_mode="multi")
-        heating_source = st.pills("Primary Heating Source", ["Natural Gas", "Electricity", "Oil", "Other", "Solar", "Petrol", "Coal", "Kerosene"], key="heating_source", selection_mode="multi")
-        air_conditioning = st.pills("Use Air Conditioning?", ["Never", "Rarely", "Sometimes", "Often", "Always"], key="air_conditioning", selection_mode="single")
-        energy_conservation = st.pills("Do you make an effort to turn off lights and unplug devices when not in use?", ["Rarely", "Often", "All the time"], key="energy_conservation", selection_mode="single")
+        st.pills("Key Appliances & Devices", ["Refrigerator", "Washing Machine", "Microwave", "Oven", "Dishwasher", "Air Conditioner", "Heater", "Ceiling Fan", "Vacuum Cleaner", "Toaster", "Electric Kettle", "Blender", "Coffee Maker", "Juicer", "Rice Cooker", "Iron", "Hair Dryer", "Television", "Personal Computer", "Water Purifier", "Printer", "Space Heater", "Sewing Machine", "Speaker", "Lamp", "Gaming PC (1000 Watts)", "Old Refrigerator (>5 years), Old Washing Machine (>5 years)", "Geyser"], key="appliances", selection_mode="multi")
+        st.pills("Primary Heating Source", ["Natural Gas", "Electricity", "Oil", "Other", "Solar", "Petrol", "Coal", "Kerosene"], key="heating_source", selection_mode="multi")
+        st.pills("Use Air Conditioning?", ["Never", "Rarely", "Sometimes", "Often", "Always"], key="air_conditioning", selection_mode="single")
+        st.pills("Do you make an effort to turn off lights and unplug devices when not in use?", ["Rarely", "Often", "All the time"], key="energy_conservation", selection_mode="single")
 
-    # Transport
-    st.subheader("🚗 Transportation")
+def transport_section():
     col1, col2 = st.columns(2)
     with col1:
-        primary_transport = st.pills("Primary Mode of Transport", ["Personal Car", "Public Bus", "Public Train", 
-                                                                   "Public Ferry", "Walking", "Ride-sharing", "Bicycle",
-                                                                   "Electric Scooter", "Taxi Car", "Motorcycle", "Other low fuel options"], 
-                                                                   key="primary_transport", 
-                                                                   selection_mode="single")
-        other_transport = st.pills("Other Modes of Transport", ["Personal Car", "Public Bus", "Public Train", 
-                                                                   "Public Ferry", "Walking", "Ride-sharing", "Bicycle",
-                                                                   "Electric Scooter", "Taxi Car", "Motorcycle", "Other low fuel options"], 
-                                        key="other_transport", 
-                                        selection_mode="multi")
+        st.pills("Primary Mode of Transport", ["Personal Car", "Public Bus", "Public Train", 
+                                               "Public Ferry", "Walking", "Ride-sharing", "Bicycle",
+                                               "Electric Scooter", "Taxi Car", "Motorcycle", "Other low fuel options"], 
+                 key="primary_transport", 
+                 selection_mode="single")
+        st.pills("Other Modes of Transport", ["Personal Car", "Public Bus", "Public Train", 
+                                              "Public Ferry", "Walking", "Ride-sharing", "Bicycle",
+                                              "Electric Scooter", "Taxi Car", "Motorcycle", "Other low fuel options"], 
+                 key="other_transport", 
+                 selection_mode="multi")
         
-        car_type = st.pills("Type of Car", ["Sedan", "SUV", "Truck", "Coupe", "Hatchback"], 
-                            key="car_type", selection_mode="multi")
+        st.pills("Type of Car", ["Sedan", "SUV", "Truck", "Coupe", "Hatchback"], 
+                 key="car_type", selection_mode="multi")
         
-        vehicle_fuel = st.pills("Fuel in the vehicle you use", ["Electric", "Hybrid", "Petrol", "Diesel", "None"], 
-                                key="vehicle_fuel",
-                                selection_mode="multi")
+        st.pills("Fuel in the vehicle you use", ["Electric", "Hybrid", "Petrol", "Diesel", "None"], 
+                 key="vehicle_fuel",
+                 selection_mode="multi")
         
-        commute_distance = st.text_input("Daily commute distance (Total) in miles or km", 
-                                         key="commute_distance")
+        st.text_input("Daily commute distance (Total) in miles or km", 
+                      key="commute_distance")
     
     with col2:
-        rideshare_usage = st.pills("Use ride-sharing (Uber/Lyft) or taxis?", ["Never", "Occasionally", "Weekly", "Daily"], 
-                                   key="rideshare_usage", 
-                                   selection_mode="single")
-        public_transport_usage = st.pills("Use public transportation?", ["Never", "Occasionally", "Weekly", "Daily"], 
-                                          key="public_transport_usage", 
-                                          selection_mode="single")
-    
-    # Diet & Habits
-    st.subheader("🍽️ Diet & Food Habits")
+        st.pills("Use ride-sharing (Uber/Lyft) or taxis?", ["Never", "Occasionally", "Weekly", "Daily"], 
+                 key="rideshare_usage", 
+                 selection_mode="single")
+        st.pills("Use public transportation?", ["Never", "Occasionally", "Weekly", "Daily"], 
+                 key="public_transport_usage", 
+                 selection_mode="single")
+
+def diet_section():
     col1, col2 = st.columns(2)
     with col1:
-        diet_type = st.pills("Diet Type", ["Vegan", "Vegetarian", "Pescatarian", "Omnivore", "Non-Vegetarian", 
-                                           "Paleo", "Keto", "Low-Carb", "Low-Fat", "Mediterranean", "Dash", 
-                                           "Raw Food", "Gluten-Free", "Lactose-Free", "Diabetic", "High-Protein", 
-                                           "Low-Sodium", "Whole30", "Fruititarian", "Flexitarian", "Zone Diet", 
-                                           "South Beach", "Atkins", "Macros Diet"], 
-                                           key="diet_type", 
-                                           selection_mode="multi")
-        meat_frequency = st.pills("Meat consumption frequency", ["Never", "Once a Month", "A few times a week", "Once a day", "Multiple times a day"], 
-                                  key="meat_frequency", 
-                                  selection_mode="single")
+        st.pills("Diet Type", ["Vegan", "Vegetarian", "Pescatarian", "Omnivore", "Non-Vegetarian", 
+                               "Paleo", "Keto", "Low-Carb", "Low-Fat", "Mediterranean", "Dash", 
+                               "Raw Food", "Gluten-Free", "Lactose-Free", "Diabetic", "High-Protein", 
+                               "Low-Sodium", "Whole30", "Fruititarian", "Flexitarian", "Zone Diet", 
+                               "South Beach", "Atkins", "Macros Diet"], 
+                 key="diet_type", 
+                 selection_mode="multi")
+        st.pills("Meat consumption frequency", ["Never", "Once a Month", "A few times a week", "Once a day", "Multiple times a day"], 
+                 key="meat_frequency", 
+                 selection_mode="single")
     with col2:
-        food_waste = st.pills("Food waste habits", ["Rarely/Never", "Sometimes", "Often"], 
-                              key="food_waste", 
-                              selection_mode="single")
-        shopping_frequency = st.pills("Shopping Frequency", ["Daily", "A few times a week", "Weekly", "Less than weekly"], 
-                                       key="shopping_frequency", 
-                                       selection_mode="single")
-
-    # Consumption & Shopping
-    st.subheader("🛍️ Consumption & Shopping")
+        st.pills("Food waste habits", ["Rarely/Never", "Sometimes", "Often"], 
+                 key="food_waste", 
+                 selection_mode="single")
+        st.pills("Shopping Frequency", ["Daily", "A few times a week", "Weekly", "Less than weekly"], 
+                 key="shopping_frequency", 
+                 selection_mode="single")
+
+def consumption_section():
     col1, col2 = st.columns(2)
     with col1:
-        clothes_shopping = st.pills("New Clothes Shopping Frequency", 
-                                    ["Rarely", "Seasonally", "Monthly", "Weekly"], 
-                                    key="clothes_shopping", 
-                                    selection_mode="single")
-        new_vs_secondhand = st.pills("Preference for New vs. Second-hand", 
-                                     ["Primarily new", "A mix of both", "Primarily second-hand"], 
-                                     key="new_vs_secondhand", 
-                                     selection_mode="single")
-        eco_importance = st.pills("Importance of Eco-Friendly Products", 
-                                  ["Not important", "Somewhat important", "Very important"], 
-                                  key="eco_importance", selection_mode="single")
+        st.pills("New Clothes Shopping Frequency", 
+                 ["Rarely", "Seasonally", "Monthly", "Weekly"], 
+                 key="clothes_shopping", 
+                 selection_mode="single")
+        st.pills("Preference for New vs. Second-hand", 
+                 ["Primarily new", "A mix of both", "Primarily second-hand"], 
+                 key="new_vs_secondhand", 
+                 selection_mode="single")
+        st.pills("Importance of Eco-Friendly Products", 
+                 ["Not important", "Somewhat important", "Very important"], 
+                 key="eco_importance", selection_mode="single")
     with col2:
-        recycling_habits = st.pills("Recycling Habits", 
-                                    ["I don't recycle", "I recycle sometimes", "I recycle everything I can"], 
-                                    key="recycling_habits", selection_mode="single")
-        composting = st.pills("Do you compost food waste?", 
-                              ["Yes", "No", "I'd like to start"], 
-                              key="composting", selection_mode="single")
-        plastic_usage = st.pills("Single-Use Plastics Usage", 
-                                 ["Never", "Rarely", "Sometimes", "Often"], 
-                                 key="plastic_usage", selection_mode="single")
-    
-    # Travel & Lifestyle
-    st.subheader("✈️ Travel & Lifestyle")
+        st.pills("Recycling Habits", 
+                 ["I don't recycle", "I recycle sometimes", "I recycle everything I can"], 
+                 key="recycling_habits", selection_mode="single")
+        st.pills("Do you compost food waste?", 
+                 ["Yes", "No", "I'd like to start"], 
+                 key="composting", selection_mode="single")
+        st.pills("Single-Use Plastics Usage", 
+                 ["Never", "Rarely", "Sometimes", "Often"], 
+                 key="plastic_usage", selection_mode="single")
+
+def travel_section():
     col1, col2 = st.columns(2)
     with col1:        
-        flights_per_year = st.pills("Flights per year", 
-                                    ["0", "1-2 short-haul", "3+ short-haul", "1-2 long-haul", "3+ long-haul"], 
-                                    key="flights_per_year", selection_mode="single")
-        flight_reason = st.pills("Main reason for flights", 
-                                 ["Vacation", "Work", "Family", "Other reasons", "N/A"], 
-                                 key="flight_reason", selection_mode="multi")
+        st.pills("Flights per year", 
+                 ["0", "1-2 short-haul", "3+ short-haul", "1-2 long-haul", "3+ long-haul"], 
+                 key="flights_per_year", selection_mode="single")
+        st.pills("Main reason for flights", 
+                 ["Vacation", "Work", "Family", "Other reasons", "N/A"], 
+                 key="flight_reason", selection_mode="multi")
     with col2:
-        lifestyle = st.pills("Describe your overall lifestyle", 
-                             ["Minimalist", "Average consumer", "High consumer"], 
-                             key="lifestyle", selection_mode="single")
-        hobbies = st.pills("Select your common hobbies", 
-                           ["Gardening", "Gaming", "Travel", "Sports", "Cooking", "DIY"], 
-                           key="hobbies", selection_mode="multi")
-
-    # AI Usage & Digital Footprint
-    st.subheader("🤖 AI Usage & Digital Footprint")
+        st.pills("Describe your overall lifestyle", 
+                 ["Minimalist", "Average consumer", "High consumer"], 
+                 key="lifestyle", selection_mode="single")
+        st.pills("Select your common hobbies", 
+                 ["Gardening", "Gaming", "Travel", "Sports", "Cooking", "DIY"], 
+                 key="hobbies", selection_mode="multi")
+
+def digital_section():
     col1, col2 = st.columns(2)
     with col1:
-        ai_queries_daily = st.pills("ChatGPT/AI queries per day", ["0", "1-5", "6-20", "21-50", "50+"], 
-                                    key="ai_queries_daily", selection_mode="single")
-        image_generation_monthly = st.pills("AI image generation per month (DALL-E, Midjourney, etc.)", ["0", "1-10", "11-50", "51-100", "100+"], key="image_generation_monthly", selection_mode="single")
-        video_streaming_daily = st.pills("Video streaming hours per day (YouTube, Netflix, etc.)", ["0-1", "1-3", "3-5", "5-8", "8+"], key="video_streaming_daily", selection_mode="single")
+        st.pills("ChatGPT/AI queries per day", ["0", "1-5", "6-20", "21-50", "50+"], 
+                 key="ai_queries_daily", selection_mode="single")
+        st.pills("AI image generation per month (DALL-E, Midjourney, etc.)", ["0", "1-10", "11-50", "51-100", "100+"], key="image_generation_monthly", selection_mode="single")
+        st.pills("Video streaming hours per day (YouTube, Netflix, etc.)", ["0-1", "1-3", "3-5", "5-8", "8+"], key="video_streaming_daily", selection_mode="single")
     with col2:
-        cloud_storage_usage = st.pills("Cloud storage usage (Google Drive, iCloud, etc.)", ["None", "Light (< 50GB)", "Moderate (50-500GB)", "Heavy (500GB-2TB)", "Very Heavy (2TB+)"], key="cloud_storage_usage", selection_mode="single")
-        device_usage = st.pills("Primary devices used daily", ["Smartphone", "Laptop", "Desktop PC", "Tablet", "Smart TV", "Gaming Console", "Smart Watch"], key="device_usage", selection_mode="single")
-        online_meetings_weekly = st.pills("Video calls/meetings per week", ["0", "1-5", "6-15", "16-30", "30+"], key="online_meetings_weekly", selection_mode="single")
+        st.pills("Cloud storage usage (Google Drive, iCloud, etc.)", ["None", "Light (< 50GB)", "Moderate (50-500GB)", "Heavy (500GB-2TB)", "Very Heavy (2TB+)"], key="cloud_storage_usage", selection_mode="single")
+        st.pills("Primary devices used daily", ["Smartphone", "Laptop", "Desktop PC", "Tablet", "Smart TV", "Gaming Console", "Smart Watch"], key="device_usage", selection_mode="single")
+        st.pills("Video calls/meetings per week", ["0", "1-5", "6-15", "16-30", "30+"], key="online_meetings_weekly", selection_mode="single")
 
-    # Goals & Motivation
-    st.subheader("🎯 Goals & Motivation")
+def goals_section():
     col1, col2 = st.columns(2)
     with col1:
-        main_motivation = st.pills("Main Motivation", 
-                                   ["Saving money", "Protecting the environment", 
-                                    "Social responsibility", "Health reasons"], 
-                                   key="main_motivation", selection_mode="multi")
+        st.pills("Main Motivation", 
+                 ["Saving money", "Protecting the environment", 
+                  "Social responsibility", "Health reasons"], 
+                 key="main_motivation", selection_mode="multi")
         
-        biggest_challenge = st.pills("Biggest Challenge", 
-                                     ["Cost", "Convenience", "Not knowing what to do", 
-                                      "Lack of time", "Laziness", "Bad Tips on how to help"], 
-                                     key="biggest_challenge", selection_mode="multi")
+        st.pills("Biggest Challenge", 
+                 ["Cost", "Convenience", "Not knowing what to do", 
+                  "Lack of time", "Laziness", "Bad Tips on how to help"], 
+                 key="biggest_challenge", selection_mode="multi")
     with col2:
-        improvement_area = st.pills("Area you most want to improve", 
-                                    ["Reducing carbon footprint", "Saving money on bills", 
-                                     "Reducing waste", "Eating healthier"], 
-                                     key="improvement_area", 
-                                     selection_mode="multi")
+        st.pills("Area you most want to improve", 
+                 ["Reducing carbon footprint", "Saving money on bills", 
+                  "Reducing waste", "Eating healthier"], 
+                 key="improvement_area", 
+                 selection_mode="multi")
         
-        improvement_area_other = st.text_input("If you have other areas as well", key="improvement_area_other")
+        st.text_input("If you have other areas as well", key="improvement_area_other")
 
     # Additional Information
     st.subheader("💭 Tell Us More")
-    additional_info = st.text_area("In about 100 words, tell me anything else...", 
-                                   height=120, 
-                                   placeholder="Share any additional insights...", 
-                                   key="additional_info")
+    st.text_area("In about 100 words, tell me anything else...", 
+                 height=120, 
+                 placeholder="Share any additional insights...", 
+                 key="additional_info")
+
+def build_profiler_input(user_id: str, answers: dict) -> dict:
+    """Nest the flat onboarding answers into the profiler's input structure"""
+    user_data = {key: answers.get(key) for key in form_keys}
+    user_data["improvement_area_other"] = answers.get("improvement_area_other")
     
+    # Re-nest the dictionary to match the agent's expected input structure
+    return {
+        "user_id": user_id,
+        "location": {"city": user_data["city"], "country": user_data["country"], "climate": user_data["climate"]},
+        "household": {"size": user_data["household_size"], "home_type": user_data["home_type"], "home_size": user_data["home_size"], "ownership": user_data["ownership"], "heating_source": user_data["heating_source"], "air_conditioning": user_data["air_conditioning"], "appliances": user_data["appliances"], "energy_conservation": user_data["energy_conservation"]},
+        "transportation": {"primary_transport": user_data["primary_transport"], 
+                           "car_type": user_data["car_type"], 
+                           "vehicle_fuel": user_data["vehicle_fuel"], 
+                           "commute_distance": user_data["commute_distance"], 
+                           "rideshare_usage": user_data["rideshare_usage"], 
+                           "public_transport_usage": user_data["public_transport_usage"]},
+        "diet": {"diet_type": user_data["diet_type"], "meat_frequency": user_data["meat_frequency"], "food_waste": user_data["food_waste"], "shopping_frequency": user_data["shopping_frequency"]},
+        "consumption": {"clothes_shopping": user_data["clothes_shopping"], "new_vs_secondhand": user_data["new_vs_secondhand"], "eco_importance": user_data["eco_importance"], "recycling_habits": user_data["recycling_habits"], "composting": user_data["composting"], "plastic_usage": user_data["plastic_usage"]},
+        "travel": {"flights_per_year": user_data["flights_per_year"], "flight_reason": user_data["flight_reason"], "lifestyle": user_data["lifestyle"], "hobbies": user_data["hobbies"]},
+        "digital": {"ai_queries_daily": user_data["ai_queries_daily"], "image_generation_monthly": user_data["image_generation_monthly"], "video_streaming_daily": user_data["video_streaming_daily"], "cloud_storage_usage": user_data["cloud_storage_usage"], "device_usage": user_data["device_usage"], "online_meetings_weekly": user_data["online_meetings_weekly"]},
+        "goals": {"main_motivation": user_data["main_motivation"], "biggest_challenge": user_data["biggest_challenge"], "improvement_area": user_data["improvement_area"], "other_improvement_area": user_data.get("improvement_area_other")},
+        "additional_info": user_data["additional_info"]
+    }
+
+# (title, render function, widget keys) per form section
+SECTIONS = [
+    ("🌍 Location & Climate", location_section, ["country", "city", "climate"]),
+    ("🏠 Household Information", household_section,
+     ["household_size", "home_type", "home_size", "ownership", "appliances", "heating_source",
+      "air_conditioning", "energy_conservation"]),
+    ("🚗 Transportation", transport_section,
+     ["primary_transport", "other_transport", "car_type", "vehicle_fuel", "commute_distance",
+      "rideshare_usage", "public_transport_usage"]),
+    ("🍽️ Diet & Food Habits", diet_section, ["diet_type", "meat_frequency", "food_waste", "shopping_frequency"]),
+    ("🛍️ Consumption & Shopping", consumption_section,
+     ["clothes_shopping", "new_vs_secondhand", "eco_importance", "recycling_habits", "composting", "plastic_usage"]),
+    ("✈️ Travel & Lifestyle", travel_section, ["flights_per_year", "flight_reason", "lifestyle", "hobbies"]),
+    ("🤖 AI Usage & Digital Footprint", digital_section,
+     ["ai_queries_daily", "image_generation_monthly", "video_streaming_daily", "cloud_storage_usage",
+      "device_usage", "online_meetings_weekly"]),
+    ("🎯 Goals & Motivation", goals_section,
+     ["main_motivation", "biggest_challenge", "improvement_area", "improvement_area_other", "additional_info"]),
+]
+
+# Index of the last high-signal section (household/energy, transport, diet)
+SPECULATE_FROM_STEP = 3
+
+# Resume from the saved draft on first load
+if ANSWERS_KEY not in st.session_state:
+    draft = dict(get_onboarding_draft(user.id))
+    st.session_state[STEP_KEY] = min(int(draft.pop("_step", 0) or 0), len(SECTIONS) - 1)
+    st.session_state[ANSWERS_KEY] = draft
+    if draft:
+        st.toast("📝 Restored your saved progress")
+
+answers = st.session_state[ANSWERS_KEY]
+step = st.session_state[STEP_KEY]
+section_title, render_section, section_keys = SECTIONS[step]
+is_last_step = step == len(SECTIONS) - 1
+
+# Seed widgets that aren't in session state yet (first render of the section)
+for key in section_keys:
+    if key not in st.session_state and answers.get(key) is not None:
+        st.session_state[key] = answers[key]
+
+st.progress((step + 1) / len(SECTIONS), text=f"Step {step + 1} of {len(SECTIONS)}")
+
+with st.form(f"onboarding_form_{step}"):
+    st.subheader(section_title)
+    render_section()
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        back = st.form_submit_button("← Back", disabled=step == 0)
+    with col2:
+        forward = st.form_submit_button("🌟 Save Profile" if is_last_step else "Next →")
+
+submitted = False
+if back or forward:
+    section_answers = {key: st.session_state.get(key) for key in section_keys}
+    answers.update(section_answers)
+    next_step = max(step - 1, 0) if back else min(step + 1, len(SECTIONS) - 1)
+    # Debounced: only fields that changed since the last saved draft are written
+    queue_onboarding_draft(user.id, {**section_answers, "_step": next_step})
     
-    submitted = st.form_submit_button("🌟 Save Profile")
+    # Transport, diet and energy are answered: profile speculatively while the rest is filled
+    if forward and step >= SPECULATE_FROM_STEP:
+        start_speculative_profiler(user.id, build_profiler_input(user.id, answers))
+    
+    if back or not is_last_step:
+        st.session_state[STEP_KEY] = next_step
+        st.rerun()
+    submitted = True
 
 if submitted:
-    filled_count = sum(1 for key in form_keys if st.session_state.get(key))
+    filled_count = sum(1 for key in form_keys if answers.get(key))
 
-    if not st.session_state.get('city') or not st.session_state.get('climate') or st.session_state.get('household_size', 0) < 1:
+    if not answers.get('city') or not answers.get('climate') or (answers.get('household_size') or 0) < 1:
         st.error("⚠️ Please fill in all required fields: **City**, **Climate**, and **Household Size**.")
     elif filled_count < 15:
         st.error(f"⚠️ Please fill in at least **15 fields** to get an accurate analysis. You have filled **{filled_count}**.")
     else:
-        user_data = {key: st.session_state.get(key) for key in form_keys}
-        user_data["user_id"] = user.id
         
-        # Re-nest the dictionary to match the agent's expected input structure
-        nested_user_data = {
-            "user_id": user.id,
-            "location": {"city": user_data["city"], "country": user_data["country"], "climate": user_data["climate"]},
-            "household": {"size": user_data["household_size"], "home_type": user_data["home_type"], "home_size": user_data["home_size"], "ownership": user_data["ownership"], "heating_source": user_data["heating_source"], "air_conditioning": user_data["air_conditioning"], "appliances": user_data["appliances"], "energy_conservation": user_data["energy_conservation"]},
-            "transportation": {"primary_transport": user_data["primary_transport"], 
-                               "car_type": user_data["car_type"], 
-                               "vehicle_fuel": user_data["vehicle_fuel"], 
-                               "commute_distance": user_data["commute_distance"], 
-                               "rideshare_usage": user_data["rideshare_usage"], 
-                               "public_transport_usage": user_data["public_transport_usage"]},
-            "diet": {"diet_type": user_data["diet_type"], "meat_frequency": user_data["meat_frequency"], "food_waste": user_data["food_waste"], "shopping_frequency": user_data["shopping_frequency"]},
-            "consumption": {"clothes_shopping": user_data["clothes_shopping"], "new_vs_secondhand": user_data["new_vs_secondhand"], "eco_importance": user_data["eco_importance"], "recycling_habits": user_data["recycling_habits"], "composting": user_data["composting"], "plastic_usage": user_data["plastic_usage"]},
-            "travel": {"flights_per_year": user_data["flights_per_year"], "flight_reason": user_data["flight_reason"], "lifestyle": user_data["lifestyle"], "hobbies": user_data["hobbies"]},
-            "digital": {"ai_queries_daily": user_data["ai_queries_daily"], "image_generation_monthly": user_data["image_generation_monthly"], "video_streaming_daily": user_data["video_streaming_daily"], "cloud_storage_usage": user_data["cloud_storage_usage"], "device_usage": user_data["device_usage"], "online_meetings_weekly": user_data["online_meetings_weekly"]},
-            "goals": {"main_motivation": user_data["main_motivation"], "biggest_challenge": user_data["biggest_challenge"], "improvement_area": user_data["improvement_area"], "other_improvement_area": user_data.get("improvement_area_other")},
-            "additional_info": user_data["additional_info"]
-        }
+        nested_user_data = build_profiler_input(user.id, answers)
 
         with st.spinner("💾 Saving your profile..."):
             save_success = save_onboarding_data(user.id, nested_user_data)
         
         if save_success:
+            clear_onboarding_draft(user.id)
             st.success("✅ Profile saved successfully!")
             
             # Running Agent 1 - Profiler Directly
-            with st.spinner("🧠 AI is analyzing your profile..."):
-                profiler_results = run_profiler_agent(user.id, nested_user_data)
+            profiler_results = run_profiler_agent(user.id, nested_user_data)
             
             if profiler_results:
                 update_onboarding_status(user.id, True)
@@ -624,8 +788,7 @@ if submitted:
                 
                 if profile_completed:
                     # Continue to analyst workflow
-                    with st.spinner("🤖 Our AI is analyzing your carbon footprint... This may take a moment."):
-                        agent_success = run_analyst_agent(user.id)
+                    agent_success = run_analyst_agent(user.id)
 
                     if agent_success:                        
                         st.success("🎉 **Carbon analysis complete!** Your dashboard is ready with personalized recommendations.")
@@ -649,7 +812,7 @@ if submitted:
                             st.switch_page("pages/3_dashboard.py")
                             
                         # Clear form state
-                        for key in form_keys:
+                        for key in form_keys + ["improvement_area_other", ANSWERS_KEY, STEP_KEY]:
                             if key in st.session_state:
                                 del st.session_state[key]
                     else:
@@ -4,37 +4,43 @@ import sys
 import streamlit as st
 # import sys
 import os
-import pandas as pd
-import altair as alt
+import time
 
 # Add the parent directory to the path so we can import from utils
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from agent.utils import parse_text_to_json
-from agent.utils import parse_agent3_text_output
+from agent.utils import parse_agent3_text_output, build_local_plan_text
 from data_model.auth import get_current_user, get_user_profile
-from data_model.database import check_agents_status, get_agent_results
+from data_model.async_database import load_dashboard_data
+from ui.timing import timed_fragment
+from ui.progress import run_with_progress
+from agent.single_flight import FlightKey, get_single_flight
+from agent.usage_limits import UsageLimitExceeded, get_usage_limiter
+from data_model.background import FAILED, get_background_persister
+from ui.charts import get_carbon_charts
 from data_model.database import (
-    get_supabase,
     # save_user_profile,
     # save_challenge_completion,
     # get_user_completed_challenges,
     # get_user_score,
-    check_agents_status,
-    get_agent_results,
     # save_weekly_plan,
     # get_weekly_plan,
     # get_user_weekly_plans,
     get_latest_weekly_plan,
-    save_task_completion,
-    get_task_completions,
+    get_complete_user_data_with_score,
+    save_task_completion_async,
     get_completed_tasks_count,
     save_weekly_plan_results,
     debug_weekly_plans,
     debug_user_actions,
     get_current_week_feedback, 
     get_user_feedback_history, 
+    fetch_user_actions_page,
     save_feedback_and_process,
+    save_agent_results,
+    create_agent_session,
+    update_agent_session,
     # check_user_engagement,
 )
 from agent.crew import (
@@ -151,6 +157,712 @@ apply_simple_styles()
 # User is authenticated, continue with normal dashboard
 user = current_user
 
+# ====================================================================
+# DASHBOARD PANELS - each is a fragment that reruns independently
+# ====================================================================
+
+@timed_fragment("carbon_analysis")
+def render_carbon_analysis(user_id, calculation_data, benchmark_data, scores_version=None):
+    """Carbon footprint metrics, category chart and insights."""
+    # Carbon Footprint Analysis Header
+    st.markdown("---")
+    st.markdown("""
+    <div style="background: linear-gradient(135deg, #BFEE90 30%, #90EEBF 70%); 
+                border-radius: 15px; padding: 1.5rem; margin: 1.5rem 0; text-align: center; 
+                color: white; box-shadow: 0 6px 24px rgba(76, 175, 80, 0.3);">
+        <h3 style="color: white; margin-bottom: 0.5rem; font-size: 1.75rem;">🌍 Your Carbon Footprint Analysis</h3>
+        <p style="color: #3D8EEB; font-size: 1rem; margin: 0;">
+            Powered by AI – Personalized insights based on your lifestyle
+        </p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Metrics, table and chart spec are derived once per scores version
+    charts = get_carbon_charts(user_id, scores_version, calculation_data, benchmark_data)
+    metrics = charts.metrics
+    
+    # Main metrics section from real data
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric(
+            "Annual Carbon Footprint", 
+            f"{metrics['total_footprint_tonnes']:.2f} tonnes CO₂",
+            help="Your estimated annual carbon emissions"
+        )
+    
+    with col2:
+        st.metric(
+            "Sustainability Score", 
+            f"{metrics['sustainability_score']}/10",
+            delta=metrics['score_category'],
+            help="Your overall sustainability rating"
+        )
+    
+    with col3:
+        st.metric(
+            "vs. Regional Average", 
+            metrics['comparison_status'].title(),
+            delta=metrics['comparison_delta'],
+            help="How you compare to others in your region"
+        )
+    
+    with col4:
+        st.metric(
+            "Top Impact Area", 
+            metrics['top_category'],
+            help="Your highest emission category"
+        )
+    
+    # Category Breakdown Chart
+    st.subheader("📊 Emissions by Category")
+    
+    if charts.category_table is not None:
+        st.vega_lite_chart(charts.category_spec, use_container_width=True)
+        st.dataframe(charts.category_table, use_container_width=True, hide_index=True)
+    
+    # Fun Comparison Facts - Move up and make bigger
+    fun_facts = calculation_data.get('fun_comparison_facts', [])
+    if fun_facts:
+        st.subheader("🎯 Fun Comparison Facts")
+        for fact in fun_facts:
+            st.markdown(f"""
+            <div style="background: linear-gradient(135deg, #E8F5E8 0%, #C8E6C9 100%); 
+                        border-radius: 15px; padding: 1.5rem; margin: 1rem 0; 
+                        border-left: 5px solid #4CAF50; box-shadow: 0 4px 15px rgba(76, 175, 80, 0.2);">
+                <p style="color: #2E7D32; font-size: 1.2rem; margin: 0; font-weight: 500;">
+                    💡 {fact}
+                </p>
+            </div>
+            """, unsafe_allow_html=True)
+    
+    # Psychographic Insights - Side by side
+    st.subheader("💭 Personalized Insights")
+    psychographic_insights = calculation_data.get('psychographic_insights', [])
+    
+    if psychographic_insights:
+        # Display insights in 2 columns if there are at least 2
+        if len(psychographic_insights) >= 2:
+            col1, col2 = st.columns(2)
+            
+            for i, insight in enumerate(psychographic_insights[:2]):  # Show max 2 insights
+                insight_text = insight.get('insight_text', '')
+                related_motivation = insight.get('related_motivation', '')
+                addresses_barrier = insight.get('addresses_barrier', '')
+                actionable_step = insight.get('actionable_next_step', '')
+                
+                col = col1 if i == 0 else col2
+                
+                with col:
+                    st.markdown(f"""
+                    <div style="background: linear-gradient(135deg, #E3F2FD 0%, #BBDEFB 100%); 
+                                border-radius: 12px; padding: 1.2rem; margin: 0.5rem 0; 
+                                border: 1px solid #2196F3; box-shadow: 0 2px 10px rgba(33,150,243,0.1); height: 220px;">
+                        <h5 style="color: #1976D2; margin-bottom: 0.8rem;">💡 Insight #{i+1}</h5>
+                        <p style="color: #2C3E50; font-size: 0.95rem; margin-bottom: 0.8rem; line-height: 1.4;">
+                            {insight_text[:100]}{"..." if len(insight_text) > 100 else ""}
+                        </p>
+                        <div style="background: rgba(255,255,255,0.7); border-radius: 6px; padding: 0.6rem; font-size: 0.85rem;">
+                            <div style="color: #1976D2; font-weight: 600; margin-bottom: 0.3rem;">
+                                🚀 {actionable_step[:60]}{"..." if len(actionable_step) > 60 else ""}
+                            </div>
+                        </div>
+                    </div>
+                    """, unsafe_allow_html=True)
+        else:
+            # If only one insight, display it normally
+            for i, insight in enumerate(psychographic_insights[:1]):
+                insight_text = insight.get('insight_text', '')
+                related_motivation = insight.get('related_motivation', '')
+                addresses_barrier = insight.get('addresses_barrier', '')
+                actionable_step = insight.get('actionable_next_step', '')
+                
+                st.info(f"💡 **Insight:** {insight_text}\n\n🚀 **Next step:** {actionable_step}")
+    
+    # Priority Reduction Areas
+    priority_areas = calculation_data.get('priority_reduction_areas', [])
+    if priority_areas:
+        st.subheader("🎯 Priority Focus Areas")
+        cols = st.columns(len(priority_areas))
+        for i, area in enumerate(priority_areas):
+            with cols[i]:
+                st.markdown(f"""
+                <div style="background: linear-gradient(135deg, #FFF3E0 0%, #FFE0B2 100%); 
+                            border-radius: 12px; padding: 1rem; text-align: center; 
+                            border: 2px solid #FF9800; margin: 0.5rem 0;">
+                    <div style="font-size: 1.5rem; margin-bottom: 0.5rem;">🎯</div>
+                    <div style="color: #E65100; font-weight: 600;">{area}</div>
+                </div>
+                """, unsafe_allow_html=True)
+    
+    # Calculation Details
+    with st.expander("📋 Calculation Details"):
+        calculation_method = calculation_data.get('calculation_method', 'Standard emission factors applied')
+        data_confidence = calculation_data.get('data_confidence', 'medium')
+        
+        confidence_color = {
+            'high': '#4CAF50',
+            'medium': '#FF9800', 
+            'low': '#F44336'
+        }.get(data_confidence, '#666')
+        
+        st.markdown(f"""
+        **Calculation Method:** {calculation_method}
+        
+        **Data Confidence:** <span style="color: {confidence_color}; font-weight: 600;">{data_confidence.upper()}</span>
+        
+        **Regional Comparison:** Compared to {metrics['regional_comparison'].get('user_location', 'regional')} average of {metrics['regional_comparison'].get('local_average_kg', 0):.1f} kg CO₂/year
+        """, unsafe_allow_html=True)
+
+
+def reconcile_pending_completions(user_id, weekly_plan_id):
+    """
+    Settle background completion writes for this plan.
+    
+    Saved completions are dropped from the pending list (and the activity
+    history is reloaded to include them); failed ones are rolled back and
+    their titles queued in session state for the challenge list to report.
+    
+    Returns:
+        bool: True if any completion was rolled back
+    """
+    pending_completions = st.session_state.get(f"pending_completions_{weekly_plan_id}", {})
+    persister = get_background_persister()
+    failed_titles = st.session_state.setdefault(f"failed_completions_{weekly_plan_id}", [])
+    rolled_back = False
+    
+    for task_id, pending in list(pending_completions.items()):
+        write = persister.get(pending['key'])
+        if write is not None and not write.done:
+            continue
+        
+        del pending_completions[task_id]
+        if write is not None and write.status == FAILED:
+            # Roll back the optimistic update
+            st.session_state[f"completed_tasks_{weekly_plan_id}"].discard(task_id)
+            failed_titles.append(pending['title'])
+            rolled_back = True
+        else:
+            # Reload activity history from the first page
+            st.session_state.pop(f"action_history_{user_id}", None)
+        persister.discard(pending['key'])
+    
+    return rolled_back
+
+
+# Background completion writes are checked every second for the first 5 s
+# they are pending, then every 5 s, and no longer after 30 s
+COMPLETION_SYNC_SCHEDULE = ((5, 1), (30, 5))
+COMPLETION_SYNC_TICK_SECONDS = 1
+
+
+def completion_sync_due(weekly_plan_id):
+    """Whether pending completions should be checked on this tick, following COMPLETION_SYNC_SCHEDULE."""
+    now = time.time()
+    started = st.session_state.setdefault(f"completion_sync_started_{weekly_plan_id}", now)
+    polled_key = f"completion_sync_polled_{weekly_plan_id}"
+    since_poll = now - st.session_state.get(polled_key, started)
+    for until, interval in COMPLETION_SYNC_SCHEDULE:
+        if now - started < until:
+            # Ticks arrive about a second apart, so allow half a tick of jitter
+            if since_poll < interval - COMPLETION_SYNC_TICK_SECONDS / 2:
+                return False
+            st.session_state[polled_key] = now
+            return True
+    return False
+
+
+def reset_completion_sync(weekly_plan_id):
+    """Restart the completion check schedule (after a new completion or once nothing is pending)."""
+    st.session_state.pop(f"completion_sync_started_{weekly_plan_id}", None)
+    st.session_state.pop(f"completion_sync_polled_{weekly_plan_id}", None)
+
+
+@timed_fragment("completion_sync", run_every=COMPLETION_SYNC_TICK_SECONDS)
+def poll_pending_completions(user_id, weekly_plan_id):
+    """
+    Checks background completion writes from inside the challenge list.
+    
+    Settled writes update the panel's state directly instead of rerunning
+    anything: saved completions were already shown, and failed ones are
+    rolled back and reported here until the panel next reruns and shows the
+    challenge as open again. Ticks between scheduled checks, and after the
+    schedule ends, do nothing. The challenge list only registers this
+    poller while completions are pending.
+    """
+    if st.session_state.get(f"pending_completions_{weekly_plan_id}") and completion_sync_due(weekly_plan_id):
+        reconcile_pending_completions(user_id, weekly_plan_id)
+    # Left in session state for the challenge list to report (and clear) on its next run
+    for failed_title in st.session_state.get(f"failed_completions_{weekly_plan_id}", []):
+        st.error(f"❌ Couldn't save completion of \"{failed_title}\". Please try again.")
+
+
+@timed_fragment("challenge_list")
+def render_challenge_list(user_id, planner_data, week_focus, latest_weekly_plan, task_completions):
+    """Weekly challenges with progress; completing one reruns only this panel."""
+    # Display weekly challenges
+    weekly_challenges = planner_data.get('challenges', planner_data.get('weekly_challenges', []))
+    
+    # Get the actual weekly plan ID from the database
+    if latest_weekly_plan:
+        weekly_plan_id = str(latest_weekly_plan['id'])  # Use the UUID from weekly_plans table
+    else:
+        # If no weekly plan found, we can't track completions
+        weekly_plan_id = None
+        st.warning("⚠️ Unable to find weekly plan in database. Task completion tracking may not work properly.")
+    
+    # Get completion status from database only if we have a valid weekly_plan_id.
+    # Completions made in this panel are added to session state optimistically
+    # and saved in the background; failed saves are rolled back here.
+    if weekly_plan_id:
+        completions_key = f"completed_tasks_{weekly_plan_id}"
+        if completions_key not in st.session_state:
+            st.session_state[completions_key] = {tc['task_id'] for tc in task_completions if tc['completed']}
+        reconcile_pending_completions(user_id, weekly_plan_id)
+        for failed_title in st.session_state.pop(f"failed_completions_{weekly_plan_id}", []):
+            st.error(f"❌ Couldn't save completion of \"{failed_title}\". Please try again.")
+        completion_map = {task_id: True for task_id in st.session_state[completions_key]}
+        if st.session_state.get(f"pending_completions_{weekly_plan_id}"):
+            poll_pending_completions(user_id, weekly_plan_id)
+        else:
+            reset_completion_sync(weekly_plan_id)
+            # Keep the poller's slot so a tick still queued for it cannot overwrite the next element
+            st.empty()
+    else:
+        completion_map = {}
+    
+    # Update challenges with completion status from database
+    for i, challenge in enumerate(weekly_challenges):
+        # Use the challenge's ID if available, otherwise use the index-based format
+        challenge_id = challenge.get('id', f"challenge_{i+1}")
+        challenge['completed'] = completion_map.get(challenge_id, challenge.get('completed', False))
+    
+    completed_count = sum(1 for challenge in weekly_challenges if challenge.get('completed', False))
+    total_challenges = len(weekly_challenges)
+    
+    # Progress tracking display
+    progress_percentage = (completed_count / total_challenges * 100) if total_challenges > 0 else 0
+    
+    # Progress header
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        st.markdown(f"### 📊 Progress: {completed_count}/{total_challenges} Challenges")
+    with col2:
+        st.metric("Completion", f"{progress_percentage:.0f}%")
+    
+    # Progress bar
+    st.progress(progress_percentage / 100)
+    
+    if completed_count >= 3:
+        st.success("🎉 Great progress! Keep up the excellent work!")
+    elif completed_count >= 1:
+        st.info(f"💪 Keep going! You're making great progress!")
+    else:
+        st.info("🚀 Start completing challenges to build sustainable habits!")
+    
+    st.markdown("---")
+    
+    # Weekly Challenges Section
+    st.subheader("🎯 Weekly Challenges")
+    
+    if not weekly_challenges:
+        st.info("No challenges available. Generate new challenges to get started!")
+    else:
+        st.info(f"**This Week's Focus:** {week_focus} | **Total Challenges:** {len(weekly_challenges)}")
+        
+        for i, challenge in enumerate(weekly_challenges, 1):
+            challenge_completed = challenge.get('completed', False)
+            challenge_title = challenge.get('title', f'Challenge {i}')
+            challenge_difficulty = challenge.get('difficulty', challenge.get('difficulty_level', 'medium')).upper()
+            # Handle all possible CO2 savings field names from the JSON structure
+            co2_savings = challenge.get('co2_savings_kg', challenge.get('co2_savings', challenge.get('estimated_co2_savings_kg', 0)))
+            
+            # Color coding for difficulty
+            difficulty_colors = {
+                'EASY': '#4CAF50',
+                'MEDIUM': '#FF9800', 
+                'HARD': '#F44336'
+            }
+            difficulty_color = difficulty_colors.get(challenge_difficulty, '#666')
+            
+            # Status styling
+            if challenge_completed:
+                card_style = "background: #E8F5E8; border-left: 5px solid #4CAF50;"
+                status_icon = "✅"
+            else:
+                card_style = "background: white; border-left: 5px solid #2196F3;"
+                status_icon = "⏳"
+            
+            # Challenge card
+            col1, col2 = st.columns([4, 1])
+            
+            with col1:
+                # Handle both old and new data structures for description
+                description = challenge.get('description', challenge.get('action', ''))
+                category = challenge.get('category', 'General').title()
+                time_required = challenge.get('time_required', challenge.get('time', 'N/A'))
+                
+                st.markdown(f"""
+                <div style="{card_style} border-radius: 12px; padding: 1.5rem; margin: 1rem 0; 
+                            box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
+                    <div style="display: flex; align-items: center; justify-content: space-between; margin-bottom: 1rem;">
+                        <h4 style="color: #2C3E50; margin: 0; flex: 1;">
+                            {status_icon} {challenge_title}
+                        </h4>
+                        <div style="display: flex; gap: 0.5rem; align-items: center; flex-wrap: wrap;">
+                            <span style="background: {difficulty_color}; color: white; padding: 0.3rem 0.8rem; 
+                                        border-radius: 20px; font-size: 0.8rem; font-weight: 600;">
+                                {challenge_difficulty}
+                            </span>
+                            <span style="background: #E3F2FD; color: #1976D2; padding: 0.3rem 0.8rem; 
+                                        border-radius: 20px; font-size: 0.8rem; font-weight: 600;">
+                                {co2_savings} kg CO₂
+                            </span>
+                            <span style="background: #F3E5F5; color: #7B1FA2; padding: 0.3rem 0.8rem; 
+                                        border-radius: 20px; font-size: 0.8rem; font-weight: 600;">
+                                {category}
+                            </span>
+                        </div>
+                    </div>
+                    <p style="color: #666; margin-bottom: 0.8rem; line-height: 1.5;">
+                        {description}
+                    </p>
+                    <div style="display: flex; gap: 1rem; font-size: 0.85rem; color: #666;">
+                        <span>⏱️ Time: {time_required}</span>
+                    </div>
+                </div>
+                """, unsafe_allow_html=True)
+            
+            with col2:
+                st.markdown("<br>", unsafe_allow_html=True)
+                if not challenge_completed:
+                    if st.button(f"✅ Finish", key=f"complete_challenge_{i}", type="primary", use_container_width=True):
+                        if weekly_plan_id:
+                            # Use the challenge's ID if available, otherwise use index-based format
+                            task_id = challenge.get('id', f"challenge_{i}")
+                            task_title = challenge.get('title', f'Weekly Challenge {i}')
+                            task_type = challenge.get('task_type', 'weekly')
+                            
+                            # Show the completion now; the write happens in the background
+                            pending = save_task_completion_async(
+                                user_id, 
+                                weekly_plan_id, 
+                                task_id, 
+                                task_title, 
+                                task_type
+                            )
+                            challenge['completed'] = True
+                            st.session_state[completions_key].add(task_id)
+                            st.session_state.setdefault(f"pending_completions_{weekly_plan_id}", {})[task_id] = {
+                                'key': pending.key,
+                                'title': task_title,
+                            }
+                            # Check quickly again for the new write
+                            reset_completion_sync(weekly_plan_id)
+                            st.toast(f"🎉 Challenge {i} completed!")
+                            st.rerun(scope="fragment")
+                        else:
+                            st.error("❌ Cannot save completion: No valid weekly plan found.")
+                else:
+                    st.success("✅ Done!")
+        
+        # Progress summary
+        if len(weekly_challenges) > 0:
+            st.markdown("---")
+            col1, col2, col3 = st.columns(3)
+            
+            with col1:
+                st.metric("Challenges Generated", len(weekly_challenges))
+            with col2:
+                st.metric("Completed", completed_count)
+            with col3:
+                progress_pct = (completed_count / len(weekly_challenges) * 100) if len(weekly_challenges) > 0 else 0
+                st.metric("Progress", f"{progress_pct:.0f}%")
+            
+            # Motivational message
+            if planner_data.get('motivation') or planner_data.get('motivation_message'):
+                motivation_msg = planner_data.get('motivation', planner_data.get('motivation_message'))
+                st.info(f"💪 **{motivation_msg}**")
+
+
+def run_plan_once(user_id, workflow, description, inputs, generate, fallback=None):
+    """
+    Run `generate(agent_session_id)` once across concurrent clicks, tabs and processes.
+    
+    Requests for the same (user, workflow, inputs) while a run is in flight
+    wait for it and share its plan instead of starting their own (see
+    agent.single_flight), so there is one LLM run and one set of plan writes.
+    Only the run's leader is charged against the user's usage limits.
+    
+    Args:
+        fallback: Called with the UsageLimitExceeded error instead of `generate`
+            when the user is over their limits; its plan is shared like a generated one
+    
+    Returns:
+        dict: The plan returned by `generate` (None if it could not be parsed)
+    
+    Raises:
+        UsageLimitExceeded: The user is over their workflow rate or daily token budget (without a fallback)
+    """
+    def run(lease_session_id):
+        try:
+            get_usage_limiter().admit(user_id, workflow)
+        except UsageLimitExceeded as e:
+            if fallback is None:
+                raise
+            return fallback(e)
+        
+        session_id = lease_session_id or create_agent_session(user_id, workflow, description)
+        try:
+            return generate(session_id)
+        except Exception as e:
+            if not lease_session_id:
+                update_agent_session(session_id, "failed", {"error": str(e)})
+            raise
+    
+    with st.spinner("⏳ Working on your plan..."):
+        return get_single_flight().do(FlightKey.for_inputs(user_id, workflow, inputs), run, description).value
+
+
+def generate_weekly_plan(user_id, description):
+    """Run the basic planner (Agent 3) and save its plan, sharing any run already in progress."""
+    def generate(agent_session_id):
+        planner_results = run_with_progress("🤖 Agent 3 is creating your personalized weekly challenges...", "planner",
+                                            run_planner_workflow, user_id)
+        if not planner_results:
+            raise ValueError("Agent 3 failed to generate challenges")
+        
+        # Parse JSON using existing function
+        weekly_plan_data = parse_text_to_json(planner_results)
+        if weekly_plan_data:
+            # Save the results
+            save_agent_results(user_id, 'planner', weekly_plan_data, agent_session_id)
+            save_weekly_plan_results(user_id, agent_session_id, weekly_plan_data)
+            update_agent_session(agent_session_id, "completed", weekly_plan_data)
+        return weekly_plan_data
+    
+    def fallback(limit_error):
+        if get_latest_weekly_plan(user_id):
+            # The current plan stays in place
+            raise limit_error
+        return save_local_plan(user_id)
+    
+    return run_plan_once(user_id, "weekly_planning", description, None, generate, fallback)
+
+
+def save_local_plan(user_id):
+    """Build a plan from the challenge metadata (no LLM call) and save it as the current plan."""
+    weekly_plan_data = parse_text_to_json(build_local_plan_text(get_complete_user_data_with_score(user_id)))
+    save_agent_results(user_id, 'planner', weekly_plan_data)
+    save_weekly_plan_results(user_id, None, weekly_plan_data)
+    return weekly_plan_data
+
+
+@timed_fragment("feedback_form")
+def render_feedback_form(user_id, current_feedback, feedback_history):
+    """Plan feedback input, regeneration and recent feedback."""
+    # Feedback Section after challenges
+    st.markdown("---")
+    st.subheader("💬 Customize Your Plan")
+    
+    # Display current feedback status
+    if st.session_state.pop("feedback_dirty", False):
+        # Feedback was just saved in this panel - reload only its data
+        current_feedback = get_current_week_feedback(user_id)
+        feedback_history = get_user_feedback_history(user_id, limit=2)
+    
+    col1, col2 = st.columns([2, 1])
+    
+    with col1:
+        # Feedback input
+        feedback_text = st.text_area(
+            "Share your thoughts:",
+            placeholder="Examples:\n• These challenges are too hard\n• I want more money-saving tips\n• Give me more home-based tasks\n• I don't have a car, focus on other areas",
+            height=100,
+            help="Your feedback helps our AI adapt your challenges to your preferences and constraints.",
+            key="feedback_text_area_after_challenges"
+        )
+        
+        col_submit, col_regenerate = st.columns([1, 1])
+        
+        with col_submit:
+            if st.button("💾 Save Feedback", type="primary", key="save_feedback_after_challenges"):
+                if feedback_text.strip():
+                    # Saves the raw text only; the summary is generated in the background
+                    success = save_feedback_and_process(user_id, feedback_text)
+                    if success:
+                        st.success("✅ Feedback saved! Use 'Regenerate Plan' to apply changes.")
+                        st.session_state["feedback_dirty"] = True
+                        st.rerun(scope="fragment")
+                    else:
+                        st.error("❌ Failed to save feedback. Please try again.")
+                else:
+                    st.warning("Please enter some feedback before saving.")
+        
+        with col_regenerate:
+            if st.button("🔄 Regenerate Plan", type="secondary", key="regenerate_plan_after_challenges"):
+                if current_feedback and current_feedback.get('user_feedback'):
+                    try:
+                        ## AGENT 3 - FEEDBACK AWARE PLANNING accessed
+                        ## ==========================================
+                        raw_feedback = current_feedback.get('user_feedback', '')
+                        
+                        def generate_feedback_plan(session_id):
+                            # Run feedback-aware planning workflow with the saved feedback
+                            results = run_with_progress("🤖 Creating personalized plan based on your feedback...", "feedback_planning",
+                                                        run_feedback_aware_planning_workflow, user_id, raw_feedback=raw_feedback)
+                            if not results:
+                                raise ValueError("Failed to generate new plan")
+                            
+                            # Parse and save the new plan
+                            new_plan = parse_agent3_text_output(results, task_type="feedback_aware")
+                            if new_plan:
+                                save_weekly_plan_results(user_id, session_id, new_plan)
+                            return new_plan
+                        
+                        new_plan = run_plan_once(user_id, "feedback_planning", "Feedback-aware planning",
+                                                 raw_feedback, generate_feedback_plan)
+                        
+                        if new_plan:
+                            st.success("✅ Your plan has been updated based on your feedback!")
+                            st.balloons()
+                            st.rerun()
+                        else:
+                            st.error("❌ Failed to parse AI response")
+                                
+                    except UsageLimitExceeded as e:
+                        st.info(f"⏳ {str(e)} Your current plan stays in place.")
+                    except Exception as e:
+                        st.error(f"Error regenerating plan: {str(e)}")
+                else:
+                    st.info("💡 Please provide feedback first, then regenerate your plan.")
+    
+    with col2:
+        # Display feedback history
+        if feedback_history:
+            st.markdown("""
+            <div style="background: #F3E5F5; border-radius: 10px; padding: 1rem; margin-bottom: 1rem;">
+                <h5 style="color: #7B1FA2; margin-bottom: 0.5rem;">📝 Recent Feedback</h5>
+            </div>
+            """, unsafe_allow_html=True)
+            
+            for i, feedback in enumerate(feedback_history[:2]):
+                st.markdown(f"""
+                <div style="background: white; border-radius: 8px; padding: 0.8rem; margin-bottom: 0.5rem; 
+                            border-left: 4px solid #9C27B0; font-size: 0.85rem;">
+                    <strong style="color: #7B1FA2;">Week of {feedback['week_of']}:</strong><br>
+                    <span style="color: #424242;">{feedback['summary']}</span>
+                </div>
+                """, unsafe_allow_html=True)
+        else:
+            st.markdown("""
+            <div style="background: #FFF3E0; border-radius: 10px; padding: 1rem; text-align: center;">
+                <div style="color: #E65100; font-size: 0.9rem;">
+                    💡 No feedback yet<br>
+                    <small>Share your thoughts to personalize your experience!</small>
+                </div>
+            </div>
+            """, unsafe_allow_html=True)
+
+
+
+@timed_fragment("update_panel")
+def render_update_panel(user_id, agent_results):
+    """Free-text progress update handled by Agent 3."""
+    st.markdown("---")
+    st.subheader("📝 Share Your Progress")
+    st.info("💬 Tell us about your recent sustainability actions or challenges. Agent 3 will update your weekly plan based on your feedback!")
+    
+    # User update text input
+    user_update = st.text_area(
+        "Share your sustainability progress, challenges, or changes:",
+        placeholder="Example: I've been biking to work 3 days this week, but struggled with reducing meat consumption. Also started composting at home...",
+        height=100,
+        help="Share any updates about your sustainability journey. Agent 3 will analyze this and update your weekly plan accordingly."
+    )
+    
+    if st.button("🤖 Update My Plan with Agent 3", type="primary", use_container_width=True):
+        if user_update.strip():
+            try:
+                # Get current data
+                carbon_data = agent_results['carbon_footprint_data']
+                calculation_data = carbon_data.get('calculation_data', {})
+                benchmark_data = carbon_data.get('benchmark_data', {})
+                    
+                ## AGENT 3 - UPDATE-PLANNER
+                ## ==========================================
+                def generate_updated_plan(agent_session_id):
+                    # Run Agent 3 update workflow
+                    update_results = run_with_progress(
+                        "🤖 Agent 3 is analyzing your update and creating new recommendations...", "update_planning",
+                        run_update_planning_workflow,
+                        user_id,
+                        user_update
+                    )
+                    if not update_results:
+                        raise ValueError("Agent 3 failed to generate updated plan")
+                    
+                    # Parse the updated plan using existing function
+                    updated_plan_data = parse_agent3_text_output(update_results, task_type="update_planning", user_update_text=user_update)
+                    
+                    if updated_plan_data:
+                        # Save updated results
+                        save_agent_results(user_id, 'planner', updated_plan_data, agent_session_id)
+                        update_agent_session(agent_session_id, "completed", updated_plan_data)
+                        
+                        # Also save to weekly_plans table
+                        save_weekly_plan_results(user_id, agent_session_id, updated_plan_data)
+                    return updated_plan_data
+                
+                updated_plan_data = run_plan_once(
+                    user_id, "update_planning", f"Plan update based on user feedback: {user_update[:50]}...",
+                    user_update.strip(), generate_updated_plan
+                )
+                
+                if updated_plan_data:
+                    st.success("✅ Your plan has been updated successfully based on your feedback!")
+                    st.balloons()
+                    st.rerun()
+                else:
+                    st.error("❌ Failed to parse Agent 3 response")
+                        
+            except UsageLimitExceeded as e:
+                st.info(f"⏳ {str(e)} Your current plan stays in place.")
+            except Exception as e:
+                st.error(f"❌ Error running Agent 3 update: {str(e)}")
+        else:
+            st.warning("⚠️ Please enter some feedback before updating your plan.")
+
+
+@timed_fragment("activity_history")
+def render_activity_history(user_id):
+    """Action history, loaded a page at a time with a keyset cursor."""
+    st.markdown("---")
+    with st.expander("📜 Activity History"):
+        history_key = f"action_history_{user_id}"
+        if history_key not in st.session_state:
+            rows, cursor = fetch_user_actions_page(user_id)
+            st.session_state[history_key] = {'rows': rows, 'cursor': cursor}
+        history = st.session_state[history_key]
+        
+        if history['rows']:
+            for action in history['rows']:
+                status_icon = "✅" if action.get('status') == 'completed' else "⏳"
+                action_name = action.get('suggestion_id') or action.get('action_id') or 'Action'
+                when = (action.get('completed_at') or action.get('created_at') or '')[:10]
+                st.markdown(f"{status_icon} **{action_name}** · {when}")
+            
+            if history['cursor'] is not None:
+                if st.button("⬇️ Load more", key="load_more_history", use_container_width=True):
+                    rows, cursor = fetch_user_actions_page(user_id, history['cursor'])
+                    history['rows'].extend(rows)
+                    history['cursor'] = cursor
+                    st.rerun(scope="fragment")
+        else:
+            st.caption("No activity recorded yet.")
+
+
+
 if user:
     user_profile = get_user_profile(user.id)
     
@@ -166,41 +878,21 @@ if user:
         
         # New Plan button
         if st.button("🔄 Original Plan", type="secondary", help="Generate fresh weekly challenges", use_container_width=True):
-            with st.spinner("🤖 Creating fresh plan..."):
-                try:
-                    # Run the basic planner workflow to generate a new plan
-                    new_plan_results = run_planner_workflow(user.id)
-                    
-                    if new_plan_results:
-                        # Parse and save the new plan
-                        from agent.utils import parse_text_to_json
-                        
-                        new_plan = parse_text_to_json(new_plan_results)
-                        
-                        if new_plan:
-                            # Save the new plan
-                            from data_model.database import (
-                                save_weekly_plan_results, 
-                                create_agent_session, 
-                                save_agent_results, 
-                                update_agent_session)
-                            
-                            # Create session and save results
-                            session_id = create_agent_session(user.id, "fresh_planning", "Fresh weekly plan generation")
-                            save_agent_results(user.id, 'planner', new_plan, session_id)
-                            update_agent_session(session_id, "completed", new_plan)
-                            save_weekly_plan_results(user.id, session_id, new_plan)
-                            
-                            st.success("✅ Fresh plan generated!")
-                            st.balloons()
-                            st.rerun()
-                        else:
-                            st.error("❌ Failed to parse AI response")
-                    else:
-                        st.error("Failed to generate new plan")
+            try:
+                # Run the basic planner workflow to generate a new plan
+                new_plan = generate_weekly_plan(user.id, "Fresh weekly plan generation")
+                
+                if new_plan:
+                    st.success("✅ Fresh plan generated!")
+                    st.balloons()
+                    st.rerun()
+                else:
+                    st.error("❌ Failed to parse AI response")
                         
-                except Exception as e:
-                    st.error(f"Error: {str(e)}")
+            except UsageLimitExceeded as e:
+                st.info(f"⏳ {str(e)} Your current plan stays in place.")
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
         
         st.markdown("---")
         
@@ -230,23 +922,19 @@ if user:
     
     
     
+    # Load scores, plan, completions and feedback in one concurrent batch
     try:
-        agents_status = check_agents_status(user.id)
-        agent_results = get_agent_results(user.id)
+        dashboard_data = load_dashboard_data(user.id)
     except Exception as e:
-        st.error(f"Error checking agents status: {str(e)}")
-        # Default to showing agents as not completed if there's an error
-        agents_status = {'analyst_completed': False, 'planner_completed': False}
-        agent_results = None
+        st.error(f"Error loading dashboard data: {str(e)}")
+        dashboard_data = {}
     
-    # Check if user has scores in user_scores table to determine if they can access Agent 3
-    try:
-        supabase = get_supabase()
-        scores_check = supabase.table('user_scores').select('id').eq('user_id', user.id).execute()
-        has_scores = len(scores_check.data) > 0
-    except Exception as e:
-        st.error(f"Error checking user scores: {str(e)}")
-        has_scores = False
+    # Default to showing agents as not completed if there's an error
+    agents_status = dashboard_data.get('agents_status', {'analyst_completed': False, 'planner_completed': False})
+    agent_results = dashboard_data.get('agent_results')
+    
+    # User needs scores in user_scores table to access Agent 3
+    has_scores = dashboard_data.get('has_scores', False)
     
     if not has_scores:
         # Show waiting message if no scores found
@@ -283,13 +971,6 @@ if user:
         
         st.stop()
     
-    # Get agent results to display carbon data and weekly plans
-    try:
-        agent_results = get_agent_results(user.id)
-    except Exception as e:
-        st.error(f"Error getting agent results: {str(e)}")
-        agent_results = None
-    
     # Display carbon footprint analysis results if available
     if agent_results and agent_results.get('carbon_footprint_data'):
         carbon_data = agent_results['carbon_footprint_data']
@@ -298,203 +979,7 @@ if user:
         calculation_data = carbon_data.get('calculation_data', {})
         benchmark_data = carbon_data.get('benchmark_data', {})
         
-        # Carbon Footprint Analysis Header
-        st.markdown("---")
-        st.markdown("""
-        <div style="background: linear-gradient(135deg, #BFEE90 30%, #90EEBF 70%); 
-                    border-radius: 15px; padding: 1.5rem; margin: 1.5rem 0; text-align: center; 
-                    color: white; box-shadow: 0 6px 24px rgba(76, 175, 80, 0.3);">
-            <h3 style="color: white; margin-bottom: 0.5rem; font-size: 1.75rem;">🌍 Your Carbon Footprint Analysis</h3>
-            <p style="color: #3D8EEB; font-size: 1rem; margin: 0;">
-                Powered by AI – Personalized insights based on your lifestyle
-            </p>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        # Main metrics section from real data
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            total_footprint_kg = calculation_data.get('total_carbon_footprint_kg', 0)
-            total_footprint_tonnes = calculation_data.get('total_carbon_footprint_tonnes', total_footprint_kg/1000)
-            st.metric(
-                "Annual Carbon Footprint", 
-                f"{total_footprint_tonnes:.2f} tonnes CO₂",
-                help="Your estimated annual carbon emissions"
-            )
-        
-        with col2:
-            sustainability_score = calculation_data.get('sustainability_score', benchmark_data.get('sustainability_score', 0))
-            score_category = calculation_data.get('score_category', benchmark_data.get('score_category', 'Unknown'))
-            st.metric(
-                "Sustainability Score", 
-                f"{sustainability_score}/10",
-                delta=score_category,
-                help="Your overall sustainability rating"
-            )
-        
-        with col3:
-            regional_comparison = calculation_data.get('regional_comparison', benchmark_data.get('regional_comparison', {}))
-            comparison_status = regional_comparison.get('comparison_status', 'unknown')
-            percentage_diff = regional_comparison.get('percentage_difference', 0)
-            delta_text = f"{percentage_diff:+.1f}%" if percentage_diff != 0 else "0%"
-            st.metric(
-                "vs. Regional Average", 
-                comparison_status.title(),
-                delta=delta_text,
-                help="How you compare to others in your region"
-            )
-        
-        with col4:
-            top_categories = calculation_data.get('top_impact_categories', [])
-            top_category = top_categories[0] if top_categories else 'N/A'
-            st.metric(
-                "Top Impact Area", 
-                top_category,
-                help="Your highest emission category"
-            )
-        
-        # Category Breakdown Chart
-        st.subheader("📊 Emissions by Category")
-        category_breakdown = calculation_data.get('category_breakdown', {})
-        
-        if category_breakdown:
-            # Create DataFrame for visualization
-            categories = []
-            emissions = []
-            
-            category_mapping = {
-                'transportation_kg': 'Transportation',
-                'diet_kg': 'Diet',
-                'home_energy_kg': 'Home Energy',
-                'shopping_kg': 'Shopping',
-                'digital_footprint_kg': 'Digital Footprint',
-                'other_kg': 'Other'
-            }
-            
-            for key, value in category_breakdown.items():
-                if value > 0:  # Only show non-zero categories
-                    display_name = category_mapping.get(key, key.replace('_kg', '').replace('_', ' ').title())
-                    categories.append(display_name)
-                    emissions.append(value)
-            
-            if categories and emissions:
-                df = pd.DataFrame({
-                    'Category': categories,
-                    'Annual Emissions (kg CO₂)': emissions
-                })
-                # Sort the DataFrame for an ordered chart (optional but good practice)
-                df_sorted = df.sort_values(by='Annual Emissions (kg CO₂)', 
-                                           ascending=False)
-
-                # --- Create the chart using Altair ---
-                chart = alt.Chart(df_sorted).mark_bar().encode(
-                    x=alt.X('Category', title='Emission Category', sort=None, axis=alt.Axis(labelAngle=45)), # Custom X-axis title
-                    y=alt.Y('Annual Emissions (kg CO₂)', title='Annual Emissions (kg CO₂)') # Custom Y-axis title
-                )
-                
-                # Display the Altair chart in Streamlit
-                st.altair_chart(chart, use_container_width=True)
-
-            # --- Display the table (can still use the original DataFrame logic) ---
-                df['Percentage'] = (df['Annual Emissions (kg CO₂)'] / df['Annual Emissions (kg CO₂)'].sum() * 100).round(1)
-                df['Percentage'] = df['Percentage'].astype(str) + '%'
-                st.dataframe(df.sort_values(by='Annual Emissions (kg CO₂)', ascending=False), 
-                             use_container_width=True, 
-                             hide_index=True)
-        
-        # Fun Comparison Facts - Move up and make bigger
-        fun_facts = calculation_data.get('fun_comparison_facts', [])
-        if fun_facts:
-            st.subheader("🎯 Fun Comparison Facts")
-            for fact in fun_facts:
-                st.markdown(f"""
-                <div style="background: linear-gradient(135deg, #E8F5E8 0%, #C8E6C9 100%); 
-                            border-radius: 15px; padding: 1.5rem; margin: 1rem 0; 
-                            border-left: 5px solid #4CAF50; box-shadow: 0 4px 15px rgba(76, 175, 80, 0.2);">
-                    <p style="color: #2E7D32; font-size: 1.2rem; margin: 0; font-weight: 500;">
-                        💡 {fact}
-                    </p>
-                </div>
-                """, unsafe_allow_html=True)
-        
-        # Psychographic Insights - Side by side
-        st.subheader("💭 Personalized Insights")
-        psychographic_insights = calculation_data.get('psychographic_insights', [])
-        
-        if psychographic_insights:
-            # Display insights in 2 columns if there are at least 2
-            if len(psychographic_insights) >= 2:
-                col1, col2 = st.columns(2)
-                
-                for i, insight in enumerate(psychographic_insights[:2]):  # Show max 2 insights
-                    insight_text = insight.get('insight_text', '')
-                    related_motivation = insight.get('related_motivation', '')
-                    addresses_barrier = insight.get('addresses_barrier', '')
-                    actionable_step = insight.get('actionable_next_step', '')
-                    
-                    col = col1 if i == 0 else col2
-                    
-                    with col:
-                        st.markdown(f"""
-                        <div style="background: linear-gradient(135deg, #E3F2FD 0%, #BBDEFB 100%); 
-                                    border-radius: 12px; padding: 1.2rem; margin: 0.5rem 0; 
-                                    border: 1px solid #2196F3; box-shadow: 0 2px 10px rgba(33,150,243,0.1); height: 220px;">
-                            <h5 style="color: #1976D2; margin-bottom: 0.8rem;">💡 Insight #{i+1}</h5>
-                            <p style="color: #2C3E50; font-size: 0.95rem; margin-bottom: 0.8rem; line-height: 1.4;">
-                                {insight_text[:100]}{"..." if len(insight_text) > 100 else ""}
-                            </p>
-                            <div style="background: rgba(255,255,255,0.7); border-radius: 6px; padding: 0.6rem; font-size: 0.85rem;">
-                                <div style="color: #1976D2; font-weight: 600; margin-bottom: 0.3rem;">
-                                    🚀 {actionable_step[:60]}{"..." if len(actionable_step) > 60 else ""}
-                                </div>
-                            </div>
-                        </div>
-                        """, unsafe_allow_html=True)
-            else:
-                # If only one insight, display it normally
-                for i, insight in enumerate(psychographic_insights[:1]):
-                    insight_text = insight.get('insight_text', '')
-                    related_motivation = insight.get('related_motivation', '')
-                    addresses_barrier = insight.get('addresses_barrier', '')
-                    actionable_step = insight.get('actionable_next_step', '')
-                    
-                    st.info(f"💡 **Insight:** {insight_text}\n\n🚀 **Next step:** {actionable_step}")
-        
-        # Priority Reduction Areas
-        priority_areas = calculation_data.get('priority_reduction_areas', [])
-        if priority_areas:
-            st.subheader("🎯 Priority Focus Areas")
-            cols = st.columns(len(priority_areas))
-            for i, area in enumerate(priority_areas):
-                with cols[i]:
-                    st.markdown(f"""
-                    <div style="background: linear-gradient(135deg, #FFF3E0 0%, #FFE0B2 100%); 
-                                border-radius: 12px; padding: 1rem; text-align: center; 
-                                border: 2px solid #FF9800; margin: 0.5rem 0;">
-                        <div style="font-size: 1.5rem; margin-bottom: 0.5rem;">🎯</div>
-                        <div style="color: #E65100; font-weight: 600;">{area}</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-        
-        # Calculation Details
-        with st.expander("📋 Calculation Details"):
-            calculation_method = calculation_data.get('calculation_method', 'Standard emission factors applied')
-            data_confidence = calculation_data.get('data_confidence', 'medium')
-            
-            confidence_color = {
-                'high': '#4CAF50',
-                'medium': '#FF9800', 
-                'low': '#F44336'
-            }.get(data_confidence, '#666')
-            
-            st.markdown(f"""
-            **Calculation Method:** {calculation_method}
-            
-            **Data Confidence:** <span style="color: {confidence_color}; font-weight: 600;">{data_confidence.upper()}</span>
-            
-            **Regional Comparison:** Compared to {regional_comparison.get('user_location', 'regional')} average of {regional_comparison.get('local_average_kg', 0):.1f} kg CO₂/year
-            """, unsafe_allow_html=True)
+        render_carbon_analysis(user.id, calculation_data, benchmark_data, carbon_data.get('calculated_at'))
         
         st.markdown("---")
         
@@ -527,275 +1012,19 @@ if user:
             elif 'motivation_message' in planner_data:
                 st.markdown(f"💪 **{planner_data['motivation_message']}**")
             
-            # Display weekly challenges
-            weekly_challenges = planner_data.get('challenges', planner_data.get('weekly_challenges', []))
-            
-            # Get the actual weekly plan ID from the database
-            latest_weekly_plan = get_latest_weekly_plan(user.id)
-            if latest_weekly_plan:
-                weekly_plan_id = str(latest_weekly_plan['id'])  # Use the UUID from weekly_plans table
-            else:
-                # If no weekly plan found, we can't track completions
-                weekly_plan_id = None
-                st.warning("⚠️ Unable to find weekly plan in database. Task completion tracking may not work properly.")
-            
-            # Get completion status from database only if we have a valid weekly_plan_id
-            if weekly_plan_id:
-                task_completions = get_task_completions(user.id, weekly_plan_id)
-                completion_map = {tc['task_id']: tc['completed'] for tc in task_completions}
-            else:
-                completion_map = {}
-            
-            # Update challenges with completion status from database
-            for i, challenge in enumerate(weekly_challenges):
-                # Use the challenge's ID if available, otherwise use the index-based format
-                challenge_id = challenge.get('id', f"challenge_{i+1}")
-                challenge['completed'] = completion_map.get(challenge_id, challenge.get('completed', False))
-            
-            completed_count = sum(1 for challenge in weekly_challenges if challenge.get('completed', False))
-            total_challenges = len(weekly_challenges)
-            
-            # Progress tracking display
-            progress_percentage = (completed_count / total_challenges * 100) if total_challenges > 0 else 0
-            
-            # Progress header
-            col1, col2 = st.columns([2, 1])
-            with col1:
-                st.markdown(f"### 📊 Progress: {completed_count}/{total_challenges} Challenges")
-            with col2:
-                st.metric("Completion", f"{progress_percentage:.0f}%")
-            
-            # Progress bar
-            st.progress(progress_percentage / 100)
-            
-            if completed_count >= 3:
-                st.success("🎉 Great progress! Keep up the excellent work!")
-            elif completed_count >= 1:
-                st.info(f"💪 Keep going! You're making great progress!")
-            else:
-                st.info("🚀 Start completing challenges to build sustainable habits!")
-            
-            st.markdown("---")
-            
-            # Weekly Challenges Section
-            st.subheader("🎯 Weekly Challenges")
-            
-            if not weekly_challenges:
-                st.info("No challenges available. Generate new challenges to get started!")
-            else:
-                st.info(f"**This Week's Focus:** {week_focus} | **Total Challenges:** {len(weekly_challenges)}")
-                
-                for i, challenge in enumerate(weekly_challenges, 1):
-                    challenge_completed = challenge.get('completed', False)
-                    challenge_title = challenge.get('title', f'Challenge {i}')
-                    challenge_difficulty = challenge.get('difficulty', challenge.get('difficulty_level', 'medium')).upper()
-                    # Handle all possible CO2 savings field names from the JSON structure
-                    co2_savings = challenge.get('co2_savings_kg', challenge.get('co2_savings', challenge.get('estimated_co2_savings_kg', 0)))
-                    
-                    # Color coding for difficulty
-                    difficulty_colors = {
-                        'EASY': '#4CAF50',
-                        'MEDIUM': '#FF9800', 
-                        'HARD': '#F44336'
-                    }
-                    difficulty_color = difficulty_colors.get(challenge_difficulty, '#666')
-                    
-                    # Status styling
-                    if challenge_completed:
-                        card_style = "background: #E8F5E8; border-left: 5px solid #4CAF50;"
-                        status_icon = "✅"
-                    else:
-                        card_style = "background: white; border-left: 5px solid #2196F3;"
-                        status_icon = "⏳"
-                    
-                    # Challenge card
-                    col1, col2 = st.columns([4, 1])
-                    
-                    with col1:
-                        # Handle both old and new data structures for description
-                        description = challenge.get('description', challenge.get('action', ''))
-                        category = challenge.get('category', 'General').title()
-                        time_required = challenge.get('time_required', challenge.get('time', 'N/A'))
-                        
-                        st.markdown(f"""
-                        <div style="{card_style} border-radius: 12px; padding: 1.5rem; margin: 1rem 0; 
-                                    box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
-                            <div style="display: flex; align-items: center; justify-content: space-between; margin-bottom: 1rem;">
-                                <h4 style="color: #2C3E50; margin: 0; flex: 1;">
-                                    {status_icon} {challenge_title}
-                                </h4>
-                                <div style="display: flex; gap: 0.5rem; align-items: center; flex-wrap: wrap;">
-                                    <span style="background: {difficulty_color}; color: white; padding: 0.3rem 0.8rem; 
-                                                border-radius: 20px; font-size: 0.8rem; font-weight: 600;">
-                                        {challenge_difficulty}
-                                    </span>
-                                    <span style="background: #E3F2FD; color: #1976D2; padding: 0.3rem 0.8rem; 
-                                                border-radius: 20px; font-size: 0.8rem; font-weight: 600;">
-                                        {co2_savings} kg CO₂
-                                    </span>
-                                    <span style="background: #F3E5F5; color: #7B1FA2; padding: 0.3rem 0.8rem; 
-                                                border-radius: 20px; font-size: 0.8rem; font-weight: 600;">
-                                        {category}
-                                    </span>
-                                </div>
-                            </div>
-                            <p style="color: #666; margin-bottom: 0.8rem; line-height: 1.5;">
-                                {description}
-                            </p>
-                            <div style="display: flex; gap: 1rem; font-size: 0.85rem; color: #666;">
-                                <span>⏱️ Time: {time_required}</span>
-                            </div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    
-                    with col2:
-                        st.markdown("<br>", unsafe_allow_html=True)
-                        if not challenge_completed:
-                            if st.button(f"✅ Finish", key=f"complete_challenge_{i}", type="primary", use_container_width=True):
-                                # Save task completion to database
-                                success = False
-                                if weekly_plan_id:
-                                    # Use the challenge's ID if available, otherwise use index-based format
-                                    task_id = challenge.get('id', f"challenge_{i}")
-                                    task_title = challenge.get('title', f'Weekly Challenge {i}')
-                                    task_type = challenge.get('task_type', 'weekly')
-                                    
-                                    success = save_task_completion(
-                                        user.id, 
-                                        weekly_plan_id, 
-                                        task_id, 
-                                        task_title, 
-                                        task_type
-                                    )
-                                else:
-                                    st.error("❌ Cannot save completion: No valid weekly plan found.")
-                                
-                                if success:
-                                    # Update in-memory status
-                                    challenge['completed'] = True
-                                    st.success(f"🎉 Challenge {i} completed!")
-                                    st.balloons()
-                                    st.rerun()
-                                else:
-                                    st.error("Failed to save completion.")
-                        else:
-                            st.success("✅ Done!")
-                
-                # Progress summary
-                if len(weekly_challenges) > 0:
-                    st.markdown("---")
-                    col1, col2, col3 = st.columns(3)
-                    
-                    with col1:
-                        st.metric("Challenges Generated", len(weekly_challenges))
-                    with col2:
-                        st.metric("Completed", completed_count)
-                    with col3:
-                        progress_pct = (completed_count / len(weekly_challenges) * 100) if len(weekly_challenges) > 0 else 0
-                        st.metric("Progress", f"{progress_pct:.0f}%")
-                    
-                    # Motivational message
-                    if planner_data.get('motivation') or planner_data.get('motivation_message'):
-                        motivation_msg = planner_data.get('motivation', planner_data.get('motivation_message'))
-                        st.info(f"💪 **{motivation_msg}**")
-
-            # Feedback Section after challenges
-            st.markdown("---")
-            st.subheader("💬 Customize Your Plan")
-            
-            # Display current feedback status
-            current_feedback = get_current_week_feedback(user.id)
-            feedback_history = get_user_feedback_history(user.id, limit=2)
-            
-            col1, col2 = st.columns([2, 1])
-            
-            with col1:
-                # Feedback input
-                feedback_text = st.text_area(
-                    "Share your thoughts:",
-                    placeholder="Examples:\n• These challenges are too hard\n• I want more money-saving tips\n• Give me more home-based tasks\n• I don't have a car, focus on other areas",
-                    height=100,
-                    help="Your feedback helps our AI adapt your challenges to your preferences and constraints.",
-                    key="feedback_text_area_after_challenges"
-                )
-                
-                col_submit, col_regenerate = st.columns([1, 1])
-                
-                with col_submit:
-                    if st.button("💾 Save Feedback", type="primary", key="save_feedback_after_challenges"):
-                        if feedback_text.strip():
-                            with st.spinner("Processing your feedback..."):
-                                success = save_feedback_and_process(user.id, feedback_text)
-                                if success:
-                                    st.success("✅ Feedback saved! Use 'Regenerate Plan' to apply changes.")
-                                    st.rerun()
-                                else:
-                                    st.error("❌ Failed to save feedback. Please try again.")
-                        else:
-                            st.warning("Please enter some feedback before saving.")
-                
-                with col_regenerate:
-                    if st.button("🔄 Regenerate Plan", type="secondary", key="regenerate_plan_after_challenges"):
-                        if current_feedback and current_feedback.get('feedback_summary'):
-                            with st.spinner("🤖 Creating personalized plan based on your feedback..."):
-                                try:
-                                    ## AGENT 3 - FEEDBACK AWARE PLANNING accessed
-                                    ## ==========================================
-                                    # Run feedback-aware planning workflow with the saved feedback
-                                    results = run_feedback_aware_planning_workflow(user.id, raw_feedback=current_feedback.get('user_feedback', ''))
-                                    
-                                    if results:
-                                        # Parse and save the new plan
-                                        from agent.utils import parse_agent3_text_output
-                                        
-                                        new_plan = parse_agent3_text_output(results, task_type="feedback_aware")
-                                        
-                                        if new_plan:
-                                            # Save the new plan
-                                            from data_model.database import save_weekly_plan_results, create_agent_session
-                                            session_id = create_agent_session(user.id, "feedback_planning", "Feedback-aware planning")
-                                            save_weekly_plan_results(user.id, session_id, new_plan)
-                                            
-                                            st.success("✅ Your plan has been updated based on your feedback!")
-                                            st.balloons()
-                                            st.rerun()
-                                        else:
-                                            st.error("❌ Failed to parse AI response")
-                                    else:
-                                        st.error("Failed to generate new plan")
-                                        
-                                except Exception as e:
-                                    st.error(f"Error regenerating plan: {str(e)}")
-                        else:
-                            st.info("💡 Please provide feedback first, then regenerate your plan.")
-            
-            with col2:
-                # Display feedback history
-                if feedback_history:
-                    st.markdown("""
-                    <div style="background: #F3E5F5; border-radius: 10px; padding: 1rem; margin-bottom: 1rem;">
-                        <h5 style="color: #7B1FA2; margin-bottom: 0.5rem;">📝 Recent Feedback</h5>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    for i, feedback in enumerate(feedback_history[:2]):
-                        st.markdown(f"""
-                        <div style="background: white; border-radius: 8px; padding: 0.8rem; margin-bottom: 0.5rem; 
-                                    border-left: 4px solid #9C27B0; font-size: 0.85rem;">
-                            <strong style="color: #7B1FA2;">Week of {feedback['week_of']}:</strong><br>
-                            <span style="color: #424242;">{feedback['summary']}</span>
-                        </div>
-                        """, unsafe_allow_html=True)
-                else:
-                    st.markdown("""
-                    <div style="background: #FFF3E0; border-radius: 10px; padding: 1rem; text-align: center;">
-                        <div style="color: #E65100; font-size: 0.9rem;">
-                            💡 No feedback yet<br>
-                            <small>Share your thoughts to personalize your experience!</small>
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
+            render_challenge_list(
+                user.id,
+                planner_data,
+                week_focus,
+                dashboard_data.get('latest_weekly_plan'),
+                dashboard_data.get('task_completions', []),
+            )
 
+            render_feedback_form(
+                user.id,
+                dashboard_data.get('current_feedback'),
+                dashboard_data.get('feedback_history', []),
+            )
         
         else:
             # No planner results - show Generate Challenges button
@@ -809,47 +1038,23 @@ if user:
             col1, col2, col3 = st.columns([1, 2, 1])
             with col2:
                 if st.button("🎯 Generate Challenges", type="primary", use_container_width=True):
-                    with st.spinner("🤖 Agent 3 is creating your personalized weekly challenges..."):
-                        from data_model.database import save_agent_results, create_agent_session, update_agent_session
-                        from agent.crew import run_planner_workflow
+                    try:
+                        ## AGENT 3 - BASIC PLANNER (INITIAL PLANNER)
+                        ## ==========================================
+                        # Run the planner workflow (joins a run already in progress)
+                        weekly_plan_data = generate_weekly_plan(user.id, "Generate challenges workflow execution from dashboard")
                         
-                        try:
-                            
-                            # Create agent session for planner
-                            agent_session_id = create_agent_session(user.id, "weekly_planning", "Generate challenges workflow execution from dashboard")
-                            
-                            ## AGENT 3 - BASIC PLANNER (INITIAL PLANNER)
-                            ## ==========================================
-                            # Run the planner workflow
-                            planner_results = run_planner_workflow(user.id)
-                            
-                            if planner_results:
-                                try:
-                                    # Parse JSON using existing function
-                                    from agent.utils import parse_text_to_json
-                                    weekly_plan_data = parse_text_to_json(planner_results)
-                                    
-                                    if weekly_plan_data:
-                                        # Save the results
-                                        save_agent_results(user.id, 'planner', weekly_plan_data, agent_session_id)
-                                        save_weekly_plan_results(user.id, agent_session_id, weekly_plan_data)
-                                        update_agent_session(agent_session_id, "completed", weekly_plan_data)
-                                        
-                                        st.success("✅ Weekly challenges generated successfully!")
-                                        st.balloons()
-                                        st.rerun()
-                                    else:
-                                        st.error("❌ Failed to parse AI response")
-                                        update_agent_session(agent_session_id, "failed", {"error": "JSON parsing failed"})
-                                except Exception as e:
-                                    st.error(f"Error processing planner results: {str(e)}")
-                                    update_agent_session(agent_session_id, "failed", {"error": str(e)})
-                            else:
-                                st.error("❌ Agent 3 failed to generate challenges")
-                                update_agent_session(agent_session_id, "failed", {"error": "No results generated"})
+                        if weekly_plan_data:
+                            st.success("✅ Weekly challenges generated successfully!")
+                            st.balloons()
+                            st.rerun()
+                        else:
+                            st.error("❌ Failed to parse AI response")
                                 
-                        except Exception as e:
-                            st.error(f"Error running Agent 3: {str(e)}")
+                    except UsageLimitExceeded as e:
+                        st.info(f"⏳ {str(e)} Your current plan stays in place.")
+                    except Exception as e:
+                        st.error(f"Error running Agent 3: {str(e)}")
     
     else:
         # No agent results available
@@ -859,71 +1064,8 @@ if user:
 
     # Agent 3 Update Section - Available to all users with completed analysis
     if agent_results and agent_results.get('carbon_footprint_data'):
-        st.markdown("---")
-        st.subheader("📝 Share Your Progress")
-        st.info("💬 Tell us about your recent sustainability actions or challenges. Agent 3 will update your weekly plan based on your feedback!")
-        
-        # User update text input
-        user_update = st.text_area(
-            "Share your sustainability progress, challenges, or changes:",
-            placeholder="Example: I've been biking to work 3 days this week, but struggled with reducing meat consumption. Also started composting at home...",
-            height=100,
-            help="Share any updates about your sustainability journey. Agent 3 will analyze this and update your weekly plan accordingly."
-        )
-        
-        if st.button("🤖 Update My Plan with Agent 3", type="primary", use_container_width=True):
-            if user_update.strip():
-                with st.spinner("🤖 Agent 3 is analyzing your update and creating new recommendations..."):
-                    try:
-                        # Get current data
-                        carbon_data = agent_results['carbon_footprint_data']
-                        calculation_data = carbon_data.get('calculation_data', {})
-                        benchmark_data = carbon_data.get('benchmark_data', {})
-                        
-                        from data_model.database import get_user_onboarding_data, save_agent_results, create_agent_session, update_agent_session
-                        user_onboarding_data = get_user_onboarding_data(user.id)
-                        
-                        ## AGENT 3 - UPDATE-PLANNER
-                        ## ==========================================
-                        # Run Agent 3 update workflow
-                        update_results = run_update_planning_workflow(
-                            user.id,
-                            user_update
-                        )
-                        
-                        if update_results:
-                            try:
-                                # Parse the updated plan using existing function
-                                from agent.utils import parse_agent3_text_output
-                                updated_plan_data = parse_agent3_text_output(update_results, task_type="update_planning", user_update_text=user_update)
-                                
-                                if updated_plan_data:
-                                    # Create new agent session for the update
-                                    agent_session_id = create_agent_session(user.id, "weekly_planning", f"Plan update based on user feedback: {user_update[:50]}...")
-                                    
-                                    # Save updated results
-                                    save_agent_results(user.id, 'planner', updated_plan_data, agent_session_id)
-                                    update_agent_session(agent_session_id, "completed", updated_plan_data)
-                                    
-                                    # Also save to weekly_plans table
-                                    save_weekly_plan_results(user.id, agent_session_id, updated_plan_data)
-                                    
-                                    st.success("✅ Your plan has been updated successfully based on your feedback!")
-                                    st.balloons()
-                                    st.rerun()
-                                else:
-                                    st.error("❌ Failed to parse Agent 3 response")
-                            except Exception as e:
-                                st.error(f"❌ Error running Agent 3 update: {str(e)}")
-                        else:
-                            st.error("❌ Agent 3 failed to generate updated plan")
-                            
-                    except Exception as e:
-                        st.error(f"❌ Error running Agent 3 update: {str(e)}")
-            else:
-                st.warning("⚠️ Please enter some feedback before updating your plan.")
-        
-
+        render_update_panel(user.id, agent_results)
+        render_activity_history(user.id)
     
     else:
         # No carbon analysis results available yet - show waiting message
@@ -937,52 +1079,29 @@ if user:
         col1, col2, col3 = st.columns([1, 2, 1])
         with col2:
             if st.button("🎯 Generate Challenges", type="primary", use_container_width=True):
-                with st.spinner("🤖 Agent 3 is creating your personalized weekly challenges..."):
-                    from data_model.database import get_user_onboarding_data, save_agent_results, create_agent_session, update_agent_session
-                    from agent.agents import create_planner_agent
-                    from agent.tasks import create_weekly_planning_task
-                    from crewai import Crew, Process
+                from data_model.database import get_user_onboarding_data
                     
-                    try:
-                        # Get user data
-                        user_onboarding_data = get_user_onboarding_data(user.id)
-                        
-                        if not user_onboarding_data:
-                            st.error("❌ No onboarding data found. Please complete onboarding first.")
-                            if st.button("🌱 Go to Onboarding"):
-                                st.switch_page("pages/2_onboarding.py")
-                            st.stop()
-                        
-                        # Create agent session for planner
-                        agent_session_id = create_agent_session(user.id, "weekly_planning", "Initial challenges generation from dashboard")
+                try:
+                    # Get user data
+                    user_onboarding_data = get_user_onboarding_data(user.id)
                         
-                        # Run the planner workflow
-                        planner_results = run_planner_workflow(user.id)
+                    if not user_onboarding_data:
+                        st.error("❌ No onboarding data found. Please complete onboarding first.")
+                        if st.button("🌱 Go to Onboarding"):
+                            st.switch_page("pages/2_onboarding.py")
+                        st.stop()
                         
-                        if planner_results:
-                            try:
-                                # Parse JSON using existing function
-                                from agent.utils import parse_text_to_json
-                                weekly_plan_data = parse_text_to_json(planner_results)
-                                
-                                if weekly_plan_data:
-                                    # Save the results
-                                    save_agent_results(user.id, 'planner', weekly_plan_data, agent_session_id)
-                                    save_weekly_plan_results(user.id, agent_session_id, weekly_plan_data)
-                                    update_agent_session(agent_session_id, "completed", weekly_plan_data)
-                                    
-                                    st.success("✅ Weekly challenges generated successfully!")
-                                    st.balloons()
-                                    st.rerun()
-                                else:
-                                    st.error("❌ Failed to parse AI response")
-                                    update_agent_session(agent_session_id, "failed", {"error": "JSON parsing failed"})
-                            except Exception as e:
-                                st.error(f"Error processing results: {str(e)}")
-                                update_agent_session(agent_session_id, "failed", {"error": str(e)})
-                        else:
-                            st.error("❌ Agent 3 failed to generate challenges")
-                            update_agent_session(agent_session_id, "failed", {"error": "No results generated"})
+                    # Run the planner workflow (joins a run already in progress)
+                    weekly_plan_data = generate_weekly_plan(user.id, "Initial challenges generation from dashboard")
+                    
+                    if weekly_plan_data:
+                        st.success("✅ Weekly challenges generated successfully!")
+                        st.balloons()
+                        st.rerun()
+                    else:
+                        st.error("❌ Failed to parse AI response")
                             
-                    except Exception as e:
-                        st.error(f"Error running Agent 3: {str(e)}")
+                except UsageLimitExceeded as e:
+                    st.info(f"⏳ {str(e)} Your current plan stays in place.")
+                except Exception as e:
+                    st.error(f"Error running Agent 3: {str(e)}")
@@ -0,0 +1,46 @@
+"""
+Tests for precomputed landing-page image variants
+"""
+import os
+import pytest
+
+pytest.importorskip("PIL")
+
+from ui import assets
+
+COVER = "images/cover_image_1.jpg"
+
+
+class TestImageVariants:
+    """Test variant generation and the in-memory markup cache."""
+
+    def test_variants_are_smaller_and_not_upscaled(self, tmp_path):
+        """Every variant is smaller than the original and no wider than it."""
+        variants = assets.build_image_variants(COVER, output_dir=str(tmp_path))
+
+        assert {v.format for v in variants} == {"webp", "jpeg"}
+        assert max(v.width for v in variants) <= 1408
+        for variant in variants:
+            assert os.path.getsize(variant.path) < os.path.getsize(COVER)
+
+    def test_rebuild_skips_fresh_variants(self, tmp_path):
+        """Up-to-date variants are not re-encoded."""
+        first = assets.build_image_variants(COVER, output_dir=str(tmp_path))
+        mtimes = [os.path.getmtime(v.path) for v in first]
+        second = assets.build_image_variants(COVER, output_dir=str(tmp_path))
+
+        assert [os.path.getmtime(v.path) for v in second] == mtimes
+
+    def test_picture_html_references_urls(self, tmp_path, monkeypatch):
+        """With static serving on, markup points at URLs instead of inlining bytes."""
+        monkeypatch.setattr(assets, "ASSET_DIR", str(tmp_path / "assets"))
+        monkeypatch.setattr(assets, "STATIC_DIR", str(tmp_path))
+        monkeypatch.setattr(assets, "_static_serving_enabled", lambda: True)
+        monkeypatch.setattr(assets, "_variant_cache", {})
+        monkeypatch.setattr(assets, "_html_cache", {})
+
+        html = assets.picture_html(COVER, css_class="cover-image", alt="Cover")
+
+        assert "app/static/assets/cover_image_1-640.webp 640w" in html
+        assert "base64" not in html
+        assert assets.picture_html(COVER, css_class="cover-image", alt="Cover") is html
@@ -0,0 +1,61 @@
+"""
+Tests for the background persister used by optimistic UI updates
+"""
+import threading
+from data_model.background import FAILED, SUCCEEDED, BackgroundPersister
+
+
+def make_persister(**kwargs):
+    options = dict(max_workers=2, max_retries=1, backoff_base=0.001)
+    options.update(kwargs)
+    return BackgroundPersister(**options)
+
+
+class TestBackgroundPersister:
+    """Test outcomes, retries and de-duplication of background writes."""
+
+    def test_successful_write(self):
+        """A truthy result marks the write succeeded."""
+        persister = make_persister()
+        pending = persister.submit('k1', lambda: True)
+        persister.wait(timeout=5)
+
+        assert persister.get('k1').status == SUCCEEDED
+        assert pending.attempts == 1
+        assert persister.metrics()['succeeded'] == 1
+        persister.close()
+
+    def test_failures_are_retried_then_reported(self):
+        """Exceptions and falsy results are retried, then marked failed."""
+        persister = make_persister()
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            raise ConnectionError("timeout")
+
+        persister.submit('k1', flaky)
+        persister.submit('k2', lambda: False)
+        persister.wait(timeout=5)
+
+        assert persister.get('k1').status == FAILED
+        assert persister.get('k1').error == "timeout"
+        assert len(calls) == 2
+        assert persister.get('k2').status == FAILED
+        persister.close()
+
+    def test_in_flight_key_is_deduplicated(self):
+        """Submitting a key that is still running returns the same write."""
+        persister = make_persister()
+        release = threading.Event()
+        first = persister.submit('k1', lambda: release.wait(5))
+        second = persister.submit('k1', lambda: True)
+        release.set()
+        persister.wait(timeout=5)
+
+        assert first is second
+        assert persister.metrics()['deduplicated'] == 1
+
+        persister.discard('k1')
+        assert persister.get('k1') is None
+        persister.close()
@@ -0,0 +1,193 @@
+"""
+Tests for incremental per-category carbon analysis
+"""
+import pytest
+from agent.category_analysis import (
+    AGGREGATED_FIELDS, CATEGORY_STAGES, GLOBAL_AVERAGE_KG, aggregate, assemble_analysis, cache_entries,
+    dirty_categories, score_for_footprint
+)
+from data_model.sqlite_backend import SQLiteBackend
+from data_model.storage import set_storage_backend
+from data_model import database
+
+USER_DATA = {
+    'user_id': 'u1',
+    'location': {'city': 'Lyon', 'country': 'France'},
+    'household': {'size': 2, 'heating_source': 'gas'},
+    'transportation': {'primary_transport': 'car'},
+    'diet': {'diet_type': 'omnivore'},
+    'consumption': {'clothes_shopping': 'monthly'},
+    'travel': {'flights_per_year': 2},
+    'digital': {'video_streaming_daily': 2},
+    'goals': {'main_motivation': 'saving money'},
+}
+
+ANALYSIS = {
+    'total_carbon_footprint_kg': 8100.0,
+    'total_carbon_footprint_tonnes': 8.1,
+    'category_breakdown': {
+        'transportation_kg': 3000.0,
+        'diet_kg': 2500.0,
+        'home_energy_kg': 1800.0,
+        'shopping_kg': 500.0,
+        'digital_footprint_kg': 100.0,
+        'other_kg': 200.0,
+    },
+    'top_impact_categories': ['Transportation', 'Diet', 'Home Energy'],
+    'sustainability_score': 5.0,
+    'score_category': 'Above Average',
+    'regional_comparison': {'user_location': 'Lyon, France', 'local_average_kg': 9000.0,
+                            'comparison_status': 'below', 'percentage_difference': 10.0},
+    'fun_comparison_facts': ['fact'],
+}
+
+
+def cached_results(user_data=USER_DATA, analysis=ANALYSIS):
+    return {entry['stage']: entry for entry in cache_entries(user_data, analysis)}
+
+
+def with_answers(section, answers):
+    return {**USER_DATA, section: answers}
+
+
+class TestDirtyCategories:
+    """Test which category units an onboarding update invalidates."""
+
+    def test_unchanged_answers_have_no_dirty_categories(self):
+        assert dirty_categories(cached_results(), dict(USER_DATA)) == []
+
+    def test_changed_section_dirties_its_category_only(self):
+        assert dirty_categories(cached_results(), with_answers('diet', {'diet_type': 'vegan'})) == ['diet']
+        assert dirty_categories(cached_results(), with_answers('travel', {'flights_per_year': 0})) == ['transportation']
+
+    def test_sections_outside_the_footprint_are_ignored(self):
+        assert dirty_categories(cached_results(), with_answers('goals', {'main_motivation': 'health'})) == []
+
+    def test_location_change_needs_full_analysis(self):
+        assert dirty_categories(cached_results(), with_answers('location', {'city': 'Oslo', 'country': 'Norway'})) is None
+
+    def test_missing_estimate_needs_full_analysis(self):
+        cached = cached_results()
+        del cached['analyst.shopping']
+        assert dirty_categories(cached, dict(USER_DATA)) is None
+        assert dirty_categories({}, dict(USER_DATA)) is None
+
+    def test_everything_changed_needs_full_analysis(self):
+        changed = {section: {'changed': True} for section in USER_DATA if section not in ('user_id', 'location')}
+        assert dirty_categories(cached_results(), {**USER_DATA, **changed}) is None
+
+
+class TestAggregate:
+    """Test re-aggregating an analysis from updated category estimates."""
+
+    def test_totals_score_and_ranking_follow_the_new_estimate(self):
+        updated = aggregate(ANALYSIS, {'diet': 800.0})
+
+        assert updated['category_breakdown']['diet_kg'] == 800.0
+        assert updated['category_breakdown']['transportation_kg'] == 3000.0
+        assert updated['total_carbon_footprint_kg'] == 6400.0
+        assert updated['total_carbon_footprint_tonnes'] == 6.4
+        assert updated['top_impact_categories'] == ['Transportation', 'Home Energy', 'Diet']
+        assert updated['score_category'] == 'Above Average'
+        assert updated['regional_comparison']['comparison_status'] == 'below'
+        assert updated['regional_comparison']['percentage_difference'] == pytest.approx(28.9)
+        # Not recomputed, and the previous analysis is left untouched
+        assert updated['fun_comparison_facts'] == ['fact']
+        assert ANALYSIS['category_breakdown']['diet_kg'] == 2500.0
+
+    def test_only_aggregated_fields_change(self):
+        updated = aggregate(ANALYSIS, {'digital': 150.0})
+        changed = {key for key in updated if updated[key] != ANALYSIS.get(key)}
+        assert changed <= set(AGGREGATED_FIELDS)
+
+    @pytest.mark.parametrize('total_kg, score, category', [
+        (0, 10.0, 'Highly Sustainable'),
+        (1500, 9.5, 'Highly Sustainable'),
+        (4500, 7.5, 'Below Average'),
+        (9000, 5.0, 'Above Average'),
+        (18000, 1.5, 'High Impact'),
+        (50000, 0.0, 'High Impact'),
+    ])
+    def test_score_bands(self, total_kg, score, category):
+        assert score_for_footprint(total_kg) == (score, category)
+
+
+ESTIMATES = {
+    'transportation': {'kg': 3000, 'calculation_method': 'car miles', 'data_confidence': 'high'},
+    'diet': {'kg': 2500, 'calculation_method': 'omnivore diet', 'data_confidence': 'medium'},
+    'home_energy': {'kg': 1800, 'calculation_method': 'gas heating', 'data_confidence': 'low'},
+    'shopping': {'kg': 500, 'calculation_method': 'monthly clothes'},
+    'digital': {'kg': 100, 'calculation_method': 'streaming'},
+}
+
+
+class TestAssembleAnalysis:
+    """Test merging the fan-out sub-analyses into one analyst output."""
+
+    def test_merges_sub_analyses(self):
+        levers = [
+            {'lever': 'Insulate', 'validated': True, 'impact_category': 'Home Energy', 'potential_reduction_kg': 600},
+            {'lever': 'Bike', 'validated': True, 'impact_category': 'Transportation', 'potential_reduction_kg': 900},
+            {'lever': 'Less email', 'validated': False, 'impact_category': 'Digital Footprint', 'potential_reduction_kg': 5},
+        ]
+        analysis = assemble_analysis(ESTIMATES, levers, [{'insight_text': 'x'}],
+                                     {'user_location': 'Lyon, France', 'local_average_kg': 9000}, ['fact'])
+
+        assert analysis['total_carbon_footprint_kg'] == 7900.0
+        assert analysis['category_breakdown']['other_kg'] == 0.0
+        assert analysis['top_impact_categories'] == ['Transportation', 'Diet', 'Home Energy']
+        assert analysis['priority_reduction_areas'] == ['Transportation', 'Home Energy', 'Diet']
+        assert analysis['regional_comparison']['user_location'] == 'Lyon, France'
+        assert analysis['regional_comparison']['comparison_status'] == 'below'
+        assert analysis['data_confidence'] == 'low'
+        assert analysis['calculation_method'].startswith('Transportation: car miles')
+        assert analysis['fun_comparison_facts'] == ['fact']
+
+    def test_failed_sub_analyses_leave_defaults(self):
+        analysis = assemble_analysis(ESTIMATES, [], [], {}, [])
+
+        assert analysis['key_lever_validations'] == []
+        assert analysis['regional_comparison']['local_average_kg'] == GLOBAL_AVERAGE_KG
+        assert analysis['regional_comparison']['comparison_status'] == 'above'
+        assert analysis['priority_reduction_areas'] == analysis['top_impact_categories']
+
+    def test_output_validates(self):
+        models = pytest.importorskip('agent.models')
+        analysis = assemble_analysis(ESTIMATES, [], [], {'user_location': 'Lyon', 'local_average_kg': 9000}, [])
+        models.validate_analyst_output(analysis)
+
+@pytest.fixture
+def backend():
+    """In-memory backend with one user."""
+    db = SQLiteBackend(':memory:')
+    db.table('users').insert({'id': 'u1', 'email': 'u1@example.com'}).execute()
+    set_storage_backend(db)
+    yield db
+    set_storage_backend(None)
+    db.close()
+
+
+class TestCategoryCache:
+    """Test storing category estimates and patching the merged profile (SQLite backend)."""
+
+    def test_category_estimates_round_trip(self, backend):
+        assert database.save_stage_results('u1', cache_entries(USER_DATA, ANALYSIS))
+        database.save_stage_results('u1', cache_entries(USER_DATA, aggregate(ANALYSIS, {'diet': 800.0}), ['diet']))
+
+        cached = database.get_stage_results('u1', CATEGORY_STAGES)
+        assert set(cached) == set(CATEGORY_STAGES)
+        assert cached['analyst.diet']['output'] == {'kg': 800.0}
+        assert cached['analyst.transportation']['output'] == {'kg': 3000.0}
+        assert dirty_categories(cached, dict(USER_DATA)) == []
+
+    def test_patch_replaces_only_given_fields(self, backend):
+        data_merge_json = pytest.importorskip('data_model.data_merge_json')
+        assert not data_merge_json.patch_complete_profile('u1', {'sustainability_score': 6.0})
+
+        backend.table('users').update({
+            'complete_profile_w_scores': {'narrative_text': 'story', 'sustainability_score': 5.0}
+        }).eq('id', 'u1').execute()
+        assert data_merge_json.patch_complete_profile('u1', {'sustainability_score': 6.0})
+
+        profile = data_merge_json.get_complete_profile_from_users_table('u1')
+        assert profile == {'narrative_text': 'story', 'sustainability_score': 6.0}
@@ -0,0 +1,49 @@
+"""
+Tests for cached carbon analysis chart data
+"""
+import pytest
+from ui import charts
+from data_model.database import notify_scores_saved
+
+CALCULATION_DATA = {
+    'total_carbon_footprint_kg': 5000,
+    'regional_comparison': {'comparison_status': 'above', 'percentage_difference': 8.0},
+    'top_impact_categories': ['Diet'],
+    'category_breakdown': {'diet_kg': 3000, 'transportation_kg': 2000, 'other_kg': 0},
+}
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(charts, '_cache', charts.OrderedDict())
+    monkeypatch.setattr(charts, '_stats', {'hits': 0, 'misses': 0, 'invalidations': 0})
+
+
+class TestCarbonCharts:
+    """Test derived chart data and its per-version cache."""
+
+    def test_table_and_spec(self):
+        """Zero categories are dropped and rows are sorted largest first."""
+        result = charts.build_carbon_charts(CALCULATION_DATA, {})
+
+        assert list(result.category_table['Category']) == ['Diet', 'Transportation']
+        assert list(result.category_table['Percentage']) == ['60.0%', '40.0%']
+        assert result.category_spec['data']['values'][0] == {'Category': 'Diet', charts.EMISSIONS_COLUMN: 3000.0}
+        assert result.metrics['total_footprint_tonnes'] == 5.0
+        assert result.metrics['comparison_delta'] == '+8.0%'
+
+    def test_cached_per_scores_version(self):
+        """Reruns with the same scores version reuse the built data."""
+        first = charts.get_carbon_charts('u1', 'v1', CALCULATION_DATA, {})
+        assert charts.get_carbon_charts('u1', 'v1', CALCULATION_DATA, {}) is first
+        assert charts.get_carbon_charts('u1', 'v2', CALCULATION_DATA, {}) is not first
+        assert charts.get_chart_cache_stats()['hits'] == 1
+
+    def test_saving_scores_invalidates(self):
+        """Saving new scores drops the user's cached charts."""
+        first = charts.get_carbon_charts('u1', None, CALCULATION_DATA, {})
+        charts.get_carbon_charts('u2', None, CALCULATION_DATA, {})
+        notify_scores_saved('u1')
+
+        assert charts.get_carbon_charts('u1', None, CALCULATION_DATA, {}) is not first
+        assert charts.get_chart_cache_stats()['invalidations'] == 1
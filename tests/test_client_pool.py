@@ -0,0 +1,91 @@
+"""
+Tests for the per-session client pool
+"""
+from types import SimpleNamespace
+from data_model import client_pool
+from data_model.client_pool import ClientPool
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_pool(**kwargs):
+    created = []
+
+    def factory(access_token, refresh_token):
+        client = {'token': access_token, 'refresh': refresh_token}
+        created.append(client)
+        return client
+
+    clock = FakeClock()
+    options = dict(max_size=2, idle_timeout=60, clock=clock)
+    options.update(kwargs)
+    return ClientPool(factory, **options), created, clock
+
+
+class TestClientPool:
+    """Test lookups, LRU and idle eviction, rekeying and metrics."""
+
+    def test_hits_reuse_client(self):
+        """Repeated lookups for a token return the same client."""
+        pool, created, _ = make_pool()
+        first = pool.get('token-a', 'refresh-a')
+        assert pool.get('token-a') is first
+        assert len(created) == 1
+
+        metrics = pool.metrics()
+        assert metrics['hits'] == 1
+        assert metrics['misses'] == 1
+        assert metrics['hit_rate'] == 0.5
+
+    def test_least_recently_used_is_evicted(self):
+        """Exceeding max_size evicts the least recently used client."""
+        pool, _, _ = make_pool()
+        pool.get('token-a')
+        pool.get('token-b')
+        pool.get('token-a')
+        pool.get('token-c')
+
+        assert pool.metrics()['size'] == 2
+        assert pool.metrics()['evicted_lru'] == 1
+        assert pool.release('token-b') is None
+        assert pool.release('token-a') is not None
+
+    def test_idle_clients_expire(self):
+        """Clients unused for longer than idle_timeout are dropped."""
+        pool, created, clock = make_pool()
+        pool.get('token-a')
+        clock.now = 61
+        pool.get('token-a')
+
+        assert len(created) == 2
+        assert pool.metrics()['evicted_idle'] == 1
+
+    def test_rekey_and_put(self):
+        """A signed-in client can be pooled and moved to its refreshed token."""
+        pool, created, _ = make_pool()
+        client = object()
+        pool.put('old-token', client)
+        pool.rekey('old-token', 'new-token')
+
+        assert pool.get('new-token') is client
+        assert created == []
+
+    def test_service_role_key_is_never_pooled(self, monkeypatch):
+        """The service-role key resolves to the dedicated client; session tokens to pooled ones."""
+        pool, created, _ = make_pool()
+        service_client = object()
+        monkeypatch.setattr(client_pool, '_pool', pool)
+        monkeypatch.setattr(client_pool, '_service_client', service_client)
+        monkeypatch.setattr(client_pool, 'get_settings',
+                            lambda: SimpleNamespace(supabase_service_role_key='service-key'))
+
+        with client_pool.bind_access_token('service-key'):
+            assert client_pool.get_session_client() is service_client
+        assert client_pool.get_client_for_token('token-a') is created[0]
+        assert pool.metrics()['size'] == 1
@@ -0,0 +1,94 @@
+"""
+Tests for debounced onboarding draft persistence
+"""
+from data_model.drafts import DraftSaver
+
+
+class RecordingWriter:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def __call__(self, user_id, changes, draft, context):
+        self.calls.append((user_id, dict(changes), dict(draft), context))
+        return not self.fail
+
+
+class TestDraftSaver:
+    """Test change detection, coalescing and failure handling."""
+
+    def test_updates_are_coalesced_into_one_write(self):
+        """Several section submits within the debounce window become one write."""
+        writer = RecordingWriter()
+        saver = DraftSaver(writer, debounce_seconds=60)
+        saver.update('u1', {'city': 'Oslo', 'climate': 'Polar'})
+        saver.update('u1', {'household_size': 2})
+        assert writer.calls == []
+
+        saver.flush()
+        assert len(writer.calls) == 1
+        user_id, changes, draft, _ = writer.calls[0]
+        assert user_id == 'u1'
+        assert changes == {'city': 'Oslo', 'climate': 'Polar', 'household_size': 2}
+        assert draft == changes
+
+    def test_only_changed_fields_are_sent(self):
+        """Fields equal to the persisted draft are not re-sent."""
+        writer = RecordingWriter()
+        saver = DraftSaver(writer, debounce_seconds=60)
+        saver.prime('u1', {'city': 'Oslo', 'climate': 'Polar'})
+
+        assert saver.update('u1', {'city': 'Oslo', 'climate': 'Arid'}) == 1
+        assert saver.update('u1', {'city': 'Oslo'}) == 0
+        saver.flush('u1')
+
+        _, changes, draft, _ = writer.calls[0]
+        assert changes == {'climate': 'Arid'}
+        assert draft == {'city': 'Oslo', 'climate': 'Arid'}
+        assert saver.metrics()['fields_unchanged'] == 2
+
+    def test_unchanged_update_issues_no_write(self):
+        """Submitting a section without edits does not touch the database."""
+        writer = RecordingWriter()
+        saver = DraftSaver(writer, debounce_seconds=60)
+        saver.prime('u1', {'city': 'Oslo'})
+        saver.update('u1', {'city': 'Oslo'})
+        saver.flush()
+        assert writer.calls == []
+        assert saver.metrics()['users_pending'] == 0
+
+    def test_failed_write_is_retried_on_next_flush(self):
+        """Changes from a failed write stay pending, merged under newer edits."""
+        writer = RecordingWriter(fail=True)
+        saver = DraftSaver(writer, debounce_seconds=60, context_provider=lambda: 'token-1')
+        saver.update('u1', {'city': 'Oslo'})
+        saver.flush()
+
+        writer.fail = False
+        saver.update('u1', {'climate': 'Polar'})
+        saver.flush()
+
+        _, changes, _, context = writer.calls[-1]
+        assert changes == {'city': 'Oslo', 'climate': 'Polar'}
+        assert context == 'token-1'
+        assert saver.metrics()['failed_writes'] == 1
+
+    def test_debounce_timer_writes_after_quiet_period(self):
+        """Pending changes are written once the debounce period elapses."""
+        import time
+        writer = RecordingWriter()
+        saver = DraftSaver(writer, debounce_seconds=0.01)
+        saver.update('u1', {'city': 'Oslo'})
+        deadline = time.monotonic() + 5
+        while not writer.calls and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert writer.calls[0][1] == {'city': 'Oslo'}
+
+    def test_discard_drops_pending_changes(self):
+        """Discarding after final submission cancels the pending write."""
+        writer = RecordingWriter()
+        saver = DraftSaver(writer, debounce_seconds=60)
+        saver.update('u1', {'city': 'Oslo'})
+        saver.discard('u1')
+        saver.close()
+        assert writer.calls == []
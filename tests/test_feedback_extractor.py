@@ -0,0 +1,76 @@
+"""
+Tests for rule-based feedback extraction
+"""
+import pytest
+from agent.feedback_extractor import EASIER, FeedbackExtractor, category_keywords
+from agent.llm_governor import CircuitOpenError
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    """Extractor over the real challenge metadata."""
+    return FeedbackExtractor()
+
+
+class TestCategoryKeywords:
+    """Test keyword derivation from challenge metadata."""
+
+    def test_terms_map_to_their_majority_category(self):
+        challenges = [
+            {'category': 'Diet', 'impact_vector': ['meat', 'health']},
+            {'category': 'Transport', 'impact_vector': ['cycling', 'health']},
+        ]
+        keywords = category_keywords(challenges)
+        assert keywords['meat'] == 'Diet'
+        assert keywords['cycling'] == 'Transport'
+        assert keywords['bus'] == 'Transport'
+        assert 'health' not in keywords
+
+
+class TestFeedbackExtractor:
+    """Test signals, confidence and the LLM fallback."""
+
+    def test_formulaic_feedback(self, extractor):
+        signals = extractor.extract("I don't have a car, focus on other areas")
+        assert signals.excluded_categories == ['Transport']
+        assert signals.confidence == 1.0
+
+        signals = extractor.extract("These challenges are too hard. I want more money-saving tips")
+        assert signals.difficulty == EASIER
+        assert signals.motivations == ['saving money']
+        assert signals.confidence == 1.0
+
+        assert extractor.extract("want diet challenges").preferred_categories == ['Diet']
+
+    def test_unrecognised_feedback_has_low_confidence(self, extractor):
+        assert extractor.extract("I am vegetarian already so those are pointless for me").confidence < extractor.threshold
+        assert extractor.extract("thanks!").confidence == 0.0
+
+    def test_summarize_avoids_llm_when_confident(self):
+        extractor = FeedbackExtractor()
+        calls = []
+
+        def llm(text):
+            calls.append(text)
+            return "LLM summary"
+
+        assert extractor.summarize("no car", llm) == "User wants to avoid Transport challenges (mentions car)."
+        assert extractor.summarize("My grandmother visits next week", llm) == "LLM summary"
+
+        metrics = extractor.metrics()
+        assert calls == ["My grandmother visits next week"]
+        assert metrics['llm_calls_avoided'] == 1
+        assert metrics['llm_calls'] == 1
+        assert metrics['hit_rate'] == 0.5
+
+    def test_rules_summarize_while_llm_circuit_is_open(self):
+        extractor = FeedbackExtractor()
+
+        def llm(text):
+            raise CircuitOpenError("circuit open")
+
+        summary = extractor.summarize("no car, but my grandmother visits next week", llm)
+        assert summary == "User wants to avoid Transport challenges (mentions car)."
+        with pytest.raises(CircuitOpenError):
+            extractor.summarize("My grandmother visits next week", llm)
+        assert extractor.metrics()['llm_failures'] == 2
@@ -0,0 +1,84 @@
+"""
+Tests for the feedback store and background summarization (run against the SQLite backend)
+"""
+import threading
+import pytest
+from data_model.background import BackgroundPersister
+from data_model.sqlite_backend import SQLiteBackend
+from data_model.storage import set_storage_backend
+from data_model import database
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """In-memory backend with one user and a private background persister."""
+    db = SQLiteBackend(':memory:')
+    db.table('users').insert({'id': 'u1', 'email': 'u1@example.com'}).execute()
+    persister = BackgroundPersister(max_workers=1, max_retries=1, backoff_base=0.001)
+    monkeypatch.setattr(database, 'get_background_persister', lambda: persister)
+    set_storage_backend(db)
+    yield db, persister
+    persister.close()
+    set_storage_backend(None)
+    db.close()
+
+
+def feedback_rows(db):
+    return db.table('user_feedback').select('raw_feedback, feedback_summary')\
+        .eq('user_id', 'u1').order('created_at').execute().data
+
+
+class TestFeedbackSummary:
+    """Test that feedback is saved first and summarized later."""
+
+    def test_raw_feedback_is_saved_before_summary(self, backend, monkeypatch):
+        """Saving returns before the LLM call; readers use the raw text meanwhile."""
+        db, persister = backend
+        release = threading.Event()
+
+        def summarize(raw_feedback):
+            release.wait(5)
+            return "User has no car."
+
+        monkeypatch.setattr(database, 'summarize_feedback', summarize)
+
+        assert database.save_feedback_and_process('u1', "I don't own a car")
+        assert feedback_rows(db) == [{'raw_feedback': "I don't own a car", 'feedback_summary': None}]
+        assert database.get_user_feedback_history('u1')[0]['summary'] == "I don't own a car"
+
+        release.set()
+        persister.wait(timeout=5)
+        assert database.get_user_feedback_history('u1')[0]['summary'] == "User has no car."
+        assert database.get_current_week_feedback('u1')['feedback_summary'] == "User has no car."
+
+    def test_feedback_is_appended_without_touching_plans(self, backend, monkeypatch):
+        """Each submission is its own record; plan documents are not rewritten."""
+        db, persister = backend
+        monkeypatch.setattr(database, 'summarize_feedback', lambda text: f"Summary of {text}")
+        plan = db.table('weekly_plans').insert({
+            'user_id': 'u1', 'week_of': database.get_week_start().isoformat(), 'suggestions': {'challenges': []}
+        }).execute().data[0]
+
+        database.save_feedback_and_process('u1', "first")
+        database.save_feedback_and_process('u1', "second")
+        persister.wait(timeout=5)
+
+        assert [row['raw_feedback'] for row in feedback_rows(db)] == ["first", "second"]
+        assert [entry['summary'] for entry in database.get_user_feedback_history('u1')] == \
+            ["Summary of second", "Summary of first"]
+        stored = db.table('weekly_plans').select('suggestions').eq('id', plan['id']).execute().data[0]
+        assert stored['suggestions'] == {'challenges': []}
+
+    def test_resaving_same_feedback_keeps_summary(self, backend, monkeypatch):
+        """Regenerating with already saved feedback neither writes nor re-summarizes."""
+        db, persister = backend
+        calls = []
+        monkeypatch.setattr(database, 'summarize_feedback', lambda text: calls.append(text) or "Summary")
+
+        database.save_feedback_and_process('u1', "more diet tasks")
+        persister.wait(timeout=5)
+        database.save_feedback_and_process('u1', "more diet tasks")
+        persister.wait(timeout=5)
+
+        assert calls == ["more diet tasks"]
+        assert feedback_rows(db) == [{'raw_feedback': "more diet tasks", 'feedback_summary': "Summary"}]
@@ -0,0 +1,142 @@
+"""
+Tests for hedged LLM calls and per-stage latency budgets
+"""
+import threading
+import time
+
+import pytest
+from agent.hedging import HedgeFailed, Hedger, model_override, percentile, use_model
+
+
+def slow(value, seconds, started=None):
+    def call():
+        if started is not None:
+            started.set()
+        time.sleep(seconds)
+        return value
+    return call
+
+
+def failing(message):
+    def call():
+        raise RuntimeError(message)
+    return call
+
+
+class TestHedger:
+    """Test when a duplicate request starts and which answer wins."""
+
+    def test_fast_call_is_not_hedged(self):
+        hedger = Hedger({'profiler': 0.5})
+        hedge_started = threading.Event()
+
+        assert hedger.run('profiler', lambda: 'primary', slow('hedge', 0, hedge_started)) == 'primary'
+        assert not hedge_started.is_set()
+        metrics = hedger.metrics()['profiler']
+        assert (metrics['calls'], metrics['hedged'], metrics['hedge_rate']) == (1, 0, 0.0)
+
+    def test_slow_call_is_hedged_and_hedge_wins(self):
+        hedger = Hedger({'analyst': 0.05})
+
+        started = time.monotonic()
+        assert hedger.run('analyst', slow('primary', 1.0), lambda: 'hedge') == 'hedge'
+        assert time.monotonic() - started < 0.5
+
+        metrics = hedger.metrics()['analyst']
+        assert (metrics['hedged'], metrics['hedge_wins'], metrics['cancelled']) == (1, 1, 1)
+        assert metrics['hedge_win_rate'] == 1.0
+
+    def test_primary_can_still_win_after_hedging(self):
+        hedger = Hedger({'planner': 0.05})
+
+        assert hedger.run('planner', slow('primary', 0.1), slow('hedge', 1.0)) == 'primary'
+        metrics = hedger.metrics()['planner']
+        assert (metrics['hedged'], metrics['hedge_wins']) == (1, 0)
+
+    def test_invalid_first_answer_does_not_win(self):
+        hedger = Hedger({'analyst': 0.05})
+
+        result = hedger.run('analyst', slow('', 0.1), slow('{"ok": true}', 0.3), validate=bool)
+
+        assert result == '{"ok": true}'
+        assert hedger.metrics()['analyst']['invalid'] == 1
+
+    def test_fast_failure_is_retried_by_the_hedge(self):
+        hedger = Hedger({'profiler': 5.0})
+
+        assert hedger.run('profiler', failing('upstream 502'), lambda: 'hedge') == 'hedge'
+        assert hedger.metrics()['profiler']['hedged'] == 1
+
+    def test_both_failing_raises(self):
+        hedger = Hedger({'profiler': 0.05})
+
+        with pytest.raises(HedgeFailed, match='upstream 502'):
+            hedger.run('profiler', failing('upstream 502'), failing('timeout'))
+        assert hedger.metrics()['profiler']['failures'] == 1
+
+    def test_disabled_hedger_only_times_calls(self):
+        hedger = Hedger({'profiler': 0.01}, enabled=False)
+
+        with pytest.raises(RuntimeError, match='upstream 502'):
+            hedger.run('profiler', failing('upstream 502'), lambda: 'hedge')
+        assert hedger.run('profiler', slow('primary', 0.05), lambda: 'hedge') == 'primary'
+        assert hedger.metrics()['profiler']['hedged'] == 0
+
+    def test_stage_without_slo_is_never_hedged(self):
+        hedger = Hedger({'planner': 0.01})
+
+        assert hedger.run('profiler', slow('primary', 0.05), lambda: 'hedge') == 'primary'
+        assert hedger.budget('profiler') is None
+
+
+class TestBudgets:
+    """Test budgets derived from SLOs and observed latencies."""
+
+    def test_budget_is_slo_until_enough_samples(self):
+        hedger = Hedger({'analyst': 60.0}, min_samples=3, min_budget=0.0)
+        assert hedger.budget('analyst') == 60.0
+
+        for _ in range(3):
+            hedger.run('analyst', lambda: 'ok')
+
+        assert hedger.budget('analyst') < 1.0
+
+    def test_budget_never_exceeds_slo(self):
+        hedger = Hedger({'analyst': 0.01}, min_samples=1, min_budget=0.0)
+        hedger.run('analyst', slow('ok', 0.05), slow('ok', 0.05))
+
+        assert hedger.budget('analyst') == 0.01
+        assert hedger.metrics()['analyst']['slo_misses'] == 1
+
+    def test_sub_stages_use_parent_slo_and_own_window(self):
+        hedger = Hedger({'analyst': 60.0}, min_samples=1, min_budget=0.0)
+        hedger.run('analyst.diet', lambda: 'ok')
+
+        assert hedger.slo('analyst.diet') == 60.0
+        assert hedger.budget('analyst.diet') < 1.0
+        assert hedger.budget('analyst') == 60.0
+
+    def test_percentiles(self):
+        samples = list(range(1, 101))
+        assert percentile(samples, 0.50) == 50
+        assert percentile(samples, 0.95) == 95
+        assert percentile(samples, 0.99) == 99
+        assert percentile([], 0.95) is None
+
+
+class TestModelOverride:
+    """Test the fallback model used by agents created for a hedge."""
+
+    def test_use_model_is_scoped(self):
+        assert model_override() is None
+        with use_model('openai/gpt-4.1-mini-2025-04-14'):
+            assert model_override() == 'openai/gpt-4.1-mini-2025-04-14'
+        assert model_override() is None
+
+    def test_override_does_not_leak_across_threads(self):
+        seen = []
+        with use_model('fallback'):
+            thread = threading.Thread(target=lambda: seen.append(model_override()))
+            thread.start()
+            thread.join()
+        assert seen == [None]
@@ -0,0 +1,212 @@
+"""
+Tests for the LLM endpoint governor (adaptive concurrency, fair queue, circuit breaker)
+"""
+import threading
+import time
+
+import pytest
+from agent.llm_governor import (
+    CLOSED, FAILED, HALF_OPEN, OPEN, THROTTLED, TIMEOUT, CircuitOpenError, LLMGovernor, QueueTimeout,
+    classify_error, for_user
+)
+from agent.utils import build_local_plan_text, parse_text_to_json
+
+
+class RateLimitError(Exception):
+    """Shaped like openai.RateLimitError / litellm.RateLimitError."""
+    status_code = 429
+
+
+class APITimeoutError(Exception):
+    pass
+
+
+class ServerError(Exception):
+    status_code = 503
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fail(error):
+    def call():
+        raise error
+    return call
+
+
+class TestClassifyError:
+    """Test which errors count as endpoint health signals."""
+
+    @pytest.mark.parametrize('error, outcome', [
+        (RateLimitError(), THROTTLED),
+        (APITimeoutError(), TIMEOUT),
+        (TimeoutError(), TIMEOUT),
+        (ServerError(), FAILED),
+        (ConnectionError(), FAILED),
+        (ValueError('bad JSON'), None),
+    ])
+    def test_classify(self, error, outcome):
+        assert classify_error(error) == outcome
+
+
+class TestAdaptiveLimit:
+    """Test the AIMD concurrency limit."""
+
+    def test_fast_successes_raise_the_limit(self):
+        governor = LLMGovernor(initial_limit=2, max_limit=4)
+        for _ in range(20):
+            governor.call(lambda: 'ok')
+        assert governor.limit == 4
+
+    def test_throttling_halves_the_limit_once_per_burst(self):
+        clock = FakeClock()
+        governor = LLMGovernor(initial_limit=8, clock=clock)
+
+        # Two requests in flight when the 429s arrive: only one decrease
+        first = governor._acquire(None)
+        second = governor._acquire(None)
+        clock.now = 1.0
+        governor._release(0.0, first, THROTTLED)
+        governor._release(0.0, second, THROTTLED)
+        assert governor.limit == 4
+
+        clock.now = 2.0
+        with pytest.raises(RateLimitError):
+            governor.call(fail(RateLimitError()))
+        assert governor.limit == 2
+        assert governor.metrics()['throttled'] == 3
+
+    def test_slow_success_counts_as_congestion(self):
+        clock = FakeClock()
+        governor = LLMGovernor(initial_limit=8, latency_target=10.0, clock=clock)
+
+        def slow():
+            clock.now += 20.0
+            return 'ok'
+
+        assert governor.call(slow) == 'ok'
+        assert governor.limit == 4
+        assert governor.metrics()['slow'] == 1
+
+    def test_request_errors_do_not_change_the_limit(self):
+        governor = LLMGovernor(initial_limit=4)
+        with pytest.raises(ValueError):
+            governor.call(fail(ValueError('bad request')))
+        assert governor.limit == 4
+        assert governor.state == CLOSED
+
+
+class TestFairQueue:
+    """Test that queued calls are served round robin across users."""
+
+    def test_round_robin_between_users(self):
+        governor = LLMGovernor(initial_limit=1, max_limit=1)
+        order = []
+        release = threading.Event()
+
+        def hold():
+            release.wait(5)
+
+        holder = threading.Thread(target=governor.call, args=(hold,), kwargs={'user_id': 'holder'})
+        holder.start()
+        while governor.metrics()['in_flight'] == 0:
+            time.sleep(0.001)
+
+        # Queue one call at a time so the arrival order is fixed
+        threads = []
+        for user_id, label in [('busy', 'busy-1'), ('busy', 'busy-2'), ('busy', 'busy-3'), ('quiet', 'quiet-1')]:
+            thread = threading.Thread(target=governor.call, args=(lambda label=label: order.append(label),),
+                                      kwargs={'user_id': user_id})
+            thread.start()
+            threads.append(thread)
+            while governor.metrics()['queued'] < len(threads):
+                time.sleep(0.001)
+
+        release.set()
+        for thread in [holder] + threads:
+            thread.join(5)
+
+        assert order == ['busy-1', 'quiet-1', 'busy-2', 'busy-3']
+        assert governor.metrics()['queued'] == 0
+
+    def test_user_defaults_to_for_user_context(self):
+        governor = LLMGovernor(initial_limit=1, max_limit=1, max_wait=0.05)
+        release = threading.Event()
+        holder = threading.Thread(target=governor.call, args=(lambda: release.wait(5),))
+        holder.start()
+        while governor.metrics()['in_flight'] == 0:
+            time.sleep(0.001)
+
+        with for_user('u1'):
+            with pytest.raises(QueueTimeout):
+                governor.call(lambda: 'never')
+
+        release.set()
+        holder.join(5)
+        assert governor.metrics()['queue_timeouts'] == 1
+
+
+class TestCircuitBreaker:
+    """Test failing fast while the endpoint is unhealthy."""
+
+    def test_opens_after_consecutive_failures_and_probes_after_cooldown(self):
+        clock = FakeClock()
+        governor = LLMGovernor(failure_threshold=3, cooldown=30.0, clock=clock)
+        for _ in range(3):
+            with pytest.raises(ServerError):
+                governor.call(fail(ServerError()))
+        assert governor.state == OPEN
+
+        calls = []
+        with pytest.raises(CircuitOpenError):
+            governor.call(lambda: calls.append('sent'))
+        with pytest.raises(CircuitOpenError):
+            governor.check()
+        assert calls == []
+
+        clock.now = 31.0
+        assert governor.state == HALF_OPEN
+        assert governor.call(lambda: 'probe') == 'probe'
+        assert governor.state == CLOSED
+
+        metrics = governor.metrics()
+        assert (metrics['circuit_opens'], metrics['rejected'], metrics['errors']) == (1, 2, 3)
+
+    def test_failed_probe_reopens(self):
+        clock = FakeClock()
+        governor = LLMGovernor(failure_threshold=1, cooldown=10.0, clock=clock)
+        with pytest.raises(APITimeoutError):
+            governor.call(fail(APITimeoutError()))
+
+        clock.now = 11.0
+        with pytest.raises(APITimeoutError):
+            governor.call(fail(APITimeoutError()))
+        assert governor.state == OPEN
+
+    def test_success_resets_the_failure_streak(self):
+        governor = LLMGovernor(failure_threshold=2)
+        with pytest.raises(ServerError):
+            governor.call(fail(ServerError()))
+        governor.call(lambda: 'ok')
+        with pytest.raises(ServerError):
+            governor.call(fail(ServerError()))
+        assert governor.state == CLOSED
+
+
+class TestLocalPlan:
+    """Test the plan used while the LLM endpoint is unavailable."""
+
+    def test_plan_prefers_priority_areas_and_parses(self):
+        plan = parse_text_to_json(build_local_plan_text({'priority_reduction_areas': ['Diet', 'Transportation']}))
+
+        assert [c['difficulty'] for c in plan['challenges']] == ['easy', 'easy', 'medium', 'hard']
+        assert plan['challenges'][0]['category'] == 'diet'
+        assert plan['total_potential_savings'] == 17.0
+
+    def test_plan_without_profile(self):
+        assert len(parse_text_to_json(build_local_plan_text())['challenges']) == 4
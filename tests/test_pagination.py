@@ -0,0 +1,50 @@
+"""
+Tests for keyset-paginated history queries (run against the SQLite backend)
+"""
+import pytest
+from data_model.sqlite_backend import SQLiteBackend
+from data_model.storage import set_storage_backend
+from data_model import database
+
+
+@pytest.fixture
+def backend():
+    """In-memory backend with one user and 7 actions, two sharing a timestamp."""
+    db = SQLiteBackend(':memory:')
+    db.table('users').insert({'id': 'u1', 'email': 'u1@example.com'}).execute()
+    timestamps = ['2025-01-01', '2025-01-02', '2025-01-03', '2025-01-03', '2025-01-04', '2025-01-05', '2025-01-06']
+    for i, created_at in enumerate(timestamps):
+        db.table('user_actions').insert({
+            'id': f'a{i}', 'user_id': 'u1', 'status': 'completed', 'created_at': f'{created_at}T08:00:00.000+00:00'
+        }).execute()
+    set_storage_backend(db)
+    yield db
+    set_storage_backend(None)
+    db.close()
+
+
+class TestKeysetPagination:
+    """Test fetch_page / iter_pages cursors."""
+
+    def test_pages_cover_all_rows_once_in_order(self, backend):
+        """Walking the cursor visits every row exactly once, newest first."""
+        seen = []
+        rows, cursor = database.fetch_user_actions_page('u1', page_size=3)
+        seen.extend(rows)
+        while cursor:
+            rows, cursor = database.fetch_user_actions_page('u1', cursor, page_size=3)
+            seen.extend(rows)
+
+        assert [row['id'] for row in seen] == ['a6', 'a5', 'a4', 'a3', 'a2', 'a1', 'a0']
+
+    def test_last_page_has_no_cursor(self, backend):
+        """An exact final page returns a None cursor."""
+        rows, cursor = database.fetch_page('user_actions', 'id', {'user_id': 'u1'}, page_size=7)
+        assert len(rows) == 7
+        assert cursor is None
+
+    def test_iterators_stream_lazily(self, backend):
+        """Iterators fetch pages on demand."""
+        pages = database.iter_pages('user_actions', 'id', {'user_id': 'u1'}, page_size=2)
+        assert [row['id'] for row in next(pages)] == ['a6', 'a5']
+        assert sum(1 for _ in database.iter_user_actions('u1', page_size=2)) == 7
@@ -0,0 +1,103 @@
+"""
+Tests for workflow progress events
+"""
+import pytest
+from agent.progress import (
+    FAILED, FINISHED, STARTED, STEP, TOKENS,
+    ProgressBroker, ProgressReporter, progress_stage
+)
+
+
+class FakeStep:
+    def __init__(self, text, tool=None):
+        self.text = text
+        self.tool = tool
+        self.thought = "Thinking"
+
+
+class FakeUsage:
+    total_tokens = 1234
+
+
+class FakeCrewOutput:
+    token_usage = FakeUsage()
+
+
+class TestProgressBroker:
+    """Test delivery, replay and isolation of channels."""
+
+    def test_subscribers_receive_only_their_channel(self):
+        broker = ProgressBroker()
+        mine = broker.subscribe('session-a')
+        other = broker.subscribe('session-b')
+        ProgressReporter('session-a', 'planner', broker).started('planning')
+
+        event = mine.get(timeout=1)
+        assert (event.workflow, event.kind, event.stage) == ('planner', STARTED, 'planning')
+        assert other.get(timeout=0) is None
+
+    def test_late_subscriber_replays_missed_events(self):
+        broker = ProgressBroker()
+        reporter = ProgressReporter('session-a', 'analyst', broker)
+        reporter.started('analysis')
+        reporter.finished('analysis')
+
+        first_seq = broker.history('session-a')[0].seq
+        replayed = broker.subscribe('session-a', after_seq=first_seq).drain()
+        assert [event.kind for event in replayed] == [FINISHED]
+        assert broker.subscribe('session-a').drain() == []
+
+    def test_closed_subscription_stops_receiving(self):
+        broker = ProgressBroker()
+        subscription = broker.subscribe('session-a')
+        subscription.close()
+        ProgressReporter('session-a', 'planner', broker).started('planning')
+        assert subscription.get(timeout=0) is None
+
+    def test_full_subscriber_queue_drops_instead_of_blocking(self):
+        broker = ProgressBroker(max_queue=2)
+        subscription = broker.subscribe('session-a')
+        reporter = ProgressReporter('session-a', 'planner', broker)
+        for _ in range(5):
+            reporter.started('planning')
+        assert len(subscription.drain()) == 2
+        assert subscription.dropped == 3
+
+
+class TestProgressReporter:
+    """Test the events published for stages, steps and token usage."""
+
+    def test_stage_reports_start_and_failure(self):
+        broker = ProgressBroker()
+        subscription = broker.subscribe('s')
+        reporter = ProgressReporter('s', 'planner', broker)
+
+        with progress_stage(reporter, 'load_data'):
+            pass
+        with pytest.raises(ValueError):
+            with progress_stage(reporter, 'planning'):
+                raise ValueError("LLM timeout")
+
+        events = subscription.drain()
+        assert [(e.kind, e.stage) for e in events] == [
+            (STARTED, 'load_data'), (FINISHED, 'load_data'), (STARTED, 'planning'), (FAILED, 'planning')
+        ]
+        assert events[-1].message == "LLM timeout"
+
+    def test_steps_estimate_tokens_until_usage_is_known(self):
+        broker = ProgressBroker()
+        subscription = broker.subscribe('s')
+        reporter = ProgressReporter('s', 'planner', broker)
+        reporter.started('planning')
+        reporter.step_callback(FakeStep("x" * 400, tool="search"))
+        reporter.report_usage(FakeCrewOutput())
+
+        events = subscription.drain()
+        assert events[1].kind == STEP and events[1].tokens == 100 and events[1].message == "Using search"
+        assert events[2].kind == TOKENS and events[2].tokens == 1234
+        assert reporter.tokens_so_far == 1234
+
+    def test_progress_stage_without_reporter_is_a_no_op(self):
+        with progress_stage(None, 'planning'):
+            value = 1
+        assert value == 1
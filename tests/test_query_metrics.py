@@ -0,0 +1,46 @@
+"""
+Tests for query payload instrumentation
+"""
+from types import SimpleNamespace
+from data_model.query_metrics import (
+    get_query_payload_stats,
+    payload_size,
+    record_query,
+    reset_query_payload_stats,
+)
+
+
+class TestQueryMetrics:
+    """Test payload size recording per query label."""
+
+    def setup_method(self):
+        reset_query_payload_stats()
+
+    def test_record_query_returns_response_and_counts_rows(self):
+        """The response passes through and rows/bytes are recorded."""
+        rows = [{'id': 1, 'scores': {'total': 10}}, {'id': 2, 'scores': {'total': 20}}]
+        response = SimpleNamespace(data=rows)
+
+        assert record_query('get_agent_results.user_scores', response) is response
+
+        stats = get_query_payload_stats()['get_agent_results.user_scores']
+        assert stats['calls'] == 1
+        assert stats['rows'] == 2
+        assert stats['total_bytes'] == payload_size(rows)
+
+    def test_stats_are_ordered_by_total_bytes(self):
+        """Labels moving the most bytes come first."""
+        record_query('small', SimpleNamespace(data=[{'id': 1}]))
+        record_query('large', SimpleNamespace(data=[{'blob': 'x' * 1000}]))
+        record_query('large', SimpleNamespace(data=[]))
+
+        stats = get_query_payload_stats()
+        assert list(stats) == ['large', 'small']
+        assert stats['large']['calls'] == 2
+        assert stats['large']['max_bytes'] > 1000
+        assert stats['large']['avg_bytes'] == stats['large']['total_bytes'] // 2
+
+    def test_empty_response(self):
+        """Responses without data record zero bytes."""
+        record_query('empty', SimpleNamespace(data=None))
+        assert get_query_payload_stats()['empty']['total_bytes'] == 0
@@ -0,0 +1,162 @@
+"""
+Tests for off-peak weekly plan pre-generation
+"""
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import pytest
+from agent.scheduler import PlanScheduler, next_week_start
+from data_model.sqlite_backend import SQLiteBackend
+from data_model.storage import set_storage_backend
+from data_model import database
+
+# A Sunday inside the default window (01:00-05:00)
+SUNDAY_NIGHT = datetime(2025, 1, 12, 2, 0)
+NEXT_MONDAY = date(2025, 1, 13)
+
+
+def make_scheduler(candidates, generate=None, has_plan=None, **kwargs):
+    return PlanScheduler(
+        generate=generate or (lambda user_id, week_of: None),
+        candidates=lambda since: candidates,
+        has_plan=has_plan or (lambda user_id, week_of: False),
+        clock=lambda: SUNDAY_NIGHT,
+        **kwargs
+    )
+
+
+class TestPlanScheduler:
+    """Test queue order, the concurrency budget and the off-peak window."""
+
+    def test_next_week_start(self):
+        assert next_week_start(SUNDAY_NIGHT) == NEXT_MONDAY
+        assert next_week_start(datetime(2025, 1, 13, 9, 0)) == date(2025, 1, 20)
+
+    def test_most_active_users_first(self):
+        order = []
+        scheduler = make_scheduler([
+            {'user_id': 'idle', 'recent_actions': 0, 'last_active_at': '2025-01-10T08:00:00'},
+            {'user_id': 'busy', 'recent_actions': 9, 'last_active_at': '2025-01-05T08:00:00'},
+            {'user_id': 'recent', 'recent_actions': 0, 'last_active_at': '2025-01-11T20:00:00'},
+            {'user_id': 'some', 'recent_actions': 3, 'last_active_at': None},
+        ], generate=lambda user_id, week_of: order.append((user_id, week_of)), max_concurrency=1)
+
+        assert scheduler.tick() == 4
+        assert order == [('busy', NEXT_MONDAY), ('some', NEXT_MONDAY), ('recent', NEXT_MONDAY), ('idle', NEXT_MONDAY)]
+        # Done for this week: later ticks in the window do nothing
+        assert scheduler.tick(SUNDAY_NIGHT + timedelta(hours=1)) == 0
+
+    def test_concurrency_budget(self):
+        lock = threading.Lock()
+        running = {'now': 0, 'max': 0}
+
+        def generate(user_id, week_of):
+            with lock:
+                running['now'] += 1
+                running['max'] = max(running['max'], running['now'])
+            time.sleep(0.02)
+            with lock:
+                running['now'] -= 1
+
+        candidates = [{'user_id': f'u{i}', 'recent_actions': i} for i in range(8)]
+        scheduler = make_scheduler(candidates, generate=generate, max_concurrency=3)
+
+        assert scheduler.tick() == 8
+        assert 1 < running['max'] <= 3
+
+    def test_existing_plans_and_failures(self):
+        def generate(user_id, week_of):
+            if user_id == 'broken':
+                raise RuntimeError('LLM down')
+
+        scheduler = make_scheduler(
+            [{'user_id': 'has_plan'}, {'user_id': 'broken'}, {'user_id': 'new'}],
+            generate=generate, has_plan=lambda user_id, week_of: user_id == 'has_plan')
+
+        assert scheduler.tick() == 1
+        metrics = scheduler.metrics()
+        assert (metrics['generated'], metrics['skipped_existing'], metrics['failed']) == (1, 1, 1)
+        assert metrics['in_flight'] == 0
+
+    def test_only_runs_in_window(self):
+        scheduler = make_scheduler([{'user_id': 'u1'}])
+        assert scheduler.tick(datetime(2025, 1, 12, 12, 0)) == 0
+        assert scheduler.tick(datetime(2025, 1, 13, 2, 0)) == 0
+        assert scheduler.tick(datetime(2025, 1, 13, 12, 0), force=True) == 1
+
+    def test_jobs_past_window_stay_queued(self):
+        clock = {'now': SUNDAY_NIGHT.replace(hour=4, minute=59)}
+
+        def generate(user_id, week_of):
+            clock['now'] += timedelta(minutes=2)
+
+        scheduler = PlanScheduler(generate=generate, candidates=lambda since: [{'user_id': 'a'}, {'user_id': 'b'}],
+                                  has_plan=lambda user_id, week_of: False, max_concurrency=1,
+                                  clock=lambda: clock['now'])
+
+        assert scheduler.tick(clock['now']) == 1
+        assert scheduler.pending() == 1
+
+    def test_jobs_for_started_weeks_are_dropped(self):
+        generated = []
+        scheduler = make_scheduler([{'user_id': 'a'}],
+                                   generate=lambda user_id, week_of: generated.append((user_id, week_of)))
+        scheduler.enqueue('late', NEXT_MONDAY)
+
+        # The next window: the leftover job's week started six days ago
+        assert scheduler.tick(SUNDAY_NIGHT + timedelta(days=7)) == 1
+        assert generated == [('a', NEXT_MONDAY + timedelta(days=7))]
+        assert scheduler.metrics()['expired'] == 1
+
+
+@pytest.fixture
+def backend():
+    """In-memory backend with a recently active and a long inactive user."""
+    db = SQLiteBackend(':memory:')
+    db.table('users').insert({'id': 'u1', 'email': 'u1@example.com', 'onboarding_status': True,
+                              'last_active_at': datetime.now().isoformat()}).execute()
+    db.table('users').insert({'id': 'u2', 'email': 'u2@example.com', 'onboarding_status': True,
+                              'last_active_at': '2020-01-01T00:00:00'}).execute()
+    set_storage_backend(db)
+    yield db
+    set_storage_backend(None)
+    db.close()
+
+
+class TestPregeneratedPlans:
+    """Test storing plans for next week and reading the current one (SQLite backend)."""
+
+    def test_next_week_plan_hidden_until_it_starts(self, backend):
+        this_week = database.get_week_start()
+        database.save_weekly_plan_results('u1', None, {'challenges': ['current']})
+        database.save_weekly_plan_results('u1', None, {'challenges': ['next']}, week_of=this_week + timedelta(days=7))
+
+        assert database.has_weekly_plan('u1', this_week + timedelta(days=7))
+        assert database.get_agent_results('u1')['weekly_plan_data'] == {'challenges': ['current']}
+        assert database.get_latest_weekly_plan('u1')['week_of'] == this_week.isoformat()
+
+    def test_candidates_are_recently_active_users(self, backend):
+        backend.table('user_actions').insert({'user_id': 'u1', 'status': 'completed',
+                                              'created_at': datetime.now().isoformat()}).execute()
+
+        candidates = database.get_plan_pregeneration_candidates(datetime.now() - timedelta(days=14))
+
+        assert [(c['user_id'], c['recent_actions']) for c in candidates] == [('u1', 1)]
+
+    def test_candidates_page_through_actions_in_window(self, backend, monkeypatch):
+        monkeypatch.setattr(database, 'CANDIDATE_PAGE_SIZE', 2)
+        backend.table('users').insert({'id': 'u3', 'email': 'u3@example.com', 'onboarding_status': True,
+                                       'last_active_at': '2020-01-01T00:00:00'}).execute()
+        now = datetime.now()
+        for i, user_id in enumerate(['u3', 'u3', 'u3', 'u2']):
+            backend.table('user_actions').insert({'user_id': user_id, 'status': 'completed',
+                                                  'created_at': (now - timedelta(hours=i)).isoformat()}).execute()
+        # Outside the window
+        backend.table('user_actions').insert({'user_id': 'u2', 'status': 'completed',
+                                              'created_at': (now - timedelta(days=30)).isoformat()}).execute()
+
+        candidates = database.get_plan_pregeneration_candidates(now - timedelta(days=14))
+
+        counts = {c['user_id']: c['recent_actions'] for c in candidates}
+        assert counts == {'u1': 0, 'u2': 1, 'u3': 3}
@@ -0,0 +1,133 @@
+"""
+Tests for single-flight coalescing of workflow runs
+"""
+import threading
+import time
+import pytest
+from agent.single_flight import FlightFailed, FlightKey, SingleFlight
+
+
+KEY = FlightKey.for_inputs("u1", "weekly_planning")
+
+
+class FakeLeases:
+    """In-memory stand-in for the agent_sessions lease functions."""
+
+    def __init__(self, held=None):
+        self.rows = dict(held or {})
+        self.released = []
+
+    def acquire(self, key, description, lease_seconds):
+        if key.name in self.rows and self.rows[key.name]['status'] == 'active':
+            return None
+        self.rows[key.name] = {'id': f"s{len(self.released) + 1}", 'status': 'active'}
+        return self.rows[key.name]['id']
+
+    def lookup(self, name):
+        return self.rows.get(name)
+
+    def release(self, session_id, status, output):
+        self.released.append((session_id, status, output))
+        for row in self.rows.values():
+            if row['id'] == session_id:
+                row.update(status=status, final_output=output)
+
+
+def make_flight(leases, **kwargs):
+    return SingleFlight(leases.acquire, leases.lookup, leases.release, poll_seconds=0.01, **kwargs)
+
+
+class TestFlightKey:
+    """Test flight key derivation."""
+
+    def test_inputs_change_the_key(self):
+        assert FlightKey.for_inputs("u1", "update_planning", "less meat") == \
+            FlightKey.for_inputs("u1", "update_planning", "less meat")
+        assert FlightKey.for_inputs("u1", "update_planning", "less meat") != \
+            FlightKey.for_inputs("u1", "update_planning", "more bikes")
+        assert KEY.name.startswith("weekly_planning:u1:")
+
+
+class TestSingleFlight:
+    """Test local and cross-process coalescing."""
+
+    def test_concurrent_callers_share_one_run(self):
+        leases = FakeLeases()
+        flight = make_flight(leases)
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def run(session_id):
+            calls.append(session_id)
+            started.set()
+            release.wait(5)
+            return {"plan": 1}
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do(KEY, run)))
+        leader.start()
+        started.wait(5)
+        follower = threading.Thread(target=lambda: results.append(flight.do(KEY, run)))
+        follower.start()
+        while flight.metrics()['coalesced_local'] == 0:
+            time.sleep(0.01)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+
+        assert calls == ["s1"]
+        assert sorted(r.leader for r in results) == [False, True]
+        assert all(r.value == {"plan": 1} for r in results)
+        assert leases.released == [("s1", "completed", {"plan": 1})]
+        assert flight.metrics()['in_flight'] == 0
+
+    def test_waits_for_run_in_other_process(self):
+        leases = FakeLeases({KEY.name: {'id': 'remote', 'status': 'active'}})
+        flight = make_flight(leases)
+        timer = threading.Timer(0.05, leases.release, args=('remote', 'completed', {"plan": 2}))
+        timer.start()
+
+        result = flight.do(KEY, lambda session_id: pytest.fail("should not run"))
+        timer.join()
+
+        assert result.value == {"plan": 2}
+        assert not result.leader
+        assert result.session_id == 'remote'
+        assert flight.metrics()['coalesced_remote'] == 1
+
+    def test_failed_run_in_other_process_raises(self):
+        leases = FakeLeases({KEY.name: {'id': 'remote', 'status': 'active'}})
+        flight = make_flight(leases)
+        timer = threading.Timer(0.05, leases.release, args=('remote', 'failed', {'error': 'boom'}))
+        timer.start()
+        with pytest.raises(FlightFailed):
+            flight.do(KEY, lambda session_id: pytest.fail("should not run"))
+        timer.join()
+
+    def test_wait_times_out(self):
+        leases = FakeLeases({KEY.name: {'id': 'remote', 'status': 'active'}})
+        flight = make_flight(leases, wait_timeout=0.05)
+        with pytest.raises(TimeoutError):
+            flight.do(KEY, lambda session_id: None)
+
+    def test_failure_releases_lease_as_failed(self):
+        leases = FakeLeases()
+        flight = make_flight(leases)
+
+        def run(session_id):
+            raise ValueError("no plan")
+
+        with pytest.raises(ValueError):
+            flight.do(KEY, run)
+        assert leases.released == [("s1", "failed", {'error': 'no plan'})]
+        assert flight.metrics()['failed'] == 1
+
+    def test_lease_store_error_runs_unprotected(self):
+        def acquire(*args):
+            raise ConnectionError("database down")
+
+        flight = SingleFlight(acquire, None, None)
+        result = flight.do(KEY, lambda session_id: session_id or "ran")
+        assert result.value == "ran"
+        assert result.leader
+        assert flight.metrics()['lease_errors'] == 1
@@ -0,0 +1,103 @@
+"""
+Tests for speculative profiling and input fingerprints
+"""
+import threading
+from agent.fingerprint import changed_sections, fingerprint, profiler_fingerprint, section_fingerprints
+from agent.speculative import SpeculativeRunner, apply_late_sections
+
+
+USER_DATA = {
+    "user_id": "u1",
+    "location": {"city": "Oslo", "country": "Norway", "climate": "Continental"},
+    "household": {"size": 2, "heating_source": ["Electricity"]},
+    "transportation": {"primary_transport": "Public Train"},
+    "diet": {"diet_type": ["Vegetarian"], "shopping_frequency": "Weekly"},
+    "consumption": {"plastic_usage": None},
+    "goals": {"main_motivation": None},
+    "additional_info": "",
+}
+
+
+class TestFingerprint:
+    """Test which input changes alter the fingerprint."""
+
+    def test_key_order_and_empty_values_are_ignored(self):
+        assert fingerprint({"a": 1, "b": ""}) == fingerprint({"b": None, "a": 1})
+        assert fingerprint({"a": []}) == fingerprint({})
+        assert fingerprint({"a": 1}) != fingerprint({"a": 2})
+
+    def test_profiler_fingerprint_ignores_late_sections(self):
+        later = dict(USER_DATA, consumption={"plastic_usage": "Rarely"}, goals={"main_motivation": ["Health reasons"]})
+        assert profiler_fingerprint(later) == profiler_fingerprint(USER_DATA)
+
+        changed = dict(USER_DATA, diet={"diet_type": ["Vegan"], "shopping_frequency": "Weekly"})
+        assert profiler_fingerprint(changed) != profiler_fingerprint(USER_DATA)
+        assert profiler_fingerprint(dict(USER_DATA, additional_info="I cycle")) != profiler_fingerprint(USER_DATA)
+
+    def test_changed_sections(self):
+        before = section_fingerprints(USER_DATA)
+        assert "user_id" not in before
+        assert changed_sections(before, section_fingerprints(dict(USER_DATA))) == []
+
+        after = dict(USER_DATA, diet={"diet_type": ["Vegan"]}, goals={"main_motivation": ["Health reasons"]})
+        assert changed_sections(before, section_fingerprints(after)) == ["diet", "goals"]
+        # Answering a section that used to be empty counts; an empty new section does not
+        assert changed_sections(before, section_fingerprints(dict(USER_DATA, travel={"flights_per_year": None}))) == []
+        assert changed_sections(None, before) == ["location", "household", "transportation", "diet"]
+
+
+class TestSpeculativeRunner:
+    """Test reuse, restart and cancellation of speculative jobs."""
+
+    def test_matching_fingerprint_reuses_result(self):
+        runner = SpeculativeRunner(max_workers=1)
+        calls = []
+        runner.start('u1', 'fp1', lambda: calls.append(1) or {'profile': 1})
+        runner.start('u1', 'fp1', lambda: calls.append(2) or {'profile': 2})
+
+        assert runner.take('u1', 'fp1', timeout=5) == {'profile': 1}
+        assert calls == [1]
+        metrics = runner.metrics()
+        assert metrics['kept'] == 1 and metrics['reused'] == 1
+        runner.close()
+
+    def test_changed_fingerprint_restarts_job(self):
+        runner = SpeculativeRunner(max_workers=1)
+        release = threading.Event()
+        runner.start('u1', 'fp1', lambda: release.wait(5) and 'old')
+        runner.start('u1', 'fp2', lambda: 'new')
+        release.set()
+
+        assert runner.take('u1', 'fp2', timeout=5) == 'new'
+        assert runner.metrics()['cancelled'] == 1
+        runner.close()
+
+    def test_mismatch_or_failure_returns_none(self):
+        runner = SpeculativeRunner(max_workers=1)
+        runner.start('u1', 'fp1', lambda: 'stale')
+        assert runner.take('u1', 'fp2', timeout=5) is None
+
+        def boom():
+            raise RuntimeError("LLM error")
+
+        runner.start('u2', 'fp1', boom)
+        assert runner.take('u2', 'fp1', timeout=5) is None
+        assert runner.take('u3', 'fp1') is None
+        metrics = runner.metrics()
+        assert metrics['mismatched'] == 1 and metrics['failed'] == 1 and metrics['missing'] == 1
+        runner.close()
+
+
+def test_apply_late_sections_fills_copied_fields():
+    profile = {"key_levers": ["Fly less"], "consumption_patterns": {"shopping_frequency": "Daily"}}
+    final = dict(USER_DATA,
+                 consumption={"plastic_usage": "Rarely", "recycling_habits": "I recycle sometimes"},
+                 goals={"main_motivation": ["Saving money"], "biggest_challenge": ["Cost"],
+                        "improvement_area": ["Reducing waste"], "other_improvement_area": "Energy"})
+
+    result = apply_late_sections(profile, final)
+    assert result["key_levers"] == ["Fly less"]
+    assert result["consumption_patterns"] == {"shopping_frequency": "Weekly", "plastic_usage": "Rarely",
+                                              "recycling_habit": "I recycle sometimes"}
+    assert result["psychographic_insights"]["goals"] == ["Reducing waste", "Energy"]
+    assert profile["consumption_patterns"] == {"shopping_frequency": "Daily"}
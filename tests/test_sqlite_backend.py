@@ -0,0 +1,147 @@
+"""
+Tests for the embedded SQLite storage backend
+"""
+import pytest
+from data_model.sqlite_backend import SQLiteBackend, StorageError
+
+
+@pytest.fixture
+def backend():
+    """In-memory backend with one user."""
+    db = SQLiteBackend(':memory:')
+    db.table('users').insert({'id': 'u1', 'email': 'u1@example.com', 'first_name': 'Ada'}).execute()
+    yield db
+    db.close()
+
+
+class TestSQLiteBackend:
+    """Test the PostgREST-compatible query subset used by the data layer."""
+
+    def test_insert_generates_id_and_timestamp(self, backend):
+        """Inserts return the stored row with defaults filled in."""
+        response = backend.table('weekly_plans').insert({
+            'user_id': 'u1', 'week_of': '2025-01-06', 'suggestions': {'challenges': [{'id': 'c1'}]}
+        }).execute()
+
+        row = response.data[0]
+        assert row['id']
+        assert row['created_at']
+        assert row['suggestions'] == {'challenges': [{'id': 'c1'}]}
+
+    def test_select_columns_filters_order_and_limit(self, backend):
+        """Explicit columns, eq filters, ordering and limits behave like PostgREST."""
+        for i in range(3):
+            backend.table('weekly_plans').insert({
+                'user_id': 'u1', 'week_of': f'2025-01-0{i + 1}', 'created_at': f'2025-01-0{i + 1}T00:00:00+00:00'
+            }).execute()
+
+        response = backend.table('weekly_plans')\
+            .select('id, week_of')\
+            .eq('user_id', 'u1')\
+            .order('created_at', desc=True)\
+            .limit(2)\
+            .execute()
+
+        assert [row['week_of'] for row in response.data] == ['2025-01-03', '2025-01-02']
+        assert set(response.data[0]) == {'id', 'week_of'}
+
+    def test_count_exact(self, backend):
+        """count='exact' reports the number of matching rows."""
+        for status in ('completed', 'completed', 'pending'):
+            backend.table('user_actions').insert({'user_id': 'u1', 'status': status}).execute()
+
+        response = backend.table('user_actions').select('id', count='exact')\
+            .eq('user_id', 'u1').eq('status', 'completed').execute()
+        assert response.count == 2
+
+    def test_upsert_uses_primary_key(self, backend):
+        """Upserting user_profiles replaces the row for the same user."""
+        backend.table('user_profiles').upsert({'user_id': 'u1', 'onboarding_data': {'step': 1}}).execute()
+        backend.table('user_profiles').upsert({'user_id': 'u1', 'onboarding_data': {'step': 2}}).execute()
+
+        rows = backend.table('user_profiles').select('*').eq('user_id', 'u1').execute().data
+        assert len(rows) == 1
+        assert rows[0]['onboarding_data'] == {'step': 2}
+
+    def test_update_and_delete(self, backend):
+        """Updates return changed rows; booleans and now() are converted."""
+        response = backend.table('users').update({'onboarding_status': True, 'last_active_at': 'now()'})\
+            .eq('id', 'u1').execute()
+        assert response.data[0]['onboarding_status'] is True
+        assert response.data[0]['last_active_at'] != 'now()'
+
+        backend.table('users').delete().eq('id', 'u1').execute()
+        assert backend.table('users').select('id').execute().data == []
+
+    def test_or_filter_for_keyset_pagination(self, backend):
+        """Nested or/and filters work for (created_at, id) cursors."""
+        for row_id, created in (('a', '2025-01-01'), ('b', '2025-01-02'), ('c', '2025-01-02'), ('d', '2025-01-03')):
+            backend.table('user_actions').insert({'id': row_id, 'user_id': 'u1', 'created_at': created}).execute()
+
+        response = backend.table('user_actions')\
+            .select('id')\
+            .or_('created_at.lt.2025-01-02,and(created_at.eq.2025-01-02,id.lt.c)')\
+            .order('created_at', desc=True)\
+            .order('id', desc=True)\
+            .execute()
+        assert [row['id'] for row in response.data] == ['b', 'a']
+
+    def test_not_is_null(self, backend):
+        """not_.is_ negates a null check."""
+        backend.table('users').insert({'id': 'u2', 'email': 'u2@example.com'}).execute()
+        response = backend.table('users').select('id').not_.is_('first_name', 'null').execute()
+        assert [row['id'] for row in response.data] == ['u1']
+
+    def test_unknown_columns_are_rejected(self, backend):
+        """Unknown columns raise instead of being interpolated into SQL."""
+        with pytest.raises(StorageError):
+            backend.table('users').select('id; DROP TABLE users').execute()
+        with pytest.raises(StorageError):
+            backend.table('users').insert({'id': 'u3', 'nickname': 'x'}).execute()
+
+    def test_added_columns_are_migrated(self, tmp_path):
+        """Files created before a column was added gain it on open."""
+        import sqlite3
+        path = str(tmp_path / 'old.db')
+        conn = sqlite3.connect(path)
+        conn.execute('CREATE TABLE user_profiles (user_id TEXT PRIMARY KEY, onboarding_data TEXT, '
+                     'onboarding_final TEXT, created_at TEXT)')
+        conn.commit()
+        conn.close()
+
+        db = SQLiteBackend(path)
+        db.table('user_profiles').upsert({'user_id': 'u1', 'onboarding_draft': {'city': 'Oslo'}}).execute()
+        row = db.table('user_profiles').select('onboarding_draft').eq('user_id', 'u1').execute().data[0]
+        assert row['onboarding_draft'] == {'city': 'Oslo'}
+        db.close()
+
+    def test_one_active_lease_per_flight_key(self, backend):
+        """A second active agent session for the same flight key is rejected."""
+        lease = {'user_id': 'u1', 'agent_type': 'weekly_planning', 'status': 'active', 'flight_key': 'k1'}
+        backend.table('agent_sessions').insert(lease).execute()
+        with pytest.raises(StorageError):
+            backend.table('agent_sessions').insert(lease).execute()
+
+        backend.table('agent_sessions').update({'status': 'completed'}).eq('flight_key', 'k1').execute()
+        backend.table('agent_sessions').insert(lease).execute()
+
+    def test_feedback_is_backfilled_from_plans(self, tmp_path):
+        """Opening a file without user_feedback copies feedback out of plan documents."""
+        import sqlite3
+        path = str(tmp_path / 'old.db')
+        conn = sqlite3.connect(path)
+        conn.execute('CREATE TABLE users (id TEXT PRIMARY KEY, email TEXT)')
+        conn.execute('CREATE TABLE weekly_plans (id TEXT PRIMARY KEY, user_id TEXT, week_of TEXT, '
+                     'suggestions TEXT, created_at TEXT)')
+        conn.execute("INSERT INTO users VALUES ('u1', 'u1@example.com')")
+        conn.execute("INSERT INTO weekly_plans VALUES ('p1', 'u1', '2025-01-06', "
+                     "'{\"user_feedback\": \"no car\", \"feedback_summary\": \"User has no car.\"}', '2025-01-06')")
+        conn.execute("INSERT INTO weekly_plans VALUES ('p2', 'u1', '2025-01-13', '{\"challenges\": []}', '2025-01-13')")
+        conn.commit()
+        conn.close()
+
+        db = SQLiteBackend(path)
+        rows = db.table('user_feedback').select('user_id, week_of, raw_feedback, feedback_summary').execute().data
+        assert rows == [{'user_id': 'u1', 'week_of': '2025-01-06', 'raw_feedback': 'no car',
+                         'feedback_summary': 'User has no car.'}]
+        db.close()
@@ -0,0 +1,38 @@
+"""
+Tests for stored agent stage results (run against the SQLite backend)
+"""
+import pytest
+from agent.fingerprint import fingerprint
+from data_model.sqlite_backend import SQLiteBackend
+from data_model.storage import set_storage_backend
+from data_model import database
+
+
+@pytest.fixture
+def backend():
+    """In-memory backend with one user."""
+    db = SQLiteBackend(':memory:')
+    db.table('users').insert({'id': 'u1', 'email': 'u1@example.com'}).execute()
+    set_storage_backend(db)
+    yield db
+    set_storage_backend(None)
+    db.close()
+
+
+class TestStageResults:
+    """Test storing and replacing stage outputs with their input fingerprints."""
+
+    def test_latest_result_replaces_previous(self, backend):
+        assert database.get_stage_result('u1', 'profiler') is None
+
+        assert database.save_stage_result('u1', 'profiler', fingerprint({'diet': 'vegan'}),
+                                          {'diet': 'a'}, {'key_levers': ['diet']})
+        assert database.save_stage_result('u1', 'profiler', fingerprint({'diet': 'omnivore'}),
+                                          {'diet': 'b'}, {'key_levers': ['transport']})
+        database.save_stage_result('u1', 'analyst', 'f', {}, {'total': 1})
+
+        stored = database.get_stage_result('u1', 'profiler')
+        assert stored['input_fingerprint'] == fingerprint({'diet': 'omnivore'})
+        assert stored['section_fingerprints'] == {'diet': 'b'}
+        assert stored['output'] == {'key_levers': ['transport']}
+        assert database.get_stage_result('u1', 'analyst')['output'] == {'total': 1}
@@ -0,0 +1,28 @@
+"""
+Tests for per-session Supabase clients
+"""
+import httpx
+from data_model import supabase_client
+from data_model.supabase_client import create_session_client
+
+
+class TestSessionClients:
+    """Test that session clients share connections but not auth headers."""
+
+    def test_each_client_sends_its_own_token(self, monkeypatch):
+        """Clients restored for different tokens never send each other's Authorization header."""
+        sent = []
+
+        def handler(request):
+            sent.append(request.headers['Authorization'])
+            return httpx.Response(200, json=[])
+
+        monkeypatch.setattr(supabase_client, '_shared_transport', httpx.MockTransport(handler))
+        client_a = create_session_client('token-a')
+        client_b = create_session_client('token-b')
+
+        client_a.table('users').select('id').execute()
+        client_b.table('users').select('id').execute()
+        client_a.table('users').select('id').execute()
+
+        assert sent == ['Bearer token-a', 'Bearer token-b', 'Bearer token-a']
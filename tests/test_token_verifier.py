@@ -0,0 +1,121 @@
+"""
+Tests for local access-token verification
+"""
+import base64
+import json
+import time
+import pytest
+from jose import jwt
+from data_model import token_verifier
+from data_model.token_verifier import (
+    SigningKeyUnavailable,
+    TokenExpiredError,
+    TokenVerificationError,
+    TokenVerifier,
+    VerifiedUser,
+)
+
+SECRET = "test-jwt-secret"
+
+
+def make_token(secret=SECRET, expires_in=3600, **claims):
+    payload = {
+        'sub': 'user-123',
+        'email': 'test@example.com',
+        'aud': 'authenticated',
+        'role': 'authenticated',
+        'exp': int(time.time()) + expires_in,
+    }
+    payload.update(claims)
+    return jwt.encode(payload, secret, algorithm='HS256')
+
+
+def unsigned_token(**header):
+    """Token with an arbitrary header and a dummy signature."""
+    def encode(data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b'=').decode()
+    return f"{encode(header)}.{encode({'sub': 'user-123', 'aud': 'authenticated'})}.c2ln"
+
+
+class FakeJWKS:
+    """Stands in for httpx.get and counts JWKS fetches."""
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.fetches = 0
+
+    def __call__(self, url, headers=None, timeout=None):
+        self.fetches += 1
+        return self
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {'keys': self.keys}
+
+
+class TestTokenVerifier:
+    """Test HS256 verification without contacting the auth server."""
+
+    def test_valid_token_resolves_user(self):
+        """A correctly signed token yields the user from its claims."""
+        claims = TokenVerifier(jwt_secret=SECRET).verify(make_token())
+        user = VerifiedUser.from_claims(claims)
+
+        assert user.id == 'user-123'
+        assert user.email == 'test@example.com'
+        assert user.expires_at == claims['exp']
+
+    def test_expired_token(self):
+        """Expired tokens raise TokenExpiredError so callers can refresh."""
+        with pytest.raises(TokenExpiredError):
+            TokenVerifier(jwt_secret=SECRET, leeway=0).verify(make_token(expires_in=-60))
+
+    def test_bad_signature_and_audience(self):
+        """Tokens signed with another key or for another audience are rejected."""
+        verifier = TokenVerifier(jwt_secret=SECRET)
+        with pytest.raises(TokenVerificationError):
+            verifier.verify(make_token(secret='other-secret'))
+        with pytest.raises(TokenVerificationError):
+            verifier.verify(make_token(aud='anon'))
+
+    def test_missing_secret_falls_back(self):
+        """Without a configured key the caller is told to use the auth server."""
+        with pytest.raises(SigningKeyUnavailable):
+            TokenVerifier(jwt_secret=None).verify(make_token())
+
+
+class TestSigningKeys:
+    """Test algorithm checks and JWKS key selection."""
+
+    @pytest.mark.parametrize('algorithm', ['none', 'HS512', None])
+    def test_algorithm_outside_allowlist_is_rejected(self, algorithm):
+        with pytest.raises(TokenVerificationError) as excinfo:
+            TokenVerifier(jwt_secret=SECRET).verify(unsigned_token(alg=algorithm))
+        assert not isinstance(excinfo.value, SigningKeyUnavailable)
+
+    def test_unknown_kid_refetches_at_most_once_per_interval(self, monkeypatch):
+        jwks = FakeJWKS([{'kty': 'RSA', 'alg': 'RS256', 'kid': 'k1'}])
+        monkeypatch.setattr(token_verifier.httpx, 'get', jwks)
+        verifier = TokenVerifier(jwks_url='https://example.test/jwks', jwks_refresh_seconds=60)
+
+        for _ in range(5):
+            with pytest.raises(TokenVerificationError):
+                verifier.verify(unsigned_token(alg='RS256', kid='forged'))
+        # The initial fetch plus one forced refetch
+        assert jwks.fetches == 2
+
+    def test_key_without_kid_matches_algorithm(self):
+        keys = [{'kty': 'RSA', 'alg': 'RS256', 'kid': 'rsa'}, {'kty': 'EC', 'alg': 'ES256', 'kid': 'ec'}]
+        jwks = {'keys': keys}
+        assert TokenVerifier._find_jwk(jwks, 'ES256', None)['kid'] == 'ec'
+        assert TokenVerifier._find_jwk(jwks, 'RS256', None)['kid'] == 'rsa'
+        assert TokenVerifier._find_jwk(jwks, 'ES256', 'rsa') is None
+
+    def test_unreachable_jwks_falls_back(self, monkeypatch):
+        def unreachable(*args, **kwargs):
+            raise ConnectionError("offline")
+        monkeypatch.setattr(token_verifier.httpx, 'get', unreachable)
+        with pytest.raises(SigningKeyUnavailable):
+            TokenVerifier(jwks_url='https://example.test/jwks').verify(unsigned_token(alg='ES256', kid='k1'))
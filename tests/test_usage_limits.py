@@ -0,0 +1,92 @@
+"""
+Tests for per-user workflow rate limits and daily token budgets
+"""
+from datetime import datetime
+
+import pytest
+from agent.usage_limits import BudgetExhausted, RateLimited, TokenBucket, UsageLimiter
+
+NOON = datetime(2025, 1, 13, 12, 0).timestamp()
+
+
+class FakeClock:
+    def __init__(self, now=NOON):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket:
+    """Test refill and the wait reported for an empty bucket."""
+
+    def test_take_and_refill(self):
+        bucket = TokenBucket(capacity=60, refill_per_second=1.0, now=0.0)
+        assert bucket.take(40, now=0.0) == 0.0
+        assert bucket.take(40, now=0.0) == pytest.approx(20.0)
+        assert bucket.take(40, now=20.0) == 0.0
+
+    def test_refill_is_capped_at_capacity(self):
+        bucket = TokenBucket(capacity=60, refill_per_second=1.0, now=0.0)
+        bucket.take(60, now=0.0)
+        bucket.take(0, now=1000.0)
+        assert bucket.level == 60
+
+
+class TestUsageLimiter:
+    """Test admission against the rate limit and the daily token budget."""
+
+    def test_rate_limit_per_user(self):
+        clock = FakeClock()
+        limiter = UsageLimiter(rate_per_minute=60, workflow_cost=20, clock=clock)
+
+        for _ in range(3):
+            limiter.admit('u1', 'update_planning')
+        with pytest.raises(RateLimited) as excinfo:
+            limiter.admit('u1', 'update_planning')
+        assert excinfo.value.retry_after == pytest.approx(20.0)
+
+        # Other users have their own bucket
+        limiter.admit('u2', 'update_planning')
+
+        clock.now += 20
+        limiter.admit('u1', 'update_planning')
+        metrics = limiter.metrics()
+        assert (metrics['admitted'], metrics['rate_limited'], metrics['tracked_users']) == (5, 1, 2)
+
+    def test_daily_budget_from_recorded_usage(self):
+        clock = FakeClock()
+        limiter = UsageLimiter(rate_per_minute=600, daily_token_budget=10000, clock=clock)
+
+        limiter.record_tokens('u1', 6000)
+        limiter.admit('u1', 'planner')
+        limiter.record_tokens('u1', 4500)
+        assert limiter.remaining_tokens('u1') == 0
+        with pytest.raises(BudgetExhausted):
+            limiter.admit('u1', 'planner')
+        limiter.admit('u2', 'planner')
+
+        # The budget resets the next day
+        clock.now += 24 * 3600
+        assert limiter.tokens_used('u1') == 0
+        limiter.admit('u1', 'planner')
+
+    def test_zero_budget_disables_the_budget(self):
+        limiter = UsageLimiter(daily_token_budget=0, clock=FakeClock())
+        limiter.record_tokens('u1', 10 ** 9)
+        limiter.admit('u1', 'planner')
+        assert limiter.remaining_tokens('u1') is None
+
+    def test_usage_without_user_is_ignored(self):
+        limiter = UsageLimiter(clock=FakeClock())
+        limiter.record_tokens(None, 500)
+        assert limiter.metrics()['tokens_recorded'] == 0
+
+    def test_least_recently_seen_users_are_forgotten(self):
+        limiter = UsageLimiter(max_users=2, clock=FakeClock())
+        for user_id in ('u1', 'u2', 'u3'):
+            limiter.admit(user_id)
+            limiter.record_tokens(user_id, 100)
+        assert limiter.metrics()['tracked_users'] == 2
+        assert limiter.tokens_used('u1') == 0
+        assert limiter.tokens_used('u3') == 100
@@ -0,0 +1,213 @@
+"""
+Tests for the write-behind buffer
+"""
+import time
+import pytest
+from data_model.write_buffer import WriteBehindBuffer
+
+
+class RecordingWriter:
+    """Collects batched writes; optionally fails the first N calls."""
+
+    def __init__(self, failures: int = 0):
+        self.inserts = []
+        self.updates = []
+        self.failures = failures
+
+    def insert(self, table, rows):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("temporary failure")
+        self.inserts.append((table, list(rows)))
+
+    def update(self, table, match, values):
+        self.updates.append((table, match, values))
+
+
+def make_buffer(writer, **kwargs):
+    options = dict(batch_size=3, flush_interval=60, backoff_base=0.001, register_atexit=False)
+    options.update(kwargs)
+    return WriteBehindBuffer(writer.insert, writer.update, **options)
+
+
+class TestWriteBehindBuffer:
+    """Test batching, coalescing, retries and metrics."""
+
+    def test_rows_are_batched_per_table(self):
+        """Inserts for the same table are written in one batch."""
+        writer = RecordingWriter()
+        buffer = make_buffer(writer)
+        buffer.enqueue_insert('agent_messages', {'content': 'a'})
+        buffer.enqueue_insert('agent_messages', {'content': 'b'})
+        buffer.enqueue_insert('user_actions', {'action_id': 'x'})
+
+        assert writer.inserts == []
+        buffer.flush()
+
+        assert ('agent_messages', [{'content': 'a'}, {'content': 'b'}]) in writer.inserts
+        assert ('user_actions', [{'action_id': 'x'}]) in writer.inserts
+        buffer.close()
+
+    def test_batch_size_triggers_background_flush(self):
+        """Reaching the batch size flushes without waiting for the interval."""
+        writer = RecordingWriter()
+        buffer = make_buffer(writer)
+        for i in range(3):
+            buffer.enqueue_insert('agent_messages', {'content': str(i)})
+
+        deadline = time.time() + 2
+        while not writer.inserts and time.time() < deadline:
+            time.sleep(0.01)
+
+        assert len(writer.inserts) == 1
+        assert len(writer.inserts[0][1]) == 3
+        buffer.close()
+
+    def test_flush_interval_triggers_background_flush(self):
+        """A lone row is flushed once the interval elapses."""
+        writer = RecordingWriter()
+        buffer = make_buffer(writer, flush_interval=0.05)
+        buffer.enqueue_insert('user_actions', {'action_id': 'x'})
+
+        deadline = time.time() + 2
+        while not writer.inserts and time.time() < deadline:
+            time.sleep(0.01)
+
+        assert writer.inserts == [('user_actions', [{'action_id': 'x'}])]
+        buffer.close()
+
+    def test_updates_to_same_row_are_coalesced(self):
+        """Repeated updates of one row become a single merged write."""
+        writer = RecordingWriter()
+        buffer = make_buffer(writer)
+        buffer.enqueue_update('agent_sessions', {'id': 's1'}, {'status': 'active'})
+        buffer.enqueue_update('agent_sessions', {'id': 's1'}, {'status': 'completed', 'final_output': {'ok': True}})
+        buffer.flush()
+
+        assert writer.updates == [
+            ('agent_sessions', {'id': 's1'}, {'status': 'completed', 'final_output': {'ok': True}})
+        ]
+        assert buffer.metrics()['updates_coalesced'] == 1
+        buffer.close()
+
+    def test_failed_batches_are_retried(self):
+        """Transient failures are re-queued and retried by later flushes."""
+        writer = RecordingWriter(failures=2)
+        buffer = make_buffer(writer, max_retries=3, backoff_base=0.05)
+        buffer.enqueue_insert('user_actions', {'action_id': 'x'})
+        buffer.flush()
+        assert writer.inserts == []
+        assert buffer.metrics()['retry_queue_depth'] == 1
+
+        buffer.close()
+        metrics = buffer.metrics()
+        assert writer.inserts == [('user_actions', [{'action_id': 'x'}])]
+        assert metrics['retries'] == 2
+        assert metrics['rows_written'] == 1
+
+    def test_flush_does_not_wait_out_backoff(self):
+        """A batch in backoff is skipped, so readers flushing before a read are not delayed."""
+        writer = RecordingWriter(failures=1)
+        buffer = make_buffer(writer, backoff_base=30)
+        buffer.enqueue_insert('user_actions', {'action_id': 'x'})
+        buffer.flush()
+
+        started = time.monotonic()
+        buffer.enqueue_insert('agent_messages', {'content': 'a'})
+        buffer.flush()
+
+        assert time.monotonic() - started < 1
+        assert writer.inserts == [('agent_messages', [{'content': 'a'}])]
+        assert buffer.metrics()['retry_queue_depth'] == 1
+
+    def test_update_retry_keeps_newer_values(self):
+        """An update queued while an older one is in backoff is merged into it, newest values winning."""
+        updates = []
+        failures = [1]
+
+        def update(table, match, values):
+            if failures[0]:
+                failures[0] -= 1
+                raise ConnectionError("temporary failure")
+            updates.append((table, match, values))
+
+        buffer = WriteBehindBuffer(lambda table, rows: None, update, flush_interval=60, backoff_base=0.001,
+                                   register_atexit=False)
+        buffer.enqueue_update('agent_sessions', {'id': 's1'}, {'status': 'active', 'step': 1})
+        buffer.flush()
+        buffer.enqueue_update('agent_sessions', {'id': 's1'}, {'status': 'completed'})
+        buffer.close()
+
+        assert updates == [('agent_sessions', {'id': 's1'}, {'status': 'completed', 'step': 1})]
+
+    def test_batches_are_dead_lettered_after_max_retries(self):
+        """Permanent failures are kept in the dead-letter list and can be re-queued."""
+        writer = RecordingWriter(failures=2)
+        letters = []
+        buffer = make_buffer(writer, max_retries=1, on_dead_letter=letters.append)
+        buffer.enqueue_insert('user_actions', {'action_id': 'x'})
+        buffer.flush()
+        time.sleep(0.01)
+        buffer.flush()
+
+        assert buffer.metrics()['rows_dead_lettered'] == 1
+        assert [letter['rows'] for letter in buffer.dead_letters()] == [[{'action_id': 'x'}]]
+        assert letters[0]['table'] == 'user_actions'
+
+        assert buffer.requeue_dead_letters() == 1
+        buffer.close()
+        assert writer.inserts == [('user_actions', [{'action_id': 'x'}])]
+        assert buffer.dead_letters() == []
+
+    def test_close_flushes_remaining_rows(self):
+        """Shutdown writes everything still queued."""
+        writer = RecordingWriter()
+        buffer = make_buffer(writer)
+        buffer.enqueue_insert('agent_messages', {'content': 'last'})
+        buffer.close()
+
+        assert writer.inserts == [('agent_messages', [{'content': 'last'}])]
+        with pytest.raises(RuntimeError):
+            buffer.enqueue_insert('agent_messages', {'content': 'too late'})
+
+    def test_metrics_report_queue_depth_and_latency(self):
+        """Metrics expose queue depth before and flush latency after a flush."""
+        writer = RecordingWriter()
+        buffer = make_buffer(writer)
+        buffer.enqueue_insert('agent_messages', {'content': 'a'})
+        buffer.enqueue_update('agent_sessions', {'id': 's1'}, {'status': 'failed'})
+
+        before = buffer.metrics()
+        assert before['queue_depth'] == 2
+        assert before['queue_depth_by_table'] == {'agent_messages': 1, 'agent_sessions': 1}
+
+        buffer.flush()
+        after = buffer.metrics()
+        assert after['queue_depth'] == 0
+        assert after['flushes'] == 1
+        assert after['last_flush_latency_ms'] >= 0
+        buffer.close()
+
+    def test_context_captured_at_enqueue(self):
+        """Writes are grouped by the caller's context and flushed with it."""
+        calls = []
+        current = {'token': 'token-a'}
+        buffer = WriteBehindBuffer(
+            lambda table, rows, context: calls.append((table, context, len(rows))),
+            lambda table, match, values, context: calls.append((table, context, 1)),
+            batch_size=10, flush_interval=60, register_atexit=False,
+            context_provider=lambda: current['token'],
+        )
+        buffer.enqueue_insert('user_actions', {'id': 1})
+        buffer.enqueue_insert('user_actions', {'id': 2})
+        current['token'] = 'token-b'
+        buffer.enqueue_insert('user_actions', {'id': 3})
+        buffer.enqueue_update('agent_sessions', {'id': 's1'}, {'status': 'completed'})
+        buffer.flush()
+
+        assert sorted(calls) == [
+            ('agent_sessions', 'token-b', 1),
+            ('user_actions', 'token-a', 2),
+            ('user_actions', 'token-b', 1),
+        ]
+        buffer.close()
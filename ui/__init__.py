@@ -0,0 +1 @@
+# ui package
@@ -0,0 +1,219 @@
+"""
+Precomputed, size-optimized static image assets.
+
+Landing-page images are resized and recompressed once (at build time via
+`python -m ui.assets`, or lazily on first use at startup) into
+static/assets/, which Streamlit serves at /app/static/ when
+server.enableStaticServing is on (see .streamlit/config.toml). Pages then
+reference the images by URL with a srcset, so browsers download only the
+variant they need and can cache it across visits.
+
+The generated <picture> markup is cached in process memory, keyed by the
+source file's mtime, so a page render does no file I/O or encoding. When
+static serving is disabled, a mid-sized WebP variant is inlined as
+base64 (also cached) instead of the original file.
+"""
+import base64
+import logging
+import os
+import shutil
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; without it the original file is served as-is
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = "static"
+ASSET_DIR = os.path.join(STATIC_DIR, "assets")
+STATIC_URL_PREFIX = "app/static"
+
+# Target widths; variants wider than the source are skipped
+VARIANT_WIDTHS = (640, 1024, 1600)
+JPEG_QUALITY = 80
+WEBP_QUALITY = 78
+
+# Landing-page images prebuilt by `python -m ui.assets`
+LANDING_IMAGES = ("images/cover_image_1.jpg", "images/cover_image_2.jpg")
+
+_lock = threading.Lock()
+_html_cache: Dict[Tuple[str, float, str, str, str], str] = {}
+_variant_cache: Dict[Tuple[str, float], List["ImageVariant"]] = {}
+
+
+@dataclass(frozen=True)
+class ImageVariant:
+    """One generated rendition of a source image."""
+    path: str
+    width: int
+    format: str
+
+    @property
+    def url(self) -> str:
+        relative = os.path.relpath(self.path, STATIC_DIR).replace(os.sep, "/")
+        return f"{STATIC_URL_PREFIX}/{relative}"
+
+    @property
+    def mime_type(self) -> str:
+        return "image/webp" if self.format == "webp" else "image/jpeg"
+
+
+def _variant_path(source: str, width: int, fmt: str, output_dir: str) -> str:
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(output_dir, f"{stem}-{width}.{fmt}")
+
+
+def _is_fresh(path: str, source_mtime: float) -> bool:
+    return os.path.exists(path) and os.path.getmtime(path) >= source_mtime
+
+
+def build_image_variants(source: str, widths: Tuple[int, ...] = VARIANT_WIDTHS,
+                         output_dir: str = None) -> List[ImageVariant]:
+    """
+    Generate resized JPEG and WebP variants of `source` (skipping up-to-date ones).
+
+    Args:
+        source: Path of the original image
+        widths: Target widths in pixels
+        output_dir: Directory the variants are written to (defaults to ASSET_DIR)
+
+    Returns:
+        list: Generated variants, narrowest first (JPEG and WebP per width)
+    """
+    output_dir = output_dir or ASSET_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    source_mtime = os.path.getmtime(source)
+
+    if Image is None:
+        # No Pillow: publish the original so it can still be served by URL
+        target = os.path.join(output_dir, os.path.basename(source))
+        if not _is_fresh(target, source_mtime):
+            shutil.copyfile(source, target)
+        logger.warning("Pillow is not installed; serving %s without resizing", source)
+        return [ImageVariant(target, 0, "jpeg")]
+
+    variants = []
+    with Image.open(source) as original:
+        original = original.convert("RGB")
+        source_width, source_height = original.size
+        # Always include the source width so the largest variant is never upscaled
+        target_widths = sorted({w for w in widths if w < source_width} | {min(max(widths), source_width)})
+
+        for width in target_widths:
+            height = round(source_height * width / source_width)
+            resized = None
+            for fmt, options in (("webp", {"quality": WEBP_QUALITY, "method": 6}),
+                                 ("jpeg", {"quality": JPEG_QUALITY, "optimize": True, "progressive": True})):
+                path = _variant_path(source, width, fmt, output_dir)
+                if not _is_fresh(path, source_mtime):
+                    if resized is None:
+                        resized = original if width == source_width else original.resize((width, height), Image.LANCZOS)
+                    resized.save(path, fmt.upper(), **options)
+                variants.append(ImageVariant(path, width, fmt))
+
+    return variants
+
+
+def get_image_variants(source: str) -> List[ImageVariant]:
+    """
+    Return the variants of `source`, building them on first use.
+
+    Args:
+        source: Path of the original image
+
+    Returns:
+        list: Variants, cached in process memory until the source changes
+    """
+    key = (source, os.path.getmtime(source))
+    with _lock:
+        variants = _variant_cache.get(key)
+        if variants is None:
+            variants = build_image_variants(source)
+            _variant_cache[key] = variants
+    return variants
+
+
+def _static_serving_enabled() -> bool:
+    try:
+        import streamlit as st
+        return bool(st.get_option("server.enableStaticServing"))
+    except Exception:
+        return False
+
+
+def _inline_data_uri(variant: ImageVariant) -> str:
+    with open(variant.path, "rb") as image_file:
+        encoded = base64.b64encode(image_file.read()).decode()
+    return f"data:{variant.mime_type};base64,{encoded}"
+
+
+def _build_picture_html(variants: List[ImageVariant], css_class: str, alt: str, sizes: str) -> str:
+    webp = [v for v in variants if v.format == "webp"]
+    fallback = [v for v in variants if v.format != "webp"]
+    largest = fallback[-1]
+
+    if not _static_serving_enabled():
+        # Inline the mid-sized WebP (or the only variant) rather than the original file
+        inline = webp[len(webp) // 2] if webp else largest
+        return f'<img src="{_inline_data_uri(inline)}" class="{css_class}" alt="{alt}">'
+
+    def srcset(items: List[ImageVariant]) -> str:
+        return ", ".join(f"{v.url} {v.width}w" for v in items if v.width)
+
+    sources = ""
+    if webp:
+        sources = f'<source type="image/webp" srcset="{srcset(webp)}" sizes="{sizes}">'
+    fallback_srcset = srcset(fallback)
+    srcset_attr = f' srcset="{fallback_srcset}" sizes="{sizes}"' if fallback_srcset else ""
+    return (
+        f'<picture>{sources}'
+        f'<img src="{largest.url}"{srcset_attr} class="{css_class}" alt="{alt}" decoding="async">'
+        f'</picture>'
+    )
+
+
+def picture_html(source: str, css_class: str = "", alt: str = "", sizes: str = "100vw") -> str:
+    """
+    Return cached <picture> markup referencing the static variants of `source`.
+
+    Args:
+        source: Path of the original image
+        css_class: CSS class for the <img>
+        alt: Alternative text
+        sizes: `sizes` attribute for responsive selection
+
+    Returns:
+        str: HTML snippet (empty string if the image is missing)
+    """
+    try:
+        key = (source, os.path.getmtime(source), css_class, alt, sizes)
+    except OSError:
+        return ""
+
+    html = _html_cache.get(key)
+    if html is None:
+        html = _build_picture_html(get_image_variants(source), css_class, alt, sizes)
+        with _lock:
+            _html_cache[key] = html
+    return html
+
+
+def build_landing_assets() -> None:
+    """Prebuild variants for the landing-page images."""
+    for source in LANDING_IMAGES:
+        if not os.path.exists(source):
+            continue
+        variants = build_image_variants(source)
+        original_kb = os.path.getsize(source) / 1024
+        for variant in variants:
+            logger.info("%s -> %s (%.0f KB, original %.0f KB)",
+                        source, variant.path, os.path.getsize(variant.path) / 1024, original_kb)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    build_landing_assets()
@@ -0,0 +1,189 @@
+"""
+Cached chart data for the dashboard's carbon analysis section.
+
+The carbon analysis only changes when the analyst agent saves a new
+user_scores row, but every dashboard rerun used to rebuild its DataFrames
+and Altair chart. get_carbon_charts() derives the metric values, the
+category table and a Vega-Lite spec once per (user, scores version) and
+keeps them in process memory. The scores version is the row's
+calculated_at; entries for a user are also dropped as soon as
+save_agent_results writes new scores (see database.on_scores_saved).
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+
+from data_model.database import on_scores_saved
+
+EMISSIONS_COLUMN = 'Annual Emissions (kg CO₂)'
+
+CATEGORY_NAMES = {
+    'transportation_kg': 'Transportation',
+    'diet_kg': 'Diet',
+    'home_energy_kg': 'Home Energy',
+    'shopping_kg': 'Shopping',
+    'digital_footprint_kg': 'Digital Footprint',
+    'other_kg': 'Other'
+}
+
+# Users' chart sets kept in memory before the least recently used is dropped
+MAX_CACHED_CHARTS = 512
+
+_lock = threading.Lock()
+_cache: "OrderedDict[Tuple[str, Optional[str]], CarbonCharts]" = OrderedDict()
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+
+@dataclass(frozen=True)
+class CarbonCharts:
+    """Precomputed display data for one version of a user's scores."""
+    metrics: Dict[str, Any]
+    category_table: Optional[pd.DataFrame]
+    category_spec: Optional[Dict[str, Any]]
+
+
+def build_metrics(calculation_data: dict, benchmark_data: dict) -> Dict[str, Any]:
+    """
+    Derive the headline metric values shown above the chart.
+
+    Args:
+        calculation_data (dict): Analyst scores
+        benchmark_data (dict): Analyst benchmarks
+
+    Returns:
+        dict: Values for the four metric tiles
+    """
+    total_footprint_kg = calculation_data.get('total_carbon_footprint_kg', 0)
+    regional_comparison = calculation_data.get('regional_comparison', benchmark_data.get('regional_comparison', {}))
+    percentage_diff = regional_comparison.get('percentage_difference', 0)
+    top_categories = calculation_data.get('top_impact_categories', [])
+
+    return {
+        'total_footprint_tonnes': calculation_data.get('total_carbon_footprint_tonnes', total_footprint_kg / 1000),
+        'sustainability_score': calculation_data.get('sustainability_score', benchmark_data.get('sustainability_score', 0)),
+        'score_category': calculation_data.get('score_category', benchmark_data.get('score_category', 'Unknown')),
+        'regional_comparison': regional_comparison,
+        'comparison_status': regional_comparison.get('comparison_status', 'unknown'),
+        'comparison_delta': f"{percentage_diff:+.1f}%" if percentage_diff != 0 else "0%",
+        'top_category': top_categories[0] if top_categories else 'N/A',
+    }
+
+
+def build_category_table(category_breakdown: dict) -> Optional[pd.DataFrame]:
+    """
+    Build the per-category emissions table, largest first.
+
+    Args:
+        category_breakdown (dict): Emissions in kg keyed by category (e.g. 'diet_kg')
+
+    Returns:
+        DataFrame: Category, emissions and percentage columns, or None if all zero
+    """
+    rows = [
+        (CATEGORY_NAMES.get(key, key.replace('_kg', '').replace('_', ' ').title()), value)
+        for key, value in (category_breakdown or {}).items()
+        if value > 0  # Only show non-zero categories
+    ]
+    if not rows:
+        return None
+
+    df = pd.DataFrame(rows, columns=['Category', EMISSIONS_COLUMN])
+    df = df.sort_values(by=EMISSIONS_COLUMN, ascending=False).reset_index(drop=True)
+    df['Percentage'] = (df[EMISSIONS_COLUMN] / df[EMISSIONS_COLUMN].sum() * 100).round(1).astype(str) + '%'
+    return df
+
+
+def build_category_spec(category_table: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Build the Vega-Lite bar chart spec for the category table.
+
+    The data is inlined, so the spec can be rendered with
+    st.vega_lite_chart(spec) without rebuilding an Altair chart.
+
+    Args:
+        category_table (DataFrame): Output of build_category_table
+
+    Returns:
+        dict: Vega-Lite spec
+    """
+    values = [
+        {'Category': category, EMISSIONS_COLUMN: float(emissions)}
+        for category, emissions in zip(category_table['Category'], category_table[EMISSIONS_COLUMN])
+    ]
+    return {
+        'data': {'values': values},
+        'mark': 'bar',
+        'encoding': {
+            'x': {'field': 'Category', 'type': 'nominal', 'title': 'Emission Category',
+                  'sort': None, 'axis': {'labelAngle': 45}},
+            'y': {'field': EMISSIONS_COLUMN, 'type': 'quantitative', 'title': EMISSIONS_COLUMN},
+        },
+    }
+
+
+def build_carbon_charts(calculation_data: dict, benchmark_data: dict) -> CarbonCharts:
+    """Derive metrics, table and chart spec (uncached)."""
+    category_table = build_category_table(calculation_data.get('category_breakdown', {}))
+    return CarbonCharts(
+        metrics=build_metrics(calculation_data, benchmark_data),
+        category_table=category_table,
+        category_spec=build_category_spec(category_table) if category_table is not None else None,
+    )
+
+
+def get_carbon_charts(user_id: str, scores_version: Optional[str], calculation_data: dict,
+                      benchmark_data: dict) -> CarbonCharts:
+    """
+    Return the carbon analysis display data, building it once per scores version.
+
+    Args:
+        user_id (str): The user's UUID
+        scores_version (str): user_scores.calculated_at of the displayed scores
+        calculation_data (dict): Analyst scores
+        benchmark_data (dict): Analyst benchmarks
+
+    Returns:
+        CarbonCharts: Cached display data
+    """
+    key = (user_id, scores_version)
+    with _lock:
+        charts = _cache.get(key)
+        if charts is not None:
+            _cache.move_to_end(key)
+            _stats['hits'] += 1
+            return charts
+        _stats['misses'] += 1
+
+    charts = build_carbon_charts(calculation_data, benchmark_data)
+    with _lock:
+        _cache[key] = charts
+        while len(_cache) > MAX_CACHED_CHARTS:
+            _cache.popitem(last=False)
+    return charts
+
+
+def invalidate_user_charts(user_id: str) -> None:
+    """Drop every cached chart set for `user_id` (called when new scores are saved)."""
+    with _lock:
+        for key in [key for key in _cache if key[0] == user_id]:
+            del _cache[key]
+            _stats['invalidations'] += 1
+
+
+def get_chart_cache_stats() -> Dict[str, int]:
+    """
+    Get hit/miss counts for the chart cache.
+
+    Returns:
+        dict: Hits, misses, invalidations and current size
+    """
+    with _lock:
+        stats = dict(_stats)
+        stats['size'] = len(_cache)
+    return stats
+
+
+on_scores_saved(invalidate_user_charts)
@@ -0,0 +1,114 @@
+"""
+Live workflow progress in Streamlit pages.
+
+run_with_progress() runs an agent workflow on a worker thread (attached to
+the session's script context, so the data layer still sees the session)
+and follows the session's progress channel from the script thread,
+rendering each event into an st.status box as it arrives. This replaces
+the static spinner that was shown for multi-minute runs.
+"""
+import logging
+import threading
+import uuid
+from typing import Any, Callable
+
+import streamlit as st
+
+from agent.progress import (
+    FAILED, FINISHED, RETRY, STARTED, STEP, TOKENS,
+    ProgressEvent, ProgressReporter, get_progress_broker
+)
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx
+except ImportError:  # Older Streamlit versions
+    add_script_run_ctx = None
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_KEY = "progress_channel"
+
+# Seconds between checks of the worker thread while no event arrives
+POLL_SECONDS = 0.5
+
+
+def get_progress_channel() -> str:
+    """Return this session's progress channel id (unguessable, created on first use)."""
+    if CHANNEL_KEY not in st.session_state:
+        st.session_state[CHANNEL_KEY] = uuid.uuid4().hex
+    return st.session_state[CHANNEL_KEY]
+
+
+def format_event(event: ProgressEvent) -> str:
+    """One-line, user-facing description of a progress event."""
+    stage = (event.stage or event.workflow).replace('_', ' ')
+    if event.kind == STARTED:
+        return f"▶️ {event.message or stage.capitalize()}…"
+    if event.kind == FINISHED:
+        return f"✅ Finished {stage}"
+    if event.kind == FAILED:
+        return f"❌ {stage.capitalize()} failed: {event.message}"
+    if event.kind == RETRY:
+        return f"🔁 Retrying {stage} (attempt {event.attempt}) {event.message}".rstrip()
+    if event.kind == TOKENS:
+        return f"🔢 {event.tokens:,} tokens used"
+    return f"🔄 {event.message}"
+
+
+def run_with_progress(label: str, workflow: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run `fn(*args, progress=reporter, **kwargs)` and show its progress live.
+
+    Args:
+        label: Status box label while running
+        workflow: Workflow name attached to the events
+        fn: Workflow function accepting a `progress` keyword argument
+
+    Returns:
+        The workflow's return value (exceptions are re-raised)
+    """
+    channel = get_progress_channel()
+    broker = get_progress_broker()
+    subscription = broker.subscribe(channel)
+    reporter = ProgressReporter(channel, workflow, broker)
+    outcome = {}
+
+    def target():
+        try:
+            outcome['result'] = fn(*args, progress=reporter, **kwargs)
+        except Exception as e:
+            outcome['error'] = e
+
+    worker = threading.Thread(target=target, name=f"workflow-{workflow}", daemon=True)
+    if add_script_run_ctx is not None:
+        add_script_run_ctx(worker)
+
+    try:
+        with st.status(label, expanded=False) as status:
+            worker.start()
+            while worker.is_alive():
+                event = subscription.get(timeout=POLL_SECONDS)
+                if event is not None:
+                    _render_event(status, label, event)
+            for event in subscription.drain():
+                _render_event(status, label, event)
+
+            if 'error' in outcome:
+                status.update(label=f"{label} — failed", state="error")
+            else:
+                tokens = f" ({reporter.tokens_so_far:,} tokens)" if reporter.tokens_so_far else ""
+                status.update(label=f"{label} — done{tokens}", state="complete")
+    finally:
+        subscription.close()
+
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome.get('result')
+
+
+def _render_event(status, label: str, event: ProgressEvent) -> None:
+    if event.kind == STEP:
+        # Steps are frequent; show the latest in the label rather than one line each
+        status.update(label=f"{label} · {event.message[:80]}")
+        return
+    status.write(format_event(event))
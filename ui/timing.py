@@ -0,0 +1,73 @@
+"""
+Fragment helpers with render timing.
+
+timed_fragment wraps st.fragment so a panel reruns on its own when one of
+its widgets changes, and logs how long each render (full-page or
+fragment-only) took. get_render_stats() summarizes timings per panel.
+"""
+import functools
+import logging
+import threading
+import time
+from typing import Dict
+
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_stats: Dict[str, Dict[str, float]] = {}
+
+
+def record_render(name: str, elapsed_ms: float) -> None:
+    """
+    Record one render of panel `name`.
+
+    Args:
+        name: Panel name
+        elapsed_ms: Render time in milliseconds
+    """
+    with _lock:
+        stats = _stats.setdefault(name, {'renders': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'last_ms': 0.0})
+        stats['renders'] += 1
+        stats['total_ms'] += elapsed_ms
+        stats['last_ms'] = elapsed_ms
+        stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+    logger.info(f"Rendered fragment {name} in {elapsed_ms:.1f} ms")
+
+
+def get_render_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Snapshot of render timings per panel.
+
+    Returns:
+        dict: name -> renders, total_ms, avg_ms, max_ms, last_ms
+    """
+    with _lock:
+        snapshot = {name: dict(stats) for name, stats in _stats.items()}
+    for stats in snapshot.values():
+        stats['avg_ms'] = stats['total_ms'] / stats['renders'] if stats['renders'] else 0.0
+    return snapshot
+
+
+def timed_fragment(name: str, run_every=None):
+    """
+    Decorator turning a render function into a timed Streamlit fragment.
+
+    Args:
+        name: Panel name used in logs and stats
+        run_every: Optional auto-rerun interval passed to st.fragment
+
+    Returns:
+        Callable: Decorator
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record_render(name, (time.perf_counter() - started) * 1000)
+        return st.fragment(timed, run_every=run_every)
+    return decorator